@@ -5,4 +5,4 @@
 """
 
 from .augmentedYaml import YamlDumpDocWrap, YamlDumpWrap, writeAsYaml, nodeToPy
-from .yamlReader import YamlReader
+from .yamlReader import YamlReader, YamlLoader
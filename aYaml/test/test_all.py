@@ -3,6 +3,7 @@
 
 import unittest
 from .test_augmentedYaml import TestAugmentedYaml
+from .test_yamlReader import TestYamlReader
 
 if __name__ == '__main__':
     unittest.main(verbosity=3)
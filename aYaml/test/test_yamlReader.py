@@ -0,0 +1,122 @@
+#!/usr/bin/env python3.9
+
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+import yaml
+import aYaml
+from configVar import config_vars, ConfigVarYamlReader
+
+main_yaml_text = """--- !define
+A: a
+B: [1, 2.5, ~, "quoted", 'single']
+C: &anchor
+    - x
+    - y
+D: *anchor
+__include__: included.yaml
+--- !define_post
+POST: post
+--- !index
+ITEM_IID:
+    name: item
+    install_sources:
+        - !dir Mac/item
+        - !file Win/item.exe
+--- !unknown
+ignored: true
+...
+---
+NO_TAG: no tag
+"""
+
+included_yaml_text = """--- !define
+INCLUDED: included
+"""
+
+
+class RecordingYamlReader(ConfigVarYamlReader):
+    """ record the documents read, in the order they were handed to the specific doc readers """
+    def __init__(self, yaml_loader) -> None:
+        super().__init__(config_vars)
+        self.yaml_loader = yaml_loader
+        self.docs = list()
+
+    def init_specific_doc_readers(self):
+        super().init_specific_doc_readers()
+        self.specific_doc_readers["__no_tag__"] = self.record_doc
+        self.specific_doc_readers["!define"] = self.record_doc
+        self.specific_doc_readers["!index"] = self.record_doc
+
+    def record_doc(self, a_node, *args, **kwargs):
+        self.docs.append((os.path.basename(kwargs['path-to-file']), a_node.tag, a_node.start_mark.line, aYaml.nodeToPy(a_node, preserve_tags=True)))
+        if a_node.isMapping() and "__include__" in a_node:
+            included_path = Path(kwargs['path-to-file']).parent.joinpath(a_node["__include__"].value)
+            self.read_yaml_file(included_path, *args)
+
+
+class TestYamlReader(unittest.TestCase):
+    def setUp(self):
+        config_vars["READ_YAML_FILES"] = None
+        self.work_folder = Path(tempfile.mkdtemp())
+        self.main_yaml_path = self.work_folder.joinpath("main.yaml")
+        self.main_yaml_path.write_text(main_yaml_text)
+        self.work_folder.joinpath("included.yaml").write_text(included_yaml_text)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_folder, ignore_errors=True)
+
+    def assertSameNodes(self, python_node, fast_node):
+        self.assertIs(type(python_node), type(fast_node))
+        self.assertEqual(python_node.tag, fast_node.tag)
+        self.assertEqual((python_node.start_mark.line, python_node.start_mark.column), (fast_node.start_mark.line, fast_node.start_mark.column))
+        self.assertEqual((python_node.end_mark.line, python_node.end_mark.column), (fast_node.end_mark.line, fast_node.end_mark.column))
+        if python_node.isScalar():
+            self.assertEqual(python_node.value, fast_node.value)
+        elif python_node.isSequence():
+            self.assertEqual(len(python_node.value), len(fast_node.value))
+            for python_item, fast_item in zip(python_node.value, fast_node.value):
+                self.assertSameNodes(python_item, fast_item)
+        else:
+            self.assertEqual(len(python_node.value), len(fast_node.value))
+            for (python_key, python_val), (fast_key, fast_val) in zip(python_node.value, fast_node.value):
+                self.assertSameNodes(python_key, fast_key)
+                self.assertSameNodes(python_val, fast_val)
+
+    def test_compose_parity(self):
+        python_docs = list(yaml.compose_all(main_yaml_text, Loader=yaml.Loader))
+        fast_docs = list(yaml.compose_all(main_yaml_text, Loader=aYaml.YamlLoader))
+        self.assertEqual(len(python_docs), 5)
+        self.assertEqual(len(python_docs), len(fast_docs))
+        for python_doc, fast_doc in zip(python_docs, fast_docs):
+            self.assertSameNodes(python_doc, fast_doc)
+        self.assertIs(fast_docs[0]["C"], fast_docs[0]["D"])  # alias refers to the anchored node
+
+    def test_read_yaml_file_parity(self):
+        python_reader = RecordingYamlReader(yaml.Loader)
+        python_reader.read_yaml_file(self.main_yaml_path)
+        fast_reader = RecordingYamlReader(aYaml.YamlLoader)
+        fast_reader.read_yaml_file(self.main_yaml_path)
+        self.assertEqual([(file_name, tag) for file_name, tag, _, _ in python_reader.docs],
+                         [("main.yaml", "!define"), ("included.yaml", "!define"), ("main.yaml", "!index"),
+                          ("main.yaml", "!define_post")])  # post documents are read last
+        self.assertEqual(python_reader.docs, fast_reader.docs)
+
+    def test_error_position_parity(self):
+        bad_yaml_text = "--- !define\nA: a\nB: [b\nC: c\n"
+        problem_marks = list()
+        for loader in (yaml.Loader, aYaml.YamlLoader):
+            with self.assertRaises(yaml.YAMLError) as context:
+                list(yaml.compose_all(bad_yaml_text, Loader=loader))
+            problem_marks.append((context.exception.problem_mark.line, context.exception.problem_mark.column))
+        self.assertEqual(problem_marks[0], problem_marks[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
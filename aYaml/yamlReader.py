@@ -26,6 +26,15 @@ log = logging.getLogger()
 
 import utils
 
+# compose yaml with libyaml's C parser when pyyaml was built with it - much faster than the pure-python parser.
+# Both produce the same yaml.Node objects, with tags resolved by the same yaml.resolver.Resolver,
+# and the nodes' start_mark/end_mark have the same name, line & column; only the snippet
+# of the source text is missing when printing a mark produced by libyaml.
+try:
+    from yaml import CLoader as YamlLoader
+except ImportError:
+    from yaml import Loader as YamlLoader
+
 
 class YamlNodeStack(object):
     """ keep a stack of currently read yaml nodes
@@ -52,6 +61,8 @@ class YamlNodeStack(object):
 
 
 class YamlReader(object):
+    yaml_loader = YamlLoader  # override with yaml.Loader to use the pure-python parser
+
     def __init__(self, config_vars) -> None:
         self.config_vars = config_vars
         self.path_searcher = None
@@ -146,7 +157,7 @@ class YamlReader(object):
         pass
 
     def read_yaml_from_stream(self, the_stream, *args, **kwargs):
-        for a_node in yaml.compose_all(the_stream):
+        for a_node in yaml.compose_all(the_stream, Loader=self.yaml_loader):
             with kwargs['node-stack'](a_node):
                 try:
                     self.read_yaml_from_node(a_node, *args, **kwargs)
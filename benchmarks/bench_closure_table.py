@@ -0,0 +1,110 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare hierarchical queries of SVNTable using recursive queries over parent_id (INFO_MAP_CLOSURE_TABLE: no)
+    with the same queries using svn_item_closure_t (INFO_MAP_CLOSURE_TABLE: yes).
+    create_indexes is timed as well, since this is where svn_item_closure_t is filled.
+
+    The info map is generated: --sources bundles, each with --files-per-source files in folders --depth levels deep.
+    Every other source is an install_sources of an active IID, every tenth file needs download.
+
+    usage: bench_closure_table.py [--sources 200] [--files-per-source 500] [--depth 4]
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+from configVar import config_vars
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+
+
+def source_path(i_source):
+    return f"Mac/Plugins/Item_{i_source}.bundle"
+
+
+def create_svn_table(num_sources, files_per_source, depth):
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    rows = [("Mac", "d", 0), ("Mac/Plugins", "d", 0)]
+    for i_source in range(num_sources):
+        folder = source_path(i_source)
+        rows.append((folder, "d", 0))
+        for i_depth in range(depth):
+            folder = f"{folder}/Level_{i_depth}"
+            rows.append((folder, "d", 0))
+        for i_file in range(files_per_source):
+            file_folder = "/".join(folder.split("/")[:3 + i_file % (depth + 1)])
+            rows.append((f"{file_folder}/file_{i_file}.bin", "f", 1))
+    with svn_table.db.transaction() as curs:
+        curs.executemany("""INSERT INTO svn_item_t (path, flags, revision, checksum, size, fileFlag, level, parent, leaf, unwtarred,
+                                                    wtarFlag, symlinkFlag, required, need_download)
+                            VALUES (?, ?, 1, NULL, 0, ?, ?, ?, ?, ?, 0, 0, 0, 0)""",
+                         [(path, flags, file_flag, path.count("/") + 1, path.rpartition("/")[0], path.rpartition("/")[2], path)
+                          for path, flags, file_flag in rows])
+        curs.execute("""UPDATE svn_item_t SET need_download=1 WHERE fileFlag=1 AND _id % 10 == 0""")
+        for i_source in range(0, num_sources, 2):
+            iid = f"IID_{i_source}"
+            curs.execute("""INSERT INTO index_item_t (iid, install_status) VALUES (?, 1)""", (iid,))
+            curs.execute("""INSERT INTO index_item_detail_t (original_iid, owner_iid, os_id, detail_name, detail_value, os_is_active)
+                            VALUES (?, ?, 0, "install_sources", ?, 1)""", (iid, iid, source_path(i_source)))
+    svn_table.drop_indexes()
+    return svn_table
+
+
+def time_queries(svn_table, num_sources):
+    retVal = dict()
+
+    def timed(name, func):
+        start_time = time.perf_counter()
+        func()
+        retVal[name] = time.perf_counter() - start_time
+
+    timed("create_indexes", svn_table.create_indexes)
+    timed("mark_required_files_for_active_items", svn_table.mark_required_files_for_active_items)
+    timed("mark_required_completion", svn_table.mark_required_completion)
+    timed("mark_need_download_folders", svn_table.mark_need_download_folders)
+    timed("count_recursive_paths_in_dir x sources",
+          lambda: [svn_table.count_recursive_paths_in_dir(source_path(i_source), what="any") for i_source in range(num_sources)])
+    timed("get_items_in_dir x sources",
+          lambda: [svn_table.get_items_in_dir(source_path(i_source)) for i_source in range(num_sources)])
+    timed("update_downloads dir x sources",
+          lambda: svn_table.update_downloads([{"dir_path": source_path(i_source), "download_root": "/sync", "download_path_prefix": "/sync/",
+                                               "path_start": 1, "include_dirs": 1} for i_source in range(num_sources)]))
+    with svn_table.db.selection() as curs:
+        curs.execute("""SELECT _id, required, need_download, download_path FROM svn_item_t ORDER BY _id""")
+        rows = [tuple(row) for row in curs.fetchall()]
+    return retVal, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--files-per-source", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=4)
+    args = parser.parse_args()
+
+    all_times, all_rows = dict(), dict()
+    for closure_table in ("no", "yes"):
+        config_vars["INFO_MAP_CLOSURE_TABLE"] = closure_table
+        svn_table = create_svn_table(args.sources, args.files_per_source, args.depth)
+        all_times[closure_table], all_rows[closure_table] = time_queries(svn_table, args.sources)
+        num_items = svn_table.num_items()
+        svn_table.db.close()
+
+    print(f"{num_items} items, {args.sources} sources x {args.files_per_source} files, depth {args.depth}")
+    print(f"{'query':<40} {'recursive':>10} {'closure':>10}")
+    for name in all_times["no"]:
+        print(f"{name:<40} {all_times['no'][name]:>9.3f}s {all_times['yes'][name]:>9.3f}s")
+    print(f"{'total':<40} {sum(all_times['no'].values()):>9.3f}s {sum(all_times['yes'].values()):>9.3f}s")
+    print(f"identical results: {all_rows['no'] == all_rows['yes']}")
+
+
+if __name__ == '__main__':
+    main()
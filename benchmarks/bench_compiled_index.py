@@ -0,0 +1,64 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare the time it takes to read a large index.yaml and resolve inheritance - as done
+    at the beginning of every client command - when index.yaml is parsed (cold) and
+    when it is loaded from a compiled index saved by a previous run (warm).
+
+    The index is generated as in bench_yaml_reader.py, or pass the path to an existing index.yaml.
+
+    usage: bench_compiled_index.py [index.yaml] [--items 20000]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+from configVar import config_vars
+from pyinstl import IndexYamlReaderBase
+from bench_yaml_reader import generated_index_text
+
+
+def read_index(index_path):
+    reader = IndexYamlReaderBase(config_vars)
+    del reader.items_table  # start with a new db, as a new client command does
+    del reader.db
+    start_time = time.perf_counter()
+    reader.items_table.activate_all_oses()
+    reader.read_yaml_file(index_path)
+    reader.items_table.resolve_inheritance()
+    elapsed = time.perf_counter() - start_time
+    num_details = reader.db.select_and_fetchall("""SELECT COUNT(*) FROM index_item_detail_t""")[0]
+    return elapsed, num_details
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("index_path", nargs="?")
+    parser.add_argument("--items", type=int, default=20000)
+    args = parser.parse_args()
+
+    config_vars["__INSTL_DEFAULTS_FOLDER__"] = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+    with tempfile.TemporaryDirectory() as work_folder:
+        work_folder = Path(work_folder)
+        if args.index_path:
+            index_path = shutil.copy(args.index_path, work_folder)
+        else:
+            index_path = work_folder.joinpath("index.yaml")
+            index_path.write_text(generated_index_text(args.items))
+        config_vars["COMPILED_INDEX_CACHE_FOLDER"] = work_folder.joinpath("compiled_index")
+
+        print(f"{os.path.getsize(index_path) / (1024 * 1024):.1f} MB index.yaml")
+        print(f"{'run':<6} {'read + resolve (s)':>19} {'details':>9}")
+        for run_name in ("cold", "warm"):
+            elapsed, num_details = read_index(index_path)
+            print(f"{run_name:<6} {elapsed:>19.3f} {num_details:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare RsyncClone copying files with each of utils.FileCopier's methods the destination supports:
+    reflink (btrfs, XFS), kernel copy with os.copy_file_range, and buffered copy with shutil.copyfile.
+    Each run copies to a new destination folder. Methods that are not supported fall back to the next one,
+    the statistics column shows which method actually copied the files.
+
+    The source tree is generated in --folder (default: a temp folder, use a folder on the file system to measure):
+    --dirs folders each with --files-per-dir files of --file-size bytes.
+
+    usage: bench_copy_methods.py [--folder path] [--dirs 20] [--files-per-dir 50] [--file-size 1048576]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from pybatch import RsyncClone
+
+
+def create_source_tree(source_folder: Path, num_dirs, files_per_dir, file_size):
+    contents = os.urandom(file_size)
+    for i_dir in range(num_dirs):
+        dir_path = source_folder.joinpath(f"Plugin_{i_dir}.bundle", "Contents", "Resources")
+        dir_path.mkdir(parents=True)
+        for i_file in range(files_per_dir):
+            dir_path.joinpath(f"file_{i_file}.bin").write_bytes(contents)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder")
+    parser.add_argument("--dirs", type=int, default=20)
+    parser.add_argument("--files-per-dir", type=int, default=50)
+    parser.add_argument("--file-size", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+
+    file_copiers = {"buffered": dict(reflink=False, kernel_copy=False),
+                    "kernel copy": dict(reflink=False),
+                    "reflink": dict()}
+    with tempfile.TemporaryDirectory(dir=args.folder) as work_folder:
+        source_folder = Path(work_folder, "source")
+        create_source_tree(source_folder, args.dirs, args.files_per_dir, args.file_size)
+        num_files = args.dirs * args.files_per_dir
+        num_mb = num_files * args.file_size / (1024 * 1024)
+        print(f"{num_files} files, {num_mb:.0f} MB")
+        print(f"{'method':>12} {'time':>8} {'MB/s':>8}  statistics")
+        for method_name, file_copier_args in file_copiers.items():
+            destination_folder = Path(work_folder, "destination")
+            start_time = time.perf_counter()
+            with RsyncClone(source_folder, destination_folder, hard_links=False, report_own_progress=False) as rc:
+                rc.file_copier = utils.FileCopier(**file_copier_args)
+                rc()
+            elapsed = time.perf_counter() - start_time
+            copy_methods = {name: rc.statistics[name] for name in (utils.FileCopier.reflink, utils.FileCopier.kernel_copy, utils.FileCopier.buffered_copy) if rc.statistics[name]}
+            print(f"{method_name:>12} {elapsed:>7.3f}s {num_mb / elapsed:>8.1f}  {copy_methods}")
+            shutil.rmtree(destination_folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare RsyncClone matching ignore and no-hard-link patterns with the precompiled PathPatternMatcher
+    against the previous implementation, which called Path.match for each pattern on each file.
+    The destination is already up to date so the run is dominated by deciding what to copy, not by copying.
+
+    --patterns ignore patterns are used in addition to the global patterns instl sets from defaults/InstlClient.yaml,
+    a mix of names, *.suffix and wildcard patterns.
+
+    usage: bench_copy_patterns.py [--dirs 50] [--files-per-dir 200] [--patterns 300]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from pybatch import RsyncClone
+
+
+class RsyncCloneWithPathMatch(RsyncClone):
+    """ the previous implementation of matching patterns """
+    def should_ignore_file(self, file_path):
+        retVal = False
+        file_path = Path(file_path)
+        for ignore_pattern in self._RsyncClone__all_ignore_patterns:
+            if file_path.match(ignore_pattern):
+                retVal = True
+                break
+        return retVal
+
+    def should_hard_link_file_DirEntry(self, a_file):
+        retVal = False
+        if self.hard_links and not self.hard_links_failed and not a_file.is_symlink():
+            for no_hard_link_pattern in self._RsyncClone__all_no_hard_link_patterns:
+                if Path(a_file).match(no_hard_link_pattern):
+                    break
+            else:
+                retVal = True
+        return retVal
+
+
+def generated_patterns(num_patterns):
+    retVal = list()
+    for i_pattern in range(num_patterns):
+        kind = i_pattern % 3
+        if kind == 0:
+            retVal.append(f"ignored_name_{i_pattern}")
+        elif kind == 1:
+            retVal.append(f"*.ext{i_pattern}")
+        else:
+            retVal.append(f"tmp_{i_pattern}_*.?")
+    return retVal
+
+
+def create_source_tree(source_folder: Path, num_dirs, files_per_dir):
+    for i_dir in range(num_dirs):
+        dir_path = source_folder.joinpath(f"Plugin_{i_dir}.bundle", "Contents", "Resources")
+        dir_path.mkdir(parents=True)
+        for i_file in range(files_per_dir):
+            dir_path.joinpath(f"file_{i_file}.bin").write_bytes(b"a")
+
+
+def timed_clone(clone_class, source_folder, destination_folder, ignore_patterns):
+    start_time = time.perf_counter()
+    with clone_class(source_folder, destination_folder, ignore_patterns=ignore_patterns, hard_links=True, report_own_progress=False) as rc:
+        rc()
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dirs", type=int, default=50)
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--patterns", type=int, default=300)
+    args = parser.parse_args()
+
+    RsyncClone.add_global_ignore_patterns(["*.wtar.??", "*.wtar", "*.done", "._*"])
+    RsyncClone.add_global_no_hard_link_patterns(["*Info.xml", "*Info.plist", "desktop.ini", "*.ico"])
+    ignore_patterns = generated_patterns(args.patterns)
+    with tempfile.TemporaryDirectory() as work_folder:
+        source_folder = Path(work_folder, "source")
+        destination_folder = Path(work_folder, "destination")
+        create_source_tree(source_folder, args.dirs, args.files_per_dir)
+        timed_clone(RsyncClone, source_folder, destination_folder, ignore_patterns)  # first copy, not timed
+        path_match_time = timed_clone(RsyncCloneWithPathMatch, source_folder, destination_folder, ignore_patterns)
+        matcher_time = timed_clone(RsyncClone, source_folder, destination_folder, ignore_patterns)
+
+    num_files = args.dirs * args.files_per_dir
+    print(f"{num_files} files, {args.patterns} additional ignore patterns")
+    print(f"{'Path.match':>10} {'matcher':>9} {'speedup':>8}")
+    print(f"{path_match_time:>9.3f}s {matcher_time:>8.3f}s {path_match_time / matcher_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3.9
+
+"""
+    Time the db queries of a client sync plan with a disk db, for combinations of
+    DB_PERFORMANCE_PROFILE and the indexes in create-indexes.ddl:
+        before:        profile 'default', indexes dropped
+        indexes:       profile 'default', with indexes
+        fast:          profile 'fast', with indexes
+        fastest:       profile 'fastest', with indexes
+
+    The index and info map are generated: --items IIDs, each with a !dir source of --files-per-item files,
+    installing 10% of the IIDs and their dependencies.
+
+    usage: bench_db_profile.py [--items 3000] [--files-per-item 100] [--variants before indexes fast fastest]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from collections import defaultdict
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from configVar import config_vars
+from pyinstl import IndexYamlReaderBase
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+variants = {"before": ("default", False), "indexes": ("default", True), "fast": ("fast", True), "fastest": ("fastest", True)}
+
+
+def create_index_and_info_map(work_folder: Path, num_items, files_per_item, seed=17):
+    rand = random.Random(seed)
+    index_lines = ["--- !index"]
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+    for i in range(num_items):
+        index_lines.extend([f"ITEM_{i}_IID:",
+                            f"    name: Item number {i}",
+                            f"    version: {rand.randint(1, 20)}.{rand.randint(0, 99)}",
+                            f"    guid: {rand.getrandbits(128):032x}",
+                            f"    install_sources: !dir Mac/Plugins/Item_{i}.bundle",
+                            f"    install_folders: /Applications/Plug-Ins/Folder_{i % 20}"])
+        if i > 0:
+            index_lines.append("    depends:")
+            index_lines.extend(f"        - ITEM_{depend}_IID" for depend in rand.sample(range(i), min(i, 2)))
+        bundle = f"Mac/Plugins/Item_{i}.bundle"
+        info_map_lines.extend([f"{bundle}, d, 1", f"{bundle}/Contents, d, 1"])
+        info_map_lines.extend(f"{bundle}/Contents/file_{j}.bin, f, 1, {j:040x}, {j}" for j in range(files_per_item))
+    index_path = work_folder.joinpath("index.yaml")
+    index_path.write_text("\n".join(index_lines) + "\n")
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return index_path, info_map_path
+
+
+def sync_plan(reader, index_path, info_map_path, main_iids, timings):
+    """ the db work done by a client sync, each phase timed separately """
+    items_table, info_map_table = reader.items_table, reader.info_map_table
+
+    def phase(name, func, *args, **kwargs):
+        start_time = time.perf_counter()
+        retVal = func(*args, **kwargs)
+        timings[name] += time.perf_counter() - start_time
+        return retVal
+
+    items_table.activate_specific_oses("Mac")
+    phase("read index", reader.read_yaml_file, index_path)
+    phase("resolve inheritance", items_table.resolve_inheritance)
+    phase("mark install items", items_table.change_status_of_iids_to_another_status, items_table.install_status["none"], items_table.install_status["main"], main_iids)
+    dependencies = phase("dependencies", items_table.get_recursive_dependencies, look_for_status=items_table.install_status["main"])
+    phase("mark install items", items_table.change_status_of_iids_to_another_status, items_table.install_status["none"], items_table.install_status["depend"], dependencies)
+    phase("target folders", items_table.target_folders_to_items)
+    phase("target folders", items_table.source_folders_to_items_without_target_folders)
+    phase("name and version", items_table.set_name_and_version_for_active_iids)
+    with info_map_table.reading_files_context():  # as InstlInstanceSync.read_remote_info_map, indexes and parent_id are created on exit
+        start_time = time.perf_counter()
+        info_map_table.read_from_file(os.fspath(info_map_path), a_format="text")
+    timings["read info map"] += time.perf_counter() - start_time
+    phase("mark required", info_map_table.mark_required_files_for_active_items)
+    phase("mark required", info_map_table.get_required_items)
+    sources = phase("download paths", items_table.get_sync_folders_and_sources_for_active_iids)
+    phase("download paths", info_map_table.update_downloads,
+          [{"dir_path": source, "download_path_prefix": "/sync/", "path_start": 1, "download_root": None, "include_dirs": 0}
+           for _, _, source, _, _ in sources])
+    phase("need download", info_map_table.mark_need_download, num_workers=0)
+    phase("need download", info_map_table.get_download_items)
+
+
+def run_variant(work_folder: Path, variant, index_path, info_map_path, main_iids, timings):
+    profile, with_indexes = variants[variant]
+    db_path = work_folder.joinpath(f"{variant}.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        utils.safe_remove_file(Path(os.fspath(db_path) + suffix))
+    config_vars["__MAIN_DB_FILE__"] = db_path
+    config_vars["DB_PERFORMANCE_PROFILE"] = profile
+    reader = IndexYamlReaderBase(config_vars)
+    reader.db.open()
+    if not with_indexes:
+        reader.db.exec_script_file("drop-indexes.ddl")
+    start_time = time.perf_counter()
+    sync_plan(reader, index_path, info_map_path, main_iids, timings)
+    timings["total"] += time.perf_counter() - start_time
+    del reader.info_map_table
+    del reader.items_table
+    del reader.db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=3000)
+    parser.add_argument("--files-per-item", type=int, default=100)
+    parser.add_argument("--variants", nargs="+", choices=list(variants), default=list(variants))
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    config_vars["__INSTL_DEFAULTS_FOLDER__"] = defaults_folder
+    config_vars["READ_YAML_FILES"] = None
+    with tempfile.TemporaryDirectory() as work_folder:
+        index_path, info_map_path = create_index_and_info_map(Path(work_folder), args.items, args.files_per_item)
+        main_iids = [f"ITEM_{i}_IID" for i in range(0, args.items, 10)]
+        all_timings = dict()
+        for variant in args.variants:
+            timings = defaultdict(float)
+            for _ in range(args.repeat):
+                run_variant(Path(work_folder), variant, index_path, info_map_path, main_iids, timings)
+            all_timings[variant] = timings
+
+    print(f"{args.items} items x {args.files_per_item} files, {len(main_iids)} main install items, time in seconds")
+    phases = list(all_timings[args.variants[0]])
+    print(f"{'phase':<20}" + "".join(f"{variant:>10}" for variant in args.variants))
+    for phase in phases:
+        print(f"{phase:<20}" + "".join(f"{all_timings[variant][phase] / args.repeat:>10.3f}" for variant in args.variants))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare size, write time and load time of text and binary info maps.
+    Load time is the time SVNTable.read_from_file takes to read the file into svn_item_t, without creating indexes.
+
+    The info map is generated: --sources bundles each with --files-per-source files in a few sub folders.
+
+    usage: bench_info_map_binary.py [--sources 500] [--files-per-source 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+fields_relevant_to_info_map = ('path', 'flags', 'revision', 'checksum', 'size')
+
+
+def create_info_map(work_folder: Path, num_sources, files_per_source):
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+    for i_source in range(num_sources):
+        bundle = f"Mac/Plugins/Item_{i_source}.bundle"
+        info_map_lines.append(f"{bundle}, d, 1")
+        info_map_lines.append(f"{bundle}/Contents, d, 1")
+        for i_folder in range(10):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_folder}, d, 1")
+        for i_file in range(files_per_source):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_file % 10}/file_{i_file}.bin, f, 1, {i_source*files_per_source+i_file+1:040x}, {i_file}")
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return info_map_path
+
+
+def read_info_map(info_map_path: Path):
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    start_time = time.perf_counter()
+    svn_table.read_from_file(os.fspath(info_map_path))
+    elapsed = time.perf_counter() - start_time
+    return elapsed, svn_table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=500)
+    parser.add_argument("--files-per-source", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        text_path = create_info_map(Path(work_folder), args.sources, args.files_per_source)
+        _, svn_table = read_info_map(text_path)
+        items = svn_table.get_items()
+        print(f"{args.sources} sources x {args.files_per_source} files, {len(items)} items")
+        print(f"{'format':<8} {'size MB':>8} {'write':>8} {'load':>8}")
+        all_rows = list()
+        for in_format in ("text", "binary"):
+            out_path = Path(work_folder, f"out_info_map.{'txt' if in_format == 'text' else 'bin'}")
+            start_time = time.perf_counter()
+            svn_table.write_to_file(os.fspath(out_path), in_format=in_format, comments=False, items_list=items, field_to_write=fields_relevant_to_info_map)
+            write_time = time.perf_counter() - start_time
+            load_time, loaded_table = read_info_map(out_path)
+            with loaded_table.db.selection() as curs:
+                curs.execute("""SELECT * FROM svn_item_t ORDER BY _id""")
+                all_rows.append([tuple(row) for row in curs.fetchall()])
+            loaded_table.db.close()
+            print(f"{in_format:<8} {out_path.stat().st_size/1024/1024:>8.1f} {write_time:>7.3f}s {load_time:>7.3f}s")
+        print(f"identical rows: {all_rows[0] == all_rows[1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare reading the full info map of each repo-rev with applying the delta from the previous repo-rev,
+    on a generated chain of repo-revs. Delta apply time includes reading the previous repo-rev's info map,
+    as the client does, from an info map snapshot left by the previous repo-rev's sync, or by parsing it with --no-snapshot.
+    Times do not include creating indexes.
+
+    The info map is generated: --sources bundles each with --files-per-source files,
+    each of --revisions repo-revs changes --changed-sources bundles, adds one and removes one.
+
+    usage: bench_info_map_delta.py [--sources 200] [--files-per-source 500] [--revisions 4] [--changed-sources 3] [--no-snapshot]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+from configVar import config_vars
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+
+
+def source_lines(i_source, repo_rev, files_per_source):
+    bundle = f"Mac/Plugins/Item_{i_source}.bundle"
+    retVal = [f"{bundle}, d, {repo_rev}", f"{bundle}/Contents, d, {repo_rev}"]
+    for i_file in range(files_per_source):
+        retVal.append(f"{bundle}/Contents/file_{i_file}.bin, f, {repo_rev}, {repo_rev:08x}{i_source*files_per_source+i_file:032x}, {i_file}")
+    return retVal
+
+
+def create_revision_chain(work_folder: Path, num_sources, files_per_source, num_revisions, changed_sources):
+    source_revisions = {i_source: 1 for i_source in range(num_sources)}
+    retVal = list()
+    for repo_rev in range(1, num_revisions + 1):
+        if repo_rev > 1:
+            for i_change in range(changed_sources):
+                source_revisions[(repo_rev * 7 + i_change * 13) % num_sources] = repo_rev
+            del source_revisions[min(source_revisions)]
+            source_revisions[max(source_revisions) + 1] = repo_rev
+        info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+        for i_source, source_repo_rev in sorted(source_revisions.items()):
+            info_map_lines.extend(source_lines(i_source, source_repo_rev, files_per_source))
+        info_map_path = work_folder.joinpath(f"info_map_{repo_rev}.txt")
+        info_map_path.write_text("\n".join(info_map_lines) + "\n")
+        retVal.append(info_map_path)
+    return retVal
+
+
+def new_svn_table():
+    retVal = SVNTable(DBMaster(":memory:", defaults_folder))
+    retVal.drop_indexes()
+    return retVal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=200)
+    parser.add_argument("--files-per-source", type=int, default=500)
+    parser.add_argument("--revisions", type=int, default=4)
+    parser.add_argument("--changed-sources", type=int, default=3)
+    parser.add_argument("--no-snapshot", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        if not args.no_snapshot:
+            config_vars["INFO_MAP_SNAPSHOT_FOLDER"] = os.path.join(work_folder, "snapshots")
+        info_map_paths = create_revision_chain(Path(work_folder), args.sources, args.files_per_source, args.revisions, args.changed_sources)
+        print(f"{args.sources} sources x {args.files_per_source} files, {args.revisions} repo-revs, {args.changed_sources} changed sources per repo-rev")
+        print(f"{'repo-rev':<9} {'full KB':>9} {'delta KB':>9} {'full read':>10} {'delta apply':>12} {'delta write':>12}")
+        for base_path, target_path in zip(info_map_paths, info_map_paths[1:]):
+            delta_path = Path(work_folder, f"{target_path.name}.delta")
+            target_table = new_svn_table()
+            with open(target_path, encoding="utf-8") as rfd:
+                start_time = time.perf_counter()
+                target_table.read_from_text(rfd)  # always parse, never from snapshot
+                full_read_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            target_table.write_delta_to_file(delta_path, base_path)
+            delta_write_time = time.perf_counter() - start_time
+
+            if not args.no_snapshot:  # the previous repo-rev's sync read the base info map
+                new_svn_table().read_from_file(os.fspath(base_path))
+            applied_table = new_svn_table()
+            start_time = time.perf_counter()
+            applied_table.read_from_file(os.fspath(base_path))
+            applied_table.apply_delta_from_file(delta_path)
+            delta_apply_time = time.perf_counter() - start_time
+            if applied_table.info_map_lines_checksum() != target_table.info_map_lines_checksum():
+                raise ValueError(f"delta {delta_path} was not applied correctly")
+            target_table.db.close()
+            applied_table.db.close()
+            print(f"{target_path.stem[len('info_map_'):]:<9} {target_path.stat().st_size/1024:>9.0f} {delta_path.stat().st_size/1024:>9.0f}"
+                  f" {full_read_time:>9.3f}s {delta_apply_time:>11.3f}s {delta_write_time:>11.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare the time it takes to read an info map into svn_item_t:
+        parse:            parse the info map text, no snapshot
+        parse + save:     parse the info map text and save a snapshot, as done by the first run reading the file
+        snapshot:         copy the rows from the snapshot, as done by the next runs reading the same file
+
+    The info map is generated: --sources bundles each with --files-per-source files in a few sub folders.
+
+    usage: bench_info_map_snapshot.py [--sources 500] [--files-per-source 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from configVar import config_vars
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+
+
+def create_info_map(work_folder: Path, num_sources, files_per_source):
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+    for i_source in range(num_sources):
+        bundle = f"Mac/Plugins/Item_{i_source}.bundle"
+        info_map_lines.append(f"{bundle}, d, 1")
+        info_map_lines.append(f"{bundle}/Contents, d, 1")
+        for i_folder in range(10):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_folder}, d, 1")
+        for i_file in range(files_per_source):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_file % 10}/file_{i_file}.bin, f, 1, {i_file:040x}, {i_file}")
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return info_map_path
+
+
+def read_info_map(info_map_path: Path, snapshot_folder):
+    config_vars["INFO_MAP_SNAPSHOT_FOLDER"] = snapshot_folder
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    start_time = time.perf_counter()
+    svn_table.read_from_file(os.fspath(info_map_path), disable_indexes_during_read=True)
+    elapsed = time.perf_counter() - start_time
+    with svn_table.db.selection() as curs:
+        curs.execute("""SELECT * FROM svn_item_t ORDER BY _id""")
+        rows = [tuple(row) for row in curs.fetchall()]
+    svn_table.db.close()
+    return elapsed, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=500)
+    parser.add_argument("--files-per-source", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        info_map_path = create_info_map(Path(work_folder), args.sources, args.files_per_source)
+        snapshot_folder = Path(work_folder, "snapshots")
+        print(f"{args.sources} sources x {args.files_per_source} files, info map {info_map_path.stat().st_size/1024/1024:.1f}MB")
+        results = list()
+        for name, folder in (("parse", ""), ("parse + save", snapshot_folder), ("snapshot", snapshot_folder)):
+            elapsed, rows = read_info_map(info_map_path, folder)
+            results.append(rows)
+            print(f"{name:<14} {elapsed:>8.3f}s")
+        print(f"identical rows: {results[0] == results[1] == results[2]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare wall time and peak memory of SVNTable.mark_need_download:
+        udf-whole-file: the original sqlite function, reading each file to memory in one go
+        udf-streaming:  the sqlite function (num_workers=0) reading files in chunks
+        engine-N:       utils.ChecksumEngine with N worker threads
+
+    usage: bench_mark_need_download.py [--num-files 4000] [--large-files 4] [--large-file-mb 64] [--workers 1 4 8]
+"""
+
+import os
+import sys
+import time
+import argparse
+import hashlib
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+
+
+def need_to_download_file_whole_file(file_path, file_checksum):
+    """ need_to_download_file as it was before files were read in chunks """
+    retVal = True
+    if os.path.isfile(file_path):
+        with open(file_path, "rb") as rfd:
+            retVal = not utils.check_buffer_checksum(rfd.read(), file_checksum)
+    return retVal
+
+
+def create_files(work_folder: Path, num_files, num_large_files, large_file_mb):
+    info_map_lines = ["Mac, d, 1"]
+    for i in range(num_files + num_large_files):
+        if i < num_large_files:
+            contents = os.urandom(1024 * 1024) * large_file_mb
+        else:
+            contents = os.urandom(1024 + (i % 64) * 1024)
+        path = f"Mac/folder_{i % 100}/file_{i}.bin"
+        if i < 100:
+            info_map_lines.append(f"Mac/folder_{i % 100}, d, 1")
+        file_path = work_folder.joinpath("sync", path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(contents)
+        info_map_lines.append(f"{path}, f, 1, {hashlib.sha1(contents).hexdigest()}, {len(contents)}")
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return info_map_path
+
+
+def prepare_table(info_map_path: Path):
+    sync_folder = info_map_path.parent.joinpath("sync")
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    svn_table.read_from_file(os.fspath(info_map_path), a_format="text")
+    svn_table.create_indexes()
+    with svn_table.db.transaction() as curs:
+        curs.execute("""UPDATE svn_item_t SET required=1""")
+        curs.execute("""UPDATE svn_item_t SET download_path=:sync_folder || '/' || path""", {"sync_folder": os.fspath(sync_folder)})
+    return svn_table
+
+
+def run_once(info_map_path, num_workers, trace_memory):
+    svn_table = prepare_table(info_map_path)
+    if trace_memory:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    svn_table.mark_need_download(num_workers=num_workers)
+    elapsed = time.perf_counter() - start_time
+    peak_memory = 0
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    svn_table.db.close()
+    return elapsed, peak_memory
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-files", type=int, default=4000)
+    parser.add_argument("--large-files", type=int, default=4)
+    parser.add_argument("--large-file-mb", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        info_map_path = create_files(Path(work_folder), args.num_files, args.large_files, args.large_file_mb)
+        variants = [("udf-whole-file", 0), ("udf-streaming", 0)] + [(f"engine-{n}", n) for n in args.workers]
+        print(f"{args.num_files} files + {args.large_files} files of {args.large_file_mb}MB")
+        print(f"{'variant':<16} {'wall time (s)':>14} {'peak memory (MB)':>17}")
+        original_need_to_download_file = utils.need_to_download_file
+        for name, num_workers in variants:
+            if name == "udf-whole-file":
+                utils.need_to_download_file = need_to_download_file_whole_file
+            run_once(info_map_path, num_workers, trace_memory=False)  # warm the OS file cache
+            elapsed, _ = run_once(info_map_path, num_workers, trace_memory=False)
+            _, peak_memory = run_once(info_map_path, num_workers, trace_memory=True)
+            utils.need_to_download_file = original_need_to_download_file
+            print(f"{name:<16} {elapsed:>14.3f} {peak_memory / (1024 * 1024):>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare RsyncClone copying one file at a time (num_workers=0) with copying by a pool of threads,
+    for a range of thread counts. Each run copies to a new destination folder.
+
+    The source tree is generated in --folder (default: a temp folder, use a folder on the file system to measure):
+    --dirs folders each with --files-per-dir files of --file-size bytes.
+    With --hard-links files are hard linked instead of copied, as when copying from the sync folder.
+
+    usage: bench_parallel_copy.py [--folder path] [--dirs 100] [--files-per-dir 200] [--file-size 16384] [--workers 0,1,2,4,8,16] [--hard-links]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from pybatch import RsyncClone
+
+
+def create_source_tree(source_folder: Path, num_dirs, files_per_dir, file_size):
+    contents = os.urandom(file_size)
+    for i_dir in range(num_dirs):
+        dir_path = source_folder.joinpath(f"Plugin_{i_dir}.bundle", "Contents", "Resources")
+        dir_path.mkdir(parents=True)
+        for i_file in range(files_per_dir):
+            dir_path.joinpath(f"file_{i_file}.bin").write_bytes(contents)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder")
+    parser.add_argument("--dirs", type=int, default=100)
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    parser.add_argument("--file-size", type=int, default=16384)
+    parser.add_argument("--workers", default="0,1,2,4,8,16")
+    parser.add_argument("--hard-links", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as work_folder:
+        source_folder = Path(work_folder, "source")
+        create_source_tree(source_folder, args.dirs, args.files_per_dir, args.file_size)
+        num_files = args.dirs * args.files_per_dir
+        num_mb = num_files * args.file_size / (1024 * 1024)
+        print(f"{num_files} files, {num_mb:.0f} MB, {'hard links' if args.hard_links else 'copy'}")
+        print(f"{'workers':>8} {'time':>8} {'files/s':>9} {'MB/s':>8}")
+        for num_workers in [int(workers) for workers in args.workers.split(",")]:
+            destination_folder = Path(work_folder, f"destination_{num_workers}")
+            start_time = time.perf_counter()
+            with RsyncClone(source_folder, destination_folder, hard_links=args.hard_links, num_workers=num_workers, report_own_progress=False) as rc:
+                rc()
+            elapsed = time.perf_counter() - start_time
+            if rc.statistics['files'] != num_files:
+                raise ValueError(f"{rc.statistics['files']} files copied, expected {num_files}")
+            print(f"{num_workers:>8} {elapsed:>7.3f}s {num_files / elapsed:>9.0f} {num_mb / elapsed:>8.1f}")
+            shutil.rmtree(destination_folder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3.9
+
+"""
+    Measure the CPU time consumed by utils.run_processes_in_parallel itself - not by the children -
+    while N children run in parallel, each printing a line every --print-interval seconds.
+
+    usage: bench_parallel_run.py [--children 16] [--seconds 3] [--print-interval 0.1] [--no-output]
+"""
+
+import os
+import sys
+import time
+import argparse
+import resource
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--children", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--print-interval", type=float, default=0.1)
+    parser.add_argument("--no-output", action="store_true")
+    args = parser.parse_args()
+
+    child_code = f"import time\nfor i in range(int({args.seconds} / {args.print_interval})):\n    print(i, flush=True)\n    time.sleep({args.print_interval})\n"
+    commands = [[sys.executable, "-c", child_code] for _ in range(args.children)]
+
+    start_wall = time.perf_counter()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    try:
+        utils.run_processes_in_parallel(commands, shell=False, do_enqueue_output=not args.no_output)
+    except SystemExit:  # run_processes_in_parallel always exits
+        pass
+    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    wall = time.perf_counter() - start_wall
+    runner_cpu = (end_usage.ru_utime - start_usage.ru_utime) + (end_usage.ru_stime - start_usage.ru_stime)
+    print(f"{args.children} children, {wall:.2f}s wall time, runner used {runner_cpu:.2f}s CPU ({100 * runner_cpu / wall:.0f}% of a core)")
+
+
+if __name__ == '__main__':
+    main()
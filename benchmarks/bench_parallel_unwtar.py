@@ -0,0 +1,101 @@
+#!/usr/bin/env python3.9
+
+"""
+    Time extracting the wtar files of an install, one archive at a time with Unwtar (--workers 0)
+    and in the background with ScheduledUnwtar and $(PARALLEL_UNWTAR) worker processes, followed by WaitForUnwtars.
+    Time with workers includes starting the worker processes. Each run extracts to a new folder,
+    and the number of extracted files is checked.
+
+    Archives are generated in --folder (default: a temp folder): --small-items plugin bundles each with
+    --files-per-item files of --file-size bytes, and --huge-items bundles of --huge-size bytes each.
+    Huge archives are extracted last, as they would be if their names sort last, to show that
+    the scheduler starts them first.
+
+    usage: bench_parallel_unwtar.py [--folder path] [--small-items 500] [--files-per-item 4] [--file-size 65536] [--huge-items 2] [--huge-size 67108864] [--workers 0,1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from configVar import config_vars
+from pybatch import ParallelWtar, Unwtar, ScheduledUnwtar, WaitForUnwtars, UnwtarScheduler
+
+
+def create_item(item_path: Path, num_files, file_size, rand):
+    words = [bytes(rand.choices(range(256), k=rand.randint(4, 64))) for _ in range(256)]
+    resources_path = item_path.joinpath("Contents", "Resources")
+    resources_path.mkdir(parents=True)
+    for i_file in range(num_files):
+        contents = bytearray()
+        while len(contents) < file_size:
+            contents += rand.choice(words)
+        resources_path.joinpath(f"resource_{i_file}.bin").write_bytes(contents[:file_size])
+
+
+def create_wtars(wtars_folder: Path, num_small_items, files_per_item, file_size, num_huge_items, huge_size):
+    """ return the paths of the first wtar file of each item, huge items last """
+    rand = random.Random(17)
+    small_names = [f"Plugin_{i_item}.bundle" for i_item in range(num_small_items)]
+    huge_names = [f"Huge_{i_item}.bundle" for i_item in range(num_huge_items)]
+    for name in small_names:
+        create_item(wtars_folder.joinpath(name), files_per_item, file_size, rand)
+    for name in huge_names:
+        create_item(wtars_folder.joinpath(name), 16, huge_size // 16, rand)
+    with ParallelWtar([wtars_folder.joinpath(name) for name in small_names + huge_names], num_jobs=0, report_own_progress=False) as pw:
+        pw()
+    return [wtars_folder.joinpath(f"{name}.wtar.aa") for name in small_names + huge_names]
+
+
+def unwtar_all(wtar_paths, destination_folder: Path, num_workers):
+    destination_folder.mkdir()
+    if num_workers == 0:
+        for wtar_path in wtar_paths:
+            with Unwtar(wtar_path, destination_folder, report_own_progress=False) as unwtar:
+                unwtar()
+    else:
+        config_vars["PARALLEL_UNWTAR"] = num_workers
+        for wtar_path in wtar_paths:
+            with ScheduledUnwtar(wtar_path, destination_folder, report_own_progress=False) as scheduled_unwtar:
+                scheduled_unwtar()
+        with WaitForUnwtars(report_own_progress=False) as wait_for_unwtars:
+            wait_for_unwtars()
+        UnwtarScheduler.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder")
+    parser.add_argument("--small-items", type=int, default=500)
+    parser.add_argument("--files-per-item", type=int, default=4)
+    parser.add_argument("--file-size", type=int, default=65536)
+    parser.add_argument("--huge-items", type=int, default=2)
+    parser.add_argument("--huge-size", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--workers", default="0,1,2,4,8")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as work_folder:
+        wtar_paths = create_wtars(Path(work_folder, "wtars"), args.small_items, args.files_per_item, args.file_size, args.huge_items, args.huge_size)
+        num_files = args.small_items * args.files_per_item + args.huge_items * 16
+        wtars_mb = sum(wtar_path.stat().st_size for wtar_path in wtar_paths) / (1024 * 1024)
+        print(f"{args.small_items} small and {args.huge_items} huge archives, {wtars_mb:.0f} MB of wtar files, {os.cpu_count()} cpus")
+        print(f"{'workers':>8} {'time':>8} {'archives/s':>11}")
+        for num_workers in [int(workers) for workers in args.workers.split(",")]:
+            destination_folder = Path(work_folder, f"unwtar_{num_workers}_workers")
+            start_time = time.perf_counter()
+            unwtar_all(wtar_paths, destination_folder, num_workers)
+            elapsed = time.perf_counter() - start_time
+            num_extracted = sum(len(files) for root, dirs, files in os.walk(destination_folder))
+            if num_extracted != num_files:
+                raise ValueError(f"{num_workers} workers: {num_extracted} files extracted, expected {num_files}")
+            print(f"{num_workers:>8} {elapsed:>7.3f}s {len(wtar_paths) / elapsed:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.9
+
+"""
+    Time wtarring the items of a staging folder with ParallelWtar, one item at a time (--jobs 1)
+    and by several worker processes. Each run wtars a fresh copy of the staging folder,
+    and the wtar files of all runs are checked to be identical.
+
+    The staging folder is generated in --folder (default: a temp folder): --items plugin bundles
+    each with --files-per-item files of --file-size bytes.
+
+    usage: bench_parallel_wtar.py [--folder path] [--items 1000] [--files-per-item 4] [--file-size 65536] [--jobs 1,2,4,8]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import filecmp
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from pybatch import ParallelWtar
+
+
+def create_staging_folder(staging_folder: Path, num_items, files_per_item, file_size):
+    rand = random.Random(17)
+    words = [bytes(rand.choices(range(256), k=rand.randint(4, 64))) for _ in range(256)]
+    for i_item in range(num_items):
+        resources_path = staging_folder.joinpath(f"Plugin_{i_item}.bundle", "Contents", "Resources")
+        resources_path.mkdir(parents=True)
+        for i_file in range(files_per_item):
+            contents = bytearray()
+            while len(contents) < file_size:
+                contents += rand.choice(words)
+            resources_path.joinpath(f"resource_{i_file}.bin").write_bytes(contents[:file_size])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder")
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--files-per-item", type=int, default=4)
+    parser.add_argument("--file-size", type=int, default=65536)
+    parser.add_argument("--jobs", default="1,2,4,8")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as work_folder:
+        staging_folder = Path(work_folder, "staging")
+        create_staging_folder(staging_folder, args.items, args.files_per_item, args.file_size)
+        item_names = sorted(item.name for item in staging_folder.iterdir())
+        print(f"{args.items} items, {os.cpu_count()} cpus")
+        print(f"{'jobs':>5} {'time':>8} {'items/s':>8}")
+        first_wtar_folder = None
+        for num_jobs in [int(jobs) for jobs in args.jobs.split(",")]:
+            wtar_folder = Path(work_folder, f"wtar_{num_jobs}_jobs")
+            shutil.copytree(staging_folder, wtar_folder)
+            start_time = time.perf_counter()
+            with ParallelWtar([wtar_folder.joinpath(name) for name in item_names], num_jobs=num_jobs, report_own_progress=False) as pw:
+                pw()
+            elapsed = time.perf_counter() - start_time
+            print(f"{num_jobs:>5} {elapsed:>7.3f}s {args.items / elapsed:>8.1f}")
+            if first_wtar_folder is None:
+                first_wtar_folder = wtar_folder
+            else:
+                _, mismatch, errors = filecmp.cmpfiles(first_wtar_folder, wtar_folder, [f"{name}.wtar.aa" for name in item_names], shallow=False)
+                if mismatch or errors:
+                    raise ValueError(f"{num_jobs} jobs: {len(mismatch) + len(errors)} wtar files are different from the first run")
+
+
+if __name__ == '__main__':
+    main()
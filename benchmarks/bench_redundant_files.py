@@ -0,0 +1,112 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare SVNTable.get_files_that_should_be_removed_from_sync_folder with the previous implementation,
+    which joined the paths in the sync folder with the info map paths using sqlite's LIKE.
+
+    For each size the info map has that many files, the sync folder has the same files minus 1% plus 1% redundant files,
+    and 10 IIDs with custom info_map files keep their install_sources folders by prefix.
+    The LIKE implementation is quadratic and only runs for sizes up to --max-like-size.
+
+    usage: bench_redundant_files.py [--sizes 10000,100000,1000000] [--max-like-size 10000]
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+num_custom_info_maps = 10
+
+
+def create_svn_table(num_files):
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    rows = list()
+    for i_file in range(num_files):
+        path = f"Mac/Plugins/Item_{i_file // 1000}.bundle/Contents/file_{i_file}.bin"
+        rows.append((path, "f", 1, f"{i_file:040x}", i_file, 3, f"Mac/Plugins/Item_{i_file // 1000}.bundle/Contents", f"file_{i_file}.bin", 1))
+    with svn_table.db.transaction() as curs:
+        curs.executemany("""INSERT INTO svn_item_t (path, flags, revision, checksum, size, level, parent, leaf, fileFlag)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+        for i_iid in range(num_custom_info_maps):
+            iid = f"CUSTOM_IID_{i_iid}"
+            curs.execute("""INSERT INTO index_item_t (iid) VALUES (?)""", (iid,))
+            curs.executemany("""INSERT INTO index_item_detail_t (original_iid, owner_iid, os_id, detail_name, detail_value)
+                                VALUES (?, ?, 0, ?, ?)""",
+                             [(iid, iid, "install_sources", f"Mac/Plugins/Custom_{i_iid}.bundle"), (iid, iid, "info_map", f"{iid}.txt")])
+    svn_table.create_indexes()
+    return svn_table
+
+
+def files_in_sync_folder(num_files):
+    retVal = [f"Mac/Plugins/Item_{i_file // 1000}.bundle/Contents/file_{i_file}.bin" for i_file in range(num_files) if i_file % 100 != 0]
+    retVal.extend(f"Mac/Plugins/Item_{i_file // 1000}.bundle/Contents/file_{i_file}.old" for i_file in range(0, num_files, 200))
+    retVal.extend(f"Mac/Plugins/Custom_{i_file % num_custom_info_maps}.bundle/Contents/file_{i_file}.bin" for i_file in range(0, num_files, 200))
+    retVal.sort()
+    return retVal
+
+
+def files_to_remove_with_like(svn_table, files_to_check):
+    """ the previous implementation of get_files_that_should_be_removed_from_sync_folder """
+    with svn_table.db.transaction() as curs:
+        curs.execute("""CREATE TEMP TABLE cache_folder_file_paths_t (path TEXT, remove BOOLEAN DEFAULT 1);""")
+        curs.executemany("""INSERT INTO cache_folder_file_paths_t (path) VALUES (?);""", [(p,) for p in files_to_check])
+        curs.execute("""CREATE TEMP TABLE do_not_remove_file_paths_t (path TEXT);""")
+        curs.execute("""
+                INSERT INTO do_not_remove_file_paths_t (path)
+                SELECT install_sources_t.detail_value||"%" as __path
+                FROM index_item_detail_t AS install_sources_t, index_item_detail_t as info_map_t
+                WHERE install_sources_t.detail_name == "install_sources"
+                        AND info_map_t.detail_name == "info_map"
+                        AND info_map_t.owner_iid == install_sources_t.owner_iid
+                        AND install_sources_t.detail_value NOT IN (SELECT path FROM svn_item_t)
+               UNION
+                SELECT svn_item_t.path as __path from svn_item_t
+                ORDER BY __path
+                """)
+        curs.execute("""
+            UPDATE cache_folder_file_paths_t
+            SET remove = 0
+            WHERE cache_folder_file_paths_t.path  in
+            (SELECT cache_folder_file_paths_t.path FROM cache_folder_file_paths_t, do_not_remove_file_paths_t
+            WHERE cache_folder_file_paths_t.path LIKE do_not_remove_file_paths_t.path)
+            """)
+        curs.execute("""SELECT path from cache_folder_file_paths_t WHERE remove=1""")
+        retVal = [row[0] for row in curs.fetchall()]
+        curs.execute("""DROP TABLE cache_folder_file_paths_t""")
+        curs.execute("""DROP TABLE do_not_remove_file_paths_t""")
+    return retVal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--max-like-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'files':>9} {'to remove':>10} {'time':>8} {'LIKE time':>10} {'same':>5}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        svn_table = create_svn_table(size)
+        files_to_check = files_in_sync_folder(size)
+        start_time = time.perf_counter()
+        files_to_remove = svn_table.get_files_that_should_be_removed_from_sync_folder(files_to_check)
+        new_time = time.perf_counter() - start_time
+        like_time, same = "", ""
+        if size <= args.max_like_size:
+            start_time = time.perf_counter()
+            files_to_remove_like = files_to_remove_with_like(svn_table, files_to_check)
+            like_time = f"{time.perf_counter() - start_time:.3f}s"
+            same = str(sorted(files_to_remove) == sorted(files_to_remove_like))
+        svn_table.db.close()
+        print(f"{size:>9} {len(files_to_remove):>10} {new_time:>7.3f}s {like_time:>10} {same:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare IndexItemsTable.resolve_inheritance with the previous implementation,
+    which ran one INSERT...SELECT per inheriting item in a single executescript.
+    resolve_inheritance is timed without a cache (cold) and with the outcome cached by a previous run (warm).
+
+    The index is generated: a chain of --depth templates each inheriting from the one before,
+    --items products each inheriting from one of the templates, and shells inheriting from 4 products each.
+
+    usage: bench_resolve_inheritance.py [--items 5000] [--depth 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+from configVar import config_vars
+from pyinstl import IndexYamlReaderBase
+
+
+def generated_index_text(num_items, depth):
+    lines = ["--- !index"]
+    for i_level in range(depth):
+        lines.extend([f"TEMPLATE_{i_level}_IID:",
+                      f"    name: template {i_level}",
+                      f"    install_folders: $(FOLDER_{i_level})",
+                      "    actions:",
+                      f"        pre_copy_item: [template {i_level} pre copy item 1, template {i_level} pre copy item 2]",
+                      "    Mac:",
+                      f"        install_sources: Mac/Shared/Level_{i_level}",
+                      "    Win:",
+                      f"        install_sources: Win/Shared/Level_{i_level}"])
+        if i_level > 0:
+            lines.append(f"    inherit: TEMPLATE_{i_level-1}_IID")
+    for i_item in range(num_items):
+        lines.extend([f"PRODUCT_{i_item}_IID:",
+                      f"    name: product {i_item}",
+                      f"    inherit: TEMPLATE_{i_item % depth}_IID",
+                      "    actions:",
+                      f"        post_copy: product {i_item} post copy",
+                      "    Mac:",
+                      f"        install_sources: Mac/Plugins/Product_{i_item}.bundle",
+                      "    Win:",
+                      f"        install_sources: Win/Plugins/Product_{i_item}.dll"])
+    for i_shell in range(num_items // depth):
+        lines.extend([f"SHELL_{i_shell}_IID:",
+                      f"    name: shell {i_shell}",
+                      f"    inherit: [{', '.join(f'PRODUCT_{i_shell*depth+i_level}_IID' for i_level in range(min(depth, 4)))}]"])
+    return "\n".join(lines) + "\n"
+
+
+def resolve_inheritance_with_script(items_table):
+    """ the previous implementation of resolve_inheritance """
+    inherit_order, inherit_dict = items_table.prepare_inherit_order()
+    resolve_items_script = ""
+    for iid in inherit_order:
+        resolve_items_script += items_table.get_resolve_item_query_for_iid(iid, inherit_dict[iid])
+    with items_table.db.transaction() as curs:
+        curs.executescript(resolve_items_script)
+        curs.execute("""CREATE INDEX IF NOT EXISTS ix_svn_index_item_detail_t_owner_iid ON index_item_detail_t(owner_iid)""")
+
+
+def read_and_resolve(index_path, resolve_func):
+    reader = IndexYamlReaderBase(config_vars)
+    del reader.items_table  # start with a new db, as a new client command does
+    del reader.db
+    reader.items_table.activate_all_oses()
+    reader.read_yaml_file(index_path)
+    start_time = time.perf_counter()
+    resolve_func(reader.items_table)
+    elapsed = time.perf_counter() - start_time
+    details = [tuple(row) for row in reader.db.select_and_fetchall("""
+                SELECT original_iid, owner_iid, os_id, detail_name, detail_value, generation, tag, os_is_active
+                FROM index_item_detail_t ORDER BY _id""")]
+    return elapsed, details
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--depth", type=int, default=10)
+    args = parser.parse_args()
+
+    config_vars["__INSTL_DEFAULTS_FOLDER__"] = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+    config_vars["DEBUG_INDEX_DB"] = "no"
+    with tempfile.TemporaryDirectory() as work_folder:
+        index_path = Path(work_folder, "index.yaml")
+        index_path.write_text(generated_index_text(args.items, args.depth))
+
+        script_time, script_details = read_and_resolve(index_path, resolve_inheritance_with_script)
+        config_vars["RESOLVED_INHERITANCE_CACHE_FOLDER"] = Path(work_folder, "resolved_inheritance")
+        cold_time, cold_details = read_and_resolve(index_path, lambda items_table: items_table.resolve_inheritance())
+        warm_time, warm_details = read_and_resolve(index_path, lambda items_table: items_table.resolve_inheritance())
+
+    print(f"{args.items} products, templates chain depth {args.depth}, {len(script_details)} details after resolving")
+    print(f"{'executescript':<14} {'cold':>8} {'warm':>8}")
+    print(f"{script_time:>13.3f}s {cold_time:>7.3f}s {warm_time:>7.3f}s")
+    print(f"identical results: {script_details == cold_details == warm_details}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3.9
+
+"""
+    Measure ConfigVarStack.resolve_str throughput on strings similar to those resolved during batch generation:
+    paths built from a few path ConfigVars, ConfigVars referring to other ConfigVars, array references
+    and ConfigVars with params.
+
+    Three configurations are timed:
+        parse every time: templates are parsed on every resolve and resolve cache is disabled (like before compiled templates)
+        compiled templates: templates are parsed once, resolve cache is disabled
+        compiled + cache: templates are parsed once and resolved strings are cached
+
+    usage: bench_resolve_str.py [--repeat 20000]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from configVar import private_config_vars
+from configVar import configVarStack
+from configVar.configVarParser import var_parse_imp, compile_template
+
+
+def define_vars(config_vars):
+    config_vars["LOCAL_REPO_SYNC_DIR"] = "/Library/Application Support/Waves/.instl/V12/sync"
+    config_vars["REPO_NAME"] = "V12"
+    config_vars["TARGET_OS"] = "Mac"
+    config_vars["SOURCE_PREFIX"] = "Mac"
+    config_vars["WAVES_PLUGINS_DIR"] = "/Applications/Waves/Plug-Ins V12"
+    config_vars["COPY_TOOL_FLAGS"] = "-a", "--delete", "--exclude=.DS_Store"
+    config_vars["SYNC_BASE_URL"] = "https://d1.waves.com/$(REPO_NAME)"
+    config_vars["BOOKKEEPING_DIR"] = "$(LOCAL_REPO_SYNC_DIR)/bookkeeping"
+    config_vars["HAVE_INFO_MAP_PATH"] = "$(BOOKKEEPING_DIR)/have_info_map.txt"
+    config_vars["ITEM_SOURCE"] = "$(__ITEM_SOURCE_1__)/$(TARGET_OS)"
+
+
+templates = ("$(LOCAL_REPO_SYNC_DIR)/$(SOURCE_PREFIX)/Plugins/Item.bundle",
+             "$(WAVES_PLUGINS_DIR)/Item.bundle/Contents/Info.plist",
+             "$(HAVE_INFO_MAP_PATH)",
+             "$(SYNC_BASE_URL)/$(TARGET_OS)/index.yaml",
+             "rsync $(COPY_TOOL_FLAGS[0]) $(COPY_TOOL_FLAGS[-1])",
+             "$(ITEM_SOURCE<Common/Data>)",
+             "no variables here",
+             )
+
+
+def time_resolve(config_vars, repeat):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for template in templates:
+            config_vars.resolve_str(template)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+    num_resolves = args.repeat * len(templates)
+
+    original_compile_template = configVarStack.compile_template
+    results = list()
+    for title, compile_function, use_cache in (("parse every time", lambda s, ri: tuple(var_parse_imp(s, ri)), False),
+                                               ("compiled templates", compile_template, False),
+                                               ("compiled + cache", compile_template, True)):
+        configVarStack.compile_template = compile_function
+        try:
+            with private_config_vars() as config_vars:
+                define_vars(config_vars)
+                if not use_cache:
+                    config_vars.resolve_cache_max_size = 0  # cache is cleared on every access
+                results.append((title, time_resolve(config_vars, args.repeat)))
+        finally:
+            configVarStack.compile_template = original_compile_template
+
+    base_time = results[0][1]
+    for title, total_time in results:
+        print(f"{title:<20} {total_time:>7.3f}s  {num_resolves / total_time:>10.0f} resolves/s  ({base_time / total_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
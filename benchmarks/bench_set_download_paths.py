@@ -0,0 +1,130 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare the time it takes to set download_path & download_root for the items of !dir sources,
+    as done by InstlClient.set_sync_locations_for_active_items:
+        item-by-item: fetch the items of each source, resolve each download path and update each item
+        whole-dir:    calculate the download path prefix once per source and let update_downloads set all items in sql
+
+    The info map is generated: --sources bundles each with --files-per-source files in a few sub folders.
+    Half of the sources are treated as direct-sync (downloaded to an install folder) the others to the local sync folder.
+
+    usage: bench_set_download_paths.py [--sources 500] [--files-per-source 1000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils  # do not remove, prevents cyclic import problems
+from configVar import config_vars
+from db.dbMaster import DBMaster
+from svnTree import SVNTable
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+local_repo_sync_dir = "/Library/Application Support/Waves/.instl/V12/sync"
+install_folder = "/Applications/Waves/Plug-Ins V12"
+
+
+def create_info_map(work_folder: Path, num_sources, files_per_source):
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+    for i_source in range(num_sources):
+        bundle = f"Mac/Plugins/Item_{i_source}.bundle"
+        info_map_lines.append(f"{bundle}, d, 1")
+        for i_folder in range(10):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_folder}, d, 1")
+        info_map_lines.append(f"{bundle}/Contents, d, 1")
+        for i_file in range(files_per_source):
+            info_map_lines.append(f"{bundle}/Contents/Folder_{i_file % 10}/file_{i_file}.bin, f, 1, {i_file:040x}, {i_file}")
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return info_map_path
+
+
+def prepare_table(info_map_path: Path):
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    svn_table.read_from_file(os.fspath(info_map_path), a_format="text")
+    svn_table.create_indexes()
+    return svn_table
+
+
+def item_by_item(svn_table, sources):
+    """ the way download paths were set before whole dir updates """
+    items_to_update = list()
+    for i_source, source in enumerate(sources):
+        resolved_source_parts = source.split("/")
+        if i_source % 2 == 0:
+            item_paths = svn_table.get_recursive_paths_in_dir(dir_path=source, what="any")
+            source_parent = "/".join(resolved_source_parts[:-1])
+            for item in item_paths:
+                items_to_update.append({"_id": item['_id'],
+                                        "download_path": config_vars.resolve_str("/".join((install_folder, item['path'][len(source_parent)+1:]))),
+                                        "download_root": config_vars.resolve_str("/".join((install_folder, resolved_source_parts[-1])))})
+        else:
+            item_paths = svn_table.get_recursive_paths_in_dir(dir_path=source)
+            for item in item_paths:
+                items_to_update.append({"_id": item['_id'],
+                                        "download_path": config_vars.resolve_str("/".join((local_repo_sync_dir, item['path']))),
+                                        "download_root": None})
+    svn_table.update_downloads(items_to_update)
+
+
+def whole_dir(svn_table, sources):
+    """ the way InstlClient.set_sync_locations_for_active_items sets download paths """
+    items_to_update = list()
+    for i_source, source in enumerate(sources):
+        resolved_source_parts = source.split("/")
+        if i_source % 2 == 0:
+            svn_table.count_recursive_paths_in_dir(dir_path=source, what="any")  # for the progress message
+            source_parent = "/".join(resolved_source_parts[:-1])
+            items_to_update.append({"dir_path": source,
+                                    "download_path_prefix": install_folder + "/",
+                                    "path_start": len(source_parent) + 2,
+                                    "download_root": config_vars.resolve_str("/".join((install_folder, resolved_source_parts[-1]))),
+                                    "include_dirs": 1})
+        else:
+            svn_table.count_recursive_paths_in_dir(dir_path=source)
+            items_to_update.append({"dir_path": source,
+                                    "download_path_prefix": local_repo_sync_dir + "/",
+                                    "path_start": 1,
+                                    "download_root": None,
+                                    "include_dirs": 0})
+    svn_table.update_downloads(items_to_update)
+
+
+def run_once(info_map_path, sources, set_download_paths):
+    svn_table = prepare_table(info_map_path)
+    start_time = time.perf_counter()
+    set_download_paths(svn_table, sources)
+    elapsed = time.perf_counter() - start_time
+    with svn_table.db.selection() as curs:
+        curs.execute("""SELECT _id, download_root, download_path FROM svn_item_t ORDER BY _id""")
+        downloads = [tuple(row) for row in curs.fetchall()]
+    svn_table.db.close()
+    return elapsed, downloads
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sources", type=int, default=500)
+    parser.add_argument("--files-per-source", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        info_map_path = create_info_map(Path(work_folder), args.sources, args.files_per_source)
+        sources = [f"Mac/Plugins/Item_{i_source}.bundle" for i_source in range(args.sources)]
+        print(f"{args.sources} sources x {args.files_per_source} files")
+        results = list()
+        for name, set_download_paths in (("item-by-item", item_by_item), ("whole-dir", whole_dir)):
+            elapsed, downloads = run_once(info_map_path, sources, set_download_paths)
+            results.append(downloads)
+            print(f"{name:<14} {elapsed:>8.3f}s")
+        print(f"identical download paths: {results[0] == results[1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare download throughput of the two sync download engines against a local HTTP server:
+        curl:   CUrlHelper config files, each run by a curl process in parallel - as ParallelRun does
+        python: DownloadFiles batch command, threads pulling from one shared list of files
+
+    Files sizes are skewed - a few large files and many small ones - and the server adds a fixed
+    latency to each request, so static sharding of files between curl processes can be compared
+    with threads that rebalance while downloading.
+
+    usage: bench_sync_download.py [--num-files 2000] [--large-files 8] [--large-file-mb 16] [--parallel 8] [--latency-ms 5]
+"""
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+import functools
+import http.server
+import multiprocessing
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+from configVar import config_vars
+from pybatch import DownloadFiles, PythonBatchCommandBase
+from pyinstl.curlHelper import CUrlHelper
+
+
+class LatencyRequestHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as CDN servers do
+    latency_sec = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency_sec)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_folder_forever(serve_folder, latency_sec, port_queue):
+    """ the server runs in its own process so it does not compete with the python engine for the GIL """
+    LatencyRequestHandler.latency_sec = latency_sec
+    handler = functools.partial(LatencyRequestHandler, directory=os.fspath(serve_folder))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def create_files(serve_folder: Path, num_files, num_large_files, large_file_mb):
+    """ return list of (name, size, checksum) """
+    retVal = list()
+    for i in range(num_files + num_large_files):
+        if i < num_large_files:
+            contents = os.urandom(1024 * 1024) * large_file_mb
+        else:
+            contents = os.urandom(512 + (i % 32) * 1024)
+        name = f"folder_{i % 20}/file_{i}.bin"
+        file_path = serve_folder.joinpath(name)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(contents)
+        retVal.append((name, len(contents), hashlib.sha1(contents).hexdigest()))
+    return retVal
+
+
+def fill_dl_tool(base_url, download_folder, files):
+    dl_tool = CUrlHelper()
+    for name, size, checksum in files:
+        dl_tool.add_download_url(f"{base_url}/{name}", download_folder.joinpath(name), verbatim=True, size=size, checksum=checksum)
+    return dl_tool
+
+
+def download_with_curl(base_url, work_folder, files, parallel):
+    download_folder = work_folder.joinpath("curl")
+    config_folder = work_folder.joinpath("curl_config")
+    config_folder.mkdir()
+    dl_tool = fill_dl_tool(base_url, download_folder, files)
+    config_files = dl_tool.create_config_files(config_folder.joinpath("dl"), parallel)
+    start_time = time.perf_counter()
+    processes = [subprocess.Popen(["curl", "--config", config_file], stdout=subprocess.DEVNULL) for config_file in config_files if config_file]
+    for process in processes:
+        process.wait()
+    return time.perf_counter() - start_time, download_folder
+
+
+def download_with_python(base_url, work_folder, files, parallel):
+    download_folder = work_folder.joinpath("python")
+    download_list_file = work_folder.joinpath("download_list.csv")
+    fill_dl_tool(base_url, download_folder, files).create_download_list_file(download_list_file)
+    start_time = time.perf_counter()
+    with DownloadFiles(download_list_file, num_workers=parallel, report_own_progress=False) as downloader:
+        downloader()
+    return time.perf_counter() - start_time, download_folder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-files", type=int, default=2000)
+    parser.add_argument("--large-files", type=int, default=8)
+    parser.add_argument("--large-file-mb", type=int, default=16)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    config_vars["CURL_RETRIES"] = 0
+    PythonBatchCommandBase.ignore_progress = True
+    with tempfile.TemporaryDirectory() as work_folder:
+        work_folder = Path(work_folder)
+        serve_folder = work_folder.joinpath("serve")
+        files = create_files(serve_folder, args.num_files, args.large_files, args.large_file_mb)
+        total_mb = sum(size for _, size, _ in files) / (1024 * 1024)
+
+        port_queue = multiprocessing.Queue()
+        server_process = multiprocessing.Process(target=serve_folder_forever, args=(serve_folder, args.latency_ms / 1000, port_queue), daemon=True)
+        server_process.start()
+        base_url = f"http://127.0.0.1:{port_queue.get()}"
+
+        print(f"{len(files)} files, {total_mb:.1f} MB, {args.parallel} in parallel, {args.latency_ms}ms latency per request")
+        print(f"{'engine':<8} {'wall time (s)':>14} {'MB/s':>8}")
+        engines = [("python", download_with_python)]
+        if shutil.which("curl"):
+            engines.insert(0, ("curl", download_with_curl))
+        for name, download_func in engines:
+            elapsed, download_folder = download_func(base_url, work_folder, files, args.parallel)
+            num_ok = sum(1 for file_name, _, _ in files if download_folder.joinpath(file_name).is_file())
+            print(f"{name:<8} {elapsed:>14.3f} {total_mb / elapsed:>8.1f}  ({num_ok} of {len(files)} files)")
+        server_process.terminate()
+
+
+if __name__ == '__main__':
+    main()
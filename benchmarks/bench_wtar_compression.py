@@ -0,0 +1,96 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare compression throughput and ratio of wtar archives:
+    tarfile's own "w:bz2" single stream, as Wtar did before, followed by SplitFile,
+    against utils.ParallelCompressingWriter with each available compression and --workers threads,
+    split with utils.SplitFileWriter while writing.
+
+    The plugin tree is generated in --folder (default: a temp folder): --plugins bundles each with
+    --files-per-plugin files of --file-size bytes, a mix of repetitive data and noise,
+    somewhat like the binaries and resources of real plugins.
+
+    usage: bench_wtar_compression.py [--folder path] [--plugins 4] [--files-per-plugin 20] [--file-size 1048576] [--workers 1,2,4,8] [--split 5242880]
+"""
+
+import os
+import sys
+import time
+import random
+import tarfile
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils
+from pybatch import SplitFile
+
+
+def create_plugin_tree(source_folder: Path, num_plugins, files_per_plugin, file_size):
+    rand = random.Random(17)
+    words = [bytes(rand.choices(range(256), k=rand.randint(4, 64))) for _ in range(512)]
+    for i_plugin in range(num_plugins):
+        resources_path = source_folder.joinpath(f"Plugin_{i_plugin}.bundle", "Contents", "Resources")
+        resources_path.mkdir(parents=True)
+        for i_file in range(files_per_plugin):
+            contents = bytearray()
+            while len(contents) < file_size:
+                contents += rand.choice(words) if rand.random() < 0.9 else rand.randbytes(256)
+            resources_path.joinpath(f"resource_{i_file}.bin").write_bytes(contents[:file_size])
+
+
+def tar_with_tarfile_bz2(source_folder: Path, wtar_path: Path, split_threshold):
+    with tarfile.open(wtar_path, "w:bz2", format=tarfile.PAX_FORMAT, compresslevel=1) as tar:
+        tar.add(source_folder, arcname=source_folder.name)
+    with SplitFile(wtar_path, max_size=split_threshold, report_own_progress=False) as sf, contextlib.redirect_stdout(None):
+        sf()  # SplitFile prints the parts
+
+
+def tar_with_parallel_compression(source_folder: Path, wtar_path: Path, split_threshold, codec, num_workers):
+    with utils.SplitFileWriter(wtar_path, max_size=split_threshold) as split_writer:
+        with utils.ParallelCompressingWriter(split_writer, codec, num_workers) as compressing_writer:
+            with tarfile.open(fileobj=compressing_writer, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                tar.add(source_folder, arcname=source_folder.name)
+
+
+def timed(work_folder: Path, source_size, tar_func, *args):
+    wtar_folder = Path(tempfile.mkdtemp(dir=work_folder))
+    wtar_path = wtar_folder.joinpath("plugins.wtar")
+    start_time = time.perf_counter()
+    tar_func(wtar_path, *args)
+    elapsed = time.perf_counter() - start_time
+    compressed_size = sum(part.stat().st_size for part in wtar_folder.iterdir())
+    return f"{elapsed:>7.3f}s {source_size / elapsed / (1024 * 1024):>8.1f} {source_size / compressed_size:>7.2f}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder")
+    parser.add_argument("--plugins", type=int, default=4)
+    parser.add_argument("--files-per-plugin", type=int, default=20)
+    parser.add_argument("--file-size", type=int, default=1024 * 1024)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--split", type=int, default=5 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.folder) as work_folder:
+        work_folder = Path(work_folder)
+        source_folder = work_folder.joinpath("plugins")
+        create_plugin_tree(source_folder, args.plugins, args.files_per_plugin, args.file_size)
+        source_size = args.plugins * args.files_per_plugin * args.file_size
+        print(f"{source_size / (1024 * 1024):.0f} MB, {os.cpu_count()} cpus")
+        print(f"{'compression':<18} {'workers':>7} {'time':>8} {'MB/s':>8} {'ratio':>7}")
+        print(f"{'tarfile w:bz2':<18} {1:>7} {timed(work_folder, source_size, lambda wtar_path: tar_with_tarfile_bz2(source_folder, wtar_path, args.split))}")
+        for codec in utils.wtar_codecs.values():
+            if not codec.available:
+                print(f"{codec.name:<18} python module not installed")
+                continue
+            for num_workers in [int(workers) for workers in args.workers.split(",")]:
+                result = timed(work_folder, source_size, lambda wtar_path: tar_with_parallel_compression(source_folder, wtar_path, args.split, codec, num_workers))
+                print(f"{codec.name:<18} {num_workers:>7} {result}")
+
+
+if __name__ == '__main__':
+    main()
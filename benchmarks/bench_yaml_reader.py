@@ -0,0 +1,84 @@
+#!/usr/bin/env python3.9
+
+"""
+    Compare the time it takes to compose a large index.yaml with the pure-python yaml parser
+    and with the parser used by aYaml.YamlReader (libyaml's CLoader when pyyaml was built with it).
+
+    The index is generated: --items IIDs each with name, version, guid, inheritance, install_sources
+    and actions, similar to a real index.yaml. Alternatively pass the path to an existing index.yaml.
+
+    usage: bench_yaml_reader.py [index.yaml] [--items 20000] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import argparse
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import yaml
+import aYaml
+
+
+def generated_index_text(num_items, num_base_items=100, seed=17):
+    """ items inherit from one of the first num_base_items, which do not inherit, as in a real index.yaml """
+    rand = random.Random(seed)
+    lines = ["--- !index"]
+    for i in range(num_items):
+        lines.extend([f"ITEM_{i}_IID:",
+                      f"    name: Item number {i}",
+                      f"    version: {rand.randint(1, 20)}.{rand.randint(0, 99)}.{rand.randint(0, 999)}",
+                      f"    guid: {uuid.UUID(int=rand.getrandbits(128))}",
+                      f"    inherit: ITEM_{rand.randrange(num_base_items)}_IID" if i >= num_base_items else f"    remark: base item",
+                      f"    install_sources:",
+                      f"        - !dir Common/Plugins/Item_{i}.bundle",
+                      f"        - !file Common/Data/Item_{i}.dat",
+                      f"    install_folders: $(COMMON_PLUGINS_DIR)",
+                      f"    actions:",
+                      f"        pre_copy_to_folder:",
+                      f"            - ShellCommand(r'''echo \"copy item {i}\"''')",
+                      f"        post_copy_item:",
+                      f"            - Chmod(r'''Item_{i}.bundle''', 'a+rw')",
+                      f"    Mac:",
+                      f"        remove_item: Item_{i}.bundle",
+                      f"    Win:",
+                      f"        remove_item: Item_{i}.dll"])
+    lines.append("")
+    return "\n".join(lines)
+
+
+def time_compose(text, loader, repeat):
+    retVal = float("inf")
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in yaml.compose_all(text, Loader=loader):
+            pass
+        retVal = min(retVal, time.perf_counter() - start_time)
+    return retVal
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("index_path", nargs="?")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.index_path:
+        with open(args.index_path, "r", encoding="utf-8") as rfd:
+            text = rfd.read()
+    else:
+        text = generated_index_text(args.items)
+
+    print(f"{len(text) / (1024 * 1024):.1f} MB of yaml, libyaml available: {yaml.__with_libyaml__}")
+    python_time = time_compose(text, yaml.Loader, args.repeat)
+    print(f"{'yaml.Loader':<18} {python_time:>8.3f}s")
+    if aYaml.YamlLoader is not yaml.Loader:
+        fast_time = time_compose(text, aYaml.YamlLoader, args.repeat)
+        print(f"{aYaml.YamlLoader.__name__:<18} {fast_time:>8.3f}s  ({python_time / fast_time:.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
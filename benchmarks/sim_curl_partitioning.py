@@ -0,0 +1,104 @@
+#!/usr/bin/env python3.9
+
+"""
+    Simulate the time it takes curl processes to download a sync, with files divided between curl config files by:
+        round-robin:  the previous division - files sorted by size and dealt to config files one by one
+        balanced:     utils.partition_by_total_size - about the same number of bytes in each config file
+        balanced-xN:  N config files per process, processes that finish a config file pick the next one
+                      ($(CURL_CONFIG_FILES_PER_PROCESS) = N)
+
+    Each process downloads its files one after the other, each file taking:
+        latency + size / bandwidth-per-connection
+    bandwidth of each config file's connection is randomly varied by up to +-jitter, since in real life some
+    connections are slower than others, which is where picking the next config file pays off.
+    The "ideal" column is the total time divided by the number of processes.
+
+    File sizes are read from info_map files (text format, e.g. full_info_map.txt) or,
+    if none are given, generated: many small files and a few large wtar parts.
+
+    usage: sim_curl_partitioning.py [info_map.txt ...] [--parallel 16] [--mbps-per-connection 4] [--latency-ms 30] [--jitter 0.5] [--chunks 2 4 8]
+"""
+
+import os
+import sys
+import heapq
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+import utils
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, "defaults").resolve()
+
+
+def sizes_from_info_maps(info_map_paths):
+    from db.dbMaster import DBMaster
+    from svnTree import SVNTable
+    retVal = list()
+    for info_map_path in info_map_paths:
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        svn_table.read_from_file(os.fspath(info_map_path), a_format="text")
+        retVal.extend(svn_table.db.select_and_fetchall("""SELECT size FROM svn_item_t WHERE fileFlag=1"""))
+        svn_table.db.close()
+    return retVal
+
+
+def generated_sizes(num_files=20000, num_wtar_parts=40, wtar_part_mb=100, seed=17):
+    rand = random.Random(seed)
+    retVal = [int(rand.lognormvariate(9, 2)) for _ in range(num_files)]
+    retVal.extend(wtar_part_mb * 1024 * 1024 for _ in range(num_wtar_parts))
+    return retVal
+
+
+def round_robin_partition(sizes, num_partitions):
+    retVal = [list() for _ in range(min(num_partitions, len(sizes)))]
+    for i, size in enumerate(sorted(sizes)):
+        retVal[i % len(retVal)].append(size)
+    return retVal
+
+
+def download_time(sizes, latency_sec, bytes_per_sec):
+    return sum(latency_sec + size / bytes_per_sec for size in sizes)
+
+
+def makespan(config_files, num_processes, latency_sec, bytes_per_sec, jitter, seed=17):
+    """ each process takes the next config file when it's free, as ParallelRun does with max_parallel_processes """
+    rand = random.Random(seed)
+    process_free_at = [0.0] * min(num_processes, len(config_files))
+    for config_file in config_files:
+        free_at = heapq.heappop(process_free_at)
+        connection_bytes_per_sec = bytes_per_sec * rand.uniform(1 - jitter, 1 + jitter)
+        heapq.heappush(process_free_at, free_at + download_time(config_file, latency_sec, connection_bytes_per_sec))
+    return max(process_free_at)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("info_maps", nargs="*")
+    parser.add_argument("--parallel", type=int, default=16)
+    parser.add_argument("--mbps-per-connection", type=float, default=4)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    sizes = sizes_from_info_maps(args.info_maps) if args.info_maps else generated_sizes()
+    latency_sec = args.latency_ms / 1000
+    bytes_per_sec = args.mbps_per_connection * 1024 * 1024
+    ideal = download_time(sizes, latency_sec, bytes_per_sec) / args.parallel
+
+    print(f"{len(sizes)} files, {sum(sizes) / (1024 * 1024):.1f} MB, largest {max(sizes) / (1024 * 1024):.1f} MB, {args.parallel} processes")
+    print(f"{'partitioning':<14} {'makespan (s)':>13} {'vs ideal':>9}")
+    print(f"{'ideal':<14} {ideal:>13.1f} {1:>9.2f}")
+    variants = [("round-robin", round_robin_partition(sizes, args.parallel)),
+                ("balanced", utils.partition_by_total_size(sizes, args.parallel, lambda size: size))]
+    for num_chunks in args.chunks:
+        variants.append((f"balanced-x{num_chunks}", utils.partition_by_total_size(sizes, args.parallel * num_chunks, lambda size: size)))
+    for name, config_files in variants:
+        variant_makespan = makespan(config_files, args.parallel, latency_sec, bytes_per_sec, args.jitter)
+        print(f"{name:<14} {variant_makespan:>13.1f} {variant_makespan / ideal:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -231,6 +231,7 @@ class ConfigVar:
         """
         if value is not None:
             self.values.append(str(value))
+            self.owner.config_var_changed(self)
             self.callback_when_value_is_set(self.name, value)
 
     def extend(self, values):
@@ -254,6 +255,7 @@ class ConfigVar:
         """ erase all values """
         if self.values:
             self.values.clear()
+            self.owner.config_var_changed(self)
 
     def raw(self, join_sep: Optional[str] = "") -> Union[str, List[str]]:
         """ return the list of values unresolved"""
@@ -3,6 +3,7 @@
 import re
 import string
 from collections import namedtuple
+from functools import lru_cache
 from typing import Optional, Callable, Dict
 
 
@@ -257,6 +258,17 @@ def var_parse_imp(f_string, resolve_indicator='$'):
         raise ValueError(f"failed to parse {f_string}")
 
 
+@lru_cache(maxsize=64*1024)
+def compile_template(f_string, resolve_indicator='$'):
+    """ parse f_string with var_parse_imp and return the parsed sections as a tuple.
+        Parsing depends only on f_string and resolve_indicator - not on the values of ConfigVars,
+        so each template is parsed once and the compiled form is reused.
+        Returned ParseRetVal-s are shared and should not be changed.
+    """
+    retVal = tuple(var_parse_imp(f_string, resolve_indicator))
+    return retVal
+
+
 def resolve_variable_1(parse_retVal, default=""):
     retVal = "".join(("!", parse_retVal.variable_name))
     if parse_retVal.array_index_str is not None:
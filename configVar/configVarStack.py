@@ -10,11 +10,35 @@
 import os
 import re
 from contextlib import contextmanager
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import aYaml
 from .configVarOne import ConfigVar
-from .configVarParser import var_parse_imp
+from .configVarParser import compile_template
+
+
+class AccessedConfigVars(dict):
+    """ maps the names of ConfigVars accessed while recording, to their raw values
+        at the time of first access, or None if the ConfigVar was not defined.
+        See ConfigVarStack.record_accessed_vars.
+    """
+    def __init__(self, ignore=()) -> None:
+        super().__init__()
+        self.ignore = set(ignore)
+        self.dynamic_var_was_accessed = False  # values of dynamic ConfigVars cannot be compared
+        self.environment_was_read = False
+
+    def record(self, var_list: List[Dict], key: str) -> None:
+        if key not in self and key not in self.ignore:
+            for var_dict in reversed(var_list):
+                if key in var_dict:
+                    config_var = var_dict[key]
+                    self[key] = tuple(config_var.values)
+                    if config_var.dynamic:
+                        self.dynamic_var_was_accessed = True
+                    break
+            else:
+                self[key] = None
 
 
 class ConfigVarStack:
@@ -36,6 +60,17 @@ class ConfigVarStack:
             while resolving and cache is not purged
             also with the introduction of dynamic configVars maintain a cache becomes more complicated, as these cannot be cached
             last version with cache was 2.1.5.5 9/12/2019
+        compiled templates and versioned resolve cache:
+            Strings to resolve are parsed once by compile_template and the parsed form is reused,
+            parsing does not depend on ConfigVar values so it never needs invalidation.
+            self.version identifies the state of the ConfigVars, a new version is created whenever
+            a ConfigVar is added, removed or changed or the resolve indicator changes.
+            Resolved strings are cached per version, so a change makes the cache of the previous version irrelevant.
+            push_scope does not change the state, and pop_scope returns to the version the state had before
+            push_scope - unless lower stack levels were changed in the meanwhile. So resolving a ConfigVar
+            with params - which pushes a scope and adds temporary variables - does not invalidate the cache.
+            Strings that depend on dynamic ConfigVars are not cached, and the cache is not used
+            while recording accessed ConfigVars.
         simple resolve:
             when a string to resolve does not contain '$' it need not go through parsing
             this proved to save relatively a lot of resolve time (-60% ~500ms for large installations) - much more than caching
@@ -46,6 +81,14 @@ class ConfigVarStack:
         self.simple_resolve_counter: int = 0
         self.resolve_time: float = 0.0
         self.resolve_indicator = '$'  # default is $ but can be changed for special cases
+        self.accessed_vars: Optional[AccessedConfigVars] = None  # see record_accessed_vars
+        self.version: int = 0  # identifies the state of the ConfigVars, see class doc string
+        self.last_version: int = 0
+        self.scope_versions: List[List] = list()  # for each pushed scope: [version before push, True if lower levels were changed]
+        self.resolve_caches: Dict[int, Dict] = dict()  # version -> {str_to_resolve: resolved}
+        self.resolve_cache_max_size: int = 64*1024
+        self.resolve_cache_hits: int = 0
+        self.uncachable_resolve_counter: int = 0  # incremented when a dynamic ConfigVar is resolved
 
     def __len__(self) -> int:
         """ From RafeKettler/magicmethods: Returns the length of the container.
@@ -74,6 +117,8 @@ class ConfigVarStack:
         """
         if not isinstance(key, str):
             raise TypeError(f"'key' param of __getitem__() should be str not {type(key)},  '{key}'")
+        if self.accessed_vars is not None:
+            self.accessed_vars.record(self.var_list, key)
         for var_dict in reversed(self.var_list):
             if key in var_dict:
                 return var_dict[key]
@@ -99,6 +144,7 @@ class ConfigVarStack:
         except KeyError:
             config_var = ConfigVar(self, key)
             self.var_list[-1][key] = config_var
+            self.new_version(len(self.var_list)-1)
         else:
             # clear the ConfigVar if its already in self.var_list[-1]
             config_var.clear()
@@ -125,9 +171,10 @@ class ConfigVarStack:
         """
         if not isinstance(key, str):
             raise TypeError(f"'key' param of __delitem__() should be str not {type(key)},  '{key}'")
-        for var_dict in reversed(self.var_list):
+        for i_level in range(len(self.var_list)-1, -1, -1):
             try:
-                del var_dict[key]
+                del self.var_list[i_level][key]
+                self.new_version(i_level)
                 return
             except KeyError:
                 continue
@@ -138,6 +185,8 @@ class ConfigVarStack:
         """__contains__ defines behavior for membership tests using in and not in. Why isn't this part of a sequence protocol, you ask? Because when __contains__ isn't defined, Python just iterates over the sequence and returns True if it comes across the item it's looking for."""
         if not isinstance(key, str):
             raise TypeError(f"'key' param of __contains__() should be str not {type(key)},  '{key}'")
+        if self.accessed_vars is not None:
+            self.accessed_vars.record(self.var_list, key)
         for var_dict in self.var_list:
             if key in var_dict:
                 return True
@@ -188,6 +237,7 @@ class ConfigVarStack:
             if default:
                 new_config_var.append(default)
             self.var_list[-1][key] = new_config_var
+            self.new_version(len(self.var_list)-1)
         retVal = self[key]
         return retVal
 
@@ -195,6 +245,40 @@ class ConfigVarStack:
         """ clear all stack levels"""
         self.var_list.clear()
         self.var_list.append(dict())
+        self.scope_versions.clear()
+        self.new_version()
+
+    def new_version(self, changed_level=0):
+        """ called whenever ConfigVars change, see class doc string.
+            changed_level: index of the stack level that was changed. Scopes pushed above
+            that level will not return to their previous version when popped.
+        """
+        self.last_version += 1
+        self.version = self.last_version
+        for scope_version in self.scope_versions[changed_level:]:
+            scope_version[1] = True
+
+    def config_var_changed(self, config_var):
+        """ called by ConfigVar when it's values change """
+        for i_level in range(len(self.var_list)-1, -1, -1):
+            if self.var_list[i_level].get(config_var.name) is config_var:
+                self.new_version(i_level)
+                break
+        # ConfigVars not in self.var_list, e.g. those returned by get(), do not change the state
+
+    def get_resolve_cache(self) -> Dict:
+        """ return the resolve cache for the current version, creating it if needed
+            and discarding caches of versions that cannot return
+        """
+        retVal = self.resolve_caches.get(self.version)
+        if retVal is None:
+            live_versions = {scope_version[0] for scope_version in self.scope_versions if not scope_version[1]}
+            for version in [version for version in self.resolve_caches if version not in live_versions]:
+                del self.resolve_caches[version]
+            retVal = self.resolve_caches[self.version] = dict()
+        elif len(retVal) >= self.resolve_cache_max_size:
+            retVal.clear()
+        return retVal
 
     def variable_params_to_config_vars(self, parser_retVal):
         """ parse positional and/or key word params and create
@@ -232,10 +316,20 @@ class ConfigVarStack:
         """ resolve a string to a list, return the list and also the number of variables and literal in the list.
             Returning these statistic can help with debugging
         """
+        use_cache = self.accessed_vars is None  # cached strings would not be recorded as accessed
+        if use_cache:
+            resolve_cache = self.get_resolve_cache()
+            cached = resolve_cache.get(str_to_resolve)
+            if cached is not None:
+                self.resolve_cache_hits += 1
+                return list(cached[0]), cached[1], cached[2]
+
+        version_before = self.version
+        uncachable_before = self.uncachable_resolve_counter
         resolved_parts = list()
         num_literals = 0
         num_variables = 0
-        for parser_retVal in var_parse_imp(str_to_resolve, self.resolve_indicator):
+        for parser_retVal in compile_template(str_to_resolve, self.resolve_indicator):
             if parser_retVal.literal_text:
                 resolved_parts.append(parser_retVal.literal_text)
                 num_literals += 1
@@ -243,10 +337,16 @@ class ConfigVarStack:
                 if parser_retVal.variable_name in self:
                     with self.push_scope_context(use_cache=False):
                         array_range = self.variable_params_to_config_vars(parser_retVal)
-                        resolved_parts.extend(list(self[parser_retVal.variable_name])[array_range[0]:array_range[1]])
+                        config_var = self[parser_retVal.variable_name]
+                        if config_var.dynamic:
+                            self.uncachable_resolve_counter += 1
+                        resolved_parts.extend(list(config_var)[array_range[0]:array_range[1]])
                 else:
                     resolved_parts.append(parser_retVal.variable_str)
                 num_variables += 1
+
+        if use_cache and self.version == version_before and self.uncachable_resolve_counter == uncachable_before:
+            self.get_resolve_cache()[str_to_resolve] = (tuple(resolved_parts), num_literals, num_variables)
         return resolved_parts, num_literals, num_variables
 
     def resolve_str(self, val_to_resolve: str) -> str:
@@ -347,9 +447,15 @@ class ConfigVarStack:
 
     def push_scope(self):
         self.var_list.append(dict())
+        self.scope_versions.append([self.version, False])
 
     def pop_scope(self):
         self.var_list.pop()
+        version_before_push, lower_levels_changed = self.scope_versions.pop() if self.scope_versions else (None, True)
+        if lower_levels_changed:
+            self.new_version(len(self.var_list))
+        else:
+            self.version = version_before_push
 
     @contextmanager
     def push_scope_context(self, use_cache=True):
@@ -357,9 +463,25 @@ class ConfigVarStack:
         yield self
         self.pop_scope()
 
+    @contextmanager
+    def record_accessed_vars(self, ignore=()):
+        """ record the ConfigVars that are accessed (read or checked for existence) inside the context,
+            with their values before they were first accessed. Outcome of code that depends on ConfigVars
+            can be reused if all recorded ConfigVars still have the same values.
+            ConfigVars named in ignore are not recorded.
+        """
+        previous_accessed_vars = self.accessed_vars
+        self.accessed_vars = AccessedConfigVars(ignore)
+        try:
+            yield self.accessed_vars
+        finally:
+            self.accessed_vars = previous_accessed_vars
+
     def read_environment(self, vars_to_read_from_environ=None):
         """ Get values from environment. Get all values if regex is None.
             Get values matching regex otherwise """
+        if self.accessed_vars is not None:
+            self.accessed_vars.environment_was_read = True
         if vars_to_read_from_environ is None:
             for env_key, env_value in os.environ.items():
                 # not sure why, sometimes I get an empty string as env variable name
@@ -404,6 +526,7 @@ class ConfigVarStack:
             print(f"{len(self)} ConfigVars")
             print(f"{self.resolve_counter} resolves")
             print(f"{self.simple_resolve_counter} simple resolves")
+            print(f"{self.resolve_cache_hits} cached resolves")
             average_resolve_ms = (self.resolve_time / self.resolve_counter)*1000 if self.resolve_counter else 0.0
             print(f"{average_resolve_ms:.4}ms per resolve")
             print(f"{self.resolve_time:.3}sec total resolve time")
@@ -435,8 +558,10 @@ class ConfigVarStack:
     def push_resolve_indicator(self, resolve_indicator):
         previous_resolve_indicator = self.resolve_indicator
         self.resolve_indicator = resolve_indicator
+        self.new_version()
         yield self
         self.resolve_indicator = previous_resolve_indicator
+        self.new_version()
 
     def does_config_var_name_means_path(self, config_var_name):
         for ending in self.get("CONFIG_VAR_NAME_ENDING_DENOTING_PATH", []).list():
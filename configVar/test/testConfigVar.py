@@ -193,4 +193,75 @@ class TestConfigVar(unittest.TestCase):
         self.assertEqual(config_vars["01"].str(), "@(ONE) Two")
         self.assertEqual(config_vars["00"].str(), "@(ONE) @(TWO)")
 
+    def test_resolve_cache_invalidation(self):
+        config_vars["GREETING"] = "Hello $(NAME)"
+        config_vars["NAME"] = "World"
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello World!")
+        hits_before = config_vars.resolve_cache_hits
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello World!")
+        self.assertGreater(config_vars.resolve_cache_hits, hits_before)
+
+        config_vars["NAME"] = "Moon"  # assignment
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello Moon!")
+        config_vars["NAME"].append("light")  # change of existing ConfigVar
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello Moonlight!")
+        config_vars["NAME"].clear()
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello !")
+        del config_vars["NAME"]
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello $(NAME)!")
+        config_vars.setdefault("NAME", "Sun")
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello Sun!")
+        with config_vars.push_resolve_indicator('@'):
+            self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "$(GREETING)!")
+        self.assertEqual(config_vars.resolve_str("$(GREETING)!"), "Hello Sun!")
+
+    def test_resolve_cache_scopes(self):
+        config_vars["GREETING"] = "Hello $(NAME)"
+        config_vars["NAME"] = "World"
+        self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello World")
+        with config_vars.push_scope_context():
+            self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello World")
+            config_vars["NAME"] = "Inner"  # overrides NAME in inner scope only
+            self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello Inner")
+            with config_vars.push_scope_context():
+                config_vars["GREETING"] = "Bye $(NAME)"
+                self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Bye Inner")
+            self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello Inner")
+        self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello World")
+
+        # params are resolved in their own scope, and should not leak to later resolves
+        config_vars["PARAMED"] = "$(__PARAMED_1__)-$(key)"
+        self.assertEqual(config_vars.resolve_str("$(PARAMED<a, key=b>)"), "a-b")
+        self.assertEqual(config_vars.resolve_str("$(PARAMED<c, key=d>)"), "c-d")
+        self.assertEqual(config_vars.resolve_str("$(PARAMED)"), "$(__PARAMED_1__)-$(key)")
+        self.assertEqual(config_vars.stack_size(), 1)
+        hits_before = config_vars.resolve_cache_hits
+        self.assertEqual(config_vars.resolve_str("$(PARAMED<a, key=b>)"), "a-b")  # scope for params did not invalidate the cache
+        self.assertEqual(config_vars.resolve_cache_hits, hits_before+1)
+
+        # changing a lower level inside a scope is visible after the scope is popped
+        self.assertEqual(config_vars.resolve_str("$(GREETING)"), "Hello World")
+        with config_vars.push_scope_context():
+            config_vars["NAME"].append("wide")
+            config_vars["INNER_ONLY"] = "inner"
+            self.assertEqual(config_vars.resolve_str("$(GREETING) $(INNER_ONLY)"), "Hello Worldwide inner")
+        self.assertEqual(config_vars.resolve_str("$(GREETING) $(INNER_ONLY)"), "Hello Worldwide $(INNER_ONLY)")
+
+    def test_resolve_cache_dynamic_and_recorded(self):
+        counter = [0]
+
+        def next_number(val):
+            counter[0] += 1
+            return str(counter[0])
+        config_vars.set_dynamic_var("__NEXT__", next_number)
+        config_vars["NUMBERED"] = "number $(__NEXT__)"
+        self.assertEqual(config_vars.resolve_str("$(NUMBERED)"), "number 1")
+        self.assertEqual(config_vars.resolve_str("$(NUMBERED)"), "number 2")
+
+        config_vars["RECORDED"] = "recorded"
+        config_vars.resolve_str("$(RECORDED)")  # now in cache
+        with config_vars.record_accessed_vars() as accessed_vars:
+            self.assertEqual(config_vars.resolve_str("$(RECORDED)"), "recorded")
+        self.assertEqual(accessed_vars["RECORDED"], ("recorded",))
+
 
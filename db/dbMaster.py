@@ -1,8 +1,9 @@
 import os
+import sys
+import time
 import sqlite3
 from contextlib import contextmanager
 import datetime
-import inspect
 from pathlib import Path
 from _collections import defaultdict
 import shutil
@@ -34,25 +35,51 @@ class Statistic():
     def __init__(self) -> None:
         self.count = 0
         self.time = 0.0
+        self.rows = 0
 
-    def add_instance(self, time):
+    def add_instance(self, time, rows=0):
         self.count += 1
         self.time += time
+        self.rows += rows
 
     def __str__(self):
         average = self.time/self.count if self.count else 0.0
-        retVal = f"count, {self.count}, time, {self.time:.2f}, ms, average, {average:.2f}, ms"
+        retVal = f"count, {self.count}, time, {self.time:.2f}, ms, average, {average:.2f}, ms, rows, {self.rows}"
         return retVal
 
     def __repr__(self):
         average = self.time/self.count if self.count else 0.0
-        retVal = f"{self.count}, {self.time:.2f}, {average:.2f}"
+        retVal = f"{self.count}, {self.time:.2f}, {average:.2f}, {self.rows}"
         return retVal
 
 
+def call_site(depth):
+    """ name of the function depth frames above the caller of call_site, with file name and line number.
+        sys._getframe is used instead of inspect.stack which reads the source of all frames and is much slower.
+    """
+    try:
+        frame = sys._getframe(depth + 1)
+        retVal = f"{frame.f_code.co_name} {os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}"
+    except ValueError:  # call stack is not deep enough
+        retVal = "unknown"
+    return retVal
+
+
 class DBMaster(object):
-    def __init__(self, db_url: str, ddl_folder: Path) -> None:
+    # PRAGMAs set by each performance profile, profile is chosen by $(DB_PERFORMANCE_PROFILE).
+    # The db is recreated by each run of instl, so losing it in a crash is less of a concern than speed.
+    performance_profiles = {
+        "default": {},  # sqlite's defaults
+        "fast": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -64*1024,  # negative cache_size is in KiB
+                 "mmap_size": 256*1024*1024, "temp_store": "MEMORY"},
+        "fastest": {"journal_mode": "WAL", "synchronous": "OFF", "cache_size": -256*1024,
+                    "mmap_size": 1024*1024*1024, "temp_store": "MEMORY"},
+    }
+    file_only_pragmas = ("journal_mode", "mmap_size")  # not relevant for :memory: db
+
+    def __init__(self, db_url: str, ddl_folder: Path, performance_profile=None) -> None:
         self.top_user_version = 1  # user_version is a standard pragma tha defaults to 0
+        self.performance_profile = performance_profile  # if None $(DB_PERFORMANCE_PROFILE) is used
         if db_url == ":memory:":
             self.memory_db = True
             self.db_file_path = None
@@ -63,7 +90,8 @@ class DBMaster(object):
         self.__conn = None
         self.__curs = None
         self.locked_tables = set()
-        self.statistics = defaultdict(Statistic)
+        self.statistics = defaultdict(Statistic)  # call site => Statistic, collected only if self.profile_queries
+        self.profile_queries = bool(config_vars.get("PROFILE_DB_QUERIES", "False"))
         self.print_execute_times = False
         self.transaction_depth = 0
 
@@ -112,11 +140,22 @@ class DBMaster(object):
     def configure_db(self):
         self.set_db_pragma("foreign_keys", "ON")
         self.set_db_pragma("user_version", self.top_user_version)
+        self.set_performance_pragmas()
         #self.__conn.set_authorizer(self.authorizer_handler_sqlite3)
         #self.__conn.set_progress_handler(self.progress_handler_sqlite3, 8)
         self.__conn.row_factory = sqlite3.Row
         self.__conn.set_trace_callback(None)
 
+    def set_performance_pragmas(self):
+        profile_name = self.performance_profile or config_vars.get("DB_PERFORMANCE_PROFILE", "default").str()
+        pragmas = self.performance_profiles.get(profile_name)
+        if pragmas is None:
+            log.warning(f"unknown DB_PERFORMANCE_PROFILE '{profile_name}', using 'default'")
+            pragmas = self.performance_profiles["default"]
+        for pragma_name, pragma_value in pragmas.items():
+            if not (self.memory_db and pragma_name in self.file_only_pragmas):
+                self.set_db_pragma(pragma_name, pragma_value)
+
     def authorizer_handler_sqlite3(self, *args, **kwargs):
         """ callback for sqlite3.connection.set_authorizer"""
         return sqlite3.SQLITE_OK
@@ -128,28 +167,40 @@ class DBMaster(object):
     def create_function(self, func_name, num_params, func_ptr):
         self.__conn.create_function(func_name, num_params, func_ptr)
 
+    @staticmethod
+    def db_and_wal_file_paths(db_file_path: Path):
+        """ the db file and the -wal, -shm files sqlite creates next to it with journal_mode=WAL.
+            A leftover -wal file might be replayed into a new db with the same name, so they are removed together.
+        """
+        retVal = [db_file_path] + [db_file_path.parent.joinpath(db_file_path.name+suffix) for suffix in ("-wal", "-shm")]
+        return retVal
+
     def close_and_delete(self):
         self.close()
         if not self.memory_db:
             from pybatch import RmFile
-            with RmFile(self.db_file_path, report_own_progress=False) as rf:
-                rf()
+            for file_path in self.db_and_wal_file_paths(self.db_file_path):
+                with RmFile(file_path, report_own_progress=False) as rf:
+                    rf()
 
     def close(self):
         if self.__conn:
             self.__conn.close()
             self.__conn = None
-        if bool(config_vars.get("PRINT_STATISTICS_DB", "False")) and self.statistics:
-            for name, stats in sorted(self.statistics.items()):
-                average = stats.time/stats.count
-                print(f"{name}, {repr(stats)}")
-
-                max_count = max(self.statistics.items(), key=lambda S: S[1].count)
-                max_time = max(self.statistics.items(), key=lambda S: S[1].time)
-                total_DB_time = sum(stat.time for stat in self.statistics.values())
-                print("max count:", max_count[0], max_count[1])
-                print("max time:", max_time[0], max_time[1])
-                print("total DB time:", total_DB_time)
+        if (self.profile_queries or bool(config_vars.get("PRINT_STATISTICS_DB", "False"))) and self.statistics:
+            self.print_statistics()
+
+    def print_statistics(self):
+        """ print statistics collected for each call site, sorted by total time """
+        print("call site, count, time ms, average ms, rows")
+        for name, stats in sorted(self.statistics.items(), key=lambda S: S[1].time, reverse=True):
+            print(f"{name}, {repr(stats)}")
+        max_count = max(self.statistics.items(), key=lambda S: S[1].count)
+        max_time = max(self.statistics.items(), key=lambda S: S[1].time)
+        total_DB_time = sum(stat.time for stat in self.statistics.values())
+        print("max count:", max_count[0], max_count[1])
+        print("max time:", max_time[0], max_time[1])
+        print(f"total DB time: {total_DB_time:.2f} ms")
 
     def set_db_pragma(self, pragma_name, pragma_value):
         set_pragma_q = f"""PRAGMA {pragma_name} = {pragma_value};"""
@@ -209,21 +260,18 @@ class DBMaster(object):
     @contextmanager
     def transaction(self, description=None, progress_callback=None, progress_callback_n_instructions=50*1024*1024):
         try:
-
-            if not description:
-                try:  # sporadically inspect.stack()[2] will raise 'list index out of range'
-                    description = inspect.stack()[2][3]
-                except IndexError as ex:
-                    description = "unknown"
+            # call site is looked for only when needed, when not profiling there is no overhead
+            if self.profile_queries:
+                site = description or call_site(2)
+                time1, changes1 = time.perf_counter(), self.__conn.total_changes
+            elif not description and progress_callback:
+                description = call_site(2)
             with self.ProgressCallBacker(self, description, progress_callback, progress_callback_n_instructions):
-                #time1 = time.perf_counter()
                 self.begin()
                 yield self.__curs
                 self.commit()
-                #time2 = time.perf_counter()
-                #if self.print_execute_times:
-                #    print('DB transaction %s took %0.3f ms' % (description, (time2-time1)*1000.0))
-                #self.statistics[description].add_instance((time2-time1)*1000.0)
+            if self.profile_queries:
+                self.statistics[site].add_instance((time.perf_counter()-time1)*1000.0, self.__conn.total_changes-changes1)
         except sqlite3.OperationalError as s3oo:
             if not self.memory_db:
                 log.error("database error, disk %s", str(shutil.disk_usage(self.db_file_path.parent)), exc_info=True)
@@ -238,17 +286,15 @@ class DBMaster(object):
             no commit is done
         """
         try:
-            if not description:
-                description = inspect.stack()[2][3]
+            if self.profile_queries:
+                site = description or call_site(2)
+                time1, changes1 = time.perf_counter(), self.__conn.total_changes
+            elif not description and progress_callback:
+                description = call_site(2)
             with self.ProgressCallBacker(self, description, progress_callback, progress_callback_n_instructions):
-                #time1 = time.perf_counter()
                 yield self.__conn.cursor()
-                #time2 = time.perf_counter()
-                #if self.print_execute_times:
-                #    if not description:
-                #        description = inspect.stack()[2][3]
-                #    print('DB selection %s took %0.3f ms' % (description, (time2-time1)*1000.0))
-                #self.statistics[description].add_instance((time2-time1)*1000.0)
+            if self.profile_queries:
+                self.statistics[site].add_instance((time.perf_counter()-time1)*1000.0, self.__conn.total_changes-changes1)
         except Exception as ex:
             raise
 
@@ -258,17 +304,15 @@ class DBMaster(object):
             no commit is done
         """
         try:
-            if not description:
-                description = inspect.stack()[2][3]
+            if self.profile_queries:
+                site = description or call_site(2)
+                time1, changes1 = time.perf_counter(), self.__conn.total_changes
+            elif not description and progress_callback:
+                description = call_site(2)
             with self.ProgressCallBacker(self, description, progress_callback, progress_callback_n_instructions):
-                #time1 = time.perf_counter()
                 yield self.__conn.cursor()
-                #time2 = time.perf_counter()
-                #if self.print_execute_times:
-                #    if not description:
-                #        description = inspect.stack()[2][3]
-                #    print('DB temporary transaction %s took %0.3f ms' % (description, (time2-time1)*1000.0))
-                #self.statistics[description].add_instance((time2-time1)*1000.0)
+            if self.profile_queries:
+                self.statistics[site].add_instance((time.perf_counter()-time1)*1000.0, self.__conn.total_changes-changes1)
         except Exception as ex:
             raise
 
@@ -292,8 +336,8 @@ class DBMaster(object):
         try:
             if query_params is None:
                 query_params = {}
-            if self.print_execute_times:
-                description = inspect.stack()[1][3]
+            if self.profile_queries:
+                description = call_site(1)  # report the caller of select_and_fetch... rather than select_and_fetch... itself
             else:
                 description = None
             with self.selection(description=description, progress_callback=progress_callback) as curs:
@@ -318,8 +362,8 @@ class DBMaster(object):
         try:
             if query_params is None:
                 query_params = {}
-            if self.print_execute_times:
-                description = inspect.stack()[1][3]
+            if self.profile_queries:
+                description = call_site(1)  # report the caller of select_and_fetch... rather than select_and_fetch... itself
             else:
                 description = None
             with self.selection(description=description, progress_callback=progress_callback) as curs:
@@ -431,10 +475,11 @@ class DBAccess(object):
             if config_vars["__MAIN_DB_FILE__"].str() != ":memory:":
                 db_base_path = config_vars["__MAIN_DB_FILE__"].Path()
                 if db_base_path.is_file():
-                    utils.safe_remove_file(db_base_path)
                     log.info(f'DB FILE REMOVED: {config_vars["__MAIN_DB_FILE__"].str()}')
                 else:
                     log.info(f'DB FILE DOES NOT EXIST: {config_vars["__MAIN_DB_FILE__"].str()}')
+                for file_path in DBMaster.db_and_wal_file_paths(db_base_path):
+                    utils.safe_remove_file(file_path)
 
 
 class TableAccess(object):
@@ -4,6 +4,9 @@
 import os
 import sqlite3
 import io
+import heapq
+import hashlib
+from pathlib import Path
 from collections import OrderedDict
 from collections import defaultdict
 import re
@@ -36,6 +39,8 @@ class IndexItemsTable(object):
                     'remove_item', 'post_remove_item', 'post_remove_from_folder',
                     'post_remove', 'pre_doit', 'doit', 'post_doit')
     not_inherit_details = ("name", "inherit")
+    inherited_detail_columns = "original_iid, owner_iid, os_id, detail_name, detail_value, generation, tag, os_is_active"
+    resolved_inheritance_cache_format_version = 1  # change when the outcome of resolve_inherited_details changes
 
     def __init__(self, db_master) -> None:
         super().__init__()
@@ -434,7 +439,6 @@ class IndexItemsTable(object):
     def resolve_inheritance(self) -> None:
         # utils.add_to_actions_stack("resolving inheritance")
         inherit_order, inherit_dict = self.prepare_inherit_order()
-        resolve_items_script = ""
         if bool(config_vars.get("DEBUG_INDEX_DB", False)):
             with self.db.transaction() as curs:
                 for iid in inherit_order:
@@ -443,16 +447,135 @@ class IndexItemsTable(object):
                         curs.executescript(resolve_item_script)
                     except sqlite3.IntegrityError as ex:
                         log.info(f"db exception resolving inheritance for {iid}, {ex}")
-                curs.execute("""CREATE INDEX IF NOT EXISTS ix_svn_index_item_detail_t_owner_iid ON index_item_detail_t(owner_iid)""")
         else:
-            for iid in inherit_order:
-                resolve_items_script += self.get_resolve_item_query_for_iid(iid, inherit_dict[iid])
-            with self.db.transaction() as curs:
-                curs.executescript(resolve_items_script) #to imporove perofrmance we first execute, then create the index
-                curs.execute("""CREATE INDEX IF NOT EXISTS ix_svn_index_item_detail_t_owner_iid ON index_item_detail_t(owner_iid)""")
-                # creating these indexes did not improve DB performance and added 20s to preparing __ALL_GUIDS__ installation
-                #curs.execute("""CREATE INDEX IF NOT EXISTS ix_svn_index_item_detail_t_value ON index_item_detail_t(detail_value)""")
-                #curs.execute("""CREATE INDEX IF NOT EXISTS ix_svn_index_item_detail_t_name ON index_item_detail_t(detail_name)""")
+            inheritable_details = self.get_inheritable_details()
+            cache_file_path = self.resolved_inheritance_cache_path(inheritable_details, inherit_dict)
+            if not self.read_resolved_inheritance_cache(cache_file_path):
+                inherited_details = self.resolve_inherited_details(inheritable_details, inherit_order, inherit_dict)
+                self.insert_inherited_details(inherited_details, cache_file_path)
+            # details are looked up by ix_index_item_detail_t_owner_iid(owner_iid, detail_name) from create-indexes.ddl
+            # creating indexes on detail_value or detail_name did not improve DB performance and added 20s to preparing __ALL_GUIDS__ installation
+
+    def get_inheritable_details(self):
+        """ details of active oses that can be inherited, ordered by _id, as tuples:
+            (owner_iid, original_iid, os_id, detail_name, detail_value, generation, tag, os_is_active)
+        """
+        query_text = f"""
+            SELECT owner_iid, original_iid, os_id, detail_name, detail_value, generation, tag, index_item_detail_t.os_is_active
+            FROM index_item_detail_t
+            JOIN active_operating_systems_t
+                ON active_operating_systems_t._id=index_item_detail_t.os_id
+                AND active_operating_systems_t.os_is_active = 1
+            WHERE detail_name NOT IN {utils.quoteme_single_list_for_sql(self.not_inherit_details)}
+            ORDER BY index_item_detail_t._id
+            """
+        with self.db.selection() as curs:
+            curs.execute(query_text)
+            retVal = [tuple(row) for row in curs]
+        return retVal
+
+    @staticmethod
+    def resolve_inherited_details(inheritable_details, inherit_order, inherit_dict):
+        """ compute the details each iid in inherit_order inherits, in the order get_resolve_item_query_for_iid
+            would have inserted them: an iid inherits the details of its parents, including those the parents
+            inherited themselves, in the order they were added to index_item_detail_t.
+            Details are kept per owner with a sort key - the position in inheritable_details for original details
+            and an increasing number for inherited details - so the details of all parents can be merged by sort key.
+            Return list of tuples ready to insert:
+            (original_iid, owner_iid, os_id, detail_name, detail_value, generation, tag, os_is_active)
+        """
+        details_by_owner = defaultdict(list)
+        for sort_key, detail in enumerate(inheritable_details):
+            details_by_owner[detail[0]].append((sort_key, detail[1:]))
+        next_sort_key = len(inheritable_details)
+        retVal = list()
+        for iid in inherit_order:
+            parent_details = [details_by_owner[parent_iid] for parent_iid in sorted(set(inherit_dict[iid])) if parent_iid in details_by_owner]
+            own_details = details_by_owner[iid]
+            for _, (original_iid, os_id, detail_name, detail_value, generation, tag, os_is_active) in heapq.merge(*parent_details):
+                inherited_detail = (original_iid, os_id, detail_name, detail_value, generation+1, tag, os_is_active)
+                own_details.append((next_sort_key, inherited_detail))
+                retVal.append((original_iid, iid) + inherited_detail[1:])
+                next_sort_key += 1
+        return retVal
+
+    def insert_inherited_details(self, inherited_details, cache_file_path=None) -> None:
+        """ insert the outcome of resolve_inherited_details to index_item_detail_t.
+            Rows are first inserted to a temp table, without indexes and triggers, and copied to index_item_detail_t
+            with one INSERT...SELECT - which is much faster than inserting them to index_item_detail_t one by one.
+            If cache_file_path is not None the temp table is also saved there, for read_resolved_inheritance_cache.
+        """
+        with self.db.transaction("insert_inherited_details") as curs:
+            curs.execute(f"""CREATE TEMP TABLE inherited_details_temp_t ({self.inherited_detail_columns})""")
+            curs.executemany(f"""INSERT INTO temp.inherited_details_temp_t ({self.inherited_detail_columns})
+                                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", inherited_details)
+            curs.execute(f"""INSERT INTO main.index_item_detail_t ({self.inherited_detail_columns})
+                             SELECT {self.inherited_detail_columns} FROM temp.inherited_details_temp_t ORDER BY rowid""")
+        if cache_file_path is not None:
+            self.write_resolved_inheritance_cache(cache_file_path)
+        self.db.curs.execute("""DROP TABLE IF EXISTS temp.inherited_details_temp_t""")
+
+    def resolved_inheritance_cache_path(self, inheritable_details, inherit_dict):
+        """ return path to the cached outcome of resolve_inherited_details, or None if $(RESOLVED_INHERITANCE_CACHE_FOLDER) is not defined.
+            The file name is a checksum of the details that can be inherited and who inherits from whom,
+            so unchanged index items are not resolved again.
+        """
+        retVal = None
+        cache_folder = config_vars.get("RESOLVED_INHERITANCE_CACHE_FOLDER", "").str()
+        if cache_folder:
+            sha1ner = hashlib.sha1()
+            sha1ner.update(f"{self.resolved_inheritance_cache_format_version} {self.inherited_detail_columns}".encode())
+            sha1ner.update(repr(sorted((iid, sorted(set(parent_iids))) for iid, parent_iids in inherit_dict.items())).encode())
+            sha1ner.update(repr(inheritable_details).encode())
+            retVal = Path(cache_folder, sha1ner.hexdigest() + ".db")
+        return retVal
+
+    def read_resolved_inheritance_cache(self, cache_file_path) -> bool:
+        """ insert the inherited details saved by write_resolved_inheritance_cache to index_item_detail_t,
+            return False if cache_file_path is None, does not exist or cannot be read
+        """
+        retVal = False
+        if cache_file_path is not None and cache_file_path.is_file():
+            try:
+                self.db.curs.execute("""ATTACH DATABASE ? AS resolved_db""", (os.fspath(cache_file_path),))
+                try:
+                    num_details_before = self.db.select_and_fetchall("""SELECT COUNT(*) FROM main.index_item_detail_t""")[0]
+                    num_cached_details = self.db.select_and_fetchall("""SELECT COUNT(*) FROM resolved_db.inherited_details_t""")[0]
+                    with self.db.transaction("read_resolved_inheritance_cache") as curs:
+                        curs.execute(f"""INSERT INTO main.index_item_detail_t ({self.inherited_detail_columns})
+                                         SELECT {self.inherited_detail_columns} FROM resolved_db.inherited_details_t ORDER BY rowid""")
+                    num_details_after = self.db.select_and_fetchall("""SELECT COUNT(*) FROM main.index_item_detail_t""")[0]
+                finally:
+                    self.db.curs.execute("""DETACH DATABASE resolved_db""")
+                retVal = num_details_after == num_details_before + num_cached_details  # transaction() does not raise sqlite3.OperationalError
+                if retVal:
+                    os.utime(cache_file_path)  # most recently used files are kept
+                    log.info(f"read resolved inheritance cache {cache_file_path}")
+            except sqlite3.Error as ex:
+                log.warning(f"""ignoring resolved inheritance cache {cache_file_path}, {ex}""")
+        return retVal
+
+    def write_resolved_inheritance_cache(self, cache_file_path) -> None:
+        """ save temp.inherited_details_temp_t created by insert_inherited_details to cache_file_path """
+        temp_cache_file_path = cache_file_path.with_name(cache_file_path.name + ".tmp")
+        try:
+            cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+            utils.safe_remove_file(temp_cache_file_path)
+            self.db.curs.execute("""ATTACH DATABASE ? AS resolved_db""", (os.fspath(temp_cache_file_path),))
+            try:
+                with self.db.transaction("write_resolved_inheritance_cache") as curs:
+                    curs.execute(f"""CREATE TABLE resolved_db.inherited_details_t AS
+                                     SELECT {self.inherited_detail_columns} FROM temp.inherited_details_temp_t ORDER BY rowid""")
+            finally:
+                self.db.curs.execute("""DETACH DATABASE resolved_db""")
+            os.replace(temp_cache_file_path, cache_file_path)
+            max_files = int(config_vars.get("RESOLVED_INHERITANCE_CACHE_MAX_FILES", 4))
+            cache_files = sorted(cache_file_path.parent.glob("*.db"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for cache_file in cache_files[max_files:]:
+                utils.safe_remove_file(cache_file)
+        except Exception as ex:  # failing to cache should not fail resolving inheritance
+            log.warning(f"""failed to save resolved inheritance cache {cache_file_path}, {ex}""")
+            utils.safe_remove_file(temp_cache_file_path)
 
     def prepare_inherit_order(self):
         inherit_order = utils.unique_list()
@@ -479,11 +602,12 @@ class IndexItemsTable(object):
         def check_inherit_order():
             assert len(inherit_order) == len(set(inherit_order)), "retVal has duplicates"
             assert not set(inherit_order) ^ set(inherit_dict.keys()), "retVal and inherit_dict different"
+            order_index = {iid: i for i, iid in enumerate(inherit_order)}  # list.index for each pair is quadratic
             for i in range(len(inherit_order)):
                 iis = inherit_dict[inherit_order[i]]
                 for ii in iis:
                     if ii in inherit_dict:
-                        ii_index = inherit_order.index(ii)
+                        ii_index = order_index[ii]
                         assert ii_index < i, f"{inherit_order[i]} inherit from {ii} but {ii} does not come before {inherit_order[i]}"
 
         for iid in sorted(inherit_dict):
@@ -516,7 +640,8 @@ class IndexItemsTable(object):
                 ON active_operating_systems_t._id=inherited_details_t.os_id
                 AND active_operating_systems_t.os_is_active = 1
             WHERE inherited_details_t.owner_iid IN {inherit_from_iids}
-            AND inherited_details_t.detail_name NOT IN {not_inherit_details};
+            AND inherited_details_t.detail_name NOT IN {not_inherit_details}
+            ORDER BY inherited_details_t._id;
 
             """.format(**{"inheritor_iid": utils.quoteme_single(iid_to_resolve),
                       "inherit_from_iids": utils.quoteme_single_list_for_sql(inherit_from_iids),
@@ -640,7 +765,6 @@ class IndexItemsTable(object):
             curs.executemany(insert_item_q, index_items)
             curs.executemany(insert_item_detail_q, items_details)
             curs.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ix_index_item_t_iid ON index_item_t(iid)""")
-            curs.execute("""CREATE INDEX IF NOT EXISTS ix_index_item_t_owner_iid ON index_item_detail_t(owner_iid)""")
 
     def read_index_node_one_by_one(self, a_node: yaml.MappingNode, **kwargs) -> None:
         """ for debugging problems with reading index.yaml use read_index_node_one_by_one instead of read_index_node"""
@@ -679,7 +803,6 @@ class IndexItemsTable(object):
                             current_detail = detail
                             curs.execute(insert_item_detail_q, detail)
                         curs.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ix_index_item_t_iid ON index_item_t(iid)""")
-                        curs.execute("""CREATE INDEX IF NOT EXISTS ix_index_item_t_owner_iid ON index_item_detail_t(owner_iid)""")
             except Exception as ex:
                 try:
                     from rich.console import Console
@@ -703,6 +826,46 @@ class IndexItemsTable(object):
                 rich_ruler("***")
                 raise
 
+    # columns copied by write_rows_to_db_file/read_rows_from_db_file, _id is given anew when reading
+    # and os_is_active is set by trigger set_active_os_for_details2
+    copied_item_columns = "iid, inherit_resolved, from_index, from_require, install_status, ignore, direct_sync"
+    copied_detail_columns = "original_iid, owner_iid, os_id, detail_name, detail_value, generation, tag"
+
+    def get_last_ids(self) -> (int, int):
+        """ return the highest _id of index_item_t and of index_item_detail_t, rows inserted later will have higher _ids """
+        last_item_id = self.db.select_and_fetchall("""SELECT IFNULL(MAX(_id), 0) FROM index_item_t""")[0]
+        last_detail_id = self.db.select_and_fetchall("""SELECT IFNULL(MAX(_id), 0) FROM index_item_detail_t""")[0]
+        return last_item_id, last_detail_id
+
+    def write_rows_to_db_file(self, db_file_path, after_item_id=0, after_detail_id=0) -> None:
+        """ copy rows of index_item_t and index_item_detail_t with _id higher than after_item_id, after_detail_id
+            to tables with the same names in a separate db file
+        """
+        self.db.curs.execute("""ATTACH DATABASE ? AS other_db""", (os.fspath(db_file_path),))
+        try:
+            with self.db.transaction("write_rows_to_db_file") as curs:
+                curs.execute(f"""CREATE TABLE other_db.index_item_t AS
+                                 SELECT {self.copied_item_columns} FROM main.index_item_t
+                                 WHERE _id > ? ORDER BY _id""", (after_item_id,))
+                curs.execute(f"""CREATE TABLE other_db.index_item_detail_t AS
+                                 SELECT {self.copied_detail_columns} FROM main.index_item_detail_t
+                                 WHERE _id > ? ORDER BY _id""", (after_detail_id,))
+        finally:
+            self.db.curs.execute("""DETACH DATABASE other_db""")
+
+    def read_rows_from_db_file(self, db_file_path) -> None:
+        """ add rows of index_item_t and index_item_detail_t written by write_rows_to_db_file, in the order they were written """
+        self.db.curs.execute("""ATTACH DATABASE ? AS other_db""", (os.fspath(db_file_path),))
+        try:
+            with self.db.transaction("read_rows_from_db_file") as curs:
+                curs.execute(f"""INSERT INTO main.index_item_t({self.copied_item_columns})
+                                 SELECT {self.copied_item_columns} FROM other_db.index_item_t ORDER BY rowid""")
+                curs.execute(f"""INSERT INTO main.index_item_detail_t({self.copied_detail_columns})
+                                 SELECT {self.copied_detail_columns} FROM other_db.index_item_detail_t ORDER BY rowid""")
+                curs.execute("""CREATE UNIQUE INDEX IF NOT EXISTS ix_index_item_t_iid ON index_item_t(iid)""")
+        finally:
+            self.db.curs.execute("""DETACH DATABASE other_db""")
+
     def read_index_template_node(self, template_match, instances_node, **kwargs):
         resolve_one_by_one = bool(config_vars.get("DEBUG_INDEX_DB", False))
         try:
@@ -6,7 +6,7 @@ from .conditionalBatchCommands import If, IsFile, IsDir, IsSymlink, IsEq, IsNotE
     IsEnvironVarEq, IsEnvironVarNotEq, IsConfigVarDefined, ForInConfigVar
 from .copyBatchCommands import CopyDirContentsToDir, CopyDirToDir, CopyFileToDir, CopyFileToFile, MoveDirToDir, \
     RenameFile, CopyBundle, CopyGlobToDir
-from .downloadBatchCommands import DownloadFileAndCheckChecksum, DownloadManager
+from .downloadBatchCommands import DownloadFileAndCheckChecksum, DownloadManager, DownloadFiles
 from .fileSystemBatchCommands import AppendFileToFile, Cd, ChFlags, Chmod, Chown, MakeDir, MakeRandomDirs, \
     MakeRandomDataFile, touch, Touch, Unlock, Ls, FileSizes, SplitFile, FixAllPermissions, Glober
 from .info_mapBatchCommands import CheckDownloadFolderChecksum, SetExecPermissionsInSyncFolder, CreateSyncFolders, \
@@ -20,7 +20,7 @@ from .subprocessBatchCommands import ParallelRun, ShellCommands, ShellCommand, C
     Subprocess, ExternalPythonExec, SysExit, Raise, KillProcess
 from .svnBatchCommands import SVNClient, SVNLastRepoRev, SVNCheckout, SVNInfo, SVNPropList, SVNAdd, SVNRemove, \
     SVNInfoReader, SVNSetProp, SVNDelProp, SVNCleanup
-from .wtarBatchCommands import Wtar, Unwtar, Wzip, Unwzip
+from .wtarBatchCommands import Wtar, ParallelWtar, Unwtar, ScheduledUnwtar, WaitForUnwtars, UnwtarScheduler, Wzip, Unwzip
 
 # from .fileSystemBatchCommands import AdvisoryFileLock
 
@@ -1,7 +1,10 @@
 import os
 import shutil
+import threading
 from collections import defaultdict
+from concurrent import futures
 
+from configVar import config_vars
 from .fileSystemBatchCommands import *
 from .removeBatchCommands import RmFileOrDir
 
@@ -36,6 +39,7 @@ ignore_patterns: files and folders matching these patterns will not be copied.
 hard_links: if True will attempt to create hard links to original files instead of making a copy; default: True
 no_hard_link_patterns: files and folders matching this patterns will not be hard-linked even if hard_links=True
 no_flags_patterns: if a file matching one of these patterns exists in the destination, it's flags (hidden, system, read-only) will be removed
+num_workers: number of threads copying and hard-linking files, folders are still created in order by the calling thread; 0: copy one file at a time; default: $(PARALLEL_COPY) or 0
 """
 
 
@@ -43,6 +47,7 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
     __global_no_hard_link_patterns = list()  # files and folders matching these patterns will not be hard-linked. Applicable for all instances of RsyncClone
     __global_avoid_copy_markers = list()     # if a file with one of these names exists in the folders and is identical to destination, copy will be avoided
     __global_no_flags_patterns = list()     # if a file with one of these names exists in the destination, it's flags (hidden, system, read-only) will be removed
+    files_per_copy_task = 64                # when copying in parallel, number of files handed to a thread at once
 
     @classmethod
     def add_global_ignore_patterns(cls, more_copy_ignore_patterns: List):
@@ -75,6 +80,7 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
                  verbose=0,
                  dry_run=False,
                  copy_stat=False,
+                 num_workers=None,
                  **kwargs):
         super().__init__(**kwargs)
         self.src = src
@@ -93,11 +99,19 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         self.verbose = verbose
         self.dry_run = dry_run
         self.copy_stat = copy_stat
+        self.num_workers = num_workers
+        self.file_copy_pool = None  # ThreadPoolExecutor copying files when copying in parallel
+        self.pending_file_copies = set()
+        self.max_pending_file_copies = 0
+        self.file_copy_errors = list()
         self.top_source_does_not_exist = False  # will be set to true if source does not exist - saving doing work is ignore_if_not_exist is True
         self.top_destination_does_not_exist = False  # will be set to true if destination does not exist - saving many checks
 
         self._get_ignored_files_func = None
         self.statistics = defaultdict(int)
+        self.statistics_lock = threading.Lock()  # statistics are updated by file copying threads
+        self.file_copier = utils.FileCopier()  # reflink, kernel copy or buffered copy, whichever the destination supports
+        self.non_representative__dict__keys.extend(('statistics_lock', 'file_copy_pool', 'pending_file_copies', 'max_pending_file_copies', 'file_copy_errors', 'file_copier'))
         self.last_step = None
         self.last_src = None
         self.last_dst = None
@@ -111,6 +125,10 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         self.__all_ignore_patterns = sorted(list(set(self.__global_ignore_patterns + self.local_ignore_patterns)))
         self.__all_no_hard_link_patterns = sorted(list(set(self.__global_no_hard_link_patterns + self.local_no_hard_link_patterns)))
         self.__all_no_flags_patterns = sorted(list(set(self.__global_no_flags_patterns + self.local_no_flags_patterns)))
+        self.ignore_matcher = utils.PathPatternMatcher.for_patterns(tuple(self.__all_ignore_patterns))
+        self.no_hard_link_matcher = utils.PathPatternMatcher.for_patterns(tuple(self.__all_no_hard_link_patterns))
+        self.no_flags_matcher = utils.PathPatternMatcher.for_patterns(tuple(self.__all_no_flags_patterns))
+        self.non_representative__dict__keys.extend(('ignore_matcher', 'no_hard_link_matcher', 'no_flags_matcher'))
 
     def repr_own_args(self, all_args: List[str]) -> None:
         params = list()
@@ -129,6 +147,7 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         params.append(self.optional_named__init__param("verbose", self.verbose, 0))
         params.append(self.optional_named__init__param("dry_run", self.dry_run, False))
         params.append(self.optional_named__init__param("copy_stat", self.copy_stat, False))
+        params.append(self.optional_named__init__param("num_workers", self.num_workers))
         all_args.extend(filter(None, params))
 
     def progress_msg_self(self) -> str:
@@ -154,25 +173,22 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         self.raise_if_top_source_does_not_exist()
         self.copy_tree(self.src, self.dst)
 
-    def should_ignore_file(self, file_path: str):
+    def should_ignore_file(self, file_path):
+        """ file_path can be str, Path or os.DirEntry """
         retVal = False
-        if not isinstance(file_path, Path):
-            file_path = Path(file_path)
-        for ignore_pattern in self.__all_ignore_patterns:
-            if file_path.match(ignore_pattern):
-                log.debug(f"ignoring {file_path} because it matches pattern {ignore_pattern}")
-                retVal = True
-                break
+        ignore_pattern = self.ignore_matcher.match(file_path)
+        if ignore_pattern is not None:
+            log.debug(f"ignoring {os.fspath(file_path)} because it matches pattern {ignore_pattern}")
+            retVal = True
         return retVal
 
     def should_hard_link_file(self, file_path: Path):
         assert isinstance(file_path, Path)
         retVal = False
         if self.hard_links and not self.hard_links_failed and not file_path.is_symlink():
-            for no_hard_link_pattern in self.__all_no_hard_link_patterns:
-                if file_path.match(no_hard_link_pattern):
-                    log.debug(f"not hard linking {file_path} because it matches pattern {no_hard_link_pattern}")
-                    break
+            no_hard_link_pattern = self.no_hard_link_matcher.match(file_path)
+            if no_hard_link_pattern is not None:
+                log.debug(f"not hard linking {file_path} because it matches pattern {no_hard_link_pattern}")
             else:
                 retVal = True
         return retVal
@@ -181,23 +197,19 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         assert isinstance(a_file, os.DirEntry)
         retVal = False
         if self.hard_links and not self.hard_links_failed and not a_file.is_symlink():
-            for no_hard_link_pattern in self.__all_no_hard_link_patterns:
-                file_path = Path(a_file)  # todo: avoid using Path.match, since converting DirEntry toPath is not efficient
-                if file_path.match(no_hard_link_pattern):
-                    log.debug(f"not hard linking {a_file.path} because it matches pattern {no_hard_link_pattern}")
-                    break
+            no_hard_link_pattern = self.no_hard_link_matcher.match(a_file)
+            if no_hard_link_pattern is not None:
+                log.debug(f"not hard linking {a_file.path} because it matches pattern {no_hard_link_pattern}")
             else:
                 retVal = True
         return retVal
 
     def should_no_flags_file(self, file_path: Path):
-        retVal = True
-        for no_flags_pattern in self.__all_no_flags_patterns:
-            if file_path.match(no_flags_pattern):
-                log.debug(f"removing flags from {file_path} because it matches pattern {no_flags_pattern}")
-                break
-        else:
-            retVal = False
+        retVal = False
+        no_flags_pattern = self.no_flags_matcher.match(file_path)
+        if no_flags_pattern is not None:
+            log.debug(f"removing flags from {file_path} because it matches pattern {no_flags_pattern}")
+            retVal = True
         return retVal
 
     def remove_extraneous_files(self, dst: Path, src_item_names):
@@ -207,7 +219,7 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         """
 
         for dst_item in os.scandir(dst):
-            if dst_item.name not in src_item_names and not self.should_ignore_file(dst_item.path):
+            if dst_item.name not in src_item_names and not self.should_ignore_file(dst_item):
                 self.last_step, self.last_src, self.last_dst = "remove redundant file", "", os.fspath(dst_item)
                 log.info(f"delete {dst_item.path}")
                 if not self.dry_run:
@@ -260,9 +272,14 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
                 retVal = True
         return retVal
 
-    def should_copy_file_DirEntry(self, src: os.DirEntry, dst: Path):
+    def should_copy_file_DirEntry(self, src: os.DirEntry, dst: Path, dst_may_exist=None):
+        """ dst_may_exist should be passed when called from file copying threads, since by the time
+            the file is copied self.top_destination_does_not_exist might have changed by the calling thread
+        """
         retVal = True
-        if not self.top_destination_does_not_exist:
+        if dst_may_exist is None:
+            dst_may_exist = not self.top_destination_does_not_exist
+        if dst_may_exist:
             try:
                 dst_stats = dst.stat()
                 src_stats = src.stat()
@@ -310,20 +327,20 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
                 if not self.should_hard_link_file(src):
                     log.debug(f"copy file '{self.last_src}' to '{self.last_dst}'")
                     if not self.dry_run:
-                        _fast_copy_file(src, dst)
+                        self.copy_file_contents(src, dst)
                         if self.copy_stat:
                             shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
                 else:  # try to create hard link
                     try:
                         self.dry_run or os.link(src, dst)
                         log.debug(f"hard link file '{self.last_src}' to '{self.last_dst}'")
-                        self.statistics['hard_links'] += 1
+                        self.increment_statistics('hard_links')
                     except OSError as ose:
                         self.hard_links_failed = True
                         log.debug(f"copy file '{self.last_src}' to '{self.last_dst}'")
 
                         if not self.dry_run:
-                            _fast_copy_file(src, dst)
+                            self.copy_file_contents(src, dst)
                             if self.copy_stat:
                                 shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
                 if self.copy_owner and self.has_chown:
@@ -333,10 +350,10 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
                 self.who_locks_file_error_dict(_fast_copy_file, dst)
                 raise
         else:
-            self.statistics['skipped_files'] += 1
+            self.increment_statistics('skipped_files')
         return dst
 
-    def copy_file_to_file_DirEntry(self, src: os.DirEntry, dst: Path, follow_symlinks=True):
+    def copy_file_to_file_DirEntry(self, src: os.DirEntry, dst: Path, follow_symlinks=True, dst_may_exist=None):
         """ copy the file src to the file dst. dst should either be an existing file
             or not exists at all - i.e. dst cannot be a folder. The parent folder of dst
             is assumed to exist.
@@ -345,24 +362,24 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         self.last_src, self.last_dst = os.fspath(src), os.fspath(dst)
         self.doing = f"""copy file '{self.last_src}' to '{self.last_dst}'"""
 
-        if self.should_copy_file_DirEntry(src, dst):
+        if self.should_copy_file_DirEntry(src, dst, dst_may_exist):
             try:
                 if not self.should_hard_link_file_DirEntry(src):
                     log.debug(f"copy file '{self.last_src}' to '{self.last_dst}'")
                     if not self.dry_run:
-                        _fast_copy_file(src, dst)
+                        self.copy_file_contents(src, dst)
                         shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
                 else:  # try to create hard link
                     try:
                         self.dry_run or os.link(src, dst)
                         log.debug(f"hard link file '{self.last_src}' to '{self.last_dst}'")
-                        self.statistics['hard_links'] += 1
+                        self.increment_statistics('hard_links')
                     except OSError as ose:
                         self.hard_links_failed = True
                         log.debug(f"copy file '{self.last_src}' to '{self.last_dst}'")
 
                         if not self.dry_run:
-                            _fast_copy_file(src, dst)
+                            self.copy_file_contents(src, dst)
                             shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
                 if self.copy_owner and self.has_chown:
                     src_st = src.stat()  # !
@@ -371,7 +388,7 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
                 self.who_locks_file_error_dict(_fast_copy_file, self.last_dst)
                 raise
         else:
-            self.statistics['skipped_files'] += 1
+            self.increment_statistics('skipped_files')
         return dst
 
     def copy_file_to_dir(self, src: Path, dst: Path, follow_symlinks=True):
@@ -385,9 +402,26 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         retVal = self.copy_file_to_file(src, final_dst, follow_symlinks)
         return retVal
 
+    def copy_file_contents(self, src, dst):
+        """ copy with self.file_copier and count the copy method used in self.statistics """
+        try:
+            self.increment_statistics(self.file_copier.copy_file(src, dst))
+        except shutil.SameFileError:
+            pass
+
+    def increment_statistics(self, name):
+        with self.statistics_lock:
+            self.statistics[name] += 1
+
     def copy_tree(self, src: Path, dst: Path):
         """ based on shutil.copytree
+            if num_workers > 0 files are copied by a pool of threads, see copy_tree_in_parallel
         """
+        if self.file_copy_pool is None:
+            num_workers = self.num_workers if self.num_workers is not None else int(config_vars.get("PARALLEL_COPY", 0))
+            if num_workers > 0:
+                return self.copy_tree_in_parallel(src, dst, num_workers)
+
         self.last_src, self.last_dst = os.fspath(src), os.fspath(dst)
         save_top_destination_does_not_exist = self.top_destination_does_not_exist
         self.top_destination_does_not_exist = self.top_destination_does_not_exist or not dst.exists()  # !
@@ -412,28 +446,36 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
             self.remove_extraneous_files(dst, src_file_names+src_dir_names)
 
         errors = []
+        files_to_copy = []  # when copying in parallel files are handed to the threads in batches
         for src_item in src_dir_items:
-            src_item_path = Path(src_item.path)
-            if self.should_ignore_file(src_item_path):
+            if self.should_ignore_file(src_item):
                 self.statistics['ignored'] += 1
                 continue
             dst_path = dst.joinpath(src_item.name)
             try:
                 if src_item.is_symlink():
                     self.statistics['symlinks'] += 1
-                    self.copy_symlink(src_item_path, dst_path)
+                    self.copy_symlink(Path(src_item.path), dst_path)
                 elif src_item.is_dir():
-                    self.copy_tree(src_item_path, dst_path)
+                    self.copy_tree(Path(src_item.path), dst_path)
                 else:
                     self.statistics['files'] += 1
-                    # Will raise a SpecialFileError for unsupported file types
-                    self.copy_file_to_file_DirEntry(src_item, dst_path)
+                    if self.file_copy_pool is not None:
+                        files_to_copy.append(src_item)
+                        if len(files_to_copy) == self.files_per_copy_task:
+                            self.submit_file_copies(files_to_copy, dst)
+                            files_to_copy = []
+                    else:
+                        # Will raise a SpecialFileError for unsupported file types
+                        self.copy_file_to_file_DirEntry(src_item, dst_path)
             # catch the Error from the recursive copytree so that we can
             # continue with other files
             except shutil.Error as err:
                 errors.append(err.args[0])
             except OSError as why:
-                errors.append((os.fspath(src_item_path), os.fspath(dst_path), str(why)))
+                errors.append((src_item.path, os.fspath(dst_path), str(why)))
+        if files_to_copy:
+            self.submit_file_copies(files_to_copy, dst)
 
         if errors:
             raise shutil.Error(errors)
@@ -441,6 +483,61 @@ no_flags_patterns: if a file matching one of these patterns exists in the destin
         self.top_destination_does_not_exist = save_top_destination_does_not_exist
         return dst
 
+    def copy_tree_in_parallel(self, src: Path, dst: Path, num_workers):
+        """ copy_tree with files copied by num_workers threads: the calling thread walks src, creates
+            folders in order and removes extraneous files, files are handed in batches to the first free thread.
+            Folders are created before the files in them are handed to the threads, and no more than
+            num_workers*4 batches are waiting to be copied at any time.
+            Returns when all files were copied, errors copying files are raised together as one shutil.Error.
+        """
+        errors = list()
+        self.file_copy_errors = list()
+        self.file_copy_pool = futures.ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="copy")
+        self.max_pending_file_copies = num_workers * 4
+        try:
+            try:
+                self.copy_tree(src, dst)
+            except shutil.Error as err:
+                errors.extend(err.args[0])
+            finally:
+                self.wait_for_file_copies(0)
+        finally:
+            self.file_copy_pool.shutdown(cancel_futures=True)
+            self.file_copy_pool = None
+            self.pending_file_copies.clear()
+        errors.extend(self.file_copy_errors)
+        if errors:
+            raise shutil.Error(errors)
+        return dst
+
+    def submit_file_copies(self, src_items: List[os.DirEntry], dst: Path):
+        self.wait_for_file_copies(self.max_pending_file_copies - 1)
+        future = self.file_copy_pool.submit(self.copy_files_to_dir_DirEntry, src_items, dst,
+                                            dst_may_exist=not self.top_destination_does_not_exist)
+        self.pending_file_copies.add(future)
+
+    def wait_for_file_copies(self, max_pending):
+        """ wait until no more than max_pending batches are waiting to be copied """
+        while len(self.pending_file_copies) > max_pending:
+            done, self.pending_file_copies = futures.wait(self.pending_file_copies, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                self.file_copy_errors.extend(future.result())
+
+    def copy_files_to_dir_DirEntry(self, src_items: List[os.DirEntry], dst: Path, dst_may_exist):
+        """ copy files to the existing folder dst, called by file copying threads.
+            OSError and shutil.Error are returned as a list of errors, like copy_tree collects them, other exceptions are raised
+        """
+        retVal = list()
+        for src_item in src_items:
+            dst_path = dst.joinpath(src_item.name)
+            try:
+                self.copy_file_to_file_DirEntry(src_item, dst_path, dst_may_exist=dst_may_exist)
+            except shutil.Error as err:
+                retVal.append(err.args[0])
+            except OSError as why:
+                retVal.append((src_item.path, os.fspath(dst_path), str(why)))
+        return retVal
+
     def error_dict_self(self, exc_type, exc_val, exc_tb) -> None:
         super().error_dict_self(exc_type, exc_val, exc_tb)
 
@@ -1,5 +1,13 @@
+import os
+import csv
+import time
+import queue
+import hashlib
+import logging
 from typing import List
 from pathlib import Path
+import threading
+import urllib.parse
 
 import requests
 from http.cookies import SimpleCookie
@@ -11,11 +19,19 @@ from .baseClasses import PythonBatchCommandBase
 from .fileSystemBatchCommands import MakeDir
 import utils
 
+log = logging.getLogger(__name__)
 
-# this class can be used internally, it will create the session ar the init phase and will only need
+
+# this class can be used internally, it will get a pooled session at the init phase and will only need
 # the cookie, the rest of the params will be passed to the call method, this way it will allow this class
-# to be called while lopping on multiple files without having the need to create a new connection each time
+# to be called while lopping on multiple files without having the need to create a new connection each time.
+# The response is streamed to a partial file next to the target path while being hashed, the partial
+# file is renamed to the target path only when the checksum is correct. A partial file left by an interrupted
+# download is resumed with an HTTP Range request.
 class DownloadManager(PythonBatchCommandBase):
+    partial_download_suffix = ".partial"
+    session_pool = threading.local()  # sessions are not shared between threads
+
     def __init__(self, cookie: str = None, **kwargs) -> None:
         super().__init__(**kwargs)
         self.cookie = cookie
@@ -27,32 +43,71 @@ class DownloadManager(PythonBatchCommandBase):
             all_args.append(self.named__init__param("cookie", self.cookie))
 
     def __call__(self, *args, **kwargs):
-        with self.session as dl_session:
-            url = self.url = kwargs["url"]
-            path = Path(kwargs["path"])
-            checksum = kwargs["checksum"]
-            if path.is_dir():
-                filename = Path(url.split("/").pop())
-                path = path.joinpath(filename)
-            with MakeDir(path.parent, report_own_progress=False) as dir_maker:
-                dir_maker()
-            with open(path, "wb") as fo:
-                self.doing = f"downloading file {path}"
-                timeout_seconds = int(config_vars.get("CURL_MAX_TIME", 480))
-                read_data = dl_session.get(url, timeout=timeout_seconds)
-                read_data.raise_for_status()  # must raise in case of an error. Server might return json/xml with error details, we do not want that
-                fo.write(read_data.content)
-
-            checksum_ok = utils.check_file_checksum(path, checksum)
-            if not checksum_ok:
-                raise ValueError(f"bad checksum for {str(path)} after reqs download")
+        url = self.url = kwargs["url"]
+        path = Path(kwargs["path"])
+        checksum = kwargs["checksum"]
+        if path.is_dir():
+            filename = Path(url.split("/").pop())
+            path = path.joinpath(filename)
+        with MakeDir(path.parent, report_own_progress=False) as dir_maker:
+            dir_maker()
+        self.doing = f"downloading file {path}"
+        partial_path = path.with_name(path.name + self.partial_download_suffix)
+        resumed = partial_path.is_file()
+        downloaded_checksum = self.download_to_partial_file(url, partial_path)
+        if resumed and not self.is_checksum_ok(downloaded_checksum, checksum):
+            # partial file might be left from a previous version of the file, download the whole file once more
+            log.info(f"bad checksum for {path} after resuming download, downloading the whole file")
+            utils.safe_remove_file(partial_path)
+            downloaded_checksum = self.download_to_partial_file(url, partial_path)
+        if not self.is_checksum_ok(downloaded_checksum, checksum):
+            utils.safe_remove_file(partial_path)
+            raise ValueError(f"bad checksum for {str(path)} after reqs download")
+        os.replace(partial_path, path)
+
+    @staticmethod
+    def is_checksum_ok(downloaded_checksum, expected_checksum) -> bool:
+        """ a download without expected checksum is never ok """
+        return bool(expected_checksum) and utils.compare_checksums(downloaded_checksum, expected_checksum)
+
+    def download_to_partial_file(self, url, partial_path):
+        """ stream url to partial_path and return the checksum of the whole file.
+            if partial_path already exists, only the missing part is requested.
+        """
+        hasher = hashlib.sha1()
+        headers = dict()
+        resume_from = 0
+        if partial_path.is_file():
+            with open(partial_path, "rb") as rfd:
+                for chunk in iter(lambda: rfd.read(utils.checksum_read_chunk_size), b""):
+                    hasher.update(chunk)
+                resume_from = rfd.tell()
+            headers["Range"] = f"bytes={resume_from}-"
+            headers["Accept-Encoding"] = "identity"  # byte offsets of a Range refer to the un-encoded file
+
+        timeout_seconds = int(config_vars.get("CURL_MAX_TIME", 480))
+        with self.session.get(url, headers=headers, stream=True, timeout=timeout_seconds) as response:
+            if resume_from and response.status_code == 416:  # partial file is not a prefix of the file, start over
+                utils.safe_remove_file(partial_path)
+                return self.download_to_partial_file(url, partial_path)
+            response.raise_for_status()  # must raise in case of an error. Server might return json/xml with error details, we do not want that
+            open_mode = "ab"
+            if response.status_code != 206:  # whole file was sent, even if Range was requested
+                hasher = hashlib.sha1()
+                open_mode = "wb"
+            with open(partial_path, open_mode) as wfd:
+                for chunk in response.iter_content(chunk_size=utils.checksum_read_chunk_size):
+                    hasher.update(chunk)
+                    wfd.write(chunk)
+        retVal = hasher.hexdigest()
+        return retVal
 
     def progress_msg_self(self) -> str:
         return f'downloading file {self.url}'
 
     @staticmethod
     def get_cookie_dict_from_str(cookie_input):
-        cookie_str = cookie_input or config_vars["COOKIE_JAR"].str()
+        cookie_str = cookie_input or config_vars.get("COOKIE_JAR", "").str()
         cookie = SimpleCookie()
         cookie.load(cookie_str)
         cookies = {}
@@ -63,12 +118,39 @@ class DownloadManager(PythonBatchCommandBase):
         return cookies
 
     def download_session(self):
-        session = requests.Session()
+        """ return the current thread's session for the cookie, creating it on first use """
         cookies = self.get_cookie_dict_from_str(self.cookie)
-        session.cookies = cookiejar_from_dict(cookies)
+        sessions = getattr(DownloadManager.session_pool, "sessions", None)
+        if sessions is None:
+            sessions = DownloadManager.session_pool.sessions = dict()
+        session_key = tuple(sorted(cookies.items()))
+        session = sessions.get(session_key)
+        if session is None:
+            session = sessions[session_key] = requests.Session()
+            session.cookies = cookiejar_from_dict(cookies)
         return session
 
 
+class HostConnectionLimiter(object):
+    """ limit the number of concurrent connections to each host when downloading from multiple threads:
+            limiter = HostConnectionLimiter(4)
+            with limiter(url):
+                download url...
+    """
+    def __init__(self, max_connections_per_host: int) -> None:
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.semaphores = dict()
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            retVal = self.semaphores.get(host)
+            if retVal is None:
+                retVal = self.semaphores[host] = threading.BoundedSemaphore(self.max_connections_per_host)
+        return retVal
+
+
 # the purpose of this class is to wrap download manager, and use it outside installer script, for example: central
 class DownloadFileAndCheckChecksum(DownloadManager):
     def __init__(self, url, path, cookie, checksum, **kwargs) -> None:
@@ -88,3 +170,129 @@ class DownloadFileAndCheckChecksum(DownloadManager):
     def __call__(self, *args, **kwargs):
         with DownloadManager(cookie=self.cookie, report_own_progress=False) as downloader:
             downloader(url=self.url, path=self.path, checksum=self.checksum)
+
+
+class DownloadFiles(PythonBatchCommandBase):
+    """ download the files listed in download_list_file by num_workers threads, all pulling from a shared queue
+        so work is balanced while downloading. Larger files are started first.
+        download_list_file is created by CUrlHelper.create_download_list_file, each line is:
+            url, path, size, checksum, download_last
+        files marked download_last are downloaded after all other files.
+        failed downloads are retried $(CURL_RETRIES) times, waiting $(CURL_RETRY_DELAY) seconds doubled on each retry.
+        no more than max_connections_per_host files are downloaded from the same host at the same time.
+    """
+    max_retry_delay_sec = 120
+
+    def __init__(self, download_list_file, num_workers=None, max_connections_per_host=None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.download_list_file = download_list_file
+        self.num_workers = num_workers
+        self.max_connections_per_host = max_connections_per_host
+        self.num_files_downloaded = 0
+        self.num_bytes_downloaded = 0
+        self.num_bytes_to_download = 0
+        self.start_time = None
+        self.failed_items = list()
+
+    def repr_own_args(self, all_args: List[str]) -> None:
+        all_args.append(self.unnamed__init__param(self.download_list_file))
+        all_args.append(self.optional_named__init__param("num_workers", self.num_workers))
+        all_args.append(self.optional_named__init__param("max_connections_per_host", self.max_connections_per_host))
+
+    def progress_msg_self(self) -> str:
+        return f'''Download files listed in {self.download_list_file}'''
+
+    def increment_and_output_progress(self, increment_by=None, prog_counter_msg=None, prog_msg=None):
+        """ override PythonBatchCommandBase.increment_and_output_progress so progress can be reported for each file
+        """
+        pass
+
+    def read_download_list(self):
+        """ return two lists of (url, path, size, checksum): files to download and files to download last """
+        download_items, download_last_items = list(), list()
+        with utils.utf8_open_for_read(self.download_list_file, "r") as rfd:
+            for url, path, size, checksum, download_last in csv.reader(rfd):
+                item = (url, path, int(size or 0), checksum or None)
+                if download_last == "1":
+                    download_last_items.append(item)
+                else:
+                    download_items.append(item)
+        download_items.sort(key=lambda item: item[2], reverse=True)
+        return download_items, download_last_items
+
+    def __call__(self, *args, **kwargs) -> None:
+        super().__call__(*args, **kwargs)
+        download_items, download_last_items = self.read_download_list()
+        self.num_bytes_to_download = sum(item[2] for item in download_items + download_last_items)
+        num_workers = self.num_workers or int(config_vars.get("PARALLEL_SYNC", 16))
+        max_connections_per_host = self.max_connections_per_host or int(config_vars.get("DOWNLOAD_CONNECTIONS_PER_HOST", num_workers))
+        self.host_limiter = HostConnectionLimiter(max_connections_per_host)
+        self.retries = int(config_vars.get("CURL_RETRIES", 2))
+        self.retry_delay = int(config_vars.get("CURL_RETRY_DELAY", 8))
+        self.cookie = config_vars.get("COOKIE_FOR_SYNC_URLS", "").str()
+
+        self.start_time = time.perf_counter()
+        self.download_items_in_parallel(download_items, num_workers)
+        self.download_items_in_parallel(download_last_items, num_workers)
+
+        if self.failed_items:
+            url, path, error = self.failed_items[0]
+            raise IOError(f"failed to download {len(self.failed_items)} files, first failure {url} to {path}: {error}")
+
+    def download_items_in_parallel(self, items, num_workers):
+        work_queue = queue.Queue()
+        for item in items:
+            work_queue.put(item)
+        results_queue = queue.Queue()
+
+        def download_worker():
+            dler = DownloadManager(cookie=self.cookie, report_own_progress=False)
+            while True:
+                try:
+                    item = work_queue.get_nowait()
+                except queue.Empty:
+                    return
+                results_queue.put((item, self.download_with_retries(dler, *item)))
+
+        workers = [threading.Thread(target=download_worker, daemon=True) for _ in range(min(num_workers, len(items)))]
+        for worker in workers:
+            worker.start()
+        for _ in range(len(items)):
+            (url, path, size, checksum), error = results_queue.get()
+            if error is None:
+                self.num_files_downloaded += 1
+                self.num_bytes_downloaded += size
+                super().increment_and_output_progress(increment_by=1, prog_msg=f"downloaded {path}, {self.aggregate_progress()}")
+            else:
+                self.failed_items.append((url, path, error))
+                super().increment_and_output_progress(increment_by=1, prog_msg=f"failed to download {url}, {error}")
+        for worker in workers:
+            worker.join()
+
+    def aggregate_progress(self) -> str:
+        mb_downloaded = self.num_bytes_downloaded / (1024 * 1024)
+        mb_per_sec = mb_downloaded / max(time.perf_counter() - self.start_time, 0.001)
+        retVal = f"{mb_downloaded:.1f} of {self.num_bytes_to_download / (1024 * 1024):.1f} MB, {mb_per_sec:.1f} MB/s"
+        return retVal
+
+    def download_with_retries(self, dler, url, path, size, checksum):
+        """ return None if the download succeeded, otherwise the last exception """
+        for attempt in range(self.retries + 1):
+            try:
+                with self.host_limiter(url):
+                    dler(url=url, path=path, checksum=checksum)
+                return None
+            except Exception as ex:
+                if attempt == self.retries or not self.should_retry(ex):
+                    return ex
+                retry_delay = min(self.retry_delay * 2 ** attempt, self.max_retry_delay_sec)
+                log.warning(f"retrying download of {url} in {retry_delay} seconds, {ex}")
+                time.sleep(retry_delay)
+
+    @staticmethod
+    def should_retry(ex) -> bool:
+        """ client errors, such as 404, will not go away by retrying, except for timeout and too many requests """
+        retVal = True
+        if isinstance(ex, requests.HTTPError) and ex.response is not None:
+            retVal = not (400 <= ex.response.status_code < 500) or ex.response.status_code in (408, 429)
+        return retVal
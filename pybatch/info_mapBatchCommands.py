@@ -4,13 +4,17 @@ from typing import List, Any
 import os
 import sys
 import stat
+import shutil
 import zlib
 from collections import defaultdict
 from pathlib import Path
+from types import SimpleNamespace
 import logging
 import requests
 import time
 import datetime
+import threading
+from concurrent import futures
 
 log = logging.getLogger(__name__)
 
@@ -24,10 +28,11 @@ from .fileSystemBatchCommands import MakeDir
 from .fileSystemBatchCommands import Chmod
 from .wtarBatchCommands import Wzip
 from .copyBatchCommands import CopyFileToFile
-from .downloadBatchCommands import DownloadFileAndCheckChecksum, DownloadManager
+from .downloadBatchCommands import DownloadFileAndCheckChecksum, DownloadManager, HostConnectionLimiter
 from svnTree.svnTable import SVNTable
 
 from db import DBManager
+from db.dbMaster import DBMaster
 
 """
     batch commands that need access to the db and the info_map table
@@ -36,10 +41,14 @@ from db import DBManager
 
 class CheckDownloadFolderChecksum(DBManager, PythonBatchCommandBase):
     """ check checksums in download folder
+        files are checksummed by num_workers threads, num_workers=0 will checksum files one by one,
+        if not given num_workers is taken from $(PARALLEL_CHECKSUM).
+        bad or missing files are re-downloaded by $(PARALLEL_SYNC) threads, with no more than
+        max_connections_per_host concurrent downloads from each host.
     """
 
     def __init__(self, print_report=True, raise_on_bad_checksum=True, max_bad_files_to_redownload=None,
-                 **kwargs) -> None:
+                 num_workers=None, max_connections_per_host=None, **kwargs) -> None:
         super().__init__(**kwargs)
         self.print_report = print_report
         self.raise_on_bad_checksum = raise_on_bad_checksum
@@ -51,6 +60,9 @@ class CheckDownloadFolderChecksum(DBManager, PythonBatchCommandBase):
         self.retried_files_exception_message = ""
         self.num_bad_files = 0
         self.max_bad_files_to_redownload = max_bad_files_to_redownload
+        self.num_workers = num_workers
+        self.max_connections_per_host = max_connections_per_host
+        self.num_bytes_checked = 0
         self.report_lines = None
 
     def repr_own_args(self, all_args: List[str]) -> None:
@@ -58,6 +70,8 @@ class CheckDownloadFolderChecksum(DBManager, PythonBatchCommandBase):
         all_args.append(self.optional_named__init__param("raise_on_bad_checksum", self.raise_on_bad_checksum, False))
         all_args.append(
             self.optional_named__init__param("max_bad_files_to_redownload", self.max_bad_files_to_redownload))
+        all_args.append(self.optional_named__init__param("num_workers", self.num_workers))
+        all_args.append(self.optional_named__init__param("max_connections_per_host", self.max_connections_per_host))
 
     def progress_msg_self(self) -> str:
         return f'''Check download folder checksum'''
@@ -78,30 +92,8 @@ class CheckDownloadFolderChecksum(DBManager, PythonBatchCommandBase):
             config_vars['LOCAL_SYNC_DIR'].Path(resolve=True).joinpath("BREAK_BEFORE_CHECKSUM"),
             self.break_file_callback)
 
-        for file_item in dl_file_items:
-            self.doing = f"""check checksum for '{file_item.download_path}'"""
-            super().increment_and_output_progress(increment_by=1, prog_msg=self.doing)
-
-            if os.path.isfile(file_item.download_path):
-                file_checksum = utils.get_file_checksum(file_item.download_path)
-                if not utils.compare_checksums(file_checksum, file_item.checksum):
-                    self.num_bad_files += 1
-                    super().increment_and_output_progress(increment_by=0,
-                                                          prog_msg=f"bad checksum for '{file_item.download_path}'\nexpected: {file_item.checksum}, found: {file_checksum}")
-                    self.lists_of_files["bad_checksum"].append(" ".join(("Bad checksum:", file_item.download_path,
-                                                                         "expected", file_item.checksum, "found",
-                                                                         file_checksum)))
-                    self.lists_of_files["to redownload"].append(file_item)
-            else:
-                self.num_bad_files += 1
-                super().increment_and_output_progress(increment_by=0,
-                                                      prog_msg=f"missing file '{file_item.download_path}'")
-                self.lists_of_files["missing_files"].append(" ".join((file_item.download_path, "was not found")))
-                self.lists_of_files["to redownload"].append(file_item)
-            if self.max_bad_files_to_redownload is not None and self.num_bad_files > self.max_bad_files_to_redownload:
-                super().increment_and_output_progress(increment_by=0,
-                                                      prog_msg=f"stopping checksum check too many bad or missing files found")
-                break
+        num_workers = self.num_workers if self.num_workers is not None else int(config_vars.get("PARALLEL_CHECKSUM", -1))
+        self.verify_download_items(dl_file_items, num_workers)
 
         if not self.is_checksum_ok():
             if self.max_bad_files_to_redownload is not None and self.num_bad_files <= self.max_bad_files_to_redownload:
@@ -117,23 +109,91 @@ class CheckDownloadFolderChecksum(DBManager, PythonBatchCommandBase):
                      f'Missing {len(self.lists_of_files["missing_files"])} files'))
             raise ValueError(exception_message)
 
-    def re_download_bad_files(self):
+    @staticmethod
+    def checksum_and_size(file_path):
+        """ return (checksum, size) of a file, (None, 0) if the file does not exist """
+        retVal = (None, 0)
+        if os.path.isfile(file_path):
+            retVal = (utils.get_file_checksum(file_path), os.path.getsize(file_path))
+        return retVal
+
+    def verify_download_items(self, dl_file_items, num_workers):
+        """ checksum the files of dl_file_items, missing files or files with bad checksum are added to
+            lists_of_files["to redownload"].
+            num_workers == 0: files are checksummed one by one, otherwise by a pool of threads
+        """
+        if num_workers == 0:
+            checked_items = ((file_item, self.checksum_and_size(file_item.download_path)) for file_item in dl_file_items)
+        else:
+            engine = utils.ChecksumEngine(num_workers=num_workers)
+            engine.group_size = engine.num_workers * 16  # small groups so stopping on too many bad files will not wait for many checksums
+            checked_items = engine.map_in_groups(lambda file_item: self.checksum_and_size(file_item.download_path), dl_file_items)
+
+        start_time = time.perf_counter()
         try:
-            download_path = None
-
-            with DownloadManager(cookie=config_vars["COOKIE_JAR"].str(),
-                                 report_own_progress=False) as dler:  # should get the cookie from the config vars
-                for file_item in self.lists_of_files["to redownload"]:
-                    download_url = self.info_map_table.get_sync_url_for_file_item(file_item)
-                    download_path = file_item.download_path
-                    dler(path=download_path, url=download_url, checksum=file_item.checksum)
+            for file_item, (file_checksum, file_size) in checked_items:
+                self.num_bytes_checked += file_size
+                self.doing = f"""check checksum for '{file_item.download_path}'"""
+                super().increment_and_output_progress(increment_by=1, prog_msg=f"{self.doing} ({self.mb_per_sec(start_time):.1f} MB/s)")
+
+                if file_checksum is None:
+                    self.num_bad_files += 1
+                    super().increment_and_output_progress(increment_by=0,
+                                                          prog_msg=f"missing file '{file_item.download_path}'")
+                    self.lists_of_files["missing_files"].append(" ".join((file_item.download_path, "was not found")))
+                    self.lists_of_files["to redownload"].append(file_item)
+                elif not utils.compare_checksums(file_checksum, file_item.checksum):
+                    self.num_bad_files += 1
+                    super().increment_and_output_progress(increment_by=0,
+                                                          prog_msg=f"bad checksum for '{file_item.download_path}'\nexpected: {file_item.checksum}, found: {file_checksum}")
+                    self.lists_of_files["bad_checksum"].append(" ".join(("Bad checksum:", file_item.download_path,
+                                                                         "expected", file_item.checksum, "found",
+                                                                         file_checksum)))
+                    self.lists_of_files["to redownload"].append(file_item)
+                if self.max_bad_files_to_redownload is not None and self.num_bad_files > self.max_bad_files_to_redownload:
+                    super().increment_and_output_progress(increment_by=0,
+                                                          prog_msg=f"stopping checksum check too many bad or missing files found")
+                    break
+        finally:
+            checked_items.close()
+        super().increment_and_output_progress(increment_by=0,
+                                              prog_msg=f"checked {self.num_bytes_checked / (1024 * 1024):.1f} MB in {time.perf_counter() - start_time:.1f} seconds, {self.mb_per_sec(start_time):.1f} MB/s")
+
+    def mb_per_sec(self, start_time):
+        retVal = self.num_bytes_checked / (1024 * 1024) / max(time.perf_counter() - start_time, 0.001)
+        return retVal
+
+    def re_download_bad_files(self):
+        """ re-download the files in lists_of_files["to redownload"] by $(PARALLEL_SYNC) threads.
+            each thread has its own DownloadManager, and no more than max_connections_per_host
+            threads download from the same host at the same time.
+        """
+        # urls are resolved here since the db cannot be accessed from the download threads
+        items_and_urls = [(file_item, self.info_map_table.get_sync_url_for_file_item(file_item)) for file_item in self.lists_of_files["to redownload"]]
+        max_connections_per_host = self.max_connections_per_host if self.max_connections_per_host is not None else int(config_vars.get("REDOWNLOAD_CONNECTIONS_PER_HOST", 4))
+        host_limiter = HostConnectionLimiter(max_connections_per_host)
+        cookie = config_vars["COOKIE_JAR"].str()  # should get the cookie from the config vars
+        thread_local = threading.local()
+
+        def re_download_one(file_item, download_url):
+            if not hasattr(thread_local, "dler"):
+                thread_local.dler = DownloadManager(cookie=cookie, report_own_progress=False)
+            with host_limiter(download_url):
+                thread_local.dler(path=file_item.download_path, url=download_url, checksum=file_item.checksum)
+
+        with futures.ThreadPoolExecutor(max_workers=max(1, int(config_vars.get("PARALLEL_SYNC", 16)))) as executor:
+            future_to_item = {executor.submit(re_download_one, file_item, download_url): file_item for file_item, download_url in items_and_urls}
+            for future in futures.as_completed(future_to_item):
+                file_item = future_to_item[future]
+                try:
+                    future.result()
                     super().increment_and_output_progress(increment_by=0,
                                                           prog_msg=f"redownloaded {file_item.download_path}")
                     self.num_bad_files -= 1
-        except Exception as ex:
-            log.error(f"""Exception while redownloading {download_path}, {ex}""")
-            super().increment_and_output_progress(increment_by=0,
-                                                  prog_msg=f"""Exception while redownloading {download_path}, {ex}""")
+                except Exception as ex:
+                    log.error(f"""Exception while redownloading {file_item.download_path}, {ex}""")
+                    super().increment_and_output_progress(increment_by=0,
+                                                          prog_msg=f"""Exception while redownloading {file_item.download_path}, {ex}""")
 
     def is_checksum_ok(self) -> bool:
         retVal = self.num_bad_files == 0
@@ -225,21 +285,25 @@ class InfoMapFullWriter(DBManager, PythonBatchCommandBase):
         return f'''Create full info_map file'''
 
     def __call__(self, *args, **kwargs) -> None:
-        self.info_map_table.write_to_file(self.out_file, field_to_write=InfoMapFullWriter.fields_relevant_to_info_map)
+        self.info_map_table.write_to_file(self.out_file, in_format=self.format, field_to_write=InfoMapFullWriter.fields_relevant_to_info_map)
 
 
 class InfoMapSplitWriter(DBManager, PythonBatchCommandBase):
     """ write all info map table to files according to info_map: field in index.yaml """
     fields_relevant_to_info_map = ('path', 'flags', 'revision', 'checksum', 'size')
 
-    def __init__(self, work_folder, in_format='text', **kwargs):
+    def __init__(self, work_folder, in_format='text', delta_base_folder=None, max_delta_revisions=4, **kwargs):
         super().__init__(**kwargs)
         self.work_folder = Path(work_folder)
         self.format = in_format
+        self.delta_base_folder = Path(delta_base_folder) if delta_base_folder else None  # None: do not write deltas
+        self.max_delta_revisions = max_delta_revisions
 
     def repr_own_args(self, all_args: List[str]) -> None:
         all_args.append(self.unnamed__init__param(self.work_folder))
         all_args.append(self.optional_named__init__param("in_format", self.format, 'text'))
+        all_args.append(self.optional_named__init__param("delta_base_folder", self.delta_base_folder, None))
+        all_args.append(self.optional_named__init__param("max_delta_revisions", self.max_delta_revisions, 4))
 
     def progress_msg_self(self) -> str:
         return f'''Create split info_map files'''
@@ -271,7 +335,7 @@ class InfoMapSplitWriter(DBManager, PythonBatchCommandBase):
         for infomap_file_name, info_map_items in info_map_to_item.items():
             if info_map_items:  # could be that no items are linked to the info map file
                 info_map_file_path = self.work_folder.joinpath(infomap_file_name)
-                self.info_map_table.write_to_file(in_file=info_map_file_path, items_list=info_map_items,
+                self.info_map_table.write_to_file(in_file=info_map_file_path, in_format=self.format, items_list=info_map_items,
                                                   field_to_write=self.fields_relevant_to_info_map)
                 files_to_add_to_default_info_map.append(info_map_file_path)
 
@@ -285,19 +349,62 @@ class InfoMapSplitWriter(DBManager, PythonBatchCommandBase):
         default_info_map_file_name = str(config_vars["MAIN_INFO_MAP_FILE_NAME"])
         default_info_map_file_path = self.work_folder.joinpath(default_info_map_file_name)
         info_map_items = self.info_map_table.get_items_for_default_infomap()
-        self.info_map_table.write_to_file(in_file=default_info_map_file_path, items_list=info_map_items,
+        self.info_map_table.write_to_file(in_file=default_info_map_file_path, in_format=self.format, items_list=info_map_items,
                                           field_to_write=self.fields_relevant_to_info_map)
         with Wzip(default_info_map_file_path, self.work_folder, own_progress_count=0) as wzipper:
             wzipper()
 
         # add a line to default info map for each non default info_map created above
-        with utils.utf8_open_for_read(default_info_map_file_path, "a") as wfd:
+        if self.format == "text":
+            with utils.utf8_open_for_read(default_info_map_file_path, "a") as wfd:
+                for file_to_add in files_to_add_to_default_info_map:
+                    file_checksum = utils.get_file_checksum(file_to_add)
+                    file_size = file_to_add.stat().st_size
+                    # todo: make path relative
+                    line_for_main_info_map = f"instl/{file_to_add.name}, f, {config_vars['TARGET_REPO_REV'].str()}, {file_checksum}, {file_size}\n"
+                    wfd.write(line_for_main_info_map)
+        elif files_to_add_to_default_info_map:  # binary files cannot be appended to, so write again with the additional items
             for file_to_add in files_to_add_to_default_info_map:
-                file_checksum = utils.get_file_checksum(file_to_add)
-                file_size = file_to_add.stat().st_size
-                # todo: make path relative
-                line_for_main_info_map = f"instl/{file_to_add.name}, f, {config_vars['TARGET_REPO_REV'].str()}, {file_checksum}, {file_size}\n"
-                wfd.write(line_for_main_info_map)
+                info_map_items.append(SimpleNamespace(path=f"instl/{file_to_add.name}", flags="f", fileFlag=1,
+                                                      revision=int(config_vars['TARGET_REPO_REV']),
+                                                      checksum=utils.get_file_checksum(file_to_add), size=file_to_add.stat().st_size))
+            self.info_map_table.write_to_file(in_file=default_info_map_file_path, in_format=self.format, items_list=info_map_items,
+                                              field_to_write=self.fields_relevant_to_info_map)
+
+        if self.delta_base_folder is not None:
+            self.write_info_map_deltas(default_info_map_file_path)
+
+    def write_info_map_deltas(self, default_info_map_file_path):
+        """ write a delta from the default info map of each previous repo-rev kept in delta_base_folder
+            to the default info map of this repo-rev. Clients that already have the info map of one of these
+            repo-revs can download the delta instead of the full info map.
+            The default info map of this repo-rev is then kept in delta_base_folder for future deltas.
+        """
+        target_repo_rev = int(config_vars['TARGET_REPO_REV'])
+        self.delta_base_folder.mkdir(parents=True, exist_ok=True)
+        base_repo_revs = sorted((int(base_folder.name) for base_folder in self.delta_base_folder.iterdir()
+                                 if base_folder.name.isdigit() and int(base_folder.name) < target_repo_rev), reverse=True)
+        if base_repo_revs:
+            current_table = SVNTable(DBMaster(":memory:", self.info_map_table.db.ddl_files_dir))
+            try:
+                current_table.drop_indexes()
+                current_table.read_from_file(os.fspath(default_info_map_file_path))
+                for base_repo_rev in base_repo_revs[:self.max_delta_revisions]:
+                    base_info_map_file_path = self.delta_base_folder.joinpath(str(base_repo_rev), default_info_map_file_path.name)
+                    if base_info_map_file_path.is_file():
+                        delta_file_path = self.work_folder.joinpath(f"{default_info_map_file_path.name}.delta-from-{base_repo_rev}")
+                        log.info(f"write info map delta {delta_file_path}")
+                        current_table.write_delta_to_file(delta_file_path, base_info_map_file_path,
+                                                          comment=f"delta from repo-rev {base_repo_rev} to repo-rev {target_repo_rev}")
+            finally:
+                current_table.db.close()
+
+        # keep this repo-rev's info map and remove the oldest ones
+        target_folder = self.delta_base_folder.joinpath(str(target_repo_rev))
+        target_folder.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(default_info_map_file_path, target_folder.joinpath(default_info_map_file_path.name))
+        for old_repo_rev in base_repo_revs[max(self.max_delta_revisions - 1, 0):]:
+            utils.safe_remove_folder(self.delta_base_folder.joinpath(str(old_repo_rev)))
 
 
 class IndexYamlReader(DBManager, PythonBatchCommandBase):
@@ -444,6 +551,15 @@ class CreateRepoRevFile(PythonBatchCommandBase):
             "INFO_MAP_FILE_URL"] = "$(BASE_LINKS_URL)/$(REPO_NAME)/$(__CURR_REPO_FOLDER_HIERARCHY__)/instl/" + main_info_map_file_name
         config_vars["INFO_MAP_CHECKSUM"] = main_info_map_checksum
 
+        # checksums of the info map deltas written by InfoMapSplitWriter, deltas are not wzipped.
+        # clients use a delta only if its checksum is published here, as the full info map is checked against INFO_MAP_CHECKSUM
+        delta_checksums = [f"""{delta_file.name.rsplit("-", 1)[-1]}:{utils.get_file_checksum(delta_file)}"""
+                           for delta_file in sorted(revision_instl_folder_path.glob("info_map.txt.delta-from-*"))]
+        if delta_checksums:
+            config_vars["INFO_MAP_DELTA_CHECKSUMS"] = delta_checksums
+            if "INFO_MAP_DELTA_CHECKSUMS" not in repo_rev_vars:
+                repo_rev_vars.append("INFO_MAP_DELTA_CHECKSUMS")
+
         # create checksum for the main index.yaml file, either wzipped or not
         index_file_name = "index.yaml" + zip_extension
         index_file_path = revision_instl_folder_path.joinpath(index_file_name)
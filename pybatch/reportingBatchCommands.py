@@ -299,6 +299,8 @@ class PythonBatchRuntime(pybatch.PythonBatchCommandBase, call__call__=False, is_
         if exc_val:
             self.log_error(exc_type, exc_val, exc_tb)
             log.info("Shakespeare says: The Comedy of Errors")
+        # stop the worker processes of ScheduledUnwtar, whether the batch file got to WaitForUnwtars or not
+        pybatch.UnwtarScheduler.shutdown(cancel_waiting=exc_val is not None)
 
         self.exit_timing_measure()
         time_diff = self.exit_time-self.enter_time
@@ -512,7 +514,7 @@ class ResolveConfigVarsInYamlFile(pybatch.PythonBatchCommandBase):
                     raise ValueError(f"member self.config_files is not a string or a list: {self.config_files}")
 
             with utils.utf8_open_for_read(self.unresolved_file, "r") as rfd:
-                yaml_docs = list(yaml.compose_all(rfd))
+                yaml_docs = list(yaml.compose_all(rfd, Loader=aYaml.YamlLoader))
 
             resolved_docs = list()
             for ydoc in yaml_docs:
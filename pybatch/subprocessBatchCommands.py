@@ -265,8 +265,10 @@ class ShellCommands(PythonBatchCommandBase):
                 shelli()
 
 
-class ParallelRun(PythonBatchCommandBase, kwargs_defaults={'action_name': None, 'shell': False}):
-    """ run some shell commands in parallel """
+class ParallelRun(PythonBatchCommandBase, kwargs_defaults={'action_name': None, 'shell': False, 'max_parallel_processes': None}):
+    """ run some shell commands in parallel
+        max_parallel_processes: if given, no more than max_parallel_processes commands will run at the same time
+    """
     def __init__(self, config_file, **kwargs):
         super().__init__(**kwargs)
         self.config_file = config_file
@@ -296,8 +298,8 @@ class ParallelRun(PythonBatchCommandBase, kwargs_defaults={'action_name': None,
                     commands.append(args)
         try:
 
-            self.doing = f"""{self.get_action_name()}, config file '{resolved_config_file}', running with {len(commands)} processes in parallel"""
-            utils.run_processes_in_parallel(commands, self.shell)
+            self.doing = f"""{self.get_action_name()}, config file '{resolved_config_file}', running with {min(len(commands), self.max_parallel_processes or len(commands))} processes in parallel"""
+            utils.run_processes_in_parallel(commands, self.shell, max_parallel_processes=self.max_parallel_processes)
         except SystemExit as sys_exit:
             if sys_exit.code != 0:
                 if "curl" in commands[0]:
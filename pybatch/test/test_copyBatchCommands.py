@@ -12,8 +12,12 @@ import contextlib
 import filecmp
 import random
 import string
+import errno
+import subprocess
+import tempfile
 from collections import namedtuple
 import unittest
+from unittest import mock
 
 import utils
 from pybatch import *
@@ -46,7 +50,8 @@ class TestPythonBatchCopy(unittest.TestCase):
                  ignore_dangling_symlinks=True,
                  delete_extraneous_files=True,
                  verbose=17,
-                 dry_run=True))
+                 dry_run=True,
+                 num_workers=8))
         self.pbt.reprs_test_runner(*list_of_objs)
 
     def test_RsyncClone(self):
@@ -93,6 +98,131 @@ class TestPythonBatchCopy(unittest.TestCase):
         dir_comp_with_ignore = filecmp.dircmp(dir_to_copy_from, dir_to_copy_to_with_ignore)
         is_identical_dircomp_with_ignore(dir_comp_with_ignore, file_names_to_ignore)
 
+    def test_RsyncClone_parallel(self):
+        """ test RsyncClone with num_workers > 0 copies the same as num_workers=0, with the same statistics,
+            and that delete_extraneous_files still removes only files not in the source
+        """
+        dir_to_copy_from = self.pbt.path_inside_test_folder("copy-resource_source_file")
+        dir_to_copy_to_one_by_one = self.pbt.path_inside_test_folder("copy-target-one-by-one")
+        dir_to_copy_to_parallel = self.pbt.path_inside_test_folder("copy-target-parallel")
+        dir_to_copy_to_parallel_again = self.pbt.path_inside_test_folder("copy-target-parallel-again")
+
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(dir_to_copy_from)
+        with self.pbt.batch_accum.sub_accum(Cd(dir_to_copy_from)) as sub_bc:
+            sub_bc += Touch("hootenanny")  # add one file with fixed (none random) name
+            sub_bc += MakeRandomDirs(num_levels=4, num_dirs_per_level=3, num_files_per_dir=7, file_size=413)
+        self.pbt.exec_and_capture_output()
+
+        statistics = dict()
+        for dir_to_copy_to, num_workers in ((dir_to_copy_to_one_by_one, 0), (dir_to_copy_to_parallel, 4)):
+            with RsyncClone(dir_to_copy_from, dir_to_copy_to, hard_links=False, num_workers=num_workers, report_own_progress=False) as rc:
+                rc()
+            statistics[num_workers] = dict(rc.statistics)
+            self.assertTrue(is_identical_dircmp(filecmp.dircmp(dir_to_copy_from, dir_to_copy_to)), f"{self.pbt.which_test} ({num_workers} workers): source and target dirs are not the same")
+        self.assertEqual(statistics[0], statistics[4])
+
+        # copy again over an existing destination with an extraneous file: files are skipped and the extraneous file is removed
+        shutil.copytree(dir_to_copy_to_parallel, dir_to_copy_to_parallel_again, copy_function=shutil.copy2)
+        extraneous_file = dir_to_copy_to_parallel_again.joinpath("extraneous_file")
+        extraneous_file.write_text("not in source")
+        with RsyncClone(dir_to_copy_from, dir_to_copy_to_parallel_again, hard_links=False, delete_extraneous_files=True, num_workers=4, report_own_progress=False) as rc:
+            rc()
+        self.assertFalse(extraneous_file.exists())
+        self.assertEqual(rc.statistics['skipped_files'], statistics[4]['files'])
+        self.assertTrue(is_identical_dircmp(filecmp.dircmp(dir_to_copy_from, dir_to_copy_to_parallel_again)), f"{self.pbt.which_test}: source and target dirs are not the same")
+
+    def copy_with_file_copier(self, dir_to_copy_from, dir_to_copy_to, file_copier=None):
+        with RsyncClone(dir_to_copy_from, dir_to_copy_to, hard_links=False, report_own_progress=False) as rc:
+            if file_copier is not None:
+                rc.file_copier = file_copier
+            rc()
+        self.assertTrue(is_identical_dircmp(filecmp.dircmp(dir_to_copy_from, dir_to_copy_to)), f"{self.pbt.which_test}: source and target dirs are not the same")
+        copy_methods = {name: rc.statistics[name] for name in (utils.FileCopier.reflink, utils.FileCopier.kernel_copy, utils.FileCopier.buffered_copy)}
+        self.assertEqual(sum(copy_methods.values()), rc.statistics['files'])
+        return copy_methods
+
+    def test_RsyncClone_copy_methods(self):
+        """ test RsyncClone counts how each file was copied, and falls back to buffered copy
+            when kernel copy is not available or not supported by the file system
+        """
+        dir_to_copy_from = self.pbt.path_inside_test_folder("copy-src")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(dir_to_copy_from)
+        with self.pbt.batch_accum.sub_accum(Cd(dir_to_copy_from)) as sub_bc:
+            sub_bc += MakeRandomDirs(num_levels=2, num_dirs_per_level=3, num_files_per_dir=5, file_size=70000)
+        self.pbt.exec_and_capture_output()
+
+        self.copy_with_file_copier(dir_to_copy_from, self.pbt.path_inside_test_folder("copy-target-default"))
+
+        copy_methods = self.copy_with_file_copier(dir_to_copy_from, self.pbt.path_inside_test_folder("copy-target-buffered"),
+                                                  utils.FileCopier(reflink=False, kernel_copy=False))
+        self.assertEqual(copy_methods[utils.FileCopier.reflink] + copy_methods[utils.FileCopier.kernel_copy], 0)
+
+        if not hasattr(os, "copy_file_range"):
+            return
+        file_copier = utils.FileCopier(reflink=False)
+        with mock.patch("os.copy_file_range", side_effect=OSError(errno.ENOSYS, "copy_file_range not implemented")) as copy_file_range:
+            copy_methods = self.copy_with_file_copier(dir_to_copy_from, self.pbt.path_inside_test_folder("copy-target-no-kernel-copy"), file_copier)
+        self.assertEqual(copy_file_range.call_count, 1)  # after the first failure kernel copy is not tried again
+        self.assertFalse(file_copier.try_kernel_copy)
+        self.assertEqual(copy_methods[utils.FileCopier.kernel_copy], 0)
+
+    def test_FileCopier_short_kernel_copy(self):
+        """ test FileCopier falls back to shutil.copyfile when copy_file_range returns 0 before the end of the file """
+        if not hasattr(os, "copy_file_range"):
+            self.skipTest("os.copy_file_range is not available")
+        src_path = self.pbt.path_inside_test_folder("short-copy-src")
+        dst_path = self.pbt.path_inside_test_folder("short-copy-dst")
+        src_path.write_bytes(os.urandom(70000))
+        file_copier = utils.FileCopier(reflink=False)
+        with mock.patch("os.copy_file_range", return_value=0) as copy_file_range:
+            copy_method = file_copier.copy_file(src_path, dst_path)
+        self.assertEqual(copy_file_range.call_count, 1)
+        self.assertEqual(copy_method, utils.FileCopier.buffered_copy)
+        self.assertFalse(file_copier.try_kernel_copy)
+        self.assertEqual(src_path.read_bytes(), dst_path.read_bytes())
+
+    def test_FileCopier_named_pipe(self):
+        """ test FileCopier leaves a named pipe to shutil.copyfile, which refuses it, instead of blocking on opening it """
+        if not hasattr(os, "mkfifo"):
+            self.skipTest("named pipes are not supported")
+        fifo_path = self.pbt.path_inside_test_folder("named-pipe")
+        os.mkfifo(fifo_path)
+        with self.assertRaises(shutil.SpecialFileError):
+            utils.FileCopier().copy_file(fifo_path, self.pbt.path_inside_test_folder("named-pipe-copy"))
+
+    def test_RsyncClone_reflink(self):
+        """ test RsyncClone clones files on a file system supporting reflinks,
+            using a loopback btrfs or XFS image - which requires root and mkfs.btrfs or mkfs.xfs
+        """
+        if sys.platform != 'linux' or os.geteuid() != 0:
+            self.skipTest("loopback file system requires root on Linux")
+        mkfs_commands = [mkfs for mkfs in (["mkfs.btrfs", "-q"], ["mkfs.xfs", "-q", "-m", "reflink=1"]) if shutil.which(mkfs[0])]
+        if not mkfs_commands:
+            self.skipTest("neither mkfs.btrfs nor mkfs.xfs are available")
+        image_folder = Path(tempfile.mkdtemp())
+        image_path = image_folder.joinpath("reflink.img")
+        mount_point = image_folder.joinpath("mnt")
+        mount_point.mkdir()
+        try:
+            with open(image_path, "wb") as image_file:
+                image_file.truncate(512 * 1024 * 1024)
+            subprocess.run(mkfs_commands[0] + [os.fspath(image_path)], check=True, capture_output=True)
+            if subprocess.run(["mount", "-o", "loop", os.fspath(image_path), os.fspath(mount_point)], capture_output=True).returncode != 0:
+                self.skipTest("could not mount loopback file system")
+            try:
+                dir_to_copy_from = mount_point.joinpath("copy-src")
+                dir_to_copy_from.mkdir()
+                for i_file in range(8):
+                    dir_to_copy_from.joinpath(f"file_{i_file}.bin").write_bytes(os.urandom(70000))
+                copy_methods = self.copy_with_file_copier(dir_to_copy_from, mount_point.joinpath("copy-target"))
+                self.assertEqual(copy_methods[utils.FileCopier.reflink], 8)
+            finally:
+                subprocess.run(["umount", os.fspath(mount_point)], capture_output=True)
+        finally:
+            shutil.rmtree(image_folder, ignore_errors=True)
+
     def test_CopyDirToDir_repr(self):
         dir_from = r"\p\o\i"
         dir_to = "/q/w/r"
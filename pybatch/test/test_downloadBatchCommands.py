@@ -0,0 +1,222 @@
+#!/usr/bin/env python3.9
+
+
+import os
+import unittest
+import threading
+import tracemalloc
+import http.server
+import requests
+
+import utils
+from pybatch import *
+from configVar import config_vars
+
+from .test_PythonBatchBase import *
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """ serve files from memory, with support for Range requests.
+        drop_after: close the connection after sending that many bytes of the body
+        drop_once: drop only the next response
+        ignore_range: always send the whole file
+    """
+    files = dict()
+    received_ranges = list()
+    drop_after = None
+    drop_once = False
+    ignore_range = False
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        self.received_ranges.append(range_header)
+        contents = self.files.get(self.path)
+        if contents is None:
+            self.send_error(404)
+            return
+        start = 0
+        if range_header and not self.ignore_range:
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(contents):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(contents) - 1}/{len(contents)}")
+        else:
+            self.send_response(200)
+        body = memoryview(contents)[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.drop_after is not None:
+            body = body[:self.drop_after]
+            if self.drop_once:
+                RangeRequestHandler.drop_after = None
+        for i in range(0, len(body), 1024 * 1024):
+            self.wfile.write(body[i:i + 1024 * 1024])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestPythonBatchDownload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def __init__(self, which_test):
+        super().__init__(which_test)
+        self.pbt = TestPythonBatch(self, which_test)
+
+    def setUp(self):
+        config_vars.push_scope()  # config vars set by a test are removed in tearDown
+        self.pbt.setUp()
+        RangeRequestHandler.files.clear()
+        RangeRequestHandler.received_ranges.clear()
+        RangeRequestHandler.drop_after = None
+        RangeRequestHandler.drop_once = False
+        RangeRequestHandler.ignore_range = False
+
+    def tearDown(self):
+        self.pbt.tearDown()
+        config_vars.pop_scope()
+
+    def serve(self, name, contents):
+        RangeRequestHandler.files["/" + name] = contents
+        return f"{self.base_url}/{name}", utils.get_buffer_checksum(contents)
+
+    def download(self, url, path, checksum):
+        with DownloadManager(cookie="session=1", report_own_progress=False) as dler:
+            dler(url=url, path=path, checksum=checksum)
+
+    def test_download(self):
+        url, checksum = self.serve("a.txt", b"abc" * 1000)
+        to_path = self.pbt.path_inside_test_folder("a.txt")
+        self.download(url, to_path, checksum)
+        self.assertEqual(to_path.read_bytes(), b"abc" * 1000)
+        self.assertFalse(to_path.with_name("a.txt" + DownloadManager.partial_download_suffix).exists())
+        self.assertEqual(RangeRequestHandler.received_ranges, [None])
+
+    def test_bad_checksum(self):
+        url, _ = self.serve("a.txt", b"abc")
+        to_path = self.pbt.path_inside_test_folder("a.txt")
+        with self.assertRaises(ValueError):
+            self.download(url, to_path, utils.get_buffer_checksum(b"xyz"))
+        self.assertFalse(to_path.exists())
+        self.assertFalse(to_path.with_name("a.txt" + DownloadManager.partial_download_suffix).exists())
+
+    def test_large_file_memory(self):
+        contents = os.urandom(1024 * 1024) * 64
+        url, checksum = self.serve("large.bin", contents)
+        to_path = self.pbt.path_inside_test_folder("large.bin")
+        tracemalloc.start()
+        try:
+            self.download(url, to_path, checksum)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(utils.get_file_checksum(to_path), checksum)
+        self.assertLess(peak_memory, 16 * 1024 * 1024)
+
+    def test_resume(self):
+        contents = os.urandom(3 * 1024 * 1024 + 17)
+        url, checksum = self.serve("resume.bin", contents)
+        to_path = self.pbt.path_inside_test_folder("resume.bin")
+        partial_path = to_path.with_name("resume.bin" + DownloadManager.partial_download_suffix)
+
+        RangeRequestHandler.drop_after = 1024 * 1024
+        with self.assertRaises(requests.exceptions.RequestException):
+            self.download(url, to_path, checksum)
+        self.assertFalse(to_path.exists())
+        self.assertEqual(partial_path.stat().st_size, 1024 * 1024)
+
+        RangeRequestHandler.drop_after = None
+        self.download(url, to_path, checksum)
+        self.assertEqual(RangeRequestHandler.received_ranges, [None, f"bytes={1024 * 1024}-"])
+        self.assertEqual(to_path.read_bytes(), contents)
+        self.assertFalse(partial_path.exists())
+
+    def test_missing_checksum(self):
+        url, _ = self.serve("a.txt", b"abc")
+        to_path = self.pbt.path_inside_test_folder("a.txt")
+        with self.assertRaises(ValueError):
+            self.download(url, to_path, None)
+        self.assertFalse(to_path.exists())
+
+    def test_resume_stale_partial_file(self):
+        """ a partial file left from a previous version of the file fails the checksum, and is downloaded again from the start """
+        url, checksum = self.serve("a.txt", b"abcdef")
+        to_path = self.pbt.path_inside_test_folder("a.txt")
+        to_path.with_name("a.txt" + DownloadManager.partial_download_suffix).write_bytes(b"xyz")
+        self.download(url, to_path, checksum)
+        self.assertEqual(to_path.read_bytes(), b"abcdef")
+        self.assertEqual(RangeRequestHandler.received_ranges, ["bytes=3-", None])
+
+    def test_resume_when_range_is_ignored(self):
+        url, checksum = self.serve("a.txt", b"abcdef")
+        to_path = self.pbt.path_inside_test_folder("a.txt")
+        to_path.with_name("a.txt" + DownloadManager.partial_download_suffix).write_bytes(b"abc")
+        RangeRequestHandler.ignore_range = True
+        self.download(url, to_path, checksum)
+        self.assertEqual(to_path.read_bytes(), b"abcdef")
+
+    def test_session_is_pooled(self):
+        with DownloadManager(cookie="session=1", report_own_progress=False) as dler_1:
+            with DownloadManager(cookie="session=1", report_own_progress=False) as dler_2:
+                self.assertIs(dler_1.session, dler_2.session)
+                with DownloadManager(cookie="session=2", report_own_progress=False) as dler_3:
+                    self.assertIsNot(dler_1.session, dler_3.session)
+
+    def write_download_list(self, items):
+        """ items are (name, contents, download_last), name starting with "missing" will not be served """
+        download_list_path = self.pbt.path_inside_test_folder("download_list.csv")
+        lines = list()
+        for name, contents, download_last in items:
+            url, checksum = f"{self.base_url}/{name}", utils.get_buffer_checksum(contents)
+            if not name.startswith("missing"):
+                url, checksum = self.serve(name, contents)
+            lines.append(f"{url},{self.pbt.test_folder.joinpath('downloaded', name)},{len(contents)},{checksum},{int(download_last)}\n")
+        download_list_path.write_text("".join(lines))
+        return download_list_path
+
+    def test_DownloadFiles_repr(self):
+        self.pbt.reprs_test_runner(DownloadFiles("/a/b/c.csv"), DownloadFiles("/a/b/c.csv", num_workers=3, max_connections_per_host=2))
+
+    def test_DownloadFiles(self):
+        items = [(f"file_{i}.bin", os.urandom(1000 * i), False) for i in range(40)] + [("Info.xml", b"<info/>", True)]
+        download_list_path = self.write_download_list(items)
+        with DownloadFiles(download_list_path, num_workers=4, max_connections_per_host=2, report_own_progress=False) as downloader:
+            downloader()
+        for name, contents, _ in items:
+            self.assertEqual(self.pbt.test_folder.joinpath("downloaded", name).read_bytes(), contents)
+        self.assertEqual(downloader.num_files_downloaded, len(items))
+        self.assertEqual(downloader.num_bytes_downloaded, sum(len(contents) for _, contents, _ in items))
+
+    def test_DownloadFiles_failure_is_not_retried_for_missing_url(self):
+        config_vars["CURL_RETRY_DELAY"] = 0
+        download_list_path = self.write_download_list([("a.txt", b"abc", False), ("missing.txt", b"xyz", False)])
+        with self.assertRaises(IOError):
+            with DownloadFiles(download_list_path, num_workers=2, report_own_progress=False) as downloader:
+                downloader()
+        self.assertEqual(self.pbt.test_folder.joinpath("downloaded", "a.txt").read_bytes(), b"abc")
+        self.assertEqual(len(downloader.failed_items), 1)
+        self.assertEqual(len(RangeRequestHandler.received_ranges), 2)  # 404 for missing.txt was not retried
+
+    def test_DownloadFiles_retry_resumes(self):
+        config_vars["CURL_RETRY_DELAY"] = 0
+        config_vars["CURL_RETRIES"] = 2
+        contents = os.urandom(2 * 1024 * 1024)
+        download_list_path = self.write_download_list([("a.bin", contents, False)])
+        RangeRequestHandler.drop_after = 1024 * 1024
+        RangeRequestHandler.drop_once = True
+        with DownloadFiles(download_list_path, num_workers=1, report_own_progress=False) as downloader:
+            downloader()
+        self.assertEqual(self.pbt.test_folder.joinpath("downloaded", "a.bin").read_bytes(), contents)
+        self.assertEqual(RangeRequestHandler.received_ranges, [None, f"bytes={1024 * 1024}-"])
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3.9
 
 
+import os
 import unittest
+import collections
 import logging
 log = logging.getLogger(__name__)
 
@@ -34,6 +36,29 @@ class TestPythonBatchInfoMap(unittest.TestCase):
     def test_CheckDownloadFolderChecksum(self):
         pass
 
+    def test_CheckDownloadFolderChecksum_verify_download_items(self):
+        FileItem = collections.namedtuple("FileItem", ["download_path", "checksum"])
+        dl_file_items = list()
+        for i in range(50):
+            contents = f"file number {i}".encode()
+            file_path = self.pbt.path_inside_test_folder(f"file_{i}.txt")
+            file_path.write_bytes(contents)
+            dl_file_items.append(FileItem(os.fspath(file_path), utils.get_buffer_checksum(contents)))
+        dl_file_items[7] = FileItem(dl_file_items[7].download_path, utils.get_buffer_checksum(b"something else"))
+        dl_file_items.append(FileItem(os.fspath(self.pbt.path_inside_test_folder("missing.txt")), utils.get_buffer_checksum(b"missing")))
+
+        for num_workers in (0, 4):
+            checker = CheckDownloadFolderChecksum(num_workers=num_workers, report_own_progress=False)
+            checker.verify_download_items(dl_file_items, num_workers)
+            self.assertEqual(checker.num_bad_files, 2)
+            self.assertEqual(checker.lists_of_files["to redownload"], [dl_file_items[7], dl_file_items[50]])
+            self.assertEqual(len(checker.lists_of_files["bad_checksum"]), 1)
+            self.assertEqual(len(checker.lists_of_files["missing_files"]), 1)
+
+        checker = CheckDownloadFolderChecksum(num_workers=4, max_bad_files_to_redownload=0, report_own_progress=False)
+        checker.verify_download_items(dl_file_items, 4)
+        self.assertEqual(checker.lists_of_files["to redownload"], [dl_file_items[7]])
+
     def test_SetExecPermissionsInSyncFolder_repr(self):
         pass
 
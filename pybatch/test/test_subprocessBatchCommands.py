@@ -13,6 +13,8 @@ import contextlib
 import filecmp
 import subprocess
 import string
+import signal
+import time
 from threading import Timer
 from collections import namedtuple
 
@@ -148,7 +150,8 @@ class TestPythonBatchSubprocess(unittest.TestCase):
     def test_ParallelRun_repr(self):
         """ validate ParallelRun object recreation with ParallelRun.__repr__() """
         self.pbt.reprs_test_runner(ParallelRun("/rik/ya/vik", shell=True),
-                                   ParallelRun("/rik/ya/vik", action_name="pil"))
+                                   ParallelRun("/rik/ya/vik", action_name="pil"),
+                                   ParallelRun("/rik/ya/vik", max_parallel_processes=4))
 
     def test_ParallelRun_shell(self):
         test_file = self.pbt.path_inside_test_folder("list-of-runs")
@@ -305,6 +308,58 @@ class TestPythonBatchSubprocess(unittest.TestCase):
             with assert_timeout(3):
                 run_process(cmd, shell=(sys.platform == 'win32'), abort_file=abort_file)
 
+    def run_processes_in_parallel_restore_signals(self, *args, **kwargs):
+        """ run_processes_in_parallel always exits and installs its own signal handlers, return the exit code """
+        saved_handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGABRT, signal.SIGFPE, signal.SIGILL, signal.SIGINT, signal.SIGSEGV, signal.SIGTERM)}
+        try:
+            with self.assertRaises(SystemExit) as context:
+                utils.run_processes_in_parallel(*args, **kwargs)
+        finally:
+            for sig, handler in saved_handlers.items():
+                signal.signal(sig, handler)
+        return context.exception.code
+
+    def test_run_processes_in_parallel_max_parallel_processes(self):
+        times_file = os.path.join(self.pbt.test_folder, 'times.txt')
+        child_code = f"import time\nstart = time.time()\ntime.sleep(0.3)\nwith open({times_file!r}, 'a') as wfd: wfd.write(f'{{start}} {{time.time()}}\\n')\n"
+        commands = [[sys.executable, "-c", child_code] for _ in range(5)]
+        exit_code = self.run_processes_in_parallel_restore_signals(commands, shell=False, max_parallel_processes=2)
+        self.assertEqual(exit_code, 0)
+        with open(times_file) as rfd:
+            start_end_times = [tuple(float(t) for t in line.split()) for line in rfd]
+        self.assertEqual(len(start_end_times), 5)
+        max_running = max(sum(1 for start, end in start_end_times if start <= t < end) for t, _ in start_end_times)
+        self.assertEqual(max_running, 2)
+
+    def test_run_processes_in_parallel_failure_stops_others(self):
+        commands = [[sys.executable, "-c", "import time; time.sleep(30)"],
+                    [sys.executable, "-c", "import time, sys; time.sleep(0.3); sys.exit(3)"],
+                    ["wait"],
+                    [sys.executable, "-c", "open('should_not_run.txt', 'w')"]]
+        start_time = time.perf_counter()
+        exit_code = self.run_processes_in_parallel_restore_signals(commands, shell=False, do_enqueue_output=False)
+        self.assertEqual(exit_code, 3)
+        self.assertLess(time.perf_counter() - start_time, 10)
+        self.assertFalse(os.path.exists('should_not_run.txt'))
+
+    def test_run_process_after_run_processes_in_parallel(self):
+        """ run_processes_in_parallel stops its own processes when it exits, a later run_process should still run """
+        exit_code = self.run_processes_in_parallel_restore_signals([[sys.executable, "-c", "pass"]], shell=False, do_enqueue_output=False)
+        self.assertEqual(exit_code, 0)
+        ran_file = os.path.join(self.pbt.test_folder, 'ran.txt')
+        run_process([sys.executable, "-c", f"open({ran_file!r}, 'w')"], shell=False, do_enqueue_output=False)
+        self.assertTrue(os.path.exists(ran_file))
+
+    def test_run_processes_in_parallel_abort_file(self):
+        abort_file = os.path.join(self.pbt.test_folder, 'abort.txt')
+        with open(abort_file, 'w') as stream:
+            stream.write('')
+        Timer(0.5, os.remove, args=(abort_file,)).start()
+        commands = [[sys.executable, "-c", "import time; time.sleep(30)"] for _ in range(3)]
+        start_time = time.perf_counter()
+        self.run_processes_in_parallel_restore_signals(commands, shell=False, abort_file=abort_file)
+        self.assertLess(time.perf_counter() - start_time, 10)
+
     def test_KillProcess_repr(self):
         """ validate KillProcess object recreation with ParallelRun.__repr__() """
         self.pbt.reprs_test_runner(KillProcess("itsik"),
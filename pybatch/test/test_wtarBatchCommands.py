@@ -13,6 +13,8 @@ import contextlib
 import filecmp
 import random
 import string
+import shutil
+import tarfile
 from collections import namedtuple
 
 import utils
@@ -49,9 +51,14 @@ class TestPythonBatchWtar(unittest.TestCase):
         list_of_objs.append(Wtar("/the/memphis/belle"))
         list_of_objs.append(Wtar("/the/memphis/belle", None))
         list_of_objs.append(Wtar("/the/memphis/belle", "robota"))
+        list_of_objs.append(Wtar("/the/memphis/belle", "robota", split_threshold=1024, compression="zstd", num_workers=4))
+        list_of_objs.append(ParallelWtar(["/the/memphis/belle", "/the/enola/gay"]))
+        list_of_objs.append(ParallelWtar(["/the/memphis/belle"], split_threshold=1024, compression="lz4", num_jobs=3))
         list_of_objs.append(Unwtar("/the/memphis/belle"))
         list_of_objs.append(Unwtar("/the/memphis/belle", None))
         list_of_objs.append(Unwtar("/the/memphis/belle", "robota", no_artifacts=True))
+        list_of_objs.append(ScheduledUnwtar("/the/memphis/belle", "robota"))
+        list_of_objs.append(WaitForUnwtars())
         self.pbt.reprs_test_runner(*list_of_objs)
 
     def test_Wtar_Unwtar(self):
@@ -89,6 +96,197 @@ class TestPythonBatchWtar(unittest.TestCase):
         dir_wtar_unwtar_diff = filecmp.dircmp(folder_to_wtar, unwtared_folder, ignore=['.DS_Store'])
         self.assertTrue(is_identical_dircmp(dir_wtar_unwtar_diff), f"{self.pbt.which_test} : before wtar and after unwtar dirs are not the same")
 
+    def test_Wtar_parallel_compression(self):
+        """ test Wtar compressing by several threads creates the same archive as one thread,
+            split to parts of at most split_threshold bytes while writing, and that Unwtar reads it
+        """
+        folder_to_wtar = self.pbt.path_inside_test_folder("folder-to-wtar")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(folder_to_wtar)
+        with self.pbt.batch_accum.sub_accum(Cd(folder_to_wtar)) as cd_accum:
+            cd_accum += MakeRandomDirs(num_levels=2, num_dirs_per_level=3, num_files_per_dir=5, file_size=300000)
+        self.pbt.exec_and_capture_output("create folder to wtar")
+
+        split_threshold = 1024 * 1024
+        wtar_parts = dict()
+        for num_workers in (1, 4):
+            wtar_folder = self.pbt.path_inside_test_folder(f"wtar-{num_workers}-workers")
+            wtar_folder.mkdir()
+            with Wtar(folder_to_wtar, wtar_folder, split_threshold=split_threshold, num_workers=num_workers) as wtar:
+                wtar()
+            wtar_parts[num_workers] = sorted(wtar_folder.glob("folder-to-wtar.wtar.??"))
+            self.assertGreater(len(wtar_parts[num_workers]), 1, f"{self.pbt.which_test}: wtar should have been split")
+            self.assertTrue(all(part.stat().st_size == split_threshold for part in wtar_parts[num_workers][:-1]))
+            self.assertLessEqual(wtar_parts[num_workers][-1].stat().st_size, split_threshold)
+        self.assertEqual([part.name for part in wtar_parts[1]], [part.name for part in wtar_parts[4]])
+        for part_1, part_4 in zip(wtar_parts[1], wtar_parts[4]):
+            self.assertTrue(filecmp.cmp(part_1, part_4, shallow=False), f"'{part_1}' and '{part_4}' should be identical")
+
+        unwtar_here = self.pbt.path_inside_test_folder("unwtar-here")
+        with Unwtar(wtar_parts[4][0], unwtar_here) as unwtar:
+            unwtar()
+        dir_wtar_unwtar_diff = filecmp.dircmp(folder_to_wtar, unwtar_here.joinpath("folder-to-wtar"), ignore=['.DS_Store'])
+        self.assertTrue(is_identical_dircmp(dir_wtar_unwtar_diff), f"{self.pbt.which_test} : before wtar and after unwtar dirs are not the same")
+
+    def test_ParallelWtar(self):
+        """ test ParallelWtar creates the same wtar files as wtarring one item at a time, removes the originals,
+            and that an item failing does not stop the other items from being wtarred
+        """
+        items_one_by_one = self.pbt.path_inside_test_folder("one-by-one")
+        items_in_parallel = self.pbt.path_inside_test_folder("in-parallel")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(items_one_by_one)
+        with self.pbt.batch_accum.sub_accum(Cd(items_one_by_one)) as cd_accum:
+            cd_accum += MakeRandomDirs(num_levels=2, num_dirs_per_level=4, num_files_per_dir=3, file_size=20000)
+        self.pbt.exec_and_capture_output("create items to wtar")
+        shutil.copytree(items_one_by_one, items_in_parallel, symlinks=True)  # copy2 keeps mtime, which is written to the wtar
+        item_names = sorted(item.name for item in items_one_by_one.iterdir())
+
+        with ParallelWtar([items_one_by_one.joinpath(name) for name in item_names], num_jobs=1) as pw:
+            pw()
+        missing_item = items_in_parallel.joinpath("missing-item")
+        with self.assertRaises(IOError):
+            with ParallelWtar([items_in_parallel.joinpath(name) for name in item_names] + [missing_item], num_jobs=2) as pw:
+                pw()
+        self.assertEqual([failed_item for failed_item, error in pw.failed_items], [missing_item])
+
+        for name in item_names:
+            self.assertFalse(items_in_parallel.joinpath(name).exists(), f"{self.pbt.which_test}: {name} should have been removed")
+            wtar_one_by_one = items_one_by_one.joinpath(f"{name}.wtar.aa")
+            wtar_in_parallel = items_in_parallel.joinpath(f"{name}.wtar.aa")
+            self.assertTrue(filecmp.cmp(wtar_one_by_one, wtar_in_parallel, shallow=False), f"'{wtar_one_by_one}' and '{wtar_in_parallel}' should be identical")
+
+    def test_ParallelWtar_config_vars(self):
+        """ test worker processes of ParallelWtar get the batch file's config vars:
+            with non-default config, wtarring by one job and by two jobs creates the same wtar files
+        """
+        items_one_job = self.pbt.path_inside_test_folder("one-job")
+        items_two_jobs = self.pbt.path_inside_test_folder("two-jobs")
+        item_names = [f"item_{i_item}" for i_item in range(3)]
+        for name in item_names:
+            items_one_job.joinpath(name).mkdir(parents=True)
+            for i_file in range(3):
+                items_one_job.joinpath(name, f"file_{i_file}.bin").write_bytes(os.urandom(20000))
+            items_one_job.joinpath(name, "not-to-wtar.ignore").write_text("should not be wtarred")
+        shutil.copytree(items_one_job, items_two_jobs, symlinks=True)
+
+        config_vars.push_scope()
+        try:
+            config_vars["SUFFIX_NOT_TO_WTAR"] = ".ignore"
+            config_vars["WTAR_IGNORE_FILES"] = "$(SUFFIX_NOT_TO_WTAR)"
+            config_vars["FIX_ALL_PERMISSIONS_SYMBOLIC_MODE"] = "u+rwx,go+rwx"
+            with ParallelWtar([items_one_job.joinpath(name) for name in item_names], num_jobs=1) as pw:
+                pw()
+            with ParallelWtar([items_two_jobs.joinpath(name) for name in item_names], num_jobs=2) as pw:
+                pw()
+        finally:
+            config_vars.pop_scope()
+
+        for name in item_names:
+            wtar_one_job = items_one_job.joinpath(f"{name}.wtar.aa")
+            wtar_two_jobs = items_two_jobs.joinpath(f"{name}.wtar.aa")
+            self.assertTrue(filecmp.cmp(wtar_one_job, wtar_two_jobs, shallow=False), f"'{wtar_one_job}' and '{wtar_two_jobs}' should be identical")
+            with tarfile.open(wtar_two_jobs) as tar:
+                members = tar.getmembers()
+            self.assertFalse([member.name for member in members if member.name.endswith(".ignore")])
+            if sys.platform == 'darwin':  # Chmod by FixAllPermissions
+                self.assertTrue(all(member.mode & stat.S_IWOTH for member in members), f"{wtar_two_jobs}: FIX_ALL_PERMISSIONS_SYMBOLIC_MODE was not applied")
+
+    def test_ScheduledUnwtar(self):
+        """ test ScheduledUnwtar extracts the same as Unwtar, with archives of several sizes extracted at the same time,
+            that paths are resolved before changing folder, and that a bad archive is reported by WaitForUnwtars
+        """
+        items_to_wtar = self.pbt.path_inside_test_folder("items-to-wtar")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(items_to_wtar)
+        with self.pbt.batch_accum.sub_accum(Cd(items_to_wtar)) as cd_accum:
+            cd_accum += MakeRandomDirs(num_levels=1, num_dirs_per_level=6, num_files_per_dir=4, file_size=5000)
+            cd_accum += MakeRandomDirs(num_levels=1, num_dirs_per_level=1, num_files_per_dir=4, file_size=500000)
+        self.pbt.exec_and_capture_output("create items to wtar")
+        item_names = sorted(item.name for item in items_to_wtar.iterdir())
+        wtars_folder = self.pbt.path_inside_test_folder("wtars")
+        shutil.copytree(items_to_wtar, wtars_folder, symlinks=True)
+        with ParallelWtar([wtars_folder.joinpath(name) for name in item_names], num_jobs=1) as pw:
+            pw()
+        bad_wtar = wtars_folder.joinpath("bad-item.wtar.aa")
+        bad_wtar.write_bytes(b"BZh9 not really bz2")
+
+        unwtar_here = self.pbt.path_inside_test_folder("unwtar-here")
+        unwtar_here.mkdir()
+        config_vars["PARALLEL_UNWTAR"] = 3
+        try:
+            with utils.ChangeDirIfExists(unwtar_here):
+                for name in item_names:
+                    with ScheduledUnwtar(wtars_folder.joinpath(f"{name}.wtar.aa"), os.curdir) as su:
+                        su()
+                with ScheduledUnwtar(bad_wtar, os.curdir) as su:
+                    su()
+            with self.assertRaises(IOError):
+                with WaitForUnwtars() as wfu:
+                    wfu()
+            self.assertEqual([what_to_unwtar for what_to_unwtar, error in wfu.failed_archives], [bad_wtar])
+        finally:
+            del config_vars["PARALLEL_UNWTAR"]
+            UnwtarScheduler.shutdown()
+
+        for name in item_names:
+            if items_to_wtar.joinpath(name).is_dir():
+                dir_wtar_unwtar_diff = filecmp.dircmp(items_to_wtar.joinpath(name), unwtar_here.joinpath(name), ignore=['.DS_Store'])
+                self.assertTrue(is_identical_dircmp(dir_wtar_unwtar_diff), f"{self.pbt.which_test} : {name} before wtar and after unwtar are not the same")
+            else:
+                self.assertTrue(filecmp.cmp(items_to_wtar.joinpath(name), unwtar_here.joinpath(name), shallow=False), f"{self.pbt.which_test} : {name} before wtar and after unwtar are not the same")
+
+    def test_ScheduledUnwtar_batch_failed(self):
+        """ test the worker processes of ScheduledUnwtar are stopped when the batch file fails before WaitForUnwtars """
+        item_to_wtar = self.pbt.path_inside_test_folder("item-to-wtar")
+        wtar_file = self.pbt.path_inside_test_folder("item-to-wtar.wtar.aa")
+        unwtar_here = self.pbt.path_inside_test_folder("unwtar-here")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(item_to_wtar)
+        with self.pbt.batch_accum.sub_accum(Cd(item_to_wtar)) as cd_accum:
+            cd_accum += MakeRandomDirs(num_levels=1, num_dirs_per_level=2, num_files_per_dir=2, file_size=5000)
+        self.pbt.batch_accum += Wtar(item_to_wtar)
+        self.pbt.exec_and_capture_output("create wtar")
+
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(unwtar_here)
+        self.pbt.batch_accum += ScheduledUnwtar(wtar_file, unwtar_here)
+        self.pbt.batch_accum += RaiseException(ValueError, "failed before WaitForUnwtars")
+        self.addCleanup(UnwtarScheduler.shutdown)
+        config_vars["PARALLEL_UNWTAR"] = 2
+        try:
+            self.pbt.exec_and_capture_output("fail before WaitForUnwtars", expected_exception=ValueError)
+        finally:
+            del config_vars["PARALLEL_UNWTAR"]
+        self.assertIsNone(UnwtarScheduler.executor)
+        self.assertEqual(UnwtarScheduler.job_threads, [])
+
+    def test_Wtar_compressions(self):
+        """ test Unwtar reads wtars compressed with each of the available compressions """
+        folder_to_wtar = self.pbt.path_inside_test_folder("folder-to-wtar")
+        self.pbt.batch_accum.clear(section_name="doit")
+        self.pbt.batch_accum += MakeDir(folder_to_wtar)
+        with self.pbt.batch_accum.sub_accum(Cd(folder_to_wtar)) as cd_accum:
+            cd_accum += MakeRandomDirs(num_levels=2, num_dirs_per_level=2, num_files_per_dir=3, file_size=5000)
+        self.pbt.exec_and_capture_output("create folder to wtar")
+
+        for codec in utils.wtar_codecs.values():
+            with self.subTest(compression=codec.name):
+                if not codec.available:
+                    self.skipTest(f"{codec.name} python module is not installed")
+                wtar_folder = self.pbt.path_inside_test_folder(f"wtar-{codec.name}")
+                wtar_folder.mkdir()
+                with Wtar(folder_to_wtar, wtar_folder, compression=codec.name, num_workers=2) as wtar:
+                    wtar()
+                wtar_file = wtar_folder.joinpath("folder-to-wtar.wtar.aa")
+                self.assertTrue(wtar_file.read_bytes().startswith(codec.magic))
+                self.assertIsNotNone(utils.get_wtar_total_checksum(wtar_file))
+                unwtar_here = self.pbt.path_inside_test_folder(f"unwtar-{codec.name}")
+                with Unwtar(wtar_file, unwtar_here) as unwtar:
+                    unwtar()
+                dir_wtar_unwtar_diff = filecmp.dircmp(folder_to_wtar, unwtar_here.joinpath("folder-to-wtar"), ignore=['.DS_Store'])
+                self.assertTrue(is_identical_dircmp(dir_wtar_unwtar_diff), f"{self.pbt.which_test} : before wtar and after unwtar dirs are not the same")
+
     def test_Wzip_repr(self):
         list_of_objs = list()
         list_of_objs.append(Wzip("/the/memphis/belle"))
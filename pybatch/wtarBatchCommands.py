@@ -1,6 +1,10 @@
 import os
 import stat
 import tarfile
+import heapq
+import threading
+import multiprocessing
+from concurrent import futures
 from collections import OrderedDict
 import logging
 from pathlib import Path
@@ -12,8 +16,8 @@ import utils
 import zlib
 
 from .baseClasses import PythonBatchCommandBase
-from .fileSystemBatchCommands import SplitFile, FixAllPermissions, MakeDir
-from .removeBatchCommands import RmDir, RmFile
+from .fileSystemBatchCommands import FixAllPermissions, MakeDir
+from .removeBatchCommands import RmDir, RmFile, RmFileOrDir
 
 log = logging.getLogger(__name__)
 
@@ -31,17 +35,23 @@ def can_skip_unwtar(what_to_work_on: Path, where_to_unwtar: Path):
 
 class Wtar(PythonBatchCommandBase):
     """ create a new wtar archive for a file or folder
+        compression: bz2, zstd or lz4; default: $(WTAR_COMPRESSION) or bz2
+        num_workers: number of threads compressing; 0: one per cpu; default: $(WTAR_COMPRESSION_THREADS) or 0
     """
-    def __init__(self, what_to_wtar: os.PathLike, where_to_put_wtar=None, split_threshold=0, **kwargs) -> None:
+    def __init__(self, what_to_wtar: os.PathLike, where_to_put_wtar=None, split_threshold=0, compression=None, num_workers=None, **kwargs) -> None:
         super().__init__(**kwargs)
         self.what_to_wtar = what_to_wtar
         self.where_to_put_wtar = where_to_put_wtar if where_to_put_wtar else None
         self.split_threshold = split_threshold
+        self.compression = compression
+        self.num_workers = num_workers
 
     def repr_own_args(self, all_args: List[str]) -> None:
         all_args.append(self.named__init__param("what_to_wtar", self.what_to_wtar))
         all_args.append(self.optional_named__init__param("where_to_put_wtar", self.where_to_put_wtar))
         all_args.append(self.optional_named__init__param("split_threshold", self.split_threshold, 0))
+        all_args.append(self.optional_named__init__param("compression", self.compression))
+        all_args.append(self.optional_named__init__param("num_workers", self.num_workers))
 
     def progress_msg_self(self) -> str:
         if self.where_to_put_wtar:
@@ -95,7 +105,10 @@ class Wtar(PythonBatchCommandBase):
                 If total_checksums are no identical the old wtar files wil be removed and a new war created. Removing the old wtars
                 ensures that if the number of new wtar split files is smaller than the number of old split files, not extra files wil remain. E.g. if before [a.wtar.aa, a.wtar.ab, a.wtar.ac] and after  [a.wtar.aa, a.wtar.ab] a.wtar.ac will be removed.
             Format of the tar is PAX_FORMAT.
-            Compression is bzip2.
+            Compression is bzip2, unless self.compression or WTAR_COMPRESSION specify zstd or lz4.
+                The archive is compressed in blocks by self.num_workers threads, each block an independent
+                compressed stream - like pbzip2 does. The archive is split to parts of at most self.split_threshold bytes
+                while it is written, parts are named .aa, .ab, ... and all parts but the last are split_threshold bytes.
 
         """
 
@@ -153,20 +166,139 @@ class Wtar(PythonBatchCommandBase):
                     file_pax_headers["mtime"] = mode_time
                     tarinfo.pax_headers = file_pax_headers
                 return tarinfo
-            compresslevel = 1
             if pax_headers["total_checksum"] != tar_total_checksum:
                 if utils.is_first_wtar_file(target_wtar_file):
                     existing_wtar_parts = utils.find_split_files_from_base_file(target_wtar_file)
                     [utils.safe_remove_file(f) for f in existing_wtar_parts]
-                with tarfile.open(target_wtar_file, "w:bz2", format=tarfile.PAX_FORMAT, pax_headers=pax_headers, compresslevel=compresslevel) as tar:
-                    tar.add(resolved_what_to_wtar.name, filter=check_tarinfo)
-
-                with SplitFile(target_wtar_file, max_size=self.split_threshold, own_progress_count=0) as sf:
-                    sf()
+                codec = utils.get_wtar_codec(self.compression if self.compression is not None else str(config_vars.get("WTAR_COMPRESSION", "bz2")))
+                num_workers = self.num_workers if self.num_workers is not None else int(config_vars.get("WTAR_COMPRESSION_THREADS", 0))
+                if num_workers == 0:
+                    num_workers = os.cpu_count()
+                split_writer = utils.SplitFileWriter(target_wtar_file, max_size=self.split_threshold)
+                try:
+                    with split_writer:
+                        with utils.ParallelCompressingWriter(split_writer, codec, num_workers) as compressing_writer:
+                            with tarfile.open(fileobj=compressing_writer, mode="w|", format=tarfile.PAX_FORMAT, pax_headers=pax_headers) as tar:
+                                tar.add(resolved_what_to_wtar.name, filter=check_tarinfo)
+                except Exception:
+                    [utils.safe_remove_file(part_path) for part_path in split_writer.part_paths]
+                    raise
             else:
                 log.debug(f"{resolved_what_to_wtar.name} skipped since {resolved_what_to_wtar.name}.wtar already exists and has the same contents")
 
 
+def _config_values_for_workers():
+    """ unresolved values of all config vars, so worker processes resolve paths and read settings the same as the batch file.
+        Dynamic config vars are passed with their current values.
+    """
+    retVal = dict()
+    for config_var_name in config_vars.keys():
+        config_var = config_vars[config_var_name]
+        retVal[config_var_name] = config_var.resolve_values() if config_var.dynamic else list(config_var.raw(join_sep=None))
+    return retVal
+
+
+def _init_wtar_worker(config_values):
+    """ runs when a worker process of ParallelWtar or UnwtarScheduler starts, worker processes do not have the batch file's config vars """
+    for config_var_name, config_var_value in config_values.items():
+        config_vars[config_var_name] = config_var_value
+
+
+def _wtar_and_remove(what_to_wtar, split_threshold, compression, num_workers):
+    """ the job of a ParallelWtar worker process: wtar an item and remove the original """
+    Wtar(what_to_wtar, split_threshold=split_threshold, compression=compression, num_workers=num_workers, report_own_progress=False)()
+    RmFileOrDir(what_to_wtar, report_own_progress=False)()
+
+
+class ParallelWtar(PythonBatchCommandBase):
+    """ wtar files and folders, and remove them, by several worker processes.
+        Same as Wtar followed by RmFileOrDir for each item, but items are wtarred in parallel.
+        Processes and not threads are used because Wtar changes the current working directory.
+        num_jobs: number of items wtarred at the same time; 0: one per cpu; default: $(WTAR_PARALLEL_JOBS) or 0
+        num_jobs is lowered if needed so the estimated memory of all jobs fits $(WTAR_PARALLEL_MEMORY_BUDGET),
+        cpus are divided between the jobs, each job compressing with cpu_count/num_jobs threads.
+        Wtar's output does not depend on the number of compressing threads, so the archives are the same as wtarring one by one.
+        An item that failed to wtar is not removed, other items are still wtarred and all failures are reported at the end.
+    """
+    worker_process_memory = 128 * 1024 * 1024  # python process with instl imported
+
+    def __init__(self, what_to_wtar_list, split_threshold=0, compression=None, num_jobs=None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.what_to_wtar_list = list(what_to_wtar_list)
+        self.split_threshold = split_threshold
+        self.compression = compression
+        self.num_jobs = num_jobs
+        self.own_progress_count = len(self.what_to_wtar_list)
+        self.failed_items = list()
+
+    def repr_own_args(self, all_args: List[str]) -> None:
+        all_args.append(self.unnamed__init__param(self.what_to_wtar_list))
+        all_args.append(self.optional_named__init__param("split_threshold", self.split_threshold, 0))
+        all_args.append(self.optional_named__init__param("compression", self.compression))
+        all_args.append(self.optional_named__init__param("num_jobs", self.num_jobs))
+
+    def progress_msg_self(self) -> str:
+        return f"""Compress {len(self.what_to_wtar_list)} items"""
+
+    def increment_and_output_progress(self, increment_by=None, prog_counter_msg=None, prog_msg=None):
+        """ override PythonBatchCommandBase.increment_and_output_progress so progress can be reported for each item
+        """
+        pass
+
+    def job_memory_estimate(self, codec, num_compress_workers) -> int:
+        return self.worker_process_memory + utils.ParallelCompressingWriter.memory_estimate(codec, num_compress_workers)
+
+    def jobs_and_compress_workers(self, codec):
+        """ return the number of parallel jobs and the number of compressing threads for each job """
+        cpu_count = os.cpu_count()
+        num_jobs = self.num_jobs if self.num_jobs is not None else int(config_vars.get("WTAR_PARALLEL_JOBS", 0))
+        if num_jobs == 0:
+            num_jobs = cpu_count
+        num_jobs = max(1, min(num_jobs, len(self.what_to_wtar_list)))
+        memory_budget = int(config_vars.get("WTAR_PARALLEL_MEMORY_BUDGET", 0))
+        if memory_budget:
+            while num_jobs > 1 and num_jobs * self.job_memory_estimate(codec, max(1, cpu_count // num_jobs)) > memory_budget:
+                num_jobs -= 1
+        return num_jobs, max(1, cpu_count // num_jobs)
+
+    def __call__(self, *args, **kwargs) -> None:
+        PythonBatchCommandBase.__call__(self, *args, **kwargs)
+        compression = self.compression if self.compression is not None else str(config_vars.get("WTAR_COMPRESSION", "bz2"))
+        num_jobs, num_compress_workers = self.jobs_and_compress_workers(utils.get_wtar_codec(compression))
+        self.doing = f"""wtarring {len(self.what_to_wtar_list)} items by {num_jobs} processes, each compressing with {num_compress_workers} threads"""
+        log.info(self.doing)
+
+        self.failed_items = list()
+        if num_jobs == 1:
+            for what_to_wtar in self.what_to_wtar_list:
+                try:
+                    _wtar_and_remove(what_to_wtar, self.split_threshold, compression, num_compress_workers)
+                    self.report_item_done(what_to_wtar, None)
+                except Exception as ex:
+                    self.report_item_done(what_to_wtar, ex)
+        else:
+            config_values = _config_values_for_workers()
+            with futures.ProcessPoolExecutor(max_workers=num_jobs, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_wtar_worker, initargs=(config_values,)) as executor:
+                future_to_item = {executor.submit(_wtar_and_remove, what_to_wtar, self.split_threshold, compression, num_compress_workers): what_to_wtar
+                                  for what_to_wtar in self.what_to_wtar_list}
+                for future in futures.as_completed(future_to_item):
+                    self.report_item_done(future_to_item[future], future.exception())
+
+        if self.failed_items:
+            self.failed_items.sort(key=lambda failed_item: self.what_to_wtar_list.index(failed_item[0]))
+            what_to_wtar, error = self.failed_items[0]
+            raise IOError(f"failed to wtar {len(self.failed_items)} of {len(self.what_to_wtar_list)} items, first failure {what_to_wtar}: {error}")
+
+    def report_item_done(self, what_to_wtar, error):
+        if error is None:
+            super().increment_and_output_progress(increment_by=1, prog_msg=f"wtarred {what_to_wtar}")
+        else:
+            self.failed_items.append((what_to_wtar, error))
+            log.error(f"failed to wtar {what_to_wtar}, {error.__class__.__name__}: {error}")
+            super().increment_and_output_progress(increment_by=1, prog_msg=f"failed to wtar {what_to_wtar}, {error}")
+
+
 class Unwtar(PythonBatchCommandBase):
     """ uncompress a wtar archive
     """
@@ -205,7 +337,7 @@ class Unwtar(PythonBatchCommandBase):
 
             do_the_unwtarring = True
             with utils.MultiFileReader("br", self.wtar_file_paths) as fd:
-                with tarfile.open(fileobj=fd) as tar:
+                with utils.open_wtar_tarfile(fd) as tar:
                     tar_total_checksum = tar.pax_headers.get("total_checksum")
                     # log.debug(f"total checksum for tarfile(s) {self.wtar_file_paths} {tar_total_checksum}")
                     if tar_total_checksum:
@@ -292,6 +424,153 @@ class Unwtar(PythonBatchCommandBase):
             raise FileNotFoundError(self.what_to_unwtar)
 
 
+def _unwtar_in_worker(what_to_unwtar, where_to_unwtar, no_artifacts, copy_owner):
+    """ the job of an UnwtarScheduler worker process """
+    Unwtar(what_to_unwtar, where_to_unwtar, no_artifacts=no_artifacts, copy_owner=copy_owner, report_own_progress=False)()
+
+
+class UnwtarScheduler(object):
+    """ extract wtar archives by a pool of worker processes, while the batch file goes on to the next commands.
+        ScheduledUnwtar adds archives, WaitForUnwtars waits until all added archives were extracted.
+        At most num_workers archives are extracted at the same time, the rest wait and the biggest waiting archive is
+        extracted next - so a few huge archives are started early and do not end up being extracted last, one after the other.
+        Processes and not threads are used because Unwtar changes the current working directory.
+        State is kept in the class since archives added by many ScheduledUnwtar commands share one pool.
+    """
+    condition = threading.Condition()
+    waiting_jobs = list()  # heap of (-size, order added, job)
+    num_running_jobs = 0
+    num_added_jobs = 0
+    failed_archives = list()  # (order added, what_to_unwtar, error)
+    num_workers = 0
+    executor = None
+    job_threads = list()
+
+    @classmethod
+    def start(cls, num_workers) -> None:
+        """ start the worker processes, and for each a thread feeding it the biggest waiting archive """
+        if cls.executor is not None and cls.num_workers == num_workers:
+            return
+        cls.shutdown()
+        config_values = _config_values_for_workers()
+        cls.executor = futures.ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context("spawn"),
+                                                   initializer=_init_wtar_worker, initargs=(config_values,))
+        cls.num_workers = num_workers
+        cls.job_threads = [threading.Thread(target=cls.run_jobs, name=f"unwtar_{i_thread}", daemon=True) for i_thread in range(num_workers)]
+        for job_thread in cls.job_threads:
+            job_thread.start()
+
+    @classmethod
+    def shutdown(cls, cancel_waiting=False) -> None:
+        """ wait for added archives to be extracted and stop the worker processes.
+            cancel_waiting: archives not yet started are not extracted, used when the batch file failed
+        """
+        if cls.executor is not None:
+            if cancel_waiting:
+                with cls.condition:
+                    cls.waiting_jobs = list()
+            cls.wait()
+            with cls.condition:
+                cls.num_workers = 0  # tells job threads to exit
+                cls.condition.notify_all()
+            for job_thread in cls.job_threads:
+                job_thread.join()
+            cls.executor.shutdown()
+            cls.executor = None
+            cls.job_threads = list()
+
+    @classmethod
+    def add(cls, size, what_to_unwtar, where_to_unwtar, no_artifacts, copy_owner) -> None:
+        with cls.condition:
+            heapq.heappush(cls.waiting_jobs, (-size, cls.num_added_jobs, (what_to_unwtar, where_to_unwtar, no_artifacts, copy_owner)))
+            cls.num_added_jobs += 1
+            cls.condition.notify_all()
+
+    @classmethod
+    def run_jobs(cls) -> None:
+        while True:
+            with cls.condition:
+                while not cls.waiting_jobs and cls.num_workers > 0:
+                    cls.condition.wait()
+                if not cls.waiting_jobs:
+                    return
+                _, order_added, job = heapq.heappop(cls.waiting_jobs)
+                cls.num_running_jobs += 1
+            error = None
+            try:
+                cls.executor.submit(_unwtar_in_worker, *job).result()
+            except Exception as ex:
+                error = ex
+                log.error(f"failed to unwtar {job[0]}, {error.__class__.__name__}: {error}")
+            with cls.condition:
+                cls.num_running_jobs -= 1
+                if error is not None:
+                    cls.failed_archives.append((order_added, job[0], error))
+                cls.condition.notify_all()
+
+    @classmethod
+    def wait(cls) -> List:
+        """ wait for all added archives to be extracted, return [(what_to_unwtar, error), ...] for archives that failed, in the order they were added """
+        with cls.condition:
+            while cls.waiting_jobs or cls.num_running_jobs:
+                cls.condition.wait()
+            failed_archives, cls.failed_archives = sorted(cls.failed_archives, key=lambda failed: failed[0]), list()
+        return [(what_to_unwtar, error) for _, what_to_unwtar, error in failed_archives]
+
+
+class ScheduledUnwtar(Unwtar):
+    """ Unwtar that does not wait for the archive to be extracted: the archive is added to UnwtarScheduler
+        and the batch file goes on to the next command. Commands that depend on the extracted files should come after WaitForUnwtars.
+        Paths are resolved when the command runs, since the current working directory can change before the archive is extracted.
+        $(PARALLEL_UNWTAR) is the number of worker processes, with 0 the archive is extracted right away, same as Unwtar.
+    """
+    @staticmethod
+    def archives_size(what_to_unwtar: Path) -> int:
+        """ size of the wtar files to extract, used to extract big archives first """
+        if what_to_unwtar.is_file():
+            retVal = sum(wtar_file_path.stat().st_size for wtar_file_path in utils.find_split_files(what_to_unwtar))
+        else:
+            retVal = sum(os.path.getsize(os.path.join(root, a_file)) for root, dirs, files in os.walk(what_to_unwtar) for a_file in files if utils.is_wtar_file(a_file))
+        return retVal
+
+    def __call__(self, *args, **kwargs) -> None:
+        num_workers = int(config_vars.get("PARALLEL_UNWTAR", 0))
+        if num_workers <= 0:
+            super().__call__(*args, **kwargs)
+            return
+
+        PythonBatchCommandBase.__call__(self, *args, **kwargs)
+        what_to_unwtar: Path = utils.ExpandAndResolvePath(self.what_to_unwtar)
+        where_to_unwtar = utils.ExpandAndResolvePath(self.where_to_unwtar) if self.where_to_unwtar else None
+        if not what_to_unwtar.exists():
+            raise FileNotFoundError(what_to_unwtar)
+        self.doing = f"""schedule unwtar of '{what_to_unwtar}' to '{where_to_unwtar}'"""
+        UnwtarScheduler.start(num_workers)
+        UnwtarScheduler.add(self.archives_size(what_to_unwtar), what_to_unwtar, where_to_unwtar, self.no_artifacts, self.copy_owner)
+
+
+class WaitForUnwtars(PythonBatchCommandBase):
+    """ wait until the archives added by ScheduledUnwtar were extracted.
+        An archive that failed to extract does not stop the others, failures are raised here.
+    """
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.failed_archives = list()
+
+    def repr_own_args(self, all_args: List[str]) -> None:
+        pass
+
+    def progress_msg_self(self) -> str:
+        return f"""Wait for expanding archives"""
+
+    def __call__(self, *args, **kwargs) -> None:
+        PythonBatchCommandBase.__call__(self, *args, **kwargs)
+        self.failed_archives = UnwtarScheduler.wait()
+        if self.failed_archives:
+            what_to_unwtar, error = self.failed_archives[0]
+            raise IOError(f"failed to unwtar {len(self.failed_archives)} archives, first failure {what_to_unwtar}: {error}")
+
+
 class Wzip(PythonBatchCommandBase):
     """ Create a new wzip for a file  provided in '--in' command line option
 
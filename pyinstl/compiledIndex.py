@@ -0,0 +1,140 @@
+#!/usr/bin/env python3.9
+
+""" CompiledIndex keeps the outcome of reading an index.yaml file, so the next time the same file
+    is read the outcome can be loaded instead of parsing the yaml again.
+    The outcome of reading is:
+        rows added to index_item_t and index_item_detail_t
+        ConfigVars defined or changed, e.g. by !define documents
+        defines_for_iids of the items table
+    The outcome depends on the file's contents, instl version and the values of ConfigVars
+    accessed while reading - e.g. by __ifdef__ conditionals or index templates.
+    The first two are part of the compiled index file name, the values of accessed ConfigVars are
+    saved in the compiled index and compared to their current values before loading.
+    Files that read other files (__include__), have documents other than !define... and !index...
+    or read the environment, are not compiled.
+"""
+
+import os
+import pickle
+import sqlite3
+from contextlib import contextmanager, closing
+from pathlib import Path
+import logging
+
+import utils
+from configVar import config_vars
+
+log = logging.getLogger()
+
+
+class CompiledIndex(object):
+    format_version = 1  # change when the format or contents of the compiled index file changes
+    config_vars_not_compiled = ("READ_YAML_FILES",)  # appended to by every read, so not part of the outcome
+
+    def __init__(self, db_file_path, max_files_in_folder=4) -> None:
+        self.db_file_path = Path(db_file_path)
+        self.max_files_in_folder = max_files_in_folder
+        self.cachable = True
+
+    @classmethod
+    def for_file(cls, file_path, cache_folder, max_files_in_folder=4):
+        """ return CompiledIndex for file_path, in cache_folder """
+        key_text = f"""{cls.format_version} {config_vars.resolve_str("$(__INSTL_VERSION_STR_SHORT__) $(__COMPILATION_TIME__)")} {utils.get_file_checksum(file_path)}"""
+        retVal = cls(Path(cache_folder, utils.get_buffer_checksum(key_text.encode()) + ".db"), max_files_in_folder)
+        return retVal
+
+    @staticmethod
+    def config_var_values(name):
+        """ values of a ConfigVar as tuple, or None if not defined """
+        for var_dict in reversed(config_vars.var_list):
+            if name in var_dict:
+                return tuple(var_dict[name].values)
+        return None
+
+    @staticmethod
+    def config_vars_snapshot():
+        retVal = dict()
+        for var_dict in config_vars.var_list:
+            for name, config_var in var_dict.items():
+                retVal[name] = tuple(config_var.values)
+        return retVal
+
+    def read_info(self):
+        """ return the info saved with the compiled index, or None if there is no usable compiled index """
+        retVal = None
+        if self.db_file_path.is_file():
+            try:
+                with closing(sqlite3.connect(os.fspath(self.db_file_path))) as conn:
+                    retVal = {name: pickle.loads(value) for name, value in conn.execute("""SELECT name, value FROM compiled_index_info_t""")}
+            except Exception as ex:
+                log.warning(f"""ignoring compiled index {self.db_file_path}, {ex}""")
+        return retVal
+
+    def load(self, reader, file_path) -> bool:
+        """ load the compiled index if it exists and the ConfigVars it depends on did not change,
+            return True if loaded
+        """
+        retVal = False
+        info = self.read_info()
+        if info is not None:
+            changed_vars = [name for name, values in info["accessed_vars"].items() if self.config_var_values(name) != values]
+            if changed_vars:
+                log.debug(f"""not using compiled index {self.db_file_path}, changed: {", ".join(changed_vars)}""")
+            else:
+                reader.items_table.read_rows_from_db_file(self.db_file_path)
+                for name, values in info["defined_vars"].items():
+                    config_vars[name] = values
+                for name in info["removed_vars"]:
+                    del config_vars[name]
+                reader.items_table.defines_for_iids.update(info["defines_for_iids"])
+                config_vars.setdefault("READ_YAML_FILES", None).append(os.fspath(file_path))
+                os.utime(self.db_file_path)  # most recently used compiled indexes are kept
+                reader.progress(f"reading {os.fspath(file_path)} [compiled]")
+                retVal = True
+        return retVal
+
+    @contextmanager
+    def compile(self, reader):
+        """ record the outcome of reading the yaml file inside the context, and save it if it can be compiled """
+        vars_before = self.config_vars_snapshot()
+        defines_for_iids_before = set(reader.items_table.defines_for_iids)
+        last_item_id, last_detail_id = reader.items_table.get_last_ids()
+        previous_compiled_index, reader.compiled_index = reader.compiled_index, self
+        try:
+            with config_vars.record_accessed_vars(ignore=self.config_vars_not_compiled) as accessed_vars:
+                yield self
+        finally:
+            reader.compiled_index = previous_compiled_index
+        if accessed_vars.dynamic_var_was_accessed or accessed_vars.environment_was_read:
+            self.cachable = False
+        if self.cachable and reader.items_table.get_last_ids()[0] > last_item_id:
+            vars_after = self.config_vars_snapshot()
+            info = {"accessed_vars": dict(accessed_vars),
+                    "defined_vars": {name: values for name, values in vars_after.items()
+                                     if vars_before.get(name) != values and name not in self.config_vars_not_compiled},
+                    "removed_vars": [name for name in vars_before if name not in vars_after],
+                    "defines_for_iids": {iid: node for iid, node in reader.items_table.defines_for_iids.items()
+                                         if iid not in defines_for_iids_before}}
+            self.save(reader, info, last_item_id, last_detail_id)
+
+    def save(self, reader, info, last_item_id, last_detail_id):
+        temp_db_file_path = self.db_file_path.with_name(self.db_file_path.name + ".tmp")
+        try:
+            self.db_file_path.parent.mkdir(parents=True, exist_ok=True)
+            utils.safe_remove_file(temp_db_file_path)
+            reader.items_table.write_rows_to_db_file(temp_db_file_path, last_item_id, last_detail_id)
+            with closing(sqlite3.connect(os.fspath(temp_db_file_path))) as conn:
+                with conn:
+                    conn.execute("""CREATE TABLE compiled_index_info_t (name TEXT PRIMARY KEY, value BLOB)""")
+                    conn.executemany("""INSERT INTO compiled_index_info_t (name, value) VALUES (?, ?)""",
+                                     [(name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for name, value in info.items()])
+            os.replace(temp_db_file_path, self.db_file_path)
+            self.remove_least_recently_used()
+        except Exception as ex:  # failing to compile should not fail reading the index
+            log.warning(f"""failed to save compiled index {self.db_file_path}, {ex}""")
+            utils.safe_remove_file(temp_db_file_path)
+
+    def remove_least_recently_used(self):
+        compiled_files = sorted(self.db_file_path.parent.glob("*.db"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for compiled_file in compiled_files[self.max_files_in_folder:]:
+            utils.safe_remove_file(compiled_file)
@@ -3,10 +3,9 @@
 
 import os
 import abc
-import itertools
+import csv
 from pathlib import Path, PurePath
 import sys
-import functools
 import logging
 log = logging.getLogger()
 
@@ -30,15 +29,15 @@ class CUrlHelper(object, metaclass=abc.ABCMeta):
         self.urls_to_download_last = list()
         self.short_win_paths_cache = dict()
 
-    def add_download_url(self, url, path, verbatim=False, size=0, download_last=False):
+    def add_download_url(self, url, path, verbatim=False, size=0, download_last=False, checksum=None):
         if verbatim:
             translated_url = url
         else:
             translated_url = connectionBase.connection_factory(config_vars).translate_url(url)
         if download_last:
-            self.urls_to_download_last.append((translated_url, path, size))
+            self.urls_to_download_last.append((translated_url, path, size, checksum))
         else:
-            self.urls_to_download.append((translated_url, path, size))
+            self.urls_to_download.append((translated_url, path, size, checksum))
 
     def get_num_urls_to_download(self):
         return len(self.urls_to_download)+len(self.urls_to_download_last)
@@ -88,7 +87,12 @@ class CUrlHelper(object, metaclass=abc.ABCMeta):
 
             sync_urls_cookie = str(config_vars.get("COOKIE_FOR_SYNC_URLS", ""))
 
-            actual_num_config_files = int(max(0, min(len(self.urls_to_download), num_config_files)))
+            # files are divided between the config files so each config file has about the same number of bytes
+            # to download, config files are ordered from largest to smallest so when there are more config files
+            # than processes, the largest are started first and the rest are picked by processes that finished.
+            # number of config files is taken from the partitions so no config file is left without urls.
+            partitions = utils.partition_by_total_size(self.urls_to_download, num_config_files, lambda url_item: url_item[2])
+            actual_num_config_files = len(partitions)
             if self.urls_to_download_last:
                 actual_num_config_files += 1
             num_digits = max(len(str(actual_num_config_files)), 2)
@@ -131,23 +135,18 @@ write-out = "Progress: ... of ...; {basename}: {curl_write_out_str}"
             if self.urls_to_download_last:
                 last_file = wfd_list.pop()
 
-            def url_sorter(l, r):
-                """ smaller files should be downloaded first so the progress bar gets moving early. """
-                return l[2] - r[2]  # non Info.xml files are sorted by size
-
-            wfd_cycler = itertools.cycle(wfd_list)
+            # inside each config file, smaller files are downloaded first so the progress bar gets moving early.
             url_num = 0
-            sorted_by_size = sorted(self.urls_to_download, key=functools.cmp_to_key(url_sorter))
-            for url, path, size in sorted_by_size:
-                fixed_path = self.fix_path(path)
-                wfd = next(wfd_cycler)
-                wfd.write(f'''url = "{url}"\noutput = "{fixed_path}"\n\n''')
-                url_num += 1
+            for wfd, partition in zip(wfd_list, partitions):
+                for url, path, size, checksum in sorted(partition, key=lambda url_item: url_item[2]):
+                    fixed_path = self.fix_path(path)
+                    wfd.write(f'''url = "{url}"\noutput = "{fixed_path}"\n\n''')
+                    url_num += 1
 
             for wfd in wfd_list:
                 wfd.close()
 
-            for url, path, size in self.urls_to_download_last:
+            for url, path, size, checksum in self.urls_to_download_last:
                 fixed_path = self.fix_path(path)
                 last_file.write(f'''url = "{url}"\noutput = "{fixed_path}"\n\n''')
                 url_num += 1
@@ -159,3 +158,16 @@ write-out = "Progress: ... of ...; {basename}: {curl_write_out_str}"
                 file_name_list.insert(-1, None)
 
         return file_name_list
+
+    def create_download_list_file(self, download_list_file_path):
+        """ write the urls to download as csv lines: url, path, size, checksum, download_last
+            to be downloaded by the DownloadFiles batch command instead of curl.
+            return the number of urls written.
+        """
+        with utils.utf8_open_for_write(download_list_file_path, "w") as wfd:
+            csv_writer = csv.writer(wfd, lineterminator="\n")
+            for url, path, size, checksum in self.urls_to_download:
+                csv_writer.writerow((url, os.fspath(path), size, checksum or "", 0))
+            for url, path, size, checksum in self.urls_to_download_last:
+                csv_writer.writerow((url, os.fspath(path), size, checksum or "", 1))
+        return self.get_num_urls_to_download()
@@ -486,6 +486,7 @@ class InstlAdmin(InstlInstanceBase):
 
         total_items_to_tar = 0
         total_redundant_wtar_files = 0
+        all_items_to_tar = list()  # wtarred together at the end, in parallel
         while len(items_to_check) > 0:
             item_to_check = items_to_check.pop(0)
             items_to_tar = list()
@@ -513,10 +514,10 @@ class InstlAdmin(InstlInstanceBase):
                     for item_to_delete in items_to_delete:
                         self.batch_accum += RmFile(item_to_delete)
 
-                    for item_to_tar in items_to_tar:
-                        self.batch_accum += Wtar(item_to_tar, split_threshold=self.min_file_size_to_wtar)
-                        self.batch_accum += RmFileOrDir(item_to_tar)
+                    all_items_to_tar.extend(items_to_tar)
 
+        if all_items_to_tar:
+            self.batch_accum += ParallelWtar(all_items_to_tar, split_threshold=self.min_file_size_to_wtar)
         self.progress("found", total_items_to_tar, "to wtar")
         if total_redundant_wtar_files:
             self.progress(total_redundant_wtar_files, "redundant wtar files will be removed")
@@ -1025,8 +1026,12 @@ class InstlAdmin(InstlInstanceBase):
             # also copy the whole instl folder
             batch_accum += CopyDirToDir(checkout_folder_instl_folder_path, revision_folder_path, delete_extraneous_files=False)
 
-            batch_accum += InfoMapFullWriter(full_info_map_file_path, in_format='text')
-            batch_accum += InfoMapSplitWriter(revision_instl_folder_path, in_format='text')
+            info_map_format = config_vars.get("INFO_MAP_FILE_FORMAT", "text").str()
+            batch_accum += InfoMapFullWriter(full_info_map_file_path, in_format=info_map_format)
+            info_map_delta_base_folder = config_vars.get("INFO_MAP_DELTA_BASE_FOLDER", "").str() or None
+            batch_accum += InfoMapSplitWriter(revision_instl_folder_path, in_format=info_map_format,
+                                              delta_base_folder=info_map_delta_base_folder,
+                                              max_delta_revisions=int(config_vars.get("INFO_MAP_DELTA_MAX_REVISIONS", 4)))
             batch_accum += Wzip(revision_instl_index_path)
             batch_accum += CreateRepoRevFile()
 
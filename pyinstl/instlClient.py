@@ -467,6 +467,8 @@ class InstlClient(InstlInstanceBase):
         #
         # for each file item in the source this function will set the full path where to download the file: item.download_path
         # and the top folder common to all items in a single source: item.download_root
+        # items of !dir and !dir_cont sources are not handled one by one, instead the download_path prefix is
+        # calculated once for the source and info_map_table.update_downloads sets the download_path for all the items
         sync_and_source = self.items_table.get_sync_folders_and_sources_for_active_iids()
 
         items_to_update = list()
@@ -492,22 +494,24 @@ class InstlClient(InstlInstanceBase):
                             need_to_sync = not utils.check_file_checksum(info_xml_of_target, info_xml_item.checksum)
                     if need_to_sync:
                         config_vars["ALL_SYNC_DIRS"].append(resolved_install_folder)
-                        item_paths = self.info_map_table.get_recursive_paths_in_dir(dir_path=source, what="any")
-                        self.progress(f"mark for download {len(item_paths)} files of {iid}/{source}")
+                        num_items = self.info_map_table.count_recursive_paths_in_dir(dir_path=source, what="any")
+                        self.progress(f"mark for download {num_items} files of {iid}/{source}")
+                        # download paths of all items in the dir are set together by update_downloads
                         if source_tag == '!dir':
                             source_parent = "/".join(resolved_source_parts[:-1])
-                            for item in item_paths:
-                                item_to_update = {"_id": item['_id'],
-                                                "download_path": config_vars.resolve_str("/".join((resolved_install_folder, item['path'][len(source_parent)+1:]))),
-                                                "download_root": config_vars.resolve_str("/".join((resolved_install_folder, resolved_source_parts[-1])))}
-                                items_to_update.append(item_to_update)
+                            dir_to_update = {"dir_path": source,
+                                             "download_path_prefix": resolved_install_folder + "/",
+                                             "path_start": len(source_parent) + 2,
+                                             "download_root": config_vars.resolve_str("/".join((resolved_install_folder, resolved_source_parts[-1]))),
+                                             "include_dirs": 1}
                         else:  # !dir_cont
                             source_parent = source
-                            for item in item_paths:
-                                item_to_update = {"_id": item['_id'],
-                                                "download_path": config_vars.resolve_str("/".join((resolved_install_folder, item['path'][len(source_parent)+1:]))),
-                                                "download_root": resolved_install_folder}
-                                items_to_update.append(item_to_update)
+                            dir_to_update = {"dir_path": source,
+                                             "download_path_prefix": resolved_install_folder + "/",
+                                             "path_start": len(source_parent) + 2,
+                                             "download_root": resolved_install_folder,
+                                             "include_dirs": 1}
+                        items_to_update.append(dir_to_update)
                     else:
                         num_ignored_files = self.info_map_table.ignore_file_paths_of_dir(dir_path=source)
                         if num_ignored_files < 1:
@@ -515,13 +519,14 @@ class InstlClient(InstlInstanceBase):
                         self.progress(f"avoid download {num_ignored_files} files of {iid}, Info.xml has not changed")
 
                 else:
-                    item_paths = self.info_map_table.get_recursive_paths_in_dir(dir_path=source)
-                    self.progress(f"mark for download {len(item_paths)} files of {iid}/{source}")
-                    for item in item_paths:
-                        item_to_update = {"_id": item['_id'],
-                                                "download_path": config_vars.resolve_str("/".join((local_repo_sync_dir, item['path']))),
-                                                "download_root": None}
-                        items_to_update.append(item_to_update)
+                    num_items = self.info_map_table.count_recursive_paths_in_dir(dir_path=source)
+                    self.progress(f"mark for download {num_items} files of {iid}/{source}")
+                    dir_to_update = {"dir_path": source,
+                                     "download_path_prefix": local_repo_sync_dir + "/",
+                                     "path_start": 1,
+                                     "download_root": None,
+                                     "include_dirs": 0}
+                    items_to_update.append(dir_to_update)
             elif source_tag == '!file':
                 # if the file was wtarred and split it would have multiple items
                 items_for_file = self.info_map_table.get_required_paths_for_file(source)
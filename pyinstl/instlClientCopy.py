@@ -24,6 +24,8 @@ class InstlClientCopy(InstlClient):
         self.current_destination_folder: Optional[str] = None
         self.current_iid:  Optional[str] = None
         self.avoid_copy_markers = None
+        self.unwtars_in_progress = set()  # names in the current target folder being extracted by ScheduledUnwtar, None for the whole folder
+        self.after_unwtars_instructions = list()  # instructions that should run when unwtars_in_progress were extracted
         self.calc_user_cache_dir_var()
 
     def do_copy(self) -> None:
@@ -44,6 +46,9 @@ class InstlClientCopy(InstlClient):
         self.mac_current_and_target = 'Mac' in list(config_vars["__CURRENT_OS_NAMES__"]) and 'Mac' in list(config_vars["TARGET_OS"])
         self.win_current_and_target = 'Win' in list(config_vars["__CURRENT_OS_NAMES__"]) and 'Win' in list(config_vars["TARGET_OS"])
 
+        # with PARALLEL_UNWTAR archives are extracted in the background while copying goes on, see create_unwtar_instructions
+        self.parallel_unwtar = int(config_vars.get("PARALLEL_UNWTAR", 0)) > 0
+
     def write_copy_debug_info(self) -> None:
         try:
             if config_vars.defined('ECHO_LOG_FILE'):
@@ -161,7 +166,7 @@ class InstlClientCopy(InstlClient):
                     first_wtar_item = source_wtar
             assert first_wtar_item is not None
             first_wtar_full_path = os.path.normpath("$(COPY_SOURCES_ROOT_DIR)/" + first_wtar_item.path)
-            retVal += Unwtar(first_wtar_full_path, os.curdir)
+            retVal += self.create_unwtar_instructions(first_wtar_full_path, os.curdir, os.path.basename(source_path))
         return retVal
 
     def create_copy_instructions_for_dir_cont(self, source_path: str, name_for_progress_message: str, use_hard_links=True) -> PythonBatchCommandBase:
@@ -190,7 +195,7 @@ class InstlClientCopy(InstlClient):
                             retVal += Chmod(source_path_relative_to_current_dir, source_item.chmod_spec(), recursive=True, ignore_all_errors=True)
 
         if len(wtar_items) > 0:
-            retVal += Unwtar(source_path_abs, os.pardir)  # to parent otherwise unwtar will create a folder inside the current folder, e.g. Utilities/Utilities. This issue is unique to !dir_cont
+            retVal += self.create_unwtar_instructions(source_path_abs, os.pardir, None)  # to parent otherwise unwtar will create a folder inside the current folder, e.g. Utilities/Utilities. This issue is unique to !dir_cont
 
         return retVal
 
@@ -242,19 +247,49 @@ class InstlClientCopy(InstlClient):
                         retVal += Chmod(source_path_relative_to_current_dir, source_item.chmod_spec())
 
             if has_wtars > 0:
-                retVal += Unwtar(source_path_abs, os.curdir)
+                retVal += self.create_unwtar_instructions(source_path_abs, os.curdir, source_path_name)
 
             # change ownership on destination folder + currently copied folder name (e.g: /Applications/Waves/Plug-Ins V11/XXX.bundle/, /Applications/Waves/YYY.framework)
             if self.mac_current_and_target:
                 target_folder = Path(config_vars.resolve_str(self.current_destination_folder), source_path_name).resolve() #initialized in create_copy_instructions_for_target_folder
-                retVal += Chown(path=target_folder,
-                                user_id=int(config_vars.get("ACTING_UID", -1)),
-                                group_id=int(config_vars.get("ACTING_GID", -1)), recursive=True)
+                chown_target_folder = Chown(path=target_folder,
+                                            user_id=int(config_vars.get("ACTING_UID", -1)),
+                                            group_id=int(config_vars.get("ACTING_GID", -1)), recursive=True)
+                if source_path_name in self.unwtars_in_progress:
+                    self.after_unwtars_instructions.append(chown_target_folder)
+                else:
+                    retVal += chown_target_folder
         else:
             # it might be a dir that was wtarred
             retVal = self.create_copy_instructions_for_file(source_path, name_for_progress_message)
         return retVal
 
+    def create_unwtar_instructions(self, what_to_unwtar, where_to_unwtar, destination_name) -> PythonBatchCommandBase:
+        """ destination_name: the item in the current target folder the archive is extracted to, None if extracted to the whole folder.
+            With PARALLEL_UNWTAR archives are extracted in the background by ScheduledUnwtar, so archives of many sources
+            are extracted at the same time. To keep the order of what is done in a target folder,
+            create_wait_for_unwtars_instructions should be called before anything that might depend on the extracted files.
+        """
+        if self.parallel_unwtar:
+            self.unwtars_in_progress.add(destination_name)
+            retVal = ScheduledUnwtar(what_to_unwtar, where_to_unwtar)
+        else:
+            retVal = Unwtar(what_to_unwtar, where_to_unwtar)
+        return retVal
+
+    def create_wait_for_unwtars_instructions(self) -> PythonBatchCommandBase:
+        retVal = AnonymousAccum()
+        if self.unwtars_in_progress:
+            retVal += WaitForUnwtars()
+            retVal += self.after_unwtars_instructions
+            self.unwtars_in_progress = set()
+            self.after_unwtars_instructions = list()
+        return retVal
+
+    def source_depends_on_unwtars_in_progress(self, source) -> bool:
+        """ copying a source to where an archive is being extracted should wait for the extraction, !dir_cont copies to the whole folder """
+        return None in self.unwtars_in_progress or os.path.basename(source[0]) in self.unwtars_in_progress or (source[1] == '!dir_cont' and bool(self.unwtars_in_progress))
+
     def create_copy_instructions_for_source(self, source, name_for_progress_message, use_hard_links=True) -> PythonBatchCommandBase:
         """ source is a tuple (source_path, tag), where tag is either !file or !dir or !dir_cont'
         """
@@ -347,12 +382,20 @@ class InstlClientCopy(InstlClient):
                         self.progress(f"create copy instructions of {source[0]} to {config_vars.resolve_str(target_folder_path)}")
                         with iid_accum.sub_accum(Stage("copy source", source[0])) as source_accum:
                             num_items_copied_to_folder += 1
-                            source_accum += self.accumulate_actions_for_iid(iid=IID, detail_name="pre_copy_item")
+                            # item actions might use anything copied before them, so wait for archives being extracted
+                            pre_copy_item_actions = self.accumulate_actions_for_iid(iid=IID, detail_name="pre_copy_item")
+                            if pre_copy_item_actions.is_essential() or self.source_depends_on_unwtars_in_progress(source):
+                                source_accum += self.create_wait_for_unwtars_instructions()
+                            source_accum += pre_copy_item_actions
                             source_accum += self.create_copy_instructions_for_source(source, name_and_version, use_hard_links=use_hard_links)
-                            source_accum += self.accumulate_actions_for_iid(iid=IID, detail_name="post_copy_item")
+                            post_copy_item_actions = self.accumulate_actions_for_iid(iid=IID, detail_name="post_copy_item")
+                            if post_copy_item_actions.is_essential():
+                                source_accum += self.create_wait_for_unwtars_instructions()
+                            source_accum += post_copy_item_actions
                             if self.mac_current_and_target:
                                 num_symlink_items += self.info_map_table.count_symlinks_in_dir(source[0])
             self.current_iid = None
+            copy_to_folder_accum += self.create_wait_for_unwtars_instructions()
 
             # only if items were actually copied there's need to (Mac only) resolve symlinks
             if  self.mac_current_and_target:
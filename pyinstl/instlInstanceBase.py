@@ -57,6 +57,39 @@ class IndexYamlReaderBase(DBManager, ConfigVarYamlReader):
 
     def __init__(self, config_vars, **kwargs) -> None:
         ConfigVarYamlReader.__init__(self, config_vars)
+        self.compiled_index = None  # CompiledIndex of the file currently being read and compiled, if any
+
+    def read_yaml_file(self, file_path, *args, **kwargs):
+        """ when $(COMPILED_INDEX_CACHE_FOLDER) is defined, load the outcome of reading file_path from a compiled index
+            if one was saved before, otherwise read the yaml and save a compiled index, see compiledIndex.py
+        """
+        if self.compiled_index is not None:  # file read from a file being compiled, so that file cannot be compiled
+            self.compiled_index.cachable = False
+        compiled_index = self.compiled_index_for_file(file_path)
+        if compiled_index is None:
+            ConfigVarYamlReader.read_yaml_file(self, file_path, *args, **kwargs)
+        elif not compiled_index.load(self, file_path):
+            with compiled_index.compile(self):
+                ConfigVarYamlReader.read_yaml_file(self, file_path, *args, **kwargs)
+
+    def compiled_index_for_file(self, file_path):
+        retVal = None
+        cache_folder = config_vars.get("COMPILED_INDEX_CACHE_FOLDER", "").str()
+        if cache_folder and config_vars.is_str_resolved(cache_folder) \
+                and os.path.isfile(file_path) and not os.fspath(file_path).lower().endswith(".json"):
+            from .compiledIndex import CompiledIndex
+            max_files = int(config_vars.get("COMPILED_INDEX_CACHE_MAX_FILES", 4))
+            retVal = CompiledIndex.for_file(file_path, cache_folder, max_files)
+        return retVal
+
+    def get_read_function_for_doc(self, a_node):
+        retVal, is_post_tag = ConfigVarYamlReader.get_read_function_for_doc(self, a_node)
+        if self.compiled_index is not None:
+            # reading documents other than !define... and !index... might have outcomes a compiled index does not keep
+            compilable_read_functions = (self.read_defines, self.read_defines_if_not_exist, self.read_index, self.do_nothing_node_reader, None)
+            if is_post_tag or retVal not in compilable_read_functions:
+                self.compiled_index.cachable = False
+        return retVal, is_post_tag
 
     def init_specific_doc_readers(self):
         ConfigVarYamlReader.init_specific_doc_readers(self)
@@ -339,6 +372,7 @@ class InstlInstanceBase(IndexYamlReaderBase, metaclass=abc.ABCMeta):
             in_batch_accum += PythonDoSomething('''RsyncClone.add_global_avoid_copy_markers(config_vars.get("AVOID_COPY_MARKERS", []).list())''')
 
         in_batch_accum += PythonDoSomething(f'''RemoveEmptyFolders.set_a_kwargs_default("files_to_ignore", config_vars.get("REMOVE_EMPTY_FOLDERS_IGNORE_FILES", []).list())''')
+        in_batch_accum += PythonDoSomething('''utils.open_checksum_cache(config_vars.get("CHECKSUM_CACHE_PATH", "").str(), config_vars.get("CHECKSUM_CACHE_MAX_ENTRIES", 0).int())''')
         in_batch_accum += PythonDoSomething(f"""log.setLevel({config_vars.get("PYTHON_BATCH_LOG_LEVEL", 20)})""")
 
     def calc_user_cache_dir_var(self):
@@ -58,15 +58,16 @@ class InstlInstanceSync(object, metaclass=abc.ABCMeta):
                 if "INFO_MAP_CHECKSUM" in config_vars:
                     info_map_file_expected_checksum = config_vars["INFO_MAP_CHECKSUM"].str()
                 local_copy_of_info_map_in = os.fspath(config_vars["LOCAL_COPY_OF_REMOTE_INFO_MAP_PATH"])
-                local_copy_of_info_map_out = utils.download_from_file_or_url(in_url=info_map_file_url,
-                                                config_vars=config_vars,
-                                                in_target_path=local_copy_of_info_map_in,
-                                                translate_url_callback=connectionBase.translate_url,
-                                                cache_folder=self.instlObj.get_default_sync_dir(continue_dir="cache", make_dir=True),
-                                                expected_checksum=info_map_file_expected_checksum)
+                if not self.read_remote_info_map_delta(local_copy_of_info_map_in):
+                    local_copy_of_info_map_out = utils.download_from_file_or_url(in_url=info_map_file_url,
+                                                    config_vars=config_vars,
+                                                    in_target_path=local_copy_of_info_map_in,
+                                                    translate_url_callback=connectionBase.translate_url,
+                                                    cache_folder=self.instlObj.get_default_sync_dir(continue_dir="cache", make_dir=True),
+                                                    expected_checksum=info_map_file_expected_checksum)
 
-                self.instlObj.progress(f"read info_map {info_map_file_url}")
-                self.instlObj.info_map_table.read_from_file(local_copy_of_info_map_out, progress_callback=self.instlObj.progress)
+                    self.instlObj.progress(f"read info_map {info_map_file_url}")
+                    self.instlObj.info_map_table.read_from_file(local_copy_of_info_map_out, progress_callback=self.instlObj.progress)
 
                 additional_info_maps = self.instlObj.items_table.get_details_for_active_iids("info_map", unique_values=True)
                 for additional_info_map in additional_info_maps:
@@ -100,6 +101,51 @@ class InstlInstanceSync(object, metaclass=abc.ABCMeta):
             log.error(f"""Exception reading info_map: {info_map_file_url}""")
             raise
 
+    def read_remote_info_map_delta(self, local_copy_of_info_map):
+        """ Instead of downloading and reading the full info map, read the info map of a previous repo-rev
+            from bookkeeping and apply the delta from that repo-rev, published by the admin as info_map.txt.delta-from-<repo-rev>.
+            Deltas are not wzipped, even when the full info map is. The checksum of each delta is published
+            in the repo-rev file as $(INFO_MAP_DELTA_CHECKSUMS), entries of <repo-rev>:<checksum>,
+            and only deltas with a published checksum are used.
+            The resulting info map is written to local_copy_of_info_map so the next repo-rev can use it as base.
+            Returns False if there is no previous info map or the delta could not be downloaded or applied,
+            in which case the info map table is cleared and the full info map should be read.
+        """
+        retVal = False
+        if not bool(config_vars.get("INFO_MAP_DELTA", "no")) or os.path.isfile(local_copy_of_info_map):
+            return retVal
+
+        delta_checksums = dict(delta_checksum.split(":", 1) for delta_checksum in list(config_vars.get("INFO_MAP_DELTA_CHECKSUMS", [])))
+        info_map_file_name = os.path.basename(local_copy_of_info_map)
+        current_repo_rev = int(config_vars["REPO_REV"])
+        bookkeeping_dir = os.fspath(config_vars["LOCAL_REPO_BOOKKEEPING_DIR"])
+        base_repo_revs = [int(entry.name) for entry in os.scandir(bookkeeping_dir)
+                          if entry.name.isdigit() and int(entry.name) < current_repo_rev and entry.name in delta_checksums
+                          and os.path.isfile(os.path.join(entry.path, info_map_file_name))]
+        if base_repo_revs:
+            base_repo_rev = max(base_repo_revs)
+            base_info_map_path = os.path.join(bookkeeping_dir, str(base_repo_rev), info_map_file_name)
+            delta_url = config_vars.resolve_str(f"$(INSTL_FOLDER_BASE_URL)/info_map.txt.delta-from-{base_repo_rev}")
+            try:
+                local_copy_of_delta = utils.download_from_file_or_url(in_url=delta_url,
+                                                config_vars=config_vars,
+                                                in_target_path=f"{local_copy_of_info_map}.delta-from-{base_repo_rev}",
+                                                translate_url_callback=connectionBase.translate_url,
+                                                cache_folder=self.instlObj.get_default_sync_dir(continue_dir="cache", make_dir=True),
+                                                expected_checksum=delta_checksums[str(base_repo_rev)])
+                self.instlObj.progress(f"read info_map {base_info_map_path}")
+                self.instlObj.info_map_table.read_from_file(base_info_map_path, progress_callback=self.instlObj.progress)
+                self.instlObj.progress(f"apply info_map delta {delta_url}")
+                self.instlObj.info_map_table.apply_delta_from_file(local_copy_of_delta, progress_callback=self.instlObj.progress)
+                self.instlObj.info_map_table.write_to_file(local_copy_of_info_map, in_format="text", comments=False,
+                                                           field_to_write=('path', 'flags', 'revision', 'checksum', 'size'))
+                retVal = True
+            except Exception as ex:
+                log.info(f"""info map delta {delta_url} was not used, reading full info map, {ex}""")
+                self.instlObj.info_map_table.clear_all()
+                utils.safe_remove_file(local_copy_of_info_map)
+        return retVal
+
     def mark_required_items(self):
         """ Mark all files that are needed for installation.
             Folders containing these these files are also marked.
@@ -120,6 +166,7 @@ class InstlInstanceSync(object, metaclass=abc.ABCMeta):
         self.instlObj.progress("create list of files to download")
         self.instlObj.set_sync_locations_for_active_items()
         self.instlObj.progress("check checksum of existing required files ...")
+        utils.open_checksum_cache(config_vars.get("CHECKSUM_CACHE_PATH", "").str(), config_vars.get("CHECKSUM_CACHE_MAX_ENTRIES", 0).int())
         self.instlObj.info_map_table.mark_need_download(progress_callback=self.instlObj.progress)
         need_download_file_path = os.fspath(config_vars["TO_SYNC_INFO_MAP_PATH"])
         need_download_items_list = self.instlObj.info_map_table.get_download_items()
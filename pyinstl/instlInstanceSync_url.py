@@ -61,7 +61,7 @@ class InstlInstanceSync_url(InstlInstanceSync):
         self.get_cookie_for_sync_urls(self.sync_base_url)
         for file_item in in_file_list:
             source_url = self.instlObj.info_map_table.get_sync_url_for_file_item(file_item)
-            self.instlObj.dl_tool.add_download_url(source_url, file_item.download_path, verbatim=source_url==['url'], size=file_item.size, download_last=source_url.endswith('Info.xml'))
+            self.instlObj.dl_tool.add_download_url(source_url, file_item.download_path, verbatim=source_url==['url'], size=file_item.size, download_last=source_url.endswith('Info.xml'), checksum=file_item.checksum)
         self.instlObj.progress(f"created download urls for {len(in_file_list)} files")
 
     def create_curl_download_instructions(self):
@@ -72,6 +72,9 @@ class InstlInstanceSync_url(InstlInstanceSync):
             num_config_files: the maximum number of curl config files.
             actual_num_config_files: actual number of curl config files created. Might be smaller
             than num_config_files, or might be 0 if downloading is not required.
+            num_processes: the number of curl processes running in parallel. When $(CURL_CONFIG_FILES_PER_PROCESS) > 1
+            there are more config files than processes, and each process that finishes a config file
+            picks the next one, so processes that finish early are not left idle.
         """
         dl_commands = AnonymousAccum()
 
@@ -80,14 +83,15 @@ class InstlInstanceSync_url(InstlInstanceSync):
         MakeDir(curl_config_folder, chowner=True, own_progress_count=0, report_own_progress=False)()
         curl_config_file_path = curl_config_folder.joinpath(config_vars["CURL_CONFIG_FILE_NAME"].str())
 
-        num_config_files = int(config_vars["PARALLEL_SYNC"])
+        num_processes = int(config_vars["PARALLEL_SYNC"])
+        num_config_files = num_processes * max(1, int(config_vars.get("CURL_CONFIG_FILES_PER_PROCESS", 1)))
         # TODO: Move class someplace else
         config_file_list = self.instlObj.dl_tool.create_config_files(curl_config_file_path, num_config_files)
 
         actual_num_config_files = len(config_file_list)
         if actual_num_config_files > 0:
-            if num_config_files > 1:
-                dl_start_message = f"Downloading with {num_config_files} processes in parallel"
+            if num_processes > 1:
+                dl_start_message = f"Downloading with {num_processes} processes in parallel"
             else:
                 dl_start_message = "Downloading with 1 process"
             dl_commands += Progress(dl_start_message)
@@ -96,7 +100,8 @@ class InstlInstanceSync_url(InstlInstanceSync):
 
             parallel_run_config_file_path = curl_config_folder.joinpath(config_vars.resolve_str("$(CURL_CONFIG_FILE_NAME).parallel-run"))
             self.create_parallel_run_config_file(parallel_run_config_file_path, config_file_list)
-            dl_commands += ParallelRun(parallel_run_config_file_path, shell=False, action_name="Downloading", own_progress_count=num_files_to_download, report_own_progress=False)
+            max_parallel_processes = num_processes if num_config_files > num_processes else None
+            dl_commands += ParallelRun(parallel_run_config_file_path, max_parallel_processes=max_parallel_processes, shell=False, action_name="Downloading", own_progress_count=num_files_to_download, report_own_progress=False)
 
             if num_files_to_download > 1:
                 dl_end_message = f"Downloading {num_files_to_download} files done"
@@ -107,6 +112,33 @@ class InstlInstanceSync_url(InstlInstanceSync):
 
             return dl_commands
 
+    def create_python_download_instructions(self):
+        """ Download is done in-process by the DownloadFiles batch command: a pool of $(PARALLEL_SYNC)
+            threads pull files from a shared list, so fast threads are not left idle while others
+            still work on a fixed portion of the files.
+            download_list_file: url, path, size & checksum of each file to download.
+        """
+        dl_commands = AnonymousAccum()
+
+        main_outfile = config_vars["__MAIN_OUT_FILE__"].Path()
+        download_list_file_path = main_outfile.parent.joinpath(main_outfile.name+"_download_list.csv")
+        num_urls = self.instlObj.dl_tool.create_download_list_file(download_list_file_path)
+
+        if num_urls > 0:
+            num_threads = int(config_vars["PARALLEL_SYNC"])
+            dl_commands += Progress(f"Downloading with {num_threads} threads")
+
+            num_files_to_download = int(config_vars["__NUM_FILES_TO_DOWNLOAD__"])
+            dl_commands += DownloadFiles(download_list_file_path, own_progress_count=num_files_to_download)
+
+            if num_files_to_download > 1:
+                dl_end_message = f"Downloading {num_files_to_download} files done"
+            else:
+                dl_end_message = "Downloading 1 file done"
+            dl_commands += Progress(dl_end_message)
+
+        return dl_commands
+
     def create_parallel_run_config_file(self, parallel_run_config_file_path, config_files):
         with utils.utf8_open_for_write(parallel_run_config_file_path, "w") as wfd:
             for config_file in config_files:
@@ -147,10 +179,8 @@ class InstlInstanceSync_url(InstlInstanceSync):
                     except Exception: pass # todo: use FOLDER_EXCLUDE_REGEX
                     try: files.remove(".DS_Store")
                     except Exception: pass  # todo: use FILE_EXCLUDE_REGEX
-                    for disk_item in files:
-                        item_full_path = PurePath(root, disk_item)
-                        item_partial_path = item_full_path.relative_to(pure_local_sync_dir).as_posix()
-                        files_to_check.append(item_partial_path)
+                    partial_root = PurePath(root).relative_to(pure_local_sync_dir).as_posix()  # once per folder, not per file
+                    files_to_check.extend(f"{partial_root}/{disk_item}" for disk_item in files)
         files_to_check.sort()
         redundant_files = self.instlObj.info_map_table.get_files_that_should_be_removed_from_sync_folder(files_to_check, progress_callback=self.instlObj.progress)
         rm_commands = AnonymousAccum()
@@ -189,7 +219,10 @@ class InstlInstanceSync_url(InstlInstanceSync):
 
         dl_commands += self.create_sync_folders()
         self.create_sync_urls(file_list)
-        dl_commands += self.create_curl_download_instructions()
+        if config_vars.get("DOWNLOAD_ENGINE", "curl").str() == "python":
+            dl_commands += self.create_python_download_instructions()
+        else:
+            dl_commands += self.create_curl_download_instructions()
 
         dl_commands += self.instlObj.create_sync_folder_manifest_command("after-sync", back_ground=True)
         dl_commands += self.create_check_checksum_instructions(to_sync_num_files)
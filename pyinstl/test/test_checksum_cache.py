@@ -0,0 +1,108 @@
+#!/usr/bin/env python3.9
+
+
+import sys
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+
+import utils
+from utils import checksum_cache
+
+
+class TestChecksumCache(unittest.TestCase):
+    def setUp(self):
+        self.work_folder = Path(tempfile.mkdtemp())
+        self.cache_file_path = self.work_folder.joinpath("cache", "checksum_cache.db")
+        self.num_reads = 0
+
+    def tearDown(self):
+        utils.close_checksum_cache()
+        shutil.rmtree(self.work_folder, ignore_errors=True)
+
+    def counting_checksum(self, file_path):
+        self.num_reads += 1
+        return utils.read_file_checksum(file_path)
+
+    def create_file(self, name, contents, age_seconds=60):
+        """ create a file and set its modification time to the past, so it will not be considered too recent to cache """
+        file_path = self.work_folder.joinpath(name)
+        file_path.write_bytes(contents)
+        old_time = time.time() - age_seconds
+        os.utime(file_path, (old_time, old_time))
+        return file_path
+
+    def test_hit_after_first_checksum(self):
+        file_path = self.create_file("a.txt", b"abc")
+        cache = utils.ChecksumCache(self.cache_file_path)
+        first = cache.get_file_checksum(file_path, self.counting_checksum)
+        second = cache.get_file_checksum(file_path, self.counting_checksum)
+        self.assertEqual(first, utils.get_buffer_checksum(b"abc"))
+        self.assertEqual(first, second)
+        self.assertEqual(self.num_reads, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_change_invalidates_entry(self):
+        file_path = self.create_file("a.txt", b"abc")
+        cache = utils.ChecksumCache(self.cache_file_path)
+        cache.get_file_checksum(file_path, self.counting_checksum)
+        file_path = self.create_file("a.txt", b"abd", age_seconds=30)  # same size, different mtime
+        self.assertEqual(cache.get_file_checksum(file_path, self.counting_checksum), utils.get_buffer_checksum(b"abd"))
+        file_path = self.create_file("a.txt", b"abcd", age_seconds=30)  # same mtime, different size
+        self.assertEqual(cache.get_file_checksum(file_path, self.counting_checksum), utils.get_buffer_checksum(b"abcd"))
+        self.assertEqual(self.num_reads, 3)
+
+    def test_recently_modified_file_is_not_cached(self):
+        file_path = self.create_file("a.txt", b"abc", age_seconds=0)
+        cache = utils.ChecksumCache(self.cache_file_path)
+        cache.get_file_checksum(file_path, self.counting_checksum)
+        cache.get_file_checksum(file_path, self.counting_checksum)
+        self.assertEqual(self.num_reads, 2)
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_persists_between_runs(self):
+        file_path = self.create_file("a.txt", b"abc")
+        cache = utils.ChecksumCache(self.cache_file_path)
+        cache.get_file_checksum(file_path, self.counting_checksum)
+        cache.save()
+
+        cache = utils.ChecksumCache(self.cache_file_path)
+        self.assertEqual(cache.get_file_checksum(file_path, self.counting_checksum), utils.get_buffer_checksum(b"abc"))
+        self.assertEqual(self.num_reads, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_max_entries_drops_least_recently_used(self):
+        cache = utils.ChecksumCache(self.cache_file_path, max_entries=2)
+        cache.run_time -= 10
+        cache.get_file_checksum(self.create_file("old.txt", b"old"), self.counting_checksum)
+        cache.save()
+
+        cache = utils.ChecksumCache(self.cache_file_path, max_entries=2)
+        cache.get_file_checksum(self.create_file("new1.txt", b"new1"), self.counting_checksum)
+        cache.get_file_checksum(self.create_file("new2.txt", b"new2"), self.counting_checksum)
+        cache.save()
+
+        cache = utils.ChecksumCache(self.cache_file_path, max_entries=2)
+        self.assertEqual(sorted(Path(path).name for path in cache.entries), ["new1.txt", "new2.txt"])
+
+    def test_get_file_checksum_uses_open_cache(self):
+        file_path = self.create_file("a.txt", b"abc")
+        utils.open_checksum_cache(os.fspath(self.cache_file_path))
+        self.assertEqual(utils.get_file_checksum(file_path), utils.get_buffer_checksum(b"abc"))
+        self.assertFalse(utils.need_to_download_file(file_path, utils.get_buffer_checksum(b"abc")))
+        self.assertEqual(checksum_cache.the_checksum_cache.hits, 1)
+        utils.close_checksum_cache()
+        self.assertIsNone(utils.get_checksum_cache())
+        self.assertTrue(self.cache_file_path.is_file())
+
+    def test_empty_path_does_not_cache(self):
+        self.assertIsNone(utils.open_checksum_cache(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
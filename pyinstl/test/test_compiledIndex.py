@@ -0,0 +1,124 @@
+#!/usr/bin/env python3.9
+
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+
+from configVar import config_vars, ConfigVarYamlReader
+from pyinstl import IndexYamlReaderBase
+
+index_text = """--- !define
+INDEX_VAR: index value
+--- !index
+A_IID:
+    name: A
+    inherit: B_IID
+    install_sources: a_source
+    __ifdef__(DEFINED):
+        depends: C_IID
+    define:
+        A_VAR: a
+B_IID:
+    name: B
+    version: 1.2
+    Mac:
+        install_sources: b_mac_source
+C_IID:
+    name: C
+"""
+
+
+class TestCompiledIndex(unittest.TestCase):
+    def setUp(self):
+        config_vars["__INSTL_DEFAULTS_FOLDER__"] = Path(os.path.dirname(__file__), "../..", "defaults")
+        self.work_folder = Path(tempfile.mkdtemp())
+        self.cache_folder = self.work_folder.joinpath("compiled_index")
+        config_vars["COMPILED_INDEX_CACHE_FOLDER"] = self.cache_folder
+        self.index_path = self.work_folder.joinpath("index.yaml")
+        self.index_path.write_text(index_text)
+
+    def tearDown(self):
+        self.reset_db()
+        for var_name in ("COMPILED_INDEX_CACHE_FOLDER", "DEFINED", "INDEX_VAR", "INCLUDED_VAR"):
+            if var_name in config_vars:
+                del config_vars[var_name]
+        shutil.rmtree(self.work_folder, ignore_errors=True)
+
+    def reset_db(self):
+        reader = IndexYamlReaderBase(config_vars)
+        del reader.items_table
+        del reader.db
+
+    def read_index(self):
+        """ read index.yaml into a new db, return the rows of the items table and the reader """
+        self.reset_db()
+        if "INDEX_VAR" in config_vars:
+            del config_vars["INDEX_VAR"]
+        reader = IndexYamlReaderBase(config_vars)
+        reader.items_table.activate_all_oses()
+        reader.read_yaml_file(self.index_path)
+        reader.items_table.resolve_inheritance()
+        items = [tuple(row) for row in reader.db.select_and_fetchall("""SELECT * FROM index_item_t ORDER BY _id""")]
+        details = [tuple(row) for row in reader.db.select_and_fetchall("""SELECT * FROM index_item_detail_t ORDER BY _id""")]
+        return items, details, reader
+
+    def compiled_files(self):
+        return sorted(self.cache_folder.glob("*.db"))
+
+    def test_compiled_index_is_loaded(self):
+        items, details, reader = self.read_index()
+        self.assertEqual(len(self.compiled_files()), 1)
+        self.assertEqual(config_vars["INDEX_VAR"].str(), "index value")
+
+        with mock.patch.object(ConfigVarYamlReader, "read_yaml_file") as read_yaml_file:
+            compiled_items, compiled_details, compiled_reader = self.read_index()
+        read_yaml_file.assert_not_called()
+        self.assertEqual(compiled_items, items)
+        self.assertEqual(compiled_details, details)
+        self.assertEqual(config_vars["INDEX_VAR"].str(), "index value")
+        self.assertEqual(list(compiled_reader.items_table.defines_for_iids), ["A_IID"])
+        self.assertEqual(compiled_reader.items_table.defines_for_iids["A_IID"]["A_VAR"].value, "a")
+        self.assertIn(os.fspath(self.index_path), list(config_vars["READ_YAML_FILES"]))
+
+    def test_changed_config_var_is_not_loaded(self):
+        config_vars["DEFINED"] = "yes"
+        _, details, _ = self.read_index()
+        self.assertIn(("A_IID", "depends", "C_IID"), [(d[1], d[4], d[5]) for d in details])
+
+        del config_vars["DEFINED"]
+        with mock.patch.object(ConfigVarYamlReader, "read_yaml_file", wraps=ConfigVarYamlReader.read_yaml_file, autospec=True) as read_yaml_file:
+            _, details, _ = self.read_index()
+        read_yaml_file.assert_called_once()
+        self.assertNotIn(("A_IID", "depends", "C_IID"), [(d[1], d[4], d[5]) for d in details])
+
+    def test_changed_file_is_compiled_again(self):
+        self.read_index()
+        self.index_path.write_text(index_text.replace("version: 1.2", "version: 1.3"))
+        _, details, _ = self.read_index()
+        self.assertIn(("B_IID", "version", "1.3"), [(d[1], d[4], d[5]) for d in details])
+        self.assertEqual(len(self.compiled_files()), 2)
+
+    def test_file_with_include_is_not_compiled(self):
+        self.work_folder.joinpath("included.yaml").write_text("--- !define\nINCLUDED_VAR: included\n")
+        self.index_path.write_text(index_text.replace("INDEX_VAR: index value", f"INDEX_VAR: index value\n__include__: {self.work_folder.joinpath('included.yaml')}"))
+
+        class IncludingReader(IndexYamlReaderBase):
+            def read_include_node(self, i_node, *args, **kwargs):
+                self.read_yaml_file(i_node.value, *args, **kwargs)
+
+        self.reset_db()
+        reader = IncludingReader(config_vars)
+        reader.read_yaml_file(self.index_path)
+        self.assertEqual(config_vars["INCLUDED_VAR"].str(), "included")
+        self.assertEqual(self.compiled_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.9
+
+
+import os
+import sys
+import unittest
+import io
+import contextlib
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+from db.dbMaster import DBMaster
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, os.pardir, "defaults").resolve()
+
+
+class TestDBMasterProfiler(unittest.TestCase):
+    def setUp(self):
+        self.db = DBMaster(":memory:", defaults_folder)
+        self.db.open()
+        with self.db.transaction("create_test_table") as curs:
+            curs.execute("""CREATE TABLE test_t (_id INTEGER PRIMARY KEY, name TEXT)""")
+
+    def tearDown(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.db.close()
+
+    def insert_names(self, names):
+        with self.db.transaction() as curs:
+            curs.executemany("""INSERT INTO test_t (name) VALUES (?)""", [(name,) for name in names])
+
+    def test_not_profiling_collects_nothing(self):
+        self.db.statistics.clear()
+        self.insert_names(["a", "b"])
+        self.assertEqual(self.db.select_and_fetchall("""SELECT COUNT(*) FROM test_t"""), [2])
+        self.assertEqual(len(self.db.statistics), 0)
+
+    def test_profiling_per_call_site(self):
+        self.db.profile_queries = True
+        for i in range(3):
+            self.insert_names([f"name_{i}_{j}" for j in range(i + 1)])
+        with self.db.selection("select_names") as curs:
+            curs.execute("""SELECT name FROM test_t""")
+            self.assertEqual(len(curs.fetchall()), 6)
+        self.assertEqual(self.db.select_and_fetchall("""SELECT _id FROM test_t WHERE name LIKE 'name_2%'"""), [4, 5, 6])
+
+        insert_sites = [site for site in self.db.statistics if site.startswith("insert_names test_dbMaster.py:")]
+        self.assertEqual(len(insert_sites), 1)
+        self.assertEqual(self.db.statistics[insert_sites[0]].count, 3)
+        self.assertEqual(self.db.statistics[insert_sites[0]].rows, 6)
+        self.assertEqual(self.db.statistics["select_names"].count, 1)
+        self.assertEqual(self.db.statistics["select_names"].rows, 0)
+        # select_and_fetchall is reported under the function that called it
+        self.assertTrue(any(site.startswith("test_profiling_per_call_site test_dbMaster.py:") for site in self.db.statistics))
+
+        report = io.StringIO()
+        with contextlib.redirect_stdout(report):
+            self.db.print_statistics()
+        self.assertIn(insert_sites[0], report.getvalue())
+
+
+class TestDBMasterWalFiles(unittest.TestCase):
+    def test_close_and_delete_removes_wal_files(self):
+        with tempfile.TemporaryDirectory() as db_folder:
+            db_file_path = Path(db_folder, "test.db")
+            db = DBMaster(os.fspath(db_file_path), defaults_folder, performance_profile="fast")
+            db.open()
+            with db.transaction("create_test_table") as curs:
+                curs.execute("""CREATE TABLE test_t (_id INTEGER PRIMARY KEY, name TEXT)""")
+            db.close()
+            # left next to the db by a run that crashed
+            Path(db_folder, "test.db-wal").write_bytes(b"stale")
+            Path(db_folder, "test.db-shm").write_bytes(b"stale")
+            db.close_and_delete()
+            self.assertEqual(list(Path(db_folder).iterdir()), [])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3.9
+
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+
+from configVar import config_vars
+from pyinstl import IndexYamlReaderBase
+from db.indexItemTable import IndexItemsTable
+
+
+def index_text(num_products=40, chain_depth=4):
+    """ index shaped like a real one: a chain of templates each inheriting from the one before,
+        the first inheriting from a shared actions item, products inheriting from one of the templates
+        and shells inheriting from several products. Details are inherited from several parents,
+        but never the same detail at the same generation - which sqlite's UNIQUE constraint does not allow.
+    """
+    lines = ["--- !index"]
+    lines.extend(["COMMON_ACTIONS_IID:",
+                  "    name: common actions",
+                  "    actions:",
+                  "        pre_copy: [common pre copy 1, common pre copy 2]",
+                  "        post_copy: common post copy",
+                  "    Win:",
+                  "        actions:",
+                  "            post_copy: common win post copy"])
+    for i_level in range(chain_depth):
+        lines.extend([f"TEMPLATE_{i_level}_IID:",
+                      f"    name: template {i_level}",
+                      f"    install_folders: $(FOLDER_{i_level})",
+                      "    actions:",
+                      f"        pre_copy_item: template {i_level} pre copy item",
+                      "    Mac:",
+                      f"        install_sources: Mac/Shared/Level_{i_level}",
+                      "    Win:",
+                      f"        install_sources: Win/Shared/Level_{i_level}"])
+        lines.append(f"    inherit: {f'TEMPLATE_{i_level-1}_IID' if i_level > 0 else 'COMMON_ACTIONS_IID'}")
+    for i_product in range(num_products):
+        lines.extend([f"PRODUCT_{i_product}_IID:",
+                      f"    name: product {i_product}",
+                      f"    guid: {i_product:08x}-0000-0000-0000-000000000000",
+                      f"    inherit: TEMPLATE_{i_product % chain_depth}_IID",
+                      "    actions:",
+                      f"        post_copy: product {i_product} post copy",
+                      "    Mac:",
+                      f"        install_sources: Mac/Plugins/Product_{i_product}.bundle",
+                      "    Win:",
+                      f"        install_sources: Win/Plugins/Product_{i_product}.dll"])
+    for i_shell in range(num_products // 10):
+        lines.extend([f"SHELL_{i_shell}_IID:",
+                      f"    name: shell {i_shell}",
+                      f"    inherit: [{', '.join(f'PRODUCT_{i_product}_IID' for i_product in range(i_shell*10, i_shell*10+10, 3))}]"])
+    return "\n".join(lines) + "\n"
+
+
+class TestResolveInheritance(unittest.TestCase):
+    def setUp(self):
+        config_vars["__INSTL_DEFAULTS_FOLDER__"] = Path(os.path.dirname(__file__), "../..", "defaults")
+        self.work_folder = Path(tempfile.mkdtemp())
+        self.cache_folder = self.work_folder.joinpath("resolved_inheritance")
+        self.index_path = self.work_folder.joinpath("index.yaml")
+        self.index_path.write_text(index_text())
+
+    def tearDown(self):
+        self.reset_db()
+        for var_name in ("DEBUG_INDEX_DB", "RESOLVED_INHERITANCE_CACHE_FOLDER"):
+            if var_name in config_vars:
+                del config_vars[var_name]
+        shutil.rmtree(self.work_folder, ignore_errors=True)
+
+    def reset_db(self):
+        reader = IndexYamlReaderBase(config_vars)
+        del reader.items_table
+        del reader.db
+
+    def resolved_details(self, debug_index_db, *for_oses):
+        """ read the index into a new db, resolve inheritance and return the rows of the details table """
+        self.reset_db()
+        reader = IndexYamlReaderBase(config_vars)
+        reader.read_yaml_file(self.index_path)
+        reader.items_table.activate_specific_oses(*for_oses)
+        config_vars["DEBUG_INDEX_DB"] = debug_index_db
+        reader.items_table.resolve_inheritance()
+        del config_vars["DEBUG_INDEX_DB"]
+        return [tuple(row) for row in reader.db.select_and_fetchall("""
+                    SELECT original_iid, owner_iid, os_id, detail_name, detail_value, generation, tag, os_is_active
+                    FROM index_item_detail_t ORDER BY _id""")]
+
+    def test_same_as_resolving_one_by_one(self):
+        for for_oses in (("Mac",), ("Win",), ("Mac", "Win")):
+            with self.subTest(for_oses=for_oses):
+                reference_details = self.resolved_details("yes", *for_oses)
+                details = self.resolved_details("no", *for_oses)
+                self.assertEqual(details, reference_details)
+                # the deepest product inherits from every level of the templates chain, and from what products inherit
+                self.assertIn(("TEMPLATE_0_IID", "PRODUCT_3_IID", 0, "install_folders", "$(FOLDER_0)", 4, None, 1), details)
+                self.assertIn(("TEMPLATE_0_IID", "SHELL_0_IID", 0, "install_folders", "$(FOLDER_0)", 5, None, 1), details)
+
+    def test_resolved_inheritance_is_cached(self):
+        config_vars["RESOLVED_INHERITANCE_CACHE_FOLDER"] = self.cache_folder
+        details = self.resolved_details("no", "Mac")
+        self.assertEqual(len(list(self.cache_folder.glob("*.db"))), 1)
+
+        with mock.patch.object(IndexItemsTable, "resolve_inherited_details") as resolve_inherited_details:
+            cached_details = self.resolved_details("no", "Mac")
+        resolve_inherited_details.assert_not_called()
+        self.assertEqual(cached_details, details)
+
+        # different active oses means different inheritable details
+        self.resolved_details("no", "Win")
+        self.assertEqual(len(list(self.cache_folder.glob("*.db"))), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
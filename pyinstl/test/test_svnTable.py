@@ -0,0 +1,546 @@
+#!/usr/bin/env python3.9
+
+
+import os
+import sys
+import unittest
+import tempfile
+import hashlib
+from pathlib import Path
+
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
+sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir, os.pardir)))
+from db.dbMaster import DBMaster
+from svnTree import SVNTable, SVNRow
+from configVar import config_vars
+import utils
+
+defaults_folder = Path(__file__).joinpath(os.pardir, os.pardir, os.pardir, "defaults").resolve()
+
+
+def create_sync_folder_and_info_map(work_folder: Path):
+    """ create files in work_folder/sync and an info_map describing them:
+        some files are up to date, some have wrong contents and some are missing from disk
+    """
+    sync_folder = work_folder.joinpath("sync")
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1"]
+    expected_to_download = set()
+    for i in range(48):
+        contents = f"file number {i}\n".encode() * (i + 1)
+        if i % 8 == 0:
+            contents *= 40000  # a few files bigger than one checksum read chunk
+        checksum = hashlib.sha1(contents).hexdigest()
+        path = f"Mac/Plugins/file_{i}.txt"
+        info_map_lines.append(f"{path}, f, 1, {checksum}, {len(contents)}")
+        file_path = sync_folder.joinpath(path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        if i % 5 == 1:
+            expected_to_download.add(path)  # missing from disk
+        elif i % 5 == 2:
+            expected_to_download.add(path)  # wrong contents on disk
+            file_path.write_bytes(contents + b"!")
+        else:
+            file_path.write_bytes(contents)
+    info_map_path = work_folder.joinpath("info_map.txt")
+    info_map_path.write_text("\n".join(info_map_lines) + "\n")
+    return sync_folder, info_map_path, expected_to_download
+
+
+def create_svn_table(info_map_path: Path, sync_folder: Path) -> SVNTable:
+    svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+    svn_table.read_from_file(os.fspath(info_map_path), a_format="text")
+    svn_table.create_indexes()
+    with svn_table.db.transaction() as curs:
+        curs.execute("""UPDATE svn_item_t SET required=1""")
+    svn_table.update_downloads([{"_id": item._id, "download_root": os.fspath(sync_folder),
+                                 "download_path": os.fspath(sync_folder.joinpath(item.path))}
+                                for item in svn_table.get_items(what="file")])
+    return svn_table
+
+
+class TestSVNTableMarkNeedDownload(unittest.TestCase):
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+        self.sync_folder, self.info_map_path, self.expected_to_download = create_sync_folder_and_info_map(Path(self.work_folder.name))
+
+    def tearDown(self):
+        self.work_folder.cleanup()
+
+    def need_download_paths(self, num_workers):
+        svn_table = create_svn_table(self.info_map_path, self.sync_folder)
+        svn_table.mark_need_download(num_workers=num_workers)
+        retVal = {item.path for item in svn_table.get_download_items()}
+        svn_table.db.close()
+        return retVal
+
+    def test_serial_marks_expected_files(self):
+        need_download = self.need_download_paths(num_workers=0)
+        self.assertEqual(need_download, self.expected_to_download | {"Mac", "Mac/Plugins"})
+
+    def test_parallel_same_as_serial(self):
+        serial = self.need_download_paths(num_workers=0)
+        for num_workers in (1, 4):
+            self.assertEqual(self.need_download_paths(num_workers=num_workers), serial, f"{num_workers=}")
+
+    def test_nothing_to_download(self):
+        for path in self.expected_to_download:
+            self.sync_folder.joinpath(path).unlink(missing_ok=True)
+        svn_table = create_svn_table(self.info_map_path, self.sync_folder)
+        with svn_table.db.transaction() as curs:
+            curs.executemany("""UPDATE svn_item_t SET required=0 WHERE path==?""", [(p,) for p in self.expected_to_download])
+        svn_table.mark_need_download(num_workers=4)
+        self.assertEqual(svn_table.get_download_items(), [])
+        svn_table.db.close()
+
+
+class TestSVNTableUpdateDownloadsInDir(unittest.TestCase):
+    """ download paths set for a whole dir must be the same as those set item by item """
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1", "Mac/Plugins/A.bundle, d, 1",
+                      "Mac/Plugins/A.bundle/Contents, d, 1", "Mac/Plugins/A.bundle/Contents/Info.plist, f, 1, 0123, 10",
+                      "Mac/Plugins/A.bundle/Contents/$(BUNDLE_NAME).txt, f, 1, 4567, 20",
+                      "Mac/Plugins/A.bundle/Contents/Résumé.txt, f, 1, 89ab, 30",
+                      "Mac/Plugins/B.bundle, d, 1", "Mac/Plugins/B.bundle/b.txt, f, 1, cdef, 40"]
+
+    def setUp(self):
+        config_vars["BUNDLE_NAME"] = "resolved_name"
+        self.work_folder = tempfile.TemporaryDirectory()
+        self.info_map_path = Path(self.work_folder.name, "info_map.txt")
+        self.info_map_path.write_text("\n".join(self.info_map_lines) + "\n")
+
+    def tearDown(self):
+        del config_vars["BUNDLE_NAME"]
+        self.work_folder.cleanup()
+
+    def downloads(self, items_to_update_func):
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        svn_table.read_from_file(os.fspath(self.info_map_path), a_format="text")
+        svn_table.create_indexes()
+        svn_table.update_downloads(items_to_update_func(svn_table))
+        with svn_table.db.selection() as curs:
+            curs.execute("""SELECT path, download_root, download_path FROM svn_item_t ORDER BY _id""")
+            retVal = [tuple(row) for row in curs.fetchall()]
+        svn_table.db.close()
+        return retVal
+
+    def test_dir_same_as_items(self):
+        install_folder = "/Applications/Plug-Ins"
+        source = "Mac/Plugins/A.bundle"
+        source_parent = "Mac/Plugins"
+
+        def item_by_item(svn_table):
+            items_to_update = [{"_id": item['_id'],
+                                "download_path": config_vars.resolve_str("/".join((install_folder, item['path'][len(source_parent)+1:]))),
+                                "download_root": "/".join((install_folder, "A.bundle"))}
+                               for item in svn_table.get_recursive_paths_in_dir(dir_path=source, what="any")]
+            items_to_update.extend({"_id": item['_id'],
+                                    "download_path": config_vars.resolve_str("/".join(("/sync", item['path']))),
+                                    "download_root": None}
+                                   for item in svn_table.get_recursive_paths_in_dir(dir_path="Mac/Plugins/B.bundle"))
+            return items_to_update
+
+        def whole_dir(svn_table):
+            return [{"dir_path": source, "download_path_prefix": install_folder + "/", "path_start": len(source_parent) + 2,
+                     "download_root": "/".join((install_folder, "A.bundle")), "include_dirs": 1},
+                    {"dir_path": "Mac/Plugins/B.bundle", "download_path_prefix": "/sync/", "path_start": 1,
+                     "download_root": None, "include_dirs": 0}]
+
+        expected = self.downloads(item_by_item)
+        self.assertIn(("Mac/Plugins/A.bundle/Contents/$(BUNDLE_NAME).txt", "/Applications/Plug-Ins/A.bundle",
+                       "/Applications/Plug-Ins/A.bundle/Contents/resolved_name.txt"), expected)
+        self.assertIn(("Mac/Plugins/B.bundle", None, None), expected)
+        self.assertEqual(self.downloads(whole_dir), expected)
+
+    def test_updates_are_done_in_order(self):
+        def items_then_dir(svn_table):
+            info_plist = svn_table.get_file_item("Mac/Plugins/A.bundle/Contents/Info.plist")
+            return [{"_id": info_plist._id, "download_path": "/first", "download_root": "/"},
+                    {"dir_path": "Mac/Plugins/A.bundle", "download_path_prefix": "/second/", "path_start": 1,
+                     "download_root": None, "include_dirs": 0},
+                    {"_id": info_plist._id, "download_path": "/third", "download_root": "/"}]
+        downloads = {path: download_path for path, _, download_path in self.downloads(items_then_dir)}
+        self.assertEqual(downloads["Mac/Plugins/A.bundle/Contents/Info.plist"], "/third")
+        self.assertEqual(downloads["Mac/Plugins/A.bundle/Contents/Résumé.txt"], "/second/Mac/Plugins/A.bundle/Contents/Résumé.txt")
+
+
+class TestSVNTableInfoMapSnapshot(unittest.TestCase):
+    """ reading an info map from a snapshot must give the same rows as parsing it """
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+        self.snapshot_folder = Path(self.work_folder.name, "snapshots")
+        config_vars["INFO_MAP_SNAPSHOT_FOLDER"] = self.snapshot_folder
+        _, self.info_map_path, _ = create_sync_folder_and_info_map(Path(self.work_folder.name))
+
+    def tearDown(self):
+        del config_vars["INFO_MAP_SNAPSHOT_FOLDER"]
+        self.work_folder.cleanup()
+
+    def read_rows(self, parse=True):
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        if not parse:
+            def no_parsing(*args, **kwargs):
+                raise AssertionError("info map was parsed instead of read from snapshot")
+            svn_table.read_func_by_format["text"] = no_parsing
+        svn_table.read_from_file(os.fspath(self.info_map_path), a_format="text", disable_indexes_during_read=True)
+        with svn_table.db.selection() as curs:
+            curs.execute("""SELECT * FROM svn_item_t ORDER BY _id""")
+            retVal = [tuple(row) for row in curs.fetchall()]
+        svn_table.db.close()
+        return retVal
+
+    def test_snapshot_same_as_parsing(self):
+        parsed_rows = self.read_rows()
+        self.assertEqual(len(list(self.snapshot_folder.glob("*.db"))), 1)
+        self.assertEqual(self.read_rows(parse=False), parsed_rows)
+
+    def test_changed_file_is_parsed(self):
+        self.read_rows()
+        with self.info_map_path.open("a") as wfd:
+            wfd.write("Mac/Plugins/new_file.txt, f, 2, 0123, 4\n")
+        with self.assertRaises(AssertionError):
+            self.read_rows(parse=False)
+        rows = self.read_rows()
+        self.assertEqual(rows[-1][1], "Mac/Plugins/new_file.txt")
+        self.assertEqual(len(list(self.snapshot_folder.glob("*.db"))), 2)
+        self.assertEqual(self.read_rows(parse=False), rows)
+
+    def test_bad_snapshot_is_ignored(self):
+        parsed_rows = self.read_rows()
+        for snapshot_file in self.snapshot_folder.glob("*.db"):
+            snapshot_file.write_bytes(b"not a database")
+        self.assertEqual(self.read_rows(), parsed_rows)
+        self.assertEqual(self.read_rows(parse=False), parsed_rows)
+
+
+
+class TestSVNTableBinaryInfoMap(unittest.TestCase):
+    """ reading a binary info map must give the same rows as reading the text info map it was created from """
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 7", "Mac/Plugins/A.bundle, d, 7",
+                      "Mac/Plugins/A.bundle/Contents.wtar.aa, f, 7, 5985e53ba61348d78a067b944f1e57c67f865162, 356985",
+                      "Mac/Plugins/A.bundle/Contents.wtar.ab, f, 7, 0123456789abcdef0123456789abcdef01234567, 12",
+                      "Mac/Plugins/A.bundle/link.symlink, fs, 6, 1111111111111111111111111111111111111111, 8",
+                      "Mac/Plugins/Résumé.txt, fx, 5, 2222222222222222222222222222222222222222, 0",
+                      "Mac/Plugins/Empty Folder, d, 2",
+                      "top_file.wtar, f, 3, 3333333333333333333333333333333333333333, 1234567890123"]
+    fields_to_write = ('path', 'flags', 'revision', 'checksum', 'size')
+
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.work_folder.cleanup()
+
+    def read_rows(self, file_path, a_format="guess"):
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        svn_table.read_from_file(os.fspath(file_path), a_format=a_format)
+        with svn_table.db.selection() as curs:
+            curs.execute("""SELECT * FROM svn_item_t ORDER BY _id""")
+            rows = [tuple(row) for row in curs.fetchall()]
+        return svn_table, rows
+
+    def round_trip(self, info_map_lines):
+        text_path = Path(self.work_folder.name, "info_map.txt")
+        text_path.write_text("\n".join(info_map_lines) + "\n")
+        svn_table, text_rows = self.read_rows(text_path)
+        binary_path = Path(self.work_folder.name, "info_map.bin")
+        svn_table.write_to_file(os.fspath(binary_path), field_to_write=self.fields_to_write)
+        _, binary_rows = self.read_rows(binary_path)
+        self.assertEqual(binary_rows, text_rows)
+        return svn_table, text_rows
+
+    def test_round_trip(self):
+        self.round_trip(self.info_map_lines)
+
+    def test_round_trip_checksums_not_sha1(self):
+        self.round_trip(self.info_map_lines + ["Mac/Plugins/short_checksum.txt, f, 1, abc, 3"])
+
+    def test_binary_file_with_text_name(self):
+        """ clients save the info map as remote_info_map.txt regardless of format """
+        svn_table, text_rows = self.round_trip(self.info_map_lines)
+        binary_with_text_name = Path(self.work_folder.name, "remote_info_map.txt")
+        svn_table.write_to_file(os.fspath(binary_with_text_name), in_format="binary", field_to_write=self.fields_to_write)
+        self.assertEqual(self.read_rows(binary_with_text_name)[1], text_rows)
+
+    def test_binary_to_text(self):
+        """ text written from binary info map is the same as text written from text info map """
+        svn_table, _ = self.round_trip(self.info_map_lines)
+        text_from_text = Path(self.work_folder.name, "from_text.txt")
+        svn_table.write_to_file(os.fspath(text_from_text), comments=False, field_to_write=self.fields_to_write)
+        binary_table, _ = self.read_rows(Path(self.work_folder.name, "info_map.bin"))
+        text_from_binary = Path(self.work_folder.name, "from_binary.txt")
+        binary_table.write_to_file(os.fspath(text_from_binary), comments=False, field_to_write=self.fields_to_write)
+        self.assertEqual(text_from_binary.read_text(), text_from_text.read_text())
+
+    def test_empty(self):
+        self.round_trip([])
+
+
+class TestSVNTableInfoMapDelta(unittest.TestCase):
+    """ applying an info map delta to the base info map must give the same rows as reading the full info map """
+    columns_to_compare = ", ".join(name for name in SVNRow.__slots__ if name not in ("_id", "parent_id"))
+    base_lines = ["Mac, d, 1", "Mac/Plugins, d, 1", "Mac/Plugins/A.bundle, d, 1",
+                  "Mac/Plugins/A.bundle/Contents.wtar.aa, f, 1, 5985e53ba61348d78a067b944f1e57c67f865162, 356985",
+                  "Mac/Plugins/A.bundle/Contents.wtar.ab, f, 1, 0123456789abcdef0123456789abcdef01234567, 12",
+                  "Mac/Plugins/B.txt, f, 1, 1111111111111111111111111111111111111111, 8",
+                  "Mac/Plugins/C, d, 1",
+                  "Mac/Plugins/C/c.txt, f, 1, 2222222222222222222222222222222222222222, 16"]
+
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.work_folder.cleanup()
+
+    def write_info_map(self, name, info_map_lines):
+        retVal = Path(self.work_folder.name, name)
+        retVal.write_text("\n".join(info_map_lines) + "\n")
+        return retVal
+
+    def read_table(self, info_map_path):
+        retVal = SVNTable(DBMaster(":memory:", defaults_folder))
+        retVal.read_from_file(os.fspath(info_map_path), a_format="text")
+        return retVal
+
+    def rows(self, svn_table):
+        with svn_table.db.selection() as curs:
+            curs.execute(f"""SELECT {self.columns_to_compare} FROM svn_item_t ORDER BY path""")
+            retVal = [tuple(row) for row in curs.fetchall()]
+        return retVal
+
+    def apply_delta(self, base_path, target_path):
+        delta_path = Path(self.work_folder.name, f"{target_path.name}.delta-from-{base_path.stem}")
+        self.read_table(target_path).write_delta_to_file(delta_path, base_path)
+        svn_table = self.read_table(base_path)
+        with svn_table.reading_files_context():
+            svn_table.apply_delta_from_file(delta_path)
+        return svn_table, delta_path
+
+    def test_delta_same_as_full_read(self):
+        target_lines = ["Mac, d, 1", "Mac/Plugins, d, 2", "Mac/Plugins/A.bundle, d, 2",
+                        "Mac/Plugins/A.bundle/Contents.wtar.aa, f, 2, 4444444444444444444444444444444444444444, 356990",
+                        "Mac/Plugins/A.bundle/Contents.wtar.ab, f, 1, 0123456789abcdef0123456789abcdef01234567, 12",
+                        "Mac/Plugins/B.txt, fx, 2, 1111111111111111111111111111111111111111, 8",
+                        "Mac/Plugins/C, f, 2, 5555555555555555555555555555555555555555, 3",
+                        "Mac/Plugins/D.symlink, fs, 2, 6666666666666666666666666666666666666666, 5"]
+        base_path = self.write_info_map("1.txt", self.base_lines)
+        target_path = self.write_info_map("2.txt", target_lines)
+        svn_table, delta_path = self.apply_delta(base_path, target_path)
+        self.assertEqual(self.rows(svn_table), self.rows(self.read_table(target_path)))
+        delta_lines = delta_path.read_text().splitlines()
+        self.assertEqual(sum(line.startswith("+, ") for line in delta_lines), 6)
+        self.assertEqual(delta_lines.count("-, Mac/Plugins/C/c.txt"), 1)
+
+    def test_delta_chain(self):
+        info_map_paths = [self.write_info_map("1.txt", self.base_lines)]
+        lines = list(self.base_lines)
+        for repo_rev in range(2, 5):
+            lines.append(f"Mac/Plugins/new_{repo_rev}.txt, f, {repo_rev}, {repo_rev:040}, {repo_rev}")
+            lines.remove(lines[3])
+            info_map_paths.append(self.write_info_map(f"{repo_rev}.txt", lines))
+        for base_path, target_path in zip(info_map_paths, info_map_paths[1:]):
+            svn_table, _ = self.apply_delta(base_path, target_path)
+            reconstructed_path = Path(self.work_folder.name, f"reconstructed_{target_path.name}")
+            svn_table.write_to_file(os.fspath(reconstructed_path), comments=False,
+                                    field_to_write=('path', 'flags', 'revision', 'checksum', 'size'))
+            self.assertEqual(self.rows(self.read_table(reconstructed_path)), self.rows(self.read_table(target_path)))
+
+    def test_no_changes(self):
+        base_path = self.write_info_map("1.txt", self.base_lines)
+        svn_table, delta_path = self.apply_delta(base_path, self.write_info_map("2.txt", self.base_lines))
+        self.assertEqual(len(delta_path.read_text().splitlines()), 1)
+        self.assertEqual(self.rows(svn_table), self.rows(self.read_table(base_path)))
+
+    def test_read_remote_info_map_delta(self):
+        """ the client downloads the delta from $(INSTL_FOLDER_BASE_URL) - deltas are not wzipped even when the full info map is -
+            and uses it only when its checksum is published in $(INFO_MAP_DELTA_CHECKSUMS)
+        """
+        from pyinstl.instlInstanceSyncBase import InstlInstanceSync
+
+        class ClientForDelta(object):
+            def __init__(self, work_folder):
+                self.info_map_table = SVNTable(DBMaster(":memory:", defaults_folder))
+                self.cache_folder = work_folder.joinpath("cache")
+
+            def progress(self, *args, **kwargs):
+                pass
+
+            def get_default_sync_dir(self, continue_dir=None, make_dir=True):
+                return self.cache_folder
+
+        work_folder = Path(self.work_folder.name)
+        instl_folder = work_folder.joinpath("instl")
+        instl_folder.mkdir()
+        bookkeeping_folder = work_folder.joinpath("bookkeeping")
+        bookkeeping_folder.joinpath("1").mkdir(parents=True)
+        bookkeeping_folder.joinpath("2").mkdir(parents=True)
+        base_path = bookkeeping_folder.joinpath("1", "remote_info_map.txt")
+        base_path.write_text("\n".join(self.base_lines) + "\n")
+        target_path = self.write_info_map("target.txt", self.base_lines[:-1] + ["Mac/Plugins/D.txt, f, 2, 3333333333333333333333333333333333333333, 4"])
+        delta_path = instl_folder.joinpath("info_map.txt.delta-from-1")
+        self.read_table(target_path).write_delta_to_file(delta_path, base_path)
+        local_copy_of_info_map = bookkeeping_folder.joinpath("2", "remote_info_map.txt")
+
+        def read_delta(delta_checksums):
+            client = ClientForDelta(work_folder)
+            with config_vars.push_scope_context():
+                config_vars["INFO_MAP_DELTA"] = "yes"
+                config_vars["REPO_REV"] = 2
+                config_vars["LOCAL_REPO_BOOKKEEPING_DIR"] = bookkeeping_folder
+                config_vars["INSTL_FOLDER_BASE_URL"] = instl_folder
+                config_vars["INFO_MAP_FILE_URL"] = instl_folder.joinpath("info_map.txt.wzip")
+                config_vars["INFO_MAP_DELTA_CHECKSUMS"] = delta_checksums
+                with client.info_map_table.reading_files_context():
+                    delta_was_read = InstlInstanceSync(client).read_remote_info_map_delta(os.fspath(local_copy_of_info_map))
+            return delta_was_read, client.info_map_table
+
+        delta_was_read, _ = read_delta([])
+        self.assertFalse(delta_was_read, "delta without published checksum should not be used")
+        delta_was_read, svn_table = read_delta([f"1:{'0' * 40}"])
+        self.assertFalse(delta_was_read, "delta with wrong checksum should not be used")
+        self.assertFalse(local_copy_of_info_map.exists())
+        delta_was_read, svn_table = read_delta([f"1:{utils.get_file_checksum(delta_path)}"])
+        self.assertTrue(delta_was_read)
+        self.assertEqual(self.rows(svn_table), self.rows(self.read_table(target_path)))
+        self.assertEqual(self.rows(self.read_table(local_copy_of_info_map)), self.rows(self.read_table(target_path)))
+
+    def test_wrong_base_raises(self):
+        base_path = self.write_info_map("1.txt", self.base_lines)
+        target_path = self.write_info_map("2.txt", self.base_lines[:-1])
+        delta_path = Path(self.work_folder.name, "delta")
+        self.read_table(target_path).write_delta_to_file(delta_path, base_path)
+        other_base = self.read_table(self.write_info_map("0.txt", self.base_lines[:-2]))
+        with self.assertRaises(ValueError):
+            other_base.apply_delta_from_file(delta_path)
+
+
+class TestSVNTableRedundantFiles(unittest.TestCase):
+    """ files to remove from the sync folder must be the same as found by comparing with sqlite's LIKE """
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1", "Mac/Plugins/A.bundle, d, 1",
+                      "Mac/Plugins/A.bundle/a.txt, f, 1, 1111111111111111111111111111111111111111, 1",
+                      "Mac/Plugins/B.bundle, d, 1",
+                      "Mac/Plugins/B.bundle/b.txt, f, 1, 2222222222222222222222222222222222222222, 2"]
+    files_in_sync_folder = ["Mac/Plugins/A.bundle/a.txt", "Mac/Plugins/A.bundle/old.txt", "Mac/Plugins/a.bundle/A.TXT",
+                            "Mac/Plugins/B.bundle/b.txt", "Mac/Plugins/B.bundle/b.txt.orig",
+                            "Mac/Plugins/C.bundle/c.txt", "Mac/Plugins/C.bundle/Contents/c2.txt", "Mac/Plugins/c.bundle/x.txt",
+                            "Mac/Plugins/C.bundle.old/c.txt", "Mac/Plugins/D.bundle/d.txt", "Mac/Plugins/Résumé.txt",
+                            "Mac/Plugins/E.bundle/e.txt", "Win/F.dll"]
+    custom_info_maps = {"C_IID": "Mac/Plugins/C.bundle", "D_IID": "Mac/Plugins/D.bundle", "E_IID": "Mac/Plugins/E.bundle/e.txt"}
+
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+        info_map_path = Path(self.work_folder.name, "info_map.txt")
+        info_map_path.write_text("\n".join(self.info_map_lines + ["Mac/Plugins/D.bundle, d, 1"]) + "\n")
+        self.svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        self.svn_table.read_from_file(os.fspath(info_map_path), a_format="text")
+        with self.svn_table.db.transaction() as curs:
+            for iid, install_source in self.custom_info_maps.items():
+                curs.execute("""INSERT INTO index_item_t (iid) VALUES (?)""", (iid,))
+                curs.executemany("""INSERT INTO index_item_detail_t (original_iid, owner_iid, os_id, detail_name, detail_value)
+                                    VALUES (?, ?, 0, ?, ?)""",
+                                 [(iid, iid, "install_sources", install_source), (iid, iid, "info_map", f"{iid}_info_map.txt")])
+
+    def tearDown(self):
+        self.svn_table.db.close()
+        self.work_folder.cleanup()
+
+    def files_to_remove_with_like(self):
+        with self.svn_table.db.transaction() as curs:
+            curs.execute("""CREATE TEMP TABLE files_to_check_t (path TEXT)""")
+            curs.executemany("""INSERT INTO files_to_check_t (path) VALUES (?)""", [(p,) for p in self.files_in_sync_folder])
+            curs.execute("""
+                SELECT path FROM files_to_check_t
+                WHERE NOT EXISTS (SELECT 1 FROM
+                        (SELECT install_sources_t.detail_value||"%" AS pattern
+                        FROM index_item_detail_t AS install_sources_t, index_item_detail_t as info_map_t
+                        WHERE install_sources_t.detail_name == "install_sources"
+                            AND info_map_t.detail_name == "info_map"
+                            AND info_map_t.owner_iid == install_sources_t.owner_iid
+                            AND install_sources_t.detail_value NOT IN (SELECT path FROM svn_item_t)
+                        UNION SELECT path AS pattern FROM svn_item_t)
+                    WHERE files_to_check_t.path LIKE pattern)
+                """)
+            retVal = [row[0] for row in curs.fetchall()]
+            curs.execute("""DROP TABLE files_to_check_t""")
+        return retVal
+
+    def test_same_as_like(self):
+        files_to_remove = self.svn_table.get_files_that_should_be_removed_from_sync_folder(self.files_in_sync_folder)
+        self.assertEqual(sorted(files_to_remove), sorted(self.files_to_remove_with_like()))
+        self.assertEqual(sorted(files_to_remove), ["Mac/Plugins/A.bundle/old.txt", "Mac/Plugins/B.bundle/b.txt.orig",
+                                                   "Mac/Plugins/D.bundle/d.txt", "Mac/Plugins/Résumé.txt", "Win/F.dll"])
+
+    def test_nothing_in_sync_folder(self):
+        self.assertEqual(self.svn_table.get_files_that_should_be_removed_from_sync_folder([]), [])
+
+
+class TestSVNTableClosureTable(unittest.TestCase):
+    """ hierarchical queries must give the same results with and without svn_item_closure_t """
+    info_map_lines = ["Mac, d, 1", "Mac/Plugins, d, 1", "Mac/Plugins/A.bundle, d, 1",
+                      "Mac/Plugins/A.bundle/Contents, d, 1",
+                      "Mac/Plugins/A.bundle/Contents/a.txt, f, 1, 1111111111111111111111111111111111111111, 1",
+                      "Mac/Plugins/A.bundle/Contents/link.symlink, fs, 1, 2222222222222222222222222222222222222222, 2",
+                      "Mac/Plugins/A.bundle/Contents/Resources, d, 1",
+                      "Mac/Plugins/A.bundle/Contents/Resources/r.txt, f, 1, 3333333333333333333333333333333333333333, 3",
+                      "Mac/Plugins/B.bundle.wtar.aa, f, 1, 4444444444444444444444444444444444444444, 4",
+                      "Mac/Plugins/B.bundle.wtar.ab, f, 1, 5555555555555555555555555555555555555555, 5",
+                      "Mac/Plugins/C, d, 1",
+                      "Mac/Plugins/C/D, d, 1",
+                      "Mac/Plugins/C/D/d.wtar, f, 1, 6666666666666666666666666666666666666666, 6",
+                      "Mac/Plugins/C/c.txt, f, 1, 7777777777777777777777777777777777777777, 7",
+                      "Win, d, 1", "Win/w.txt, f, 1, 8888888888888888888888888888888888888888, 8"]
+    dir_paths = ("Mac", "Mac/Plugins", "Mac/Plugins/A.bundle", "Mac/Plugins/B.bundle", "Mac/Plugins/C", "Mac/Plugins/C/D/d", "Win", "Nothing")
+
+    def setUp(self):
+        self.work_folder = tempfile.TemporaryDirectory()
+        self.info_map_path = Path(self.work_folder.name, "info_map.txt")
+        self.info_map_path.write_text("\n".join(self.info_map_lines) + "\n")
+
+    def tearDown(self):
+        del config_vars["INFO_MAP_CLOSURE_TABLE"]
+        self.work_folder.cleanup()
+
+    def query_results(self, closure_table):
+        config_vars["INFO_MAP_CLOSURE_TABLE"] = closure_table
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        svn_table.read_from_file(os.fspath(self.info_map_path), a_format="text", disable_indexes_during_read=True)
+        self.assertEqual(svn_table.closure_table_is_valid, closure_table == "yes")
+        retVal = list()
+        for dir_path in self.dir_paths:
+            retVal.append([item.path for item in svn_table.get_items_in_dir(dir_path)])
+            retVal.append([tuple(row) for row in svn_table.get_recursive_paths_in_dir(dir_path, what="any")])
+            retVal.append(svn_table.count_recursive_paths_in_dir(dir_path, what="any"))
+            retVal.append([item.path for item in svn_table.get_file_items_of_dir(dir_path)])
+            retVal.append(svn_table.count_wtar_items_of_dir(dir_path))
+            retVal.append(svn_table.count_symlinks_in_dir(dir_path))
+        svn_table.mark_required_for_dir("Mac/Plugins/C/D")
+        svn_table.mark_required_completion()
+        retVal.append(svn_table.ignore_file_paths_of_dir("Mac/Plugins/A.bundle"))
+        with svn_table.db.selection() as curs:
+            curs.execute("""SELECT path, required, ignore FROM svn_item_t ORDER BY _id""")
+            retVal.append([tuple(row) for row in curs.fetchall()])
+        svn_table.db.close()
+        return retVal
+
+    def test_same_results(self):
+        self.assertEqual(self.query_results("yes"), self.query_results("no"))
+
+    def test_closure_table_is_removed_with_indexes(self):
+        config_vars["INFO_MAP_CLOSURE_TABLE"] = "yes"
+        svn_table = SVNTable(DBMaster(":memory:", defaults_folder))
+        svn_table.read_from_file(os.fspath(self.info_map_path), a_format="text", disable_indexes_during_read=True)
+        num_items = svn_table.num_items()
+        # each item with itself, and each item with each of its ancestors, levels start at 1
+        self.assertEqual(svn_table.db.select_and_fetchall("""SELECT COUNT(*) FROM svn_item_closure_t"""),
+                         svn_table.db.select_and_fetchall("""SELECT SUM(level) FROM svn_item_t"""))
+        svn_table.drop_indexes()
+        self.assertFalse(svn_table.closure_table_is_valid)
+        self.assertEqual(len(svn_table.get_items_in_dir("Mac/Plugins/C")), 3)
+        svn_table.create_indexes()
+        self.assertTrue(svn_table.closure_table_is_valid)
+        svn_table.clear_all()
+        self.assertFalse(svn_table.closure_table_is_valid)
+        self.assertEqual(num_items, len(self.info_map_lines))
+        svn_table.db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,9 +3,14 @@
 
 import sys
 import os
+import stat
 import unittest
+import tempfile
+from pathlib import Path
 
 from utils import misc_utils
+from utils import files
+import utils
 
 
 sys.path.append(os.path.realpath(os.path.join(__file__, os.pardir, os.pardir)))
@@ -42,6 +47,68 @@ class TestUtils(unittest.TestCase):
             result_list.extend(i)
         self.assertEqual(result_list, [1, 'a', None, 2, 'b', None, 3, 'c', None, 4, None, None, 5, None, None])
 
+    def test_partition_by_total_size(self):
+        sizes = [100, 1, 2, 3, 90, 4, 5, 80, 6, 7, 8, 9, 10]
+        partitions = misc_utils.partition_by_total_size(sizes, 3, lambda x: x)
+        self.assertEqual(sorted(sum(partitions, [])), sorted(sizes))
+        self.assertEqual([sum(p) for p in partitions], [109, 108, 108])
+        self.assertEqual(misc_utils.partition_by_total_size([5, 1, 4, 2, 3], 2, lambda x: x), [[5, 2, 1], [4, 3]])
+        self.assertEqual(len(misc_utils.partition_by_total_size([7, 7], 5, lambda x: x)), 2)  # no empty partitions
+        self.assertEqual(misc_utils.partition_by_total_size([], 5, lambda x: x), [])
+        # zero size items are spread between the partitions too
+        self.assertEqual(misc_utils.partition_by_total_size([0, 0, 0], 16, lambda x: x), [[0], [0], [0]])
+        self.assertEqual(sorted(len(p) for p in misc_utils.partition_by_total_size([10, 0, 0, 0], 3, lambda x: x)), [1, 1, 2])
+
+    def test_curl_config_files_with_zero_size_files(self):
+        """ every curl config file should have urls, curl fails on a config file without urls """
+        from pyinstl.curlHelper import CUrlHelper
+        curl_helper = CUrlHelper()
+        with tempfile.TemporaryDirectory() as work_folder:
+            for i_file in range(3):
+                curl_helper.add_download_url(f"http://example.com/empty_{i_file}", os.path.join(work_folder, f"empty_{i_file}"), verbatim=True, size=0)
+            config_file_names = curl_helper.create_config_files(Path(work_folder, "dl"), 16)
+            self.assertEqual(len(config_file_names), 3)
+            for config_file_name in config_file_names:
+                self.assertEqual(Path(config_file_name).read_text().count("url = "), 1, f"{config_file_name} should have one url")
+
+    def test_SplitFileWriter(self):
+        with tempfile.TemporaryDirectory() as work_folder:
+            base_path = Path(work_folder, "a.wtar")
+            with utils.SplitFileWriter(base_path, max_size=3) as split_writer:
+                split_writer.write(b"0123456")
+                split_writer.write(b"78")
+            self.assertEqual([(part.name, part.read_bytes()) for part in sorted(Path(work_folder).iterdir())],
+                             [("a.wtar.aa", b"012"), ("a.wtar.ab", b"345"), ("a.wtar.ac", b"678")])
+            if hasattr(os, 'fchmod'):  # each part gets the mode chown_chmod_on_fd gives, regardless of umask
+                self.assertEqual([stat.S_IMODE(part.stat().st_mode) for part in sorted(Path(work_folder).iterdir())], [0o666] * 3)
+
+        with tempfile.TemporaryDirectory() as work_folder:
+            # more parts than 2 letter extensions: all parts are renamed to 3 letter extensions
+            base_path = Path(work_folder, "a.wtar")
+            data = bytes(i % 251 for i in range(700))
+            with utils.SplitFileWriter(base_path, max_size=1) as split_writer:
+                split_writer.write(data)
+            parts = sorted(Path(work_folder).iterdir())
+            self.assertEqual([part.name for part in parts[:2]] + [parts[-1].name], ["a.wtar.aaa", "a.wtar.aab", "a.wtar.bax"])
+            self.assertEqual(b"".join(part.read_bytes() for part in parts), data)
+
+    def test_PathPatternMatcher(self):
+        patterns = ["*.pyc", ".DS_Store", "*.svn*", "a?c", "[ab]*.txt", "x/*.bin", "/abs/*.q", "*~", "*.wtar.??", "foo*bar"]
+        names = ["a.pyc", "abc", "b.txt", "c.txt", ".DS_Store", "q.svnx", "foo1bar", "x.bin", "zz~", "1.wtar.aa", "1.wtar.aaa", "pyc", "a.q"]
+        for pattern in patterns + ["*", "**"]:
+            matcher = files.PathPatternMatcher([pattern])
+            for name in names:
+                for path in (name, f"x/{name}", f"/abs/{name}", f"d/e/{name}"):
+                    self.assertEqual(matcher.match(path) is not None, Path(path).match(pattern), f"{path} {pattern}")
+        matcher = files.PathPatternMatcher(patterns)
+        for name in names:
+            for path in (name, f"x/{name}", Path("x", name)):
+                matching_patterns = [pattern for pattern in patterns if Path(path).match(pattern)]
+                self.assertEqual(matcher.match(path) is not None, bool(matching_patterns), f"{path}")
+                if matching_patterns:
+                    self.assertIn(matcher.match(path), matching_patterns)
+        self.assertIs(files.PathPatternMatcher.for_patterns(tuple(patterns)), files.PathPatternMatcher.for_patterns(tuple(patterns)))
+
     """
     def test_gen_col_format(self):
         varoom = utils.gen_col_format([5, 3, 12])
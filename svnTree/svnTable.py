@@ -8,8 +8,17 @@ from pathlib import Path
 
 log = logging.getLogger()
 
+import io
 import csv
+import sys
+import hashlib
+import mmap
+import array
+import struct
+import string
+import itertools
 import sqlite3
+from collections import defaultdict
 from contextlib import contextmanager
 from typing import Dict, Generator, List, Tuple
 from functools import lru_cache
@@ -53,7 +62,21 @@ flags_and_revision_re = re.compile(r"""
 map_info_extension_to_format = {"txt": "text", "text": "text",
                                 "inf": "info", "info": "info",
                                 "props": "props", "prop": "props",
-                                "file-sizes": "file-sizes"}
+                                "file-sizes": "file-sizes",
+                                "bin": "binary", "binary": "binary"}
+
+# binary info map: header, string table, folders and rows, each section padded to 8 bytes, little endian.
+#   header:  magic, format version, num_rows, num_folders, checksum kind, size of strings
+#   strings: unique path components and flags (also checksums if checksum kind is 1), utf-8, separated by \0
+#   folders: int32 parent folder (-1 for top level folders), uint32 name (index to strings)
+#   rows:    int32 folder (-1 for top level items), uint32 leaf, uint32 flags, int64 revision, int64 size,
+#            checksum: 20 bytes digest, all zeros for no checksum (kind 0) or uint32 index to strings, 0xffffffff for no checksum (kind 1)
+#            kind 0 is used if all checksums are lower case sha1 hex digests, and none is all zeros
+binary_info_map_magic = b"INFOMAPB"
+binary_info_map_header = struct.Struct("<8sIIIIQ")
+binary_info_map_version = 1
+
+ascii_lower_table = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)  # lower case for ascii letters only, like sqlite's lower() and LIKE
 
 
 class SVNRow(object):
@@ -242,18 +265,7 @@ class SVNTable(object):
          WHERE parent_t.path==svn_item_t.parent)
          """
     get_child_items_q = """
-        WITH RECURSIVE get_children(__ID) AS
-        (
-            SELECT first_item_t._id
-            FROM svn_item_t AS first_item_t
-            WHERE first_item_t.parent_id=:parent_id
-
-            UNION
-
-            SELECT child_item_t._id
-            FROM svn_item_t child_item_t, get_children
-            WHERE child_item_t.parent_id = get_children.__ID
-        )
+        {get_children}
         SELECT * FROM svn_item_t
         WHERE _id IN get_children
         {another_filter}
@@ -261,24 +273,38 @@ class SVNTable(object):
         """
     # noinspection SyntaxError
     count_child_items_q = """
-        WITH RECURSIVE get_children(__ID) AS
-        (
-            SELECT first_item_t._id
-            FROM svn_item_t AS first_item_t
-            WHERE first_item_t.parent_id=:parent_id
-
-            UNION
-
-            SELECT child_item_t._id
-            FROM svn_item_t child_item_t, get_children
-            WHERE child_item_t.parent_id = get_children.__ID
-        )
+        {get_children}
         SELECT COUNT(_id) FROM svn_item_t
         WHERE _id IN get_children
         {another_filter}
         ORDER BY parent_id
         """
     get_immediate_child_items_q = """SELECT * FROM svn_item_t WHERE parent_id==:parent_id"""
+    # svn_item_closure_t has a row for each item and each of its ancestors, and for each item with itself at depth 0.
+    # When $(INFO_MAP_CLOSURE_TABLE) is yes create_indexes fills it, and get_children_cte, get_parents_cte
+    # use it instead of recursive queries over parent_id.
+    create_closure_table_q = """CREATE TABLE IF NOT EXISTS svn_item_closure_t (ancestor_id INTEGER, descendant_id INTEGER, depth INTEGER);"""
+    drop_closure_table_q = """DROP TABLE IF EXISTS svn_item_closure_t;"""
+    fill_closure_table_q = """
+        WITH RECURSIVE get_ancestors(__ANCESTOR_ID, __DESCENDANT_ID, __DEPTH) AS
+        (
+            SELECT _id, _id, 0
+            FROM svn_item_t
+
+            UNION ALL
+
+            SELECT parent_item_t.parent_id, get_ancestors.__DESCENDANT_ID, get_ancestors.__DEPTH+1
+            FROM svn_item_t parent_item_t, get_ancestors
+            WHERE parent_item_t._id = get_ancestors.__ANCESTOR_ID
+            AND parent_item_t.parent_id > 0
+        )
+        INSERT INTO svn_item_closure_t (ancestor_id, descendant_id, depth)
+        SELECT __ANCESTOR_ID, __DESCENDANT_ID, __DEPTH FROM get_ancestors
+        """
+    create_closure_ancestor_index_q = """CREATE INDEX IF NOT EXISTS ix_svn_item_closure_t_ancestor ON svn_item_closure_t (ancestor_id, depth, descendant_id);"""
+    create_closure_descendant_index_q = """CREATE INDEX IF NOT EXISTS ix_svn_item_closure_t_descendant ON svn_item_closure_t (descendant_id, depth, ancestor_id);"""
+    snapshot_format_version = 1  # change when the format or contents of info map snapshot files changes
+    snapshot_columns = ", ".join(SVNRow.__slots__[1:])  # _id is not copied, rows get new _ids in the same order
 
     def __init__(self, db_master) -> None:
         super().__init__()
@@ -287,15 +313,18 @@ class SVNTable(object):
         self.read_func_by_format = {"info": self.read_from_svn_info,
                                     "text": self.read_from_text,
                                     "props": self.read_props,
-                                    "file-sizes": self.read_file_sizes
+                                    "file-sizes": self.read_file_sizes,
+                                    "binary": self.read_from_binary
                                     }
 
-        self.write_func_by_format = {"text": self.write_as_text, }
+        self.write_func_by_format = {"text": self.write_as_text,
+                                     "binary": self.write_as_binary}
         self.files_read_list: List[os.PathLike] = list()
         self.files_written_list: List[os.PathLike] = list()
         self.comments: List[str] = list()
         self.num_digits_repo_rev_hierarchy = None
         self.num_digits_per_folder_repo_rev_hierarchy = None
+        self.closure_table_is_valid = False  # svn_item_closure_t is filled by create_indexes and removed by drop_indexes
 
     def __repr__(self) -> str:
         return "\n".join([item.__repr__() for item in self.get_items()])
@@ -314,6 +343,13 @@ class SVNTable(object):
             curs.execute(self.update_parent_ids_q)
             curs.execute(self.create_parent_id_index_q)
             curs.execute(self.create_unwtarred_id_index_q)
+            if bool(config_vars.get("INFO_MAP_CLOSURE_TABLE", "no")):
+                curs.execute(self.drop_closure_table_q)
+                curs.execute(self.create_closure_table_q)
+                curs.execute(self.fill_closure_table_q)
+                curs.execute(self.create_closure_ancestor_index_q)
+                curs.execute(self.create_closure_descendant_index_q)
+                self.closure_table_is_valid = True
             min_revision, max_revision = self.min_max_revision()
             config_vars["MIN_REPO_REV"] = min_revision
             config_vars["MAX_REPO_REV"] = max_revision
@@ -322,6 +358,68 @@ class SVNTable(object):
         self.db.curs.execute(self.drop_path_index_q)
         self.db.curs.execute(self.drop_parent_id_index_q)
         self.db.curs.execute(self.drop_unwtarred_id_index_q)
+        self.db.curs.execute(self.drop_closure_table_q)
+        self.closure_table_is_valid = False
+
+    def get_children_cte(self, first_items_condition, distinct=True):
+        """ WITH clause defining get_children(__ID): the items of svn_item_t AS first_item_t that match
+            first_items_condition, and all their descendants.
+            distinct=False is faster when the first items cannot be descendants of each other.
+        """
+        if self.closure_table_is_valid:
+            retVal = f"""
+                WITH get_children(__ID) AS
+                (
+                    SELECT svn_item_closure_t.descendant_id
+                    FROM svn_item_t AS first_item_t, svn_item_closure_t
+                    WHERE {first_items_condition}
+                    AND svn_item_closure_t.ancestor_id == first_item_t._id
+                )"""
+        else:
+            retVal = f"""
+                WITH RECURSIVE get_children(__ID) AS
+                (
+                    SELECT first_item_t._id
+                    FROM svn_item_t AS first_item_t
+                    WHERE {first_items_condition}
+
+                    {"UNION" if distinct else "UNION ALL"}
+
+                    SELECT child_item_t._id
+                    FROM svn_item_t child_item_t, get_children
+                    WHERE child_item_t.parent_id == get_children.__ID
+                )"""
+        return retVal
+
+    def get_parents_cte(self, first_items_condition, include_first_items=False):
+        """ WITH clause defining get_parents(__ID): the ancestors of the items of svn_item_t AS first_item_t that match
+            first_items_condition, and if include_first_items is True also these items
+        """
+        if self.closure_table_is_valid:
+            retVal = f"""
+                WITH get_parents(__ID) AS
+                (
+                    SELECT svn_item_closure_t.ancestor_id
+                    FROM svn_item_t AS first_item_t, svn_item_closure_t
+                    WHERE {first_items_condition}
+                    AND svn_item_closure_t.descendant_id == first_item_t._id
+                    AND svn_item_closure_t.depth >= {0 if include_first_items else 1}
+                )"""
+        else:
+            retVal = f"""
+                WITH RECURSIVE get_parents(__ID) AS
+                (
+                    SELECT first_item_t.{"_id" if include_first_items else "parent_id"}
+                    FROM svn_item_t AS first_item_t
+                    WHERE {first_items_condition}
+
+                    UNION
+
+                    SELECT parent_item_t.parent_id
+                    FROM svn_item_t parent_item_t, get_parents
+                    WHERE parent_item_t._id == get_parents.__ID
+                )"""
+        return retVal
 
     @contextmanager
     def reading_files_context(self):
@@ -342,20 +440,172 @@ class SVNTable(object):
             return
 
         if a_format == "guess":
-            _, extension = os.path.splitext(in_file)
-            a_format = map_info_extension_to_format[extension[1:]]
+            if self.is_binary_info_map_file(in_file):  # binary info maps might be named info_map.txt
+                a_format = "binary"
+            else:
+                _, extension = os.path.splitext(in_file)
+                a_format = map_info_extension_to_format[extension[1:]]
         self.comments.append(f"Original file {in_file}")
         if a_format in list(self.read_func_by_format.keys()):
-            with utils.open_for_read_file_or_url(in_file, config_vars=config_vars) as open_file:
+            snapshot_path = self.snapshot_path_for_file(in_file, a_format)
+            encoding = None if a_format == "binary" else 'utf-8'
+            with utils.open_for_read_file_or_url(in_file, config_vars=config_vars, encoding=encoding) as open_file:
                 if disable_indexes_during_read:
                     self.drop_indexes()
-                self.read_func_by_format[a_format](open_file.fd, progress_callback=progress_callback)
+                if snapshot_path is None or not self.read_from_snapshot(snapshot_path):
+                    self.read_func_by_format[a_format](open_file.fd, progress_callback=progress_callback)
+                    if snapshot_path is not None:
+                        self.write_to_snapshot(snapshot_path)
                 if disable_indexes_during_read:
                     self.create_indexes()
                 self.files_read_list.append(in_file)
         else:
             raise ValueError(f"Unknown read a_format {a_format}")
 
+    def snapshot_path_for_file(self, in_file, a_format):
+        """ Snapshots keep the rows of svn_item_t created by reading an info map file, so the next time
+            the same file is read the rows can be copied from the snapshot instead of parsing the file again.
+            Return the path to the snapshot of in_file, or None if snapshots cannot be used:
+            $(INFO_MAP_SNAPSHOT_FOLDER) is not defined, in_file is not a local file or svn_item_t is not empty.
+            The snapshot file name is a checksum of in_file's contents, a_format, the instl version and the
+            svn_item_t schema, so a change in any of these will not use an existing snapshot.
+        """
+        retVal = None
+        snapshot_folder = config_vars.get("INFO_MAP_SNAPSHOT_FOLDER", "").str()
+        if snapshot_folder and os.path.isfile(in_file) and not self.files_read_list and self.num_items() == 0:
+            table_sql = self.db.select_and_fetchall("""SELECT sql FROM sqlite_master WHERE type='table' AND name='svn_item_t'""")
+            instl_version = config_vars.resolve_str("$(__INSTL_VERSION_STR_SHORT__) $(__COMPILATION_TIME__)")
+            key_text = f"""{self.snapshot_format_version} {instl_version} {a_format} {table_sql} {utils.get_file_checksum(in_file)}"""
+            retVal = Path(snapshot_folder, utils.get_buffer_checksum(key_text.encode()) + ".db")
+        return retVal
+
+    def read_from_snapshot(self, snapshot_path) -> bool:
+        """ copy the rows saved by write_to_snapshot, return False if the snapshot does not exist or cannot be read """
+        retVal = False
+        if snapshot_path.is_file():
+            try:
+                self.db.curs.execute("""ATTACH DATABASE ? AS snapshot_db""", (os.fspath(snapshot_path),))
+                try:
+                    num_snapshot_items = self.db.select_and_fetchall("""SELECT COUNT(*) FROM snapshot_db.svn_item_t""")[0]
+                    with self.db.transaction("read_from_snapshot") as curs:
+                        curs.execute(f"""INSERT INTO main.svn_item_t ({self.snapshot_columns})
+                                         SELECT {self.snapshot_columns} FROM snapshot_db.svn_item_t ORDER BY _id""")
+                finally:
+                    self.db.curs.execute("""DETACH DATABASE snapshot_db""")
+                retVal = self.num_items() == num_snapshot_items  # transaction() does not raise sqlite3.OperationalError
+                if retVal:
+                    os.utime(snapshot_path)  # most recently used snapshots are kept
+                    log.info(f"read info map snapshot {snapshot_path}")
+            except sqlite3.Error as ex:
+                log.warning(f"""ignoring info map snapshot {snapshot_path}, {ex}""")
+        return retVal
+
+    def write_to_snapshot(self, snapshot_path) -> None:
+        temp_snapshot_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+        try:
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            utils.safe_remove_file(temp_snapshot_path)
+            self.db.curs.execute("""ATTACH DATABASE ? AS snapshot_db""", (os.fspath(temp_snapshot_path),))
+            try:
+                with self.db.transaction("write_to_snapshot") as curs:
+                    curs.execute(f"""CREATE TABLE snapshot_db.svn_item_t AS
+                                     SELECT _id, {self.snapshot_columns} FROM main.svn_item_t ORDER BY _id""")
+            finally:
+                self.db.curs.execute("""DETACH DATABASE snapshot_db""")
+            os.replace(temp_snapshot_path, snapshot_path)
+            max_snapshots = int(config_vars.get("INFO_MAP_SNAPSHOT_MAX_FILES", 4))
+            snapshot_files = sorted(snapshot_path.parent.glob("*.db"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for snapshot_file in snapshot_files[max_snapshots:]:
+                utils.safe_remove_file(snapshot_file)
+        except Exception as ex:  # failing to save a snapshot should not fail reading the info map
+            log.warning(f"""failed to save info map snapshot {snapshot_path}, {ex}""")
+            utils.safe_remove_file(temp_snapshot_path)
+
+    def info_map_lines(self):
+        """ yield (path, line) for each item ordered by path, line is the same as InfoMapFullWriter and InfoMapSplitWriter
+            write to text info maps.
+        """
+        with self.db.selection("info_map_lines") as curs:
+            curs.execute("""SELECT path, flags, revision, checksum, size, fileFlag FROM svn_item_t ORDER BY path""")
+            for path, flags, revision, checksum, size, file_flag in curs:
+                if file_flag:
+                    yield path, f"{path}, {flags}, {revision}, {checksum}, {size}"
+                else:
+                    yield path, f"{path}, {flags}, {revision}"
+
+    def info_map_lines_checksum(self) -> Tuple[int, str]:
+        """ number of items and checksum of their info_map_lines, used to verify applying an info map delta """
+        sha1ner = hashlib.sha1()
+        num_items = 0
+        for _, line in self.info_map_lines():
+            sha1ner.update(line.encode("utf-8"))
+            sha1ner.update(b"\n")
+            num_items += 1
+        return num_items, sha1ner.hexdigest()
+
+    def write_delta_to_file(self, delta_file_path, base_info_map_path, comment="") -> None:
+        """ write the changes needed to turn the items of info map file base_info_map_path into the items of this table:
+                -, path          item was removed
+                +, info map line item was added or changed
+                =, number of items, checksum    to verify the result of applying the delta
+        """
+        from db.dbMaster import DBMaster  # db imports svnTree
+        base_table = SVNTable(DBMaster(":memory:", self.db.ddl_files_dir))
+        try:
+            base_table.drop_indexes()  # indexes are not needed, and create_indexes would change $(MIN_REPO_REV), $(MAX_REPO_REV)
+            base_table.read_from_file(os.fspath(base_info_map_path))
+            base_lines = dict(base_table.info_map_lines())
+        finally:
+            base_table.db.close()
+        num_items = 0
+        sha1ner = hashlib.sha1()
+        with utils.utf8_open_for_write(delta_file_path, "w") as wfd:
+            if comment:
+                wfd.write(f"# {comment}\n")
+            for path, line in self.info_map_lines():
+                if base_lines.pop(path, None) != line:
+                    wfd.write(f"+, {line}\n")
+                sha1ner.update(line.encode("utf-8"))
+                sha1ner.update(b"\n")
+                num_items += 1
+            for path in base_lines:  # items not in this table
+                wfd.write(f"-, {path}\n")
+            wfd.write(f"=, {num_items}, {sha1ner.hexdigest()}\n")
+
+    def apply_delta_from_file(self, delta_file_path, progress_callback=None) -> None:
+        """ apply the changes written by write_delta_to_file to the items read from the delta's base info map.
+            Changed items are removed and added again, so _id order is not the same as reading the full info map.
+            raises ValueError if the result does not match the number of items and checksum written in the delta
+        """
+        removed_paths, changed_lines, expected = list(), list(), None
+        with utils.utf8_open_for_read(delta_file_path) as rfd:
+            for line in rfd:
+                if line.startswith("+, "):
+                    changed_lines.append(line[3:])
+                elif line.startswith("-, "):
+                    removed_paths.append(line[3:].rstrip("\n"))
+                elif line.startswith("=, "):
+                    num_items, checksum = line[3:].rstrip("\n").split(", ")
+                    expected = int(num_items), checksum
+        if expected is None:
+            raise ValueError(f"info map delta {delta_file_path} is incomplete")
+
+        changed_rows = io.StringIO("".join(changed_lines))
+        changed_rows.name = os.fspath(delta_file_path)
+        with self.db.transaction("apply_delta_from_file") as curs:
+            curs.execute("""CREATE TEMP TABLE IF NOT EXISTS delta_path_t (path TEXT)""")
+            curs.execute("""DELETE FROM delta_path_t""")
+            curs.executemany("""INSERT INTO delta_path_t (path) VALUES (?)""", [(path,) for path in removed_paths])
+            curs.executemany("""INSERT INTO delta_path_t (path) VALUES (?)""", ((row[0],) for row in csv.reader(changed_rows, skipinitialspace=True) if row))
+            curs.execute("""DELETE FROM svn_item_t WHERE path IN (SELECT path FROM delta_path_t)""")
+            curs.execute("""DROP TABLE delta_path_t""")
+        changed_rows.seek(0)
+        self.read_from_text(changed_rows, progress_callback=progress_callback)
+
+        result = self.info_map_lines_checksum()
+        if result != expected:
+            raise ValueError(f"applying info map delta {delta_file_path} resulted in {result}, expected {expected}")
+
     def read_from_svn_info(self, rfd, progress_callback=None) -> None:
         """ reads new items from svn info items prepared by iter_svn_info
             items are inserted in lexicographic directory order, so '/'
@@ -521,6 +771,166 @@ class SVNTable(object):
             for item in items:
                 wfd.write(f"{item.str_specific_fields(field_to_write)}\n")
 
+    def write_as_binary(self, wfd, items_list, comments=True, field_to_write=None, progress_callback=None) -> None:
+        """ write items as binary info map, the format is described above binary_info_map_magic.
+            Only path, flags, revision, checksum and size are written, for dirs only path, flags and revision
+            - same as write_as_text with InfoMapFullWriter.fields_relevant_to_info_map. comments and field_to_write are ignored.
+        """
+        strings = dict()
+        folders = dict()  # folder path => folder index
+        folder_parents = array.array('i')
+        folder_names = array.array('I')
+
+        def folder_index(folder_path):
+            retVal = folders.get(folder_path)
+            if retVal is None:
+                parent_path, separator, name = folder_path.rpartition("/")
+                folder_parents.append(folder_index(parent_path) if separator else -1)
+                folder_names.append(strings.setdefault(name, len(strings)))
+                retVal = folders[folder_path] = len(folders)
+            return retVal
+
+        row_folders, leaves, flags = array.array('i'), array.array('I'), array.array('I')
+        revisions, sizes = array.array('q'), array.array('q')
+        checksums = list()
+        for items in utils.iter_grouper(8192, items_list):
+            if progress_callback:
+                progress_callback(f"write {len(items)} rows to {wfd.name}")
+            for item in items:
+                folder_path, separator, leaf = item.path.rpartition("/")
+                row_folders.append(folder_index(folder_path) if separator else -1)
+                leaves.append(strings.setdefault(leaf, len(strings)))
+                flags.append(strings.setdefault(item.flags, len(strings)))
+                revisions.append(int(item.revision or 0))
+                if item.fileFlag:
+                    sizes.append(int(item.size or 0))
+                    checksums.append(item.checksum or None)
+                else:
+                    sizes.append(0)
+                    checksums.append(None)
+
+        no_checksum = "0" * 40
+        sha1_re = re.compile("[0-9a-f]{40}")
+        if all(checksum is None or (sha1_re.fullmatch(checksum) and checksum != no_checksum) for checksum in checksums):
+            checksum_kind = 0
+            checksums_data = b"".join(bytes.fromhex(checksum) if checksum else bytes(20) for checksum in checksums)
+        else:
+            checksum_kind = 1
+            checksums_data = array.array('I', (0xffffffff if checksum is None else strings.setdefault(checksum, len(strings)) for checksum in checksums))
+
+        strings_data = "\0".join(strings).encode("utf-8")
+        sections = [binary_info_map_header.pack(binary_info_map_magic, binary_info_map_version,
+                                                len(leaves), len(folders), checksum_kind, len(strings_data)),
+                    strings_data,
+                    folder_parents, folder_names,
+                    row_folders, leaves, flags, revisions, sizes, checksums_data]
+        out_stream = wfd.buffer
+        for section in sections:
+            if isinstance(section, array.array):
+                if sys.byteorder != "little":
+                    section = array.array(section.typecode, section)
+                    section.byteswap()
+                section = section.tobytes()
+            out_stream.write(section)
+            out_stream.write(bytes(-len(section) % 8))
+
+    @staticmethod
+    def is_binary_info_map_file(in_file) -> bool:
+        retVal = False
+        try:
+            with open(in_file, "rb") as rfd:
+                retVal = rfd.read(len(binary_info_map_magic)) == binary_info_map_magic
+        except (OSError, TypeError, ValueError):  # not a local file
+            pass
+        return retVal
+
+    def read_from_binary(self, rfd, progress_callback=None) -> None:
+        """ read binary info map written by write_as_binary. Local files are mapped to memory,
+            and level, parent and leaf of each item are calculated once per folder rather than for each item.
+        """
+        try:
+            buffer = mmap.mmap(rfd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):  # not a local file, or an empty file
+            buffer = rfd.read()
+        try:
+            with memoryview(buffer) as view:
+                magic, version, num_rows, num_folders, checksum_kind, strings_size = binary_info_map_header.unpack_from(view)
+                if magic != binary_info_map_magic or version != binary_info_map_version:
+                    raise ValueError(f"{rfd.name} is not a binary info map version {binary_info_map_version}")
+                offset = binary_info_map_header.size
+
+                def next_section(num_bytes):
+                    nonlocal offset
+                    retVal = view[offset:offset+num_bytes]
+                    offset += num_bytes + (-num_bytes % 8)
+                    return retVal
+
+                def next_column(typecode, count):
+                    retVal = array.array(typecode)
+                    retVal.frombytes(next_section(retVal.itemsize * count))
+                    if sys.byteorder != "little":
+                        retVal.byteswap()
+                    return retVal.tolist()
+
+                strings = str(next_section(strings_size), "utf-8").split("\0")
+                folder_parents = next_column('i', num_folders)
+                folder_names = next_column('I', num_folders)
+                row_folders = next_column('i', num_rows)
+                leaves = next_column('I', num_rows)
+                flags = next_column('I', num_rows)
+                revisions = next_column('q', num_rows)
+                sizes = next_column('q', num_rows)
+                if checksum_kind == 0:
+                    checksums_data = next_section(20 * num_rows).hex()
+                    checksums = [checksums_data[i:i+40] for i in range(0, 40 * num_rows, 40)]
+                    no_checksum = "0" * 40
+                    checksums = [None if checksum == no_checksum else checksum for checksum in checksums]
+                else:
+                    checksums = [None if i == 0xffffffff else strings[i] for i in next_column('I', num_rows)]
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+        # path, level of each folder, folders are written after their parent folder
+        folder_paths, folder_levels = list(), list()
+        for parent, name in zip(folder_parents, folder_names):
+            if parent == -1:
+                folder_paths.append(strings[name])
+                folder_levels.append(1)
+            else:
+                folder_paths.append(f"{folder_paths[parent]}/{strings[name]}")
+                folder_levels.append(folder_levels[parent] + 1)
+
+        is_file_flags = {i: 1 if 'f' in strings[i] else 0 for i in set(flags)}
+
+        def yield_row():
+            for folder, leaf, flags_index, revision, size, checksum in zip(row_folders, leaves, flags, revisions, sizes, checksums):
+                leaf = strings[leaf]
+                if folder == -1:
+                    path, parent, level = leaf, "", 1
+                else:
+                    parent = folder_paths[folder]
+                    path, level = f"{parent}/{leaf}", folder_levels[folder] + 1
+                wtar_match = utils.wtar_file_re.match(path) if ".wtar" in leaf else None
+                yield (path, strings[flags_index], revision, checksum, size,
+                       level, parent, leaf,
+                       is_file_flags[flags_index], 1 if wtar_match else 0, wtar_match['base_name'] if wtar_match else path,
+                       1 if leaf.endswith('.symlink') else 0)
+
+        description = f"read binary info_map from {rfd.name}"
+        with self.db.transaction(description=description, progress_callback=progress_callback) as curs:
+            insert_q = """
+                INSERT INTO svn_item_t (path, flags, revision,
+                                      checksum, size,
+                                      level, parent, leaf,
+                                      fileFlag, wtarFlag, unwtarred,
+                                      required, need_download,
+                                      symlinkFlag)
+                 VALUES(?,?,?,?,?,?,?,?,?,?,?,0,0,?);
+                """
+            for rows in utils.iter_grouper(8192, yield_row()):
+                curs.executemany(insert_q, rows)
+
     def initialize_from_folder(self, in_folder, progress_callback=None) -> None:
         def yield_row(_in_folder_) -> Generator:
             base_folder_len = len(_in_folder_) + 1
@@ -601,6 +1011,8 @@ class SVNTable(object):
     def clear_all(self) -> None:
         with self.db.transaction() as curs:
             curs.execute("DELETE FROM svn_item_t")
+            curs.execute(self.drop_closure_table_q)
+        self.closure_table_is_valid = False
         self.comments = list()
         self.files_read_list = list()
 
@@ -757,66 +1169,41 @@ class SVNTable(object):
         return retVal
 
     #oren TODO: perhaps we can do this actions on the previous walk on this folder
-    def get_files_that_should_be_removed_from_sync_folder(self, files_to_check, progress_callback=None) -> List[int]:
+    def get_files_that_should_be_removed_from_sync_folder(self, files_to_check, progress_callback=None) -> List[str]:
         """
-        :param files_to_check: a list of tuples [(partial_path, full_path), ...]
+        :param files_to_check: a list of partial paths, as they appear in info_map, of files found in the sync folder
         :param progress_callback: progress callback, if not None must accept a single string parameter and return None
-        :return: list of indexes into files_to_check who's partial path is not in info_map
+        :return: list of paths from files_to_check that should be removed from the sync folder
+        A file should stay in the sync folder if it is in info_map or under the install_sources of IIDs
+        that have custom info_map files. Since the exact paths of such files are not known, they are kept by prefix.
+        Paths are compared case insensitive for ascii letters, same as sqlite's LIKE operator.
+        Comparing is done with a set of paths and a set of prefixes for each prefix length,
+        so time is linear in the number of files.
         """
-        retVal = list()
-
-        with self.db.transaction(description="get_files_that_should_be_removed_from_sync_folder",
-                                 progress_callback=progress_callback) as curs:
-            create_table_text = """CREATE TEMP TABLE cache_folder_file_paths_t (path TEXT, remove BOOLEAN DEFAULT 1);"""
-            curs.execute(create_table_text)
-
-            # each partial path is inserted with it's index in the list
-            list_of_inserts = [(p,) for p in files_to_check]
-            insert_q = """INSERT INTO cache_folder_file_paths_t (path) VALUES (?);"""
-            curs.executemany(insert_q, list_of_inserts)
-
-            # create a list of files that should stay in the cache folder.
-            # the list is a combination of:
-            # - all files in known info_map files
-            # - all files appearing in IIDs that have custom info_map files.
-            # Since we do not know the exact path of such files, we append % to the folder names and later use LIKE
-
-            create_table_text = """CREATE TEMP TABLE do_not_remove_file_paths_t (path TEXT);"""
-            curs.execute(create_table_text)
-
-            path_that_should_stay_q = """
-                    INSERT INTO do_not_remove_file_paths_t (path)  
-                    SELECT install_sources_t.detail_value||"%" as __path
-                    FROM index_item_detail_t AS install_sources_t, index_item_detail_t as info_map_t
-                    WHERE install_sources_t.detail_name == "install_sources"
-                            AND info_map_t.detail_name == "info_map"
-                            AND info_map_t.owner_iid == install_sources_t.owner_iid
-                            AND install_sources_t.detail_value NOT IN (SELECT path FROM svn_item_t)
-                   UNION 
-                    SELECT svn_item_t.path as __path from svn_item_t
-                    ORDER BY __path
-                    """
-            curs.execute(path_that_should_stay_q)
-
-            # this query will mark not to remove all files found in the sync folder that are not in the info_map
-            # database, BUT will exclude those files in folders that have their own info_map for
-            # items that are not currently being installed.
-
-            update_paths_q = f"""
-                UPDATE cache_folder_file_paths_t
-                SET remove = 0
-                WHERE cache_folder_file_paths_t.path  in
-                (SELECT cache_folder_file_paths_t.path FROM cache_folder_file_paths_t, do_not_remove_file_paths_t
-                WHERE cache_folder_file_paths_t.path LIKE do_not_remove_file_paths_t.path)
-                """
-            curs.execute(update_paths_q)
-
-            get_to_remove_q = """
-                SELECT path from cache_folder_file_paths_t
-                WHERE remove=1
-                """
-            retVal.extend(self.db.select_and_fetchall(get_to_remove_q))
+        with self.db.selection(description="get_files_that_should_be_removed_from_sync_folder",
+                               progress_callback=progress_callback) as curs:
+            curs.execute("""SELECT lower(path) FROM svn_item_t""")
+            paths_that_should_stay = {row[0] for row in curs}
+            curs.execute("""
+                SELECT DISTINCT lower(install_sources_t.detail_value)
+                FROM index_item_detail_t AS install_sources_t, index_item_detail_t as info_map_t
+                WHERE install_sources_t.detail_name == "install_sources"
+                        AND info_map_t.detail_name == "info_map"
+                        AND info_map_t.owner_iid == install_sources_t.owner_iid
+                        AND install_sources_t.detail_value NOT IN (SELECT path FROM svn_item_t)
+                """)
+            prefixes_by_length = defaultdict(set)
+            for row in curs:
+                prefixes_by_length[len(row[0])].add(row[0])
 
+        retVal = list()
+        for path in files_to_check:
+            lower_path = path.lower() if path.isascii() else path.translate(ascii_lower_table)
+            if lower_path in paths_that_should_stay:
+                continue
+            if any(lower_path[:prefix_length] in prefixes for prefix_length, prefixes in prefixes_by_length.items()):
+                continue
+            retVal.append(path)
         return retVal
 
     def get_items(self, what="any") -> List[SVNRow]:
@@ -1039,18 +1426,7 @@ class SVNTable(object):
         file_or_dir_clause = {"file": "AND fileFlag=1", "dir": "AND fileFlag=0", "any": ""}[what]
 
         query_text = f"""
-            WITH RECURSIVE get_children(__ID) AS
-            (
-                SELECT first_item_t._id
-                FROM svn_item_t AS first_item_t
-                WHERE first_item_t.unwtarred == :dir_path
-
-                UNION
-
-                SELECT child_item_t._id
-                FROM svn_item_t child_item_t, get_children
-                WHERE child_item_t.parent_id = get_children.__ID
-            )
+            {self.get_children_cte("first_item_t.unwtarred == :dir_path")}
             SELECT _id, path, leaf, fileFlag
             FROM svn_item_t
             WHERE svn_item_t._id IN (SELECT __ID FROM get_children)
@@ -1066,19 +1442,8 @@ class SVNTable(object):
         """ get all file items in dir_path OR if the dir_path itself is wtarred - the wtarred file items.
             results are recursive so files from sub folders are also returned
         """
-        query_text = """
-            WITH RECURSIVE get_children(__ID) AS
-            (
-                SELECT first_item_t._id
-                FROM svn_item_t AS first_item_t
-                WHERE first_item_t.unwtarred == :dir_path
-
-                UNION
-
-                SELECT child_item_t._id
-                FROM svn_item_t child_item_t, get_children
-                WHERE child_item_t.parent_id = get_children.__ID
-            )
+        query_text = f"""
+            {self.get_children_cte("first_item_t.unwtarred == :dir_path")}
             SELECT *
             FROM svn_item_t
             WHERE svn_item_t._id IN (SELECT __ID FROM get_children)
@@ -1097,22 +1462,12 @@ class SVNTable(object):
         """
         retVal: int = 0
         with self.db.selection() as curs:
-            query_text = """
-                WITH RECURSIVE get_children(__ID, __PATH, __WTAR_FLAG) AS
-                (
-                    SELECT first_item_t._id, first_item_t.path, first_item_t.wtarFlag
-                    FROM svn_item_t AS first_item_t
-                    WHERE first_item_t.unwtarred == :dir_path
-
-                    UNION
-
-                    SELECT child_item_t._id, child_item_t.path, child_item_t.wtarFlag
-                    FROM svn_item_t child_item_t, get_children
-                    WHERE child_item_t.parent_id = get_children.__ID
-                )
+            query_text = f"""
+                {self.get_children_cte("first_item_t.unwtarred == :dir_path")}
                 SELECT COUNT(*)
-                FROM get_children
-                WHERE get_children.__WTAR_FLAG = 1
+                FROM svn_item_t
+                WHERE svn_item_t._id IN (SELECT __ID FROM get_children)
+                AND svn_item_t.wtarFlag = 1
                 """
             retVal = curs.execute(query_text, {'dir_path': dir_path}).fetchone()[0]
         return retVal
@@ -1134,7 +1489,8 @@ class SVNTable(object):
                         query_text = self.get_immediate_child_items_q
                     else:
                         query_text = self.get_child_items_q
-                    query_text = query_text.format(another_filter="")
+                    query_text = query_text.format(get_children=self.get_children_cte("first_item_t.parent_id == :parent_id"),
+                                                   another_filter="")
                     curs.execute(query_text, {"parent_id": root_dir_item._id})
                     retVal = curs.fetchall()
                     retVal = self.SVNRowListToObjects(retVal)
@@ -1182,20 +1538,8 @@ class SVNTable(object):
             mark their parent dirs are required as well
         """
         retVal = 0
-        query_text = """
-            WITH RECURSIVE get_parents(__ID, __PATH, __PARENT_ID) AS
-            (
-                SELECT file_item_t._id, file_item_t.path, file_item_t.parent_id
-                FROM svn_item_t AS file_item_t
-                WHERE file_item_t.fileFlag=1
-                AND file_item_t.required=1
-
-                UNION
-
-                SELECT parent_item_t._id, parent_item_t.path, parent_item_t.parent_id
-                FROM svn_item_t parent_item_t, get_parents
-                WHERE parent_item_t._id = get_parents.__PARENT_ID
-            )
+        query_text = f"""
+            {self.get_parents_cte("first_item_t.fileFlag=1 AND first_item_t.required=1", include_first_items=True)}
             UPDATE svn_item_t
             SET required=1
             WHERE _id IN (SELECT __ID FROM get_parents);
@@ -1205,7 +1549,21 @@ class SVNTable(object):
             retVal = curs.rowcount
         return retVal
 
-    def mark_need_download(self, progress_callback=None) -> None:
+    def mark_need_download(self, progress_callback=None, num_workers=None) -> None:
+        """ mark required files that are missing from disk or have the wrong checksum as need_download
+            and then mark the folders of these files.
+            num_workers: number of threads checksumming files, default is taken from $(PARALLEL_CHECKSUM).
+                0 means checksumming serially inside sqlite with the need_to_download_file function.
+        """
+        if num_workers is None:
+            num_workers = int(config_vars.get("PARALLEL_CHECKSUM", -1))
+        if num_workers == 0:
+            self.mark_need_download_files_serially(progress_callback=progress_callback)
+        else:
+            self.mark_need_download_files_in_parallel(progress_callback=progress_callback, num_workers=num_workers)
+        self.mark_need_download_folders(progress_callback=progress_callback)
+
+    def mark_need_download_files_serially(self, progress_callback=None) -> None:
         self.db.create_function("need_to_download_file", 2, utils.need_to_download_file)
         # mark files that need download
         query_text = """
@@ -1219,24 +1577,32 @@ class SVNTable(object):
         with self.db.transaction("mark_need_download", progress_callback=progress_callback,
                                  progress_callback_n_instructions=1024 * 10) as curs:
             curs.execute(query_text)
-        # mark folders of files that need download
-        query_text = """
-            WITH RECURSIVE get_parents(__PARENT_ID) AS
-            (
-                SELECT file_item_t.parent_id
-                FROM svn_item_t AS file_item_t
-                WHERE file_item_t.fileFlag=1
-                AND file_item_t.need_download=1
-
-                UNION
 
-                SELECT parent_item_t.parent_id
-                FROM svn_item_t parent_item_t, get_parents
-                WHERE parent_item_t._id = get_parents.__PARENT_ID
-            )
+    def mark_need_download_files_in_parallel(self, progress_callback=None, num_workers=None) -> None:
+        """ checksums are calculated outside of sqlite by utils.ChecksumEngine,
+            ids of files that need download are then updated in one transaction
+        """
+        query_text = """
+            SELECT _id, download_path, checksum
+            FROM svn_item_t
+            WHERE required == 1
+            AND ignore == 0
+            AND fileFlag == 1
+            """
+        candidates = [tuple(row) for row in self.db.select_and_fetchall(query_text)]
+        checksum_engine = utils.ChecksumEngine(num_workers=num_workers, progress_callback=progress_callback)
+        ids_to_download = checksum_engine.need_download(candidates)
+        with self.db.transaction("mark_need_download", progress_callback=progress_callback) as curs:
+            curs.executemany("""UPDATE svn_item_t SET need_download = 1 WHERE _id == ?""",
+                             [(_id,) for _id in ids_to_download])
+
+    def mark_need_download_folders(self, progress_callback=None) -> None:
+        # mark folders of files that need download
+        query_text = f"""
+            {self.get_parents_cte("first_item_t.fileFlag=1 AND first_item_t.need_download=1")}
             UPDATE svn_item_t
             SET need_download=1
-            WHERE _id IN (SELECT __PARENT_ID FROM get_parents)
+            WHERE _id IN (SELECT __ID FROM get_parents)
             """
         with self.db.transaction(description="mark_need_download_recursive",
                                  progress_callback=progress_callback) as curs:
@@ -1284,7 +1650,7 @@ class SVNTable(object):
         return min_revision, max_revision
 
     def mark_required_files_for_active_items(self, progress_callback=None) -> None:
-        script_text = """
+        script_text = f"""
             -- mark files and folders that appear in install_sources of required items
             UPDATE svn_item_t
             SET required=1
@@ -1303,36 +1669,13 @@ class SVNTable(object):
             );
 
             -- mark files and folders that are children of those appearing in install_sources of required items
-            WITH RECURSIVE get_children(__ID) AS
-            (
-                SELECT first_item_t._id
-                FROM svn_item_t AS first_item_t
-                WHERE required==1 AND fileFlag==0
-
-                UNION
-
-                SELECT child_item_t._id
-                FROM svn_item_t child_item_t, get_children
-                WHERE child_item_t.parent_id = get_children.__ID
-            )
+            {self.get_children_cte("first_item_t.required==1 AND first_item_t.fileFlag==0")}
             UPDATE svn_item_t
             SET required=1
             WHERE _id IN (SELECT __ID FROM get_children);
 
             -- mark the parent folders of all required items
-            WITH RECURSIVE get_parents(__ID) AS
-            (
-                SELECT file_item_t.parent_id
-                FROM svn_item_t AS file_item_t
-                WHERE file_item_t.fileFlag=1
-                AND file_item_t.required=1
-
-                UNION
-
-                SELECT parent_item_t.parent_id
-                FROM svn_item_t parent_item_t, get_parents
-                WHERE parent_item_t._id = get_parents.__ID
-            )
+            {self.get_parents_cte("first_item_t.fileFlag=1 AND first_item_t.required=1")}
             UPDATE svn_item_t
             SET required=1
             WHERE _id IN (SELECT __ID FROM get_parents);
@@ -1454,6 +1797,9 @@ class SVNTable(object):
         """
             items_to_update is a list of info_map items where download_root
             and download_path were changed.
+            An item in items_to_update can also describe all the items in a dir - see update_downloads_in_dir_q,
+            this allows setting download_path for many items without going through each one in python.
+            Updates are done in the order of items_to_update.
         """
         query_text = """
                 UPDATE svn_item_t
@@ -1461,8 +1807,51 @@ class SVNTable(object):
                     download_path=:download_path
                 WHERE _id=:_id
                 """
+        self.db.create_function("resolve_str", 1, config_vars.resolve_str)
         with self.db.transaction() as curs:
-            curs.executemany(query_text, items_to_update)
+            for is_dir, items in itertools.groupby(items_to_update, key=lambda item: "dir_path" in item):
+                if is_dir:
+                    update_downloads_in_dir_q = self.update_downloads_in_dir_q.format(
+                        get_children=self.get_children_cte("first_item_t.unwtarred == :dir_path", distinct=False))
+                    curs.executemany(update_downloads_in_dir_q, ({"resolve_indicator": config_vars.resolve_indicator, **item} for item in items))
+                else:
+                    curs.executemany(query_text, items)
+
+    # set download_root and download_path for all items in a dir (recursive), :dir_path being the source as it appears in index.yaml.
+    # download_path is :download_path_prefix followed by the item's path starting at character :path_start (1 based),
+    # resolved only if it contains $, the same as config_vars.resolve_str would.
+    # When :include_dirs is 0 only files are updated.
+    update_downloads_in_dir_q = """
+            {get_children}
+            UPDATE svn_item_t
+            SET download_root=:download_root,
+                download_path=CASE WHEN instr(:download_path_prefix || substr(path, :path_start), :resolve_indicator) == 0
+                                THEN :download_path_prefix || substr(path, :path_start)
+                                ELSE resolve_str(:download_path_prefix || substr(path, :path_start))
+                              END
+            WHERE svn_item_t._id IN (SELECT __ID FROM get_children)
+            AND (fileFlag==1 OR :include_dirs)
+            """
+
+    def count_recursive_paths_in_dir(self, dir_path, what="file") -> int:
+        """ number of items get_recursive_paths_in_dir would return, without fetching them """
+        if what not in ("file", "dir", "any"):
+            raise ValueError(f"{what} not a valid filter for get_item")
+
+        file_or_dir_clause = {"file": "AND fileFlag=1", "dir": "AND fileFlag=0", "any": ""}[what]
+
+        query_text = f"""
+            {self.get_children_cte("first_item_t.unwtarred == :dir_path", distinct=False)}
+            SELECT COUNT(*)
+            FROM get_children
+              JOIN svn_item_t ON svn_item_t._id == get_children.__ID
+            WHERE 1
+            {file_or_dir_clause}
+            """
+        with self.db.selection("count_recursive_paths_in_dir") as curs:  # called for each source, description saves inspecting the stack
+            curs.execute(query_text, {"dir_path": dir_path})
+            retVal = curs.fetchone()[0]
+        return retVal
 
     def SVNRowListToObjects(self, svn_row_list) -> List[SVNRow]:
         retVal = [SVNRow(item) for item in svn_row_list]
@@ -1477,7 +1866,8 @@ class SVNTable(object):
         if root_dir_item is not None:
             with self.db.selection() as curs:
                 query_text = self.count_child_items_q
-                query_text = query_text.format(another_filter="AND symlinkFlag==1")
+                query_text = query_text.format(get_children=self.get_children_cte("first_item_t.parent_id == :parent_id"),
+                                               another_filter="AND symlinkFlag==1")
                 curs.execute(query_text, {"parent_id": root_dir_item._id})
                 retVal = curs.fetchone()[0]
         return retVal
@@ -1485,19 +1875,8 @@ class SVNTable(object):
     def ignore_file_paths_of_dir(self, dir_path) -> int:
         """ mark all files inside a dir as ignored """
         retVal: int = 0
-        query_text = """
-            WITH RECURSIVE get_children(__ID) AS
-            (
-                SELECT first_item_t._id
-                FROM svn_item_t AS first_item_t
-                WHERE first_item_t.unwtarred == :dir_path
-
-                UNION
-
-                SELECT child_item_t._id
-                FROM svn_item_t child_item_t, get_children
-                WHERE child_item_t.parent_id == get_children.__ID
-            )
+        query_text = f"""
+            {self.get_children_cte("first_item_t.unwtarred == :dir_path")}
             UPDATE svn_item_t
             SET ignore=1
             WHERE svn_item_t._id IN (SELECT __ID FROM get_children)
@@ -4,6 +4,9 @@ from .str_utils import *
 from .searchPaths import SearchPaths
 from .parallel_run import run_processes_in_parallel, run_process
 from .multi_file import MultiFileReader
+from .wtar_compression import ParallelCompressingWriter, SplitFileWriter, get_wtar_codec, open_wtar_tarfile, wtar_codecs
+from .checksum_engine import ChecksumEngine
+from .checksum_cache import ChecksumCache, open_checksum_cache, close_checksum_cache, get_checksum_cache
 from .extract_info import extract_binary_info, check_binaries_versions_in_folder, check_binaries_versions_filter_with_ignore_regexes, get_info_from_plugin
 from .ls import disk_item_listing, single_disk_item_listing
 from .log_utils import *
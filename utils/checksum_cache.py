@@ -0,0 +1,170 @@
+#!/usr/bin/env python3.9
+
+
+import os
+import time
+import sqlite3
+import logging
+import atexit
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+log = logging.getLogger()
+
+
+"""
+    ChecksumCache remembers the sha1 checksum of files between runs, so files that
+    did not change since they were last checksummed need not be read again.
+
+    A file's checksum is considered valid as long as the file's
+    (path, size, mtime_ns, inode) did not change. Files whose modification time is
+    too close to the time they were checksummed are not cached, since a change
+    within the file system's time resolution might go unnoticed.
+
+    Entries are kept in a small sqlite database. All entries are loaded to memory
+    when the cache is opened and entries used or added during the run are written
+    back when the process exits. When the cache grows over max_entries the least
+    recently used entries are dropped.
+
+    utils.get_file_checksum consults the cache after calling:
+        utils.open_checksum_cache(path_to_cache_file, max_entries)
+"""
+
+# files modified less than this many nano seconds before being checksummed are not cached
+racy_mtime_window_ns = 2 * 1000 * 1000 * 1000
+
+
+class ChecksumCache(object):
+    create_table_q = """
+        CREATE TABLE IF NOT EXISTS checksum_cache_t
+        (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            checksum TEXT,
+            last_used INTEGER
+        );
+        """
+
+    def __init__(self, cache_file_path: os.PathLike, max_entries: int = 1000000) -> None:
+        self.cache_file_path = Path(cache_file_path)
+        self.max_entries = max_entries
+        self.entries: Dict[str, Tuple[int, int, int, str]] = dict()
+        self.used_paths = set()
+        self.removed_paths = set()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.run_time = int(time.time())
+        self.load()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({os.fspath(self.cache_file_path)!r}, max_entries={self.max_entries})"
+
+    def statistics(self) -> str:
+        return f"checksum cache: {self.hits} hits, {self.misses} misses, {len(self.entries)} entries"
+
+    def connect(self):
+        self.cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(os.fspath(self.cache_file_path))
+        conn.execute(self.create_table_q)
+        return conn
+
+    def load(self) -> None:
+        if self.cache_file_path.is_file():
+            try:
+                conn = self.connect()
+                try:
+                    for path, size, mtime_ns, inode, checksum in conn.execute("""SELECT path, size, mtime_ns, inode, checksum FROM checksum_cache_t"""):
+                        self.entries[path] = (size, mtime_ns, inode, checksum)
+                finally:
+                    conn.close()
+            except sqlite3.Error as ex:
+                log.warning(f"checksum cache {self.cache_file_path} could not be read and will be recreated, {ex}")
+                self.entries.clear()
+                self.cache_file_path.unlink(missing_ok=True)
+
+    def save(self) -> None:
+        """ write entries used or added during this run, and drop the least recently used if over max_entries
+        """
+        with self.lock:
+            to_write = [(path, *self.entries[path], self.run_time) for path in self.used_paths if path in self.entries]
+            to_remove = [(path,) for path in self.removed_paths]
+            self.used_paths.clear()
+            self.removed_paths.clear()
+        if not to_write and not to_remove:
+            return
+        try:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.executemany("""DELETE FROM checksum_cache_t WHERE path == ?""", to_remove)
+                    conn.executemany("""INSERT OR REPLACE INTO checksum_cache_t (path, size, mtime_ns, inode, checksum, last_used)
+                                        VALUES (?, ?, ?, ?, ?, ?)""", to_write)
+                    num_entries = conn.execute("""SELECT COUNT(*) FROM checksum_cache_t""").fetchone()[0]
+                    if num_entries > self.max_entries:
+                        conn.execute("""DELETE FROM checksum_cache_t WHERE path IN
+                                        (SELECT path FROM checksum_cache_t ORDER BY last_used LIMIT ?)""", (num_entries - self.max_entries,))
+            finally:
+                conn.close()
+        except sqlite3.Error as ex:
+            log.warning(f"checksum cache {self.cache_file_path} could not be written, {ex}")
+
+    def get_file_checksum(self, file_path, checksum_func) -> str:
+        """ return the cached checksum for file_path if the file did not change,
+            otherwise call checksum_func(file_path) and remember the result.
+        """
+        cache_key = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        stat_key = (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+        with self.lock:
+            cached = self.entries.get(cache_key)
+            if cached is not None and cached[:3] == stat_key:
+                self.hits += 1
+                self.used_paths.add(cache_key)
+                return cached[3]
+            self.misses += 1
+
+        checksum_start_ns = time.time_ns()
+        retVal = checksum_func(file_path)
+        with self.lock:
+            if file_stat.st_mtime_ns < checksum_start_ns - racy_mtime_window_ns:
+                self.entries[cache_key] = (*stat_key, retVal)
+                self.used_paths.add(cache_key)
+            elif cache_key in self.entries:
+                del self.entries[cache_key]
+                self.removed_paths.add(cache_key)
+        return retVal
+
+
+the_checksum_cache: Optional[ChecksumCache] = None
+
+
+def open_checksum_cache(cache_file_path, max_entries=0) -> Optional[ChecksumCache]:
+    """ start using a ChecksumCache stored in cache_file_path for all calls to utils.get_file_checksum.
+        if cache_file_path is empty the cache is not used.
+        the cache is saved when the process exits, hits and misses are logged then.
+    """
+    global the_checksum_cache
+    if cache_file_path:
+        if the_checksum_cache is None or the_checksum_cache.cache_file_path != Path(cache_file_path):
+            close_checksum_cache()
+            the_checksum_cache = ChecksumCache(cache_file_path, max_entries=max_entries if max_entries > 0 else 1000000)
+    return the_checksum_cache
+
+
+def close_checksum_cache() -> None:
+    global the_checksum_cache
+    if the_checksum_cache is not None:
+        the_checksum_cache.save()
+        log.info(the_checksum_cache.statistics())
+        the_checksum_cache = None
+
+
+def get_checksum_cache() -> Optional[ChecksumCache]:
+    return the_checksum_cache
+
+
+atexit.register(close_checksum_cache)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3.9
+
+
+import os
+import logging
+from concurrent import futures
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import utils
+
+log = logging.getLogger()
+
+
+"""
+    ChecksumEngine calculates sha1 checksums of many files concurrently.
+    Each file is read in chunks of utils.checksum_read_chunk_size bytes so memory
+    use is bounded by num_workers * chunk size regardless of the files' sizes.
+    hashlib releases the GIL while hashing large buffers, so a pool of threads
+    gives real parallelism for both the reading and the hashing.
+
+    Work is submitted in groups of group_size items, so the number of pending
+    futures stays bounded even for hundreds of thousands of files.
+
+    Example:
+        engine = ChecksumEngine(num_workers=8)
+        ids_to_download = engine.need_download([(_id, download_path, checksum), ...])
+"""
+
+
+def default_num_checksum_workers() -> int:
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+class ChecksumEngine(object):
+    def __init__(self, num_workers: Optional[int] = None, group_size: int = 8192, progress_callback: Optional[Callable] = None) -> None:
+        if not num_workers or num_workers < 1:
+            num_workers = default_num_checksum_workers()
+        self.num_workers = num_workers
+        self.group_size = group_size
+        self.progress_callback = progress_callback
+        self.num_files_checked = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(num_workers={self.num_workers}, group_size={self.group_size})"
+
+    def _report_progress(self, message):
+        if self.progress_callback:
+            self.progress_callback(message)
+
+    def map_in_groups(self, func: Callable, items: Iterable, description: str = "checksum") -> Iterator[Tuple[Any, Any]]:
+        """ apply func to each item using the worker pool, yield (item, result) in the original order
+        """
+        with futures.ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            for group in utils.iter_grouper(self.group_size, items):
+                results = executor.map(func, group)
+                yield from zip(group, results)
+                self.num_files_checked += len(group)
+                self._report_progress(f"{description} {self.num_files_checked} files")
+
+    @staticmethod
+    def _need_download_one(item: Tuple[Any, str, str]) -> bool:
+        _, file_path, expected_checksum = item
+        if not file_path:
+            return True
+        return utils.need_to_download_file(file_path, expected_checksum)
+
+    def need_download(self, items: Iterable[Tuple[Any, str, str]]) -> List[Any]:
+        """ items is an iterable of (key, file_path, expected_checksum)
+            return a list of keys for files that do not exist or whose checksum is not the expected one
+        """
+        retVal = [item[0] for item, need in self.map_in_groups(self._need_download_one, items, "need download") if need]
+        return retVal
+
+    def checksums(self, file_paths: Iterable[str]) -> List[Tuple[str, Optional[str]]]:
+        """ return list of (file_path, checksum), checksum is None for files that could not be read
+        """
+        def checksum_or_none(file_path):
+            try:
+                return utils.get_file_checksum(file_path)
+            except OSError:
+                return None
+        retVal = list(self.map_in_groups(checksum_or_none, file_paths))
+        return retVal
@@ -3,15 +3,19 @@
 import sys
 import os
 import re
+import errno
 import shutil
 import time
 import stat
 import fnmatch
+import functools
 from contextlib import contextmanager
 import ssl
 import subprocess
-from pathlib import Path
+from pathlib import Path, PurePath
 import logging
+if sys.platform == 'linux':
+    import fcntl
 
 log = logging.getLogger()
 
@@ -529,6 +533,89 @@ def smart_copy_file(source_path, destination_path):
             pass
 
 
+class FileCopier(object):
+    """ copy the contents of files with the fastest method the destination file system supports:
+        reflink - a copy on write clone sharing the source's blocks (btrfs, XFS),
+        kernel copy - os.copy_file_range, no data passes through user space,
+        buffered copy - shutil.copyfile, which uses sendfile on Linux and fcopyfile on Mac.
+        A method failing because the file system does not support it is not tried again,
+        so the first file copied probes the destination and later files go straight to the method that works.
+        copy_file returns the name of the method used, so callers can count them.
+    """
+    reflink = "reflinks"
+    kernel_copy = "kernel_copies"
+    buffered_copy = "buffered_copies"
+    FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+    unsupported_errnos = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS)
+
+    def __init__(self, reflink=True, kernel_copy=True) -> None:
+        self.try_reflink = reflink and sys.platform == 'linux'
+        self.try_kernel_copy = kernel_copy and hasattr(os, "copy_file_range")
+
+    def copy_file(self, src, dst) -> str:
+        """ copy contents of src to dst, symlinks are not followed. Raises shutil.SameFileError like shutil.copyfile """
+        retVal = None
+        if self.try_reflink or self.try_kernel_copy:
+            retVal = self.copy_file_in_kernel(src, dst)
+        if retVal is None:
+            shutil.copyfile(src, dst, follow_symlinks=False)
+            retVal = self.buffered_copy
+        return retVal
+
+    def copy_file_in_kernel(self, src, dst) -> Optional[str]:
+        """ return the method used or None if neither reflink nor kernel copy could copy src """
+        retVal = None
+        try:
+            # O_NONBLOCK so opening a named pipe does not wait for a writer
+            src_fd = os.open(src, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        except OSError as ose:
+            if ose.errno == errno.ELOOP:  # src is a symlink, leave it to shutil.copyfile
+                return retVal
+            raise
+        try:
+            src_stat = os.fstat(src_fd)
+            # leave pipes, sockets and devices to shutil.copyfile, and files reporting size 0 - which might still have contents, as in /proc
+            if not stat.S_ISREG(src_stat.st_mode) or src_stat.st_size == 0:
+                return retVal
+            # dst is truncated only after checking it's not src, opening with O_TRUNC would wipe src
+            dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT, 0o666)
+            try:
+                if os.path.samestat(src_stat, os.fstat(dst_fd)):
+                    raise shutil.SameFileError(f"{os.fspath(src)} and {os.fspath(dst)} are the same file")
+                os.ftruncate(dst_fd, 0)
+                if self.try_reflink:
+                    try:
+                        fcntl.ioctl(dst_fd, self.FICLONE, src_fd)
+                        retVal = self.reflink
+                    except OSError as ose:
+                        if ose.errno not in self.unsupported_errnos:
+                            raise
+                        self.try_reflink = False
+                        log.debug(f"reflink not supported copying {os.fspath(src)} to {os.fspath(dst)}, {ose}")
+                if retVal is None and self.try_kernel_copy:
+                    try:
+                        bytes_copied = 0
+                        while (num_copied := os.copy_file_range(src_fd, dst_fd, 1024 * 1024 * 1024)) > 0:
+                            bytes_copied += num_copied
+                        if bytes_copied == src_stat.st_size:
+                            retVal = self.kernel_copy
+                        else:  # some file systems return 0 before the end of the file
+                            self.try_kernel_copy = False
+                            log.debug(f"copy_file_range copied {bytes_copied} of {src_stat.st_size} bytes copying {os.fspath(src)} to {os.fspath(dst)}")
+                            os.ftruncate(dst_fd, 0)
+                    except OSError as ose:
+                        if ose.errno not in self.unsupported_errnos:
+                            raise
+                        self.try_kernel_copy = False
+                        log.debug(f"copy_file_range not supported copying {os.fspath(src)} to {os.fspath(dst)}, {ose}")
+                        os.ftruncate(dst_fd, 0)
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+        return retVal
+
+
 def find_split_files(first_file: Path):
     try:
         retVal = list()
@@ -575,6 +662,68 @@ def find_wtarred_parts_of_original(original: Path):
     return parts_list
 
 
+class PathPatternMatcher(object):
+    """ match paths against many glob patterns at once, with the same results as calling Path.match for each pattern.
+        Patterns are compiled once: patterns without wildcards are looked up by name, '*suffix' patterns
+        are checked with one str.endswith, other patterns of a single name are combined to one regex.
+        Patterns of more than one path component, which are rare, are checked with PurePath.match.
+        match(path) returns a matching pattern or None, path can be a str, Path or os.DirEntry -
+        only the name of the path is used, unless there are patterns of more than one component.
+        Like Path.match, matching is case insensitive on Windows.
+    """
+    wildcard_chars = ("*", "?", "[")
+
+    def __init__(self, patterns) -> None:
+        self.case_insensitive = sys.platform == 'win32'
+        self.names = dict()     # name -> pattern
+        self.suffixes = dict()  # suffix -> pattern
+        self.multi_part_patterns = list()
+        name_regexes = list()
+        self.regex_patterns = list()
+        for pattern in sorted(set(patterns)):
+            pattern_path = PurePath(pattern)
+            if pattern_path.anchor or len(pattern_path.parts) != 1:
+                self.multi_part_patterns.append(pattern)
+                continue
+            name_pattern = self.normcase(pattern_path.parts[0])
+            if not any(c in name_pattern for c in self.wildcard_chars):
+                self.names.setdefault(name_pattern, pattern)
+            elif name_pattern.startswith("*") and not any(c in name_pattern[1:] for c in self.wildcard_chars):
+                self.suffixes.setdefault(name_pattern[1:], pattern)
+            else:
+                name_regexes.append(f"(?P<p{len(self.regex_patterns)}>{fnmatch.translate(name_pattern)})")
+                self.regex_patterns.append(pattern)
+        self.suffixes_tuple = tuple(self.suffixes)
+        self.regex = re.compile("|".join(name_regexes)) if name_regexes else None
+
+    @classmethod
+    @functools.lru_cache(maxsize=64)
+    def for_patterns(cls, patterns: tuple):
+        """ return a PathPatternMatcher for patterns, commands with the same patterns share the compiled matcher """
+        return cls(patterns)
+
+    def normcase(self, name: str) -> str:
+        return name.lower() if self.case_insensitive else name
+
+    def match(self, path) -> Optional[str]:
+        retVal = None
+        if isinstance(path, (os.DirEntry, PurePath)):
+            name = path.name
+        else:
+            name = os.path.basename(os.path.normpath(path))
+        name = self.normcase(name)
+        if name in self.names:
+            retVal = self.names[name]
+        elif self.suffixes_tuple and name.endswith(self.suffixes_tuple):
+            retVal = next(pattern for suffix, pattern in self.suffixes.items() if name.endswith(suffix))
+        elif self.regex is not None and (match := self.regex.match(name)) is not None:
+            retVal = self.regex_patterns[int(match.lastgroup[1:])]
+        elif self.multi_part_patterns:
+            pure_path = PurePath(os.fspath(path))
+            retVal = next((pattern for pattern in self.multi_part_patterns if pure_path.match(pattern)), None)
+        return retVal
+
+
 def scandir_walk(top_path, report_files=True, report_dirs=True, follow_symlinks=False):
     """ Walk a folder hierarchy using the new and fast os.scandir, yielding
 
@@ -406,7 +406,7 @@ def wtar_ls_func(root_file_or_folder_path, ls_format):
     try:
         what_to_work_on = utils.find_split_files(root_file_or_folder_path)
         with utils.MultiFileReader("br", what_to_work_on) as fd:
-            with tarfile.open(fileobj=fd) as tar:
+            with utils.open_wtar_tarfile(fd) as tar:
                 pax_headers = tar.pax_headers
                 for item in tar:
                     listing_lines.append(wtar_item_ls_func(item, ls_format))
@@ -17,6 +17,7 @@ from decimal import Decimal
 import logging
 from functools import reduce, wraps, lru_cache
 import itertools
+import heapq
 import tarfile
 import types
 import asyncio
@@ -299,17 +300,31 @@ def check_buffer_checksum(buff, expected_checksum):
     return retVal
 
 
+# files are checksummed in chunks of this size, so memory use does not grow with the file's size
+checksum_read_chunk_size = 1024 * 1024
+
+
 def check_file_checksum(file_path, expected_checksum):
     retVal = False  # if file does not exist return False
     if file_path and expected_checksum:  # prevent reading the file if file_path or expected_checksum is None
         try:
-            with open(file_path, "rb") as rfd:
-                retVal = check_buffer_checksum(rfd.read(), expected_checksum)
+            retVal = compare_checksums(get_file_checksum(file_path), expected_checksum)
         except:
             pass
     return retVal
 
 
+def get_fd_checksum(rfd, chunk_size=checksum_read_chunk_size):
+    """ return the sha1 checksum of the contents of an open binary file object,
+        reading chunk_size bytes at a time.
+    """
+    sha1ner = hashlib.sha1()
+    for chunk in iter(lambda: rfd.read(chunk_size), b""):
+        sha1ner.update(chunk)
+    retVal = sha1ner.hexdigest()
+    return retVal
+
+
 def get_file_checksum(file_path, follow_symlinks=True):
     """ return the sha1 checksum of the contents of a file.
         If file_path is a symbolic link and follow_symlinks is True
@@ -320,8 +335,18 @@ def get_file_checksum(file_path, follow_symlinks=True):
     if os.path.islink(file_path) and not follow_symlinks:
         retVal = get_buffer_checksum(os.readlink(file_path).encode())
     else:
-        with open(file_path, "rb") as rfd:
-            retVal = get_buffer_checksum(rfd.read())
+        checksum_cache = utils.get_checksum_cache()
+        if checksum_cache is not None:
+            retVal = checksum_cache.get_file_checksum(file_path, read_file_checksum)
+        else:
+            retVal = read_file_checksum(file_path)
+    return retVal
+
+
+def read_file_checksum(file_path):
+    """ return the sha1 checksum of the contents of a file, without consulting the checksum cache """
+    with open(file_path, "rb") as rfd:
+        retVal = get_fd_checksum(rfd)
     return retVal
 
 
@@ -694,7 +719,7 @@ def get_wtar_total_checksum(wtar_file_path):
         if os.path.isfile(wtar_file_path):
             wtar_file_paths = utils.find_split_files(wtar_file_path)
             with utils.MultiFileReader("br", wtar_file_paths) as fd:
-                with tarfile.open(fileobj=fd) as tar:
+                with utils.open_wtar_tarfile(fd) as tar:
                     tar_total_checksum = tar.pax_headers.get("total_checksum")
     except Exception as ex:
         pass  # return None if there was exception from any reason
@@ -811,6 +836,26 @@ def partition_list(in_list, partition_condition):
     return list_of_lists
 
 
+def partition_by_total_size(in_list, num_partitions, size_func):
+    """ divide a list to num_partitions sub lists so that the total size of each sub list is as equal as possible.
+        items are assigned from largest to smallest, each to the sub list with the smallest total so far (LPT),
+        of sub lists with the same total the one with fewest items - so zero size items are spread too.
+        there are no empty sub lists unless there are less items than num_partitions,
+        the sub lists are returned from the largest total size to the smallest.
+        e.g. partition_by_total_size([5, 1, 4, 2, 3], 2, lambda x: x) will return: [[5, 2, 1], [4, 3]]
+    """
+    totals_heap = [(0, 0, i) for i in range(max(1, num_partitions))]
+    list_of_lists = [[] for _ in totals_heap]
+    totals = [0] * len(totals_heap)
+    for item in sorted(in_list, key=size_func, reverse=True):
+        total, num_items, i = heapq.heappop(totals_heap)
+        list_of_lists[i].append(item)
+        totals[i] = total + size_func(item)
+        heapq.heappush(totals_heap, (totals[i], num_items + 1, i))
+    retVal = [a_list for total, a_list in sorted(zip(totals, list_of_lists), key=lambda t: t[0], reverse=True) if a_list]
+    return retVal
+
+
 def iter_grouper(n, iterable):
     """ take iterator and yield groups of size <= n """
     i = iter(iterable)
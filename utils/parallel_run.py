@@ -4,13 +4,12 @@
 import subprocess
 import sys
 import os
-import time
 import signal
 import logging
 import psutil
 from itertools import repeat
+import threading
 from concurrent import futures
-from threading import Timer
 
 import utils
 
@@ -19,86 +18,108 @@ log = logging.getLogger()
 exit_val = 0
 aborted = False
 process_list = list()
+process_list_lock = threading.RLock()
+parallel_stop_event = None  # the stop event of the running run_processes_in_parallel call, None when no call is running
+abort_file_check_interval = 0.25  # seconds
 
 
 class ProcessTerminatedExternally(RuntimeError):
     pass
 
 
-class ContinuousTimer(Timer):
+def run_processes_in_parallel(commands, shell=False, do_enqueue_output=True, abort_file=None, max_parallel_processes=None):
+    """ run commands in parallel, a "wait" command will wait for all previous commands to finish.
+        max_parallel_processes: if given, no more than max_parallel_processes will run at the same time,
+        the next command will start when a previous one finishes.
+        when a command fails, or abort_file is removed, all running commands are terminated and
+        commands not yet started are not started.
     """
-    See: https://hg.python.org/cpython/file/2.7/Lib/threading.py#l1079
-    """
-
-    def run(self):
-        while not self.finished.is_set():
-            self.finished.wait(self.interval)
-            self.function(*self.args, **self.kwargs)
-
-        self.finished.set()
-
-
-def run_processes_in_parallel(commands, shell=False, do_enqueue_output=True, abort_file=None):
     global exit_val
+    global aborted
+    global parallel_stop_event
+    exit_val = 0
+    aborted = False
+    # set when no more processes should be launched: a process failed, aborted or signaled
+    stop_event = parallel_stop_event = threading.Event()
+    stop_watching_abort_file = None
     try:
         install_signal_handlers()
+        if abort_file is not None:
+            stop_watching_abort_file = watch_abort_file(abort_file)
 
         lists_of_command_lists = utils.partition_list(commands, lambda c: c[0] == "wait")
 
         for command_list in lists_of_command_lists:
-            with futures.ThreadPoolExecutor(len(command_list)) as executor:
-                list(executor.map(run_process, command_list, repeat(shell), repeat(do_enqueue_output), repeat(abort_file)))
+            num_workers = len(command_list)
+            if max_parallel_processes:
+                num_workers = min(num_workers, max_parallel_processes)
+            with futures.ThreadPoolExecutor(num_workers) as executor:
+                list(executor.map(run_process, command_list, repeat(shell), repeat(do_enqueue_output), repeat(None), repeat(stop_event)))
+            if stop_event.is_set():
+                raise ProcessTerminatedExternally(f"aborted before running {len(command_list)} commands")
         log.debug('Finished all processes')
         exit_val = 0
         killall_and_exit()
     except Exception as e:
         log.error(e)
         killall_and_exit()
+    finally:
+        parallel_stop_event = None
+        if stop_watching_abort_file is not None:
+            stop_watching_abort_file.set()
 
 
-def run_process(command, shell, do_enqueue_output=True, abort_file=None):
+def run_process(command, shell, do_enqueue_output=True, abort_file=None, stop_event=None):
     """
     Running a sub-process externally
     Args:
         command: The command to run as sub-process. list/string (when using shell=True)
         shell: Running the command in a shell
-        do_enqueue_output: Printing sub-process output to the log file.
-                           Should be used only when calling processes that are not instl.
-                           The option blocks the main process and can't be used when using abort_file.
+        do_enqueue_output: Printing sub-process output, stdout and stderr, to the log file line by line.
         abort_file: Using an abort file to monitor and killing the process in case the file was deleted.
-                    This option overrides do_enqueue_output to be able to monitor the abort file.
+        stop_event: the stop event of run_processes_in_parallel, when set the process is not launched.
+    The calling thread blocks until the process exits, output is read by a separate thread, so no
+    CPU is used while waiting. If the process fails all other running processes are terminated.
     """
     global exit_val
-    global process_list
-    if abort_file is not None:  # Disabling enqueue_output if abort file is used.
-        do_enqueue_output = False
-    a_process = launch_process(command, shell, do_enqueue_output)
-    process_list.append(a_process)
-    t = None
+    stop_watching_abort_file = None
     if abort_file is not None:
-        t = ContinuousTimer(1, check_abort_file, args=[abort_file])
-        t.start()
-
+        stop_watching_abort_file = watch_abort_file(abort_file)
     try:
-        while True:
-            if do_enqueue_output:  # Calling enqueue_output only if abort file is not used.
-                enqueue_output(a_process)
-            status = a_process.poll()
-            if status is not None:  # None means it's still alive
-                log.debug(f'Process finished - {command}')
-                if aborted:
+        a_process = launch_process(command, shell, do_enqueue_output, stop_event)
+        if a_process is None:  # stopped before launch because another process failed or was aborted
+            return
+        output_thread = None
+        if do_enqueue_output:
+            output_thread = threading.Thread(target=enqueue_output, args=(a_process,), daemon=True)
+            output_thread.start()
+        try:
+            status = a_process.wait()
+            if output_thread is not None:
+                output_thread.join()
+        finally:
+            with process_list_lock:
+                process_list.remove(a_process)
+        log.debug(f'Process finished - {command}')
+        if aborted:
+            exit_val = status
+            raise ProcessTerminatedExternally(command)
+        elif status != 0:
+            with process_list_lock:
+                terminated_by_other_process = stop_event is not None and stop_event.is_set()
+                if not terminated_by_other_process:  # only the first failure sets exit_val
                     exit_val = status
-                    raise ProcessTerminatedExternally(command)
-                elif status != 0:
-                    exit_val = status
-                    raise RuntimeError(f'Command failed {command}')
-                break
+                    terminate_all_processes()
+            if terminated_by_other_process:
+                raise ProcessTerminatedExternally(command)
+            raise RuntimeError(f'Command failed {command}')
     finally:
-        if t is not None:
-            t.cancel()
+        if stop_watching_abort_file is not None:
+            stop_watching_abort_file.set()
 
 
-def launch_process(command, shell, do_enqueue_output):
+def launch_process(command, shell, do_enqueue_output, stop_event=None):
+    """ launch a process and add it to process_list, unless stop_event was set - in which case return None """
     global exit_val
     if shell:
         full_command = " ".join(command)
@@ -109,48 +130,52 @@ def launch_process(command, shell, do_enqueue_output):
     if getattr(os, "setsid", None):  # UNIX
         kwargs['preexec_fn'] = os.setsid
     if do_enqueue_output:
-        kwargs.update({'stdout': subprocess.PIPE, 'stderr': subprocess.PIPE, 'bufsize': 128})
-    try:
-        a_process = subprocess.Popen(full_command, shell=shell, env=os.environ, **kwargs)
-    except Exception as e:
-        exit_val = 31
-        raise RuntimeError(f"failed to start {command}") from e
+        kwargs.update({'stdout': subprocess.PIPE, 'stderr': subprocess.STDOUT})
+    with process_list_lock:  # so terminate_all_processes will not miss a process being launched
+        if stop_event is not None and stop_event.is_set():
+            return None
+        try:
+            a_process = subprocess.Popen(full_command, shell=shell, env=os.environ, **kwargs)
+        except Exception as e:
+            exit_val = 31
+            raise RuntimeError(f"failed to start {command}") from e
+        process_list.append(a_process)
     return a_process
 
 
 def enqueue_output(a_process):
-    out = a_process.stdout
-    try:
-        buffer = ''
-        while True:
-            time.sleep(0)  # Releasing thread to yield other threads to do work
-            if a_process.poll() is not None:
+    """ log the output of a_process line by line, blocks until the process closes its output """
+    with a_process.stdout as out:
+        try:
+            for line in iter(out.readline, b''):
+                log.info(line.decode('utf-8', errors='backslashreplace').rstrip('\r\n'))
+        except ValueError:
+            pass  # on mac the stdout is closed when the process is terminated. In this case we ignore
+
+
+def watch_abort_file(abort_file):
+    """ watch abort_file from a separate thread, and terminate all processes if it is removed.
+        return an Event that when set will stop the watching.
+    """
+    stop_watching = threading.Event()
+
+    def abort_file_watcher():
+        while not stop_watching.wait(abort_file_check_interval):
+            if check_abort_file(abort_file):
                 break
-            b = out.read(128).decode('utf-8', errors='backslashreplace')  # Reading stream to buffer
-            if b:
-                buffer += b
-                if '\n' in buffer:
-                    to_print = buffer.split('\n')
-                    for line in to_print[:-1]:  # Logging every line except the last one in the buffer
-                        log.info(line.strip('\r\n'))
-                    if to_print[-1].endswith('\n'):  # In case the last line in the buffer ends with a newline
-                        log.info(to_print[-1].strip('\r\n'))
-                    else:
-                        buffer = to_print[-1]  # Store the rest for the next round of read
 
-    except ValueError as e:
-        pass  # on mac the stdout is closed when the process is terminated. In this case we ignore
-    finally:
-        if not out.closed:
-            out.close()
+    threading.Thread(target=abort_file_watcher, daemon=True, name="abort file watcher").start()
+    return stop_watching
 
 
 def check_abort_file(abort_file):
     global aborted
-    if not os.path.exists(abort_file):
+    retVal = not os.path.exists(abort_file)
+    if retVal:
         aborted = True
         log.debug(f'Process aborted - Abort file not found {abort_file}')
-        killall_and_exit()
+        terminate_all_processes()
+    return retVal
 
 
 def signal_handler(signum, frame):
@@ -159,14 +184,26 @@ def signal_handler(signum, frame):
     killall_and_exit()
 
 
+def terminate_all_processes():
+    """ terminate all running processes and prevent run_processes_in_parallel from launching new processes """
+    stop_event = parallel_stop_event
+    if stop_event is not None:
+        stop_event.set()
+    with process_list_lock:
+        for a_process in process_list:
+            status = a_process.poll()
+            if status is None:  # None means it's still alive
+                try:
+                    if getattr(os, "killpg", None):
+                        os.killpg(a_process.pid, signal.SIGTERM)  # Unix
+                    else:
+                        kill_proc_tree(a_process.pid)  # Windows
+                except (ProcessLookupError, psutil.NoSuchProcess):
+                    pass  # process ended just now
+
+
 def killall_and_exit():
-    for a_process in process_list:
-        status = a_process.poll()
-        if status is None:  # None means it's still alive
-            if getattr(os, "killpg", None):
-                os.killpg(a_process.pid, signal.SIGTERM)  # Unix
-            else:
-                kill_proc_tree(a_process.pid)  # Windows
+    terminate_all_processes()
     sys.exit(exit_val)
 
 
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3.9
+
+"""
+    Writing and reading the compressed stream of wtar files.
+
+    ParallelCompressingWriter compresses a stream in blocks, by a pool of threads. Each block
+    is compressed to an independent stream and the output is these streams one after the other -
+    the way pbzip2 does it. Decompressors read such concatenated streams as one stream,
+    so tarfile reads the archives as before.
+    SplitFileWriter writes a stream to parts named .aa, .ab, ... while the stream is written.
+
+    bz2 is always available, zstd and lz4 when the zstandard or lz4 modules are installed.
+    Compression is identified by the magic bytes at the start of the stream, so wtar file names
+    do not change: open_wtar_tarfile opens a wtar with whatever compression it was written.
+
+    Example:
+        with SplitFileWriter(Path("a.wtar"), max_size=5*1024*1024) as split_writer:
+            with ParallelCompressingWriter(split_writer, get_wtar_codec("bz2"), num_workers=8) as compressing_writer:
+                with tarfile.open(fileobj=compressing_writer, mode="w|") as tar:
+                    tar.add("a")
+"""
+
+import io
+import bz2
+import string
+import tarfile
+from collections import deque, namedtuple
+from concurrent import futures
+from pathlib import Path
+
+import utils
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+def _bz2_compress_block(data, level):
+    return bz2.compress(data, level)
+
+
+def _zstd_compress_block(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _zstd_open_decompressed(fileobj):
+    return zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True)
+
+
+def _lz4_compress_block(data, level):
+    return lz4.frame.compress(data, compression_level=level)
+
+
+def _lz4_open_decompressed(fileobj):
+    return lz4.frame.LZ4FrameFile(fileobj, mode="rb")
+
+
+# block_size: input bytes compressed to each stream, bigger blocks compress better but less in parallel.
+# open_decompressed is None when tarfile can read the compression by itself
+WtarCodec = namedtuple("WtarCodec", ["name", "magic", "block_size", "default_level", "available", "compress_block", "open_decompressed"])
+
+wtar_codecs = {
+    "bz2": WtarCodec("bz2", b"BZh", 900 * 1024, 1, True, _bz2_compress_block, None),
+    "zstd": WtarCodec("zstd", b"\x28\xb5\x2f\xfd", 4 * 1024 * 1024, 3, zstandard is not None, _zstd_compress_block, _zstd_open_decompressed),
+    "lz4": WtarCodec("lz4", b"\x04\x22\x4d\x18", 4 * 1024 * 1024, 0, lz4 is not None, _lz4_compress_block, _lz4_open_decompressed),
+}
+
+
+def get_wtar_codec(name) -> WtarCodec:
+    codec = wtar_codecs.get(name)
+    if codec is None:
+        raise ValueError(f"unknown wtar compression '{name}', known compressions are: {', '.join(wtar_codecs)}")
+    if not codec.available:
+        raise ValueError(f"wtar compression '{name}' is not available, python module for {name} is not installed")
+    return codec
+
+
+def open_wtar_tarfile(fileobj) -> tarfile.TarFile:
+    """ open a wtar stream for reading, fileobj should be seekable, e.g. utils.MultiFileReader """
+    magic = fileobj.read(max(len(codec.magic) for codec in wtar_codecs.values()))
+    fileobj.seek(0)
+    for codec in wtar_codecs.values():
+        if codec.open_decompressed is not None and magic.startswith(codec.magic):
+            if not codec.available:
+                raise tarfile.ReadError(f"wtar is compressed with {codec.name}, python module for {codec.name} is not installed")
+            return tarfile.open(fileobj=codec.open_decompressed(fileobj), mode="r|")
+    return tarfile.open(fileobj=fileobj)
+
+
+class ParallelCompressingWriter(io.RawIOBase):
+    """ compress what is written in blocks of codec.block_size by num_workers threads and write the
+        compressed blocks, in order, to out_file. With num_workers <= 1 blocks are compressed by the writing thread.
+        The output does not depend on num_workers. out_file is not closed.
+    """
+    def __init__(self, out_file, codec: WtarCodec, num_workers=1, level=None) -> None:
+        super().__init__()
+        self.out_file = out_file
+        self.codec = codec
+        self.level = level if level is not None else codec.default_level
+        self.buffer = bytearray()
+        self.pool = futures.ThreadPoolExecutor(num_workers, thread_name_prefix="compress") if num_workers > 1 else None
+        self.pending_blocks = deque()
+        self.max_pending_blocks = num_workers * 2  # keep all threads busy while the oldest block is written
+
+    @staticmethod
+    def memory_estimate(codec: WtarCodec, num_workers) -> int:
+        """ rough peak memory of compressing: blocks being compressed or waiting to be written, and the block being filled """
+        return codec.block_size * (max(1, num_workers) * 2 + 2) * 2
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.codec.block_size:
+            block_start = 0
+            while len(self.buffer) - block_start >= self.codec.block_size:
+                self.compress_block(bytes(self.buffer[block_start:block_start + self.codec.block_size]))
+                block_start += self.codec.block_size
+            del self.buffer[:block_start]
+        return len(data)
+
+    def compress_block(self, block):
+        if self.pool is None:
+            self.out_file.write(self.codec.compress_block(block, self.level))
+        else:
+            self.pending_blocks.append(self.pool.submit(self.codec.compress_block, block, self.level))
+            while len(self.pending_blocks) > self.max_pending_blocks:
+                self.out_file.write(self.pending_blocks.popleft().result())
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self.buffer:
+                    self.compress_block(bytes(self.buffer))
+                    self.buffer.clear()
+                while self.pending_blocks:
+                    self.out_file.write(self.pending_blocks.popleft().result())
+            finally:
+                if self.pool is not None:
+                    self.pool.shutdown(cancel_futures=True)
+                super().close()
+
+
+class SplitFileWriter(io.RawIOBase):
+    """ write to parts of at most max_size bytes, named like SplitFile names them: base_path.aa, base_path.ab, ...
+        Unlike SplitFile parts are not of equal size, since the total size is not known while writing -
+        all parts are max_size bytes except the last one. If max_size is 0 all is written to one part, base_path.aa.
+    """
+    num_two_letter_parts = len(string.ascii_lowercase) ** 2
+
+    def __init__(self, base_path: Path, max_size=0) -> None:
+        super().__init__()
+        self.base_path = Path(base_path)
+        self.max_size = max_size
+        self.part_paths = list()
+        self.current_part = None
+        self.current_part_size = 0
+
+    @staticmethod
+    def part_extension(part_index, extension_length):
+        """ part_extension(0, 2) = "aa", part_extension(27, 2) = "bb" """
+        letters = list()
+        for _ in range(extension_length):
+            part_index, letter_index = divmod(part_index, len(string.ascii_lowercase))
+            letters.append(string.ascii_lowercase[letter_index])
+        return "".join(reversed(letters))
+
+    def part_path(self, part_index, extension_length):
+        return self.base_path.with_name(f"{self.base_path.name}.{self.part_extension(part_index, extension_length)}")
+
+    def writable(self):
+        return True
+
+    def open_next_part(self):
+        if self.current_part is not None:
+            self.current_part.close()
+        part_index = len(self.part_paths)
+        if part_index < self.num_two_letter_parts:
+            part_path = self.part_path(part_index, 2)
+        else:  # renamed when closing, see rename_parts_to_longer_extensions
+            part_path = self.base_path.with_name(f"{self.base_path.name}.part{part_index}")
+        self.current_part = open(part_path, "wb")
+        utils.chown_chmod_on_fd(self.current_part)
+        self.current_part_size = 0
+        self.part_paths.append(part_path)
+
+    def write(self, data):
+        data = memoryview(data)
+        written = 0
+        while written < len(data) or self.current_part is None:
+            if self.current_part is None or (self.max_size and self.current_part_size >= self.max_size):
+                self.open_next_part()
+            to_write = len(data) - written
+            if self.max_size:
+                to_write = min(to_write, self.max_size - self.current_part_size)
+            self.current_part.write(data[written:written + to_write])
+            self.current_part_size += to_write
+            written += to_write
+        return len(data)
+
+    def rename_parts_to_longer_extensions(self):
+        """ more than 26*26 parts need extensions of 3 or more letters, and all parts should have the same length of extension
+            so sorting the names will give the order of the parts.
+        """
+        extension_length = 3
+        while len(string.ascii_lowercase) ** extension_length < len(self.part_paths):
+            extension_length += 1
+        temp_paths = [part_path.rename(part_path.with_name(part_path.name + ".tmp")) for part_path in self.part_paths]
+        self.part_paths = [temp_path.rename(self.part_path(part_index, extension_length)) for part_index, temp_path in enumerate(temp_paths)]
+
+    def close(self):
+        if not self.closed:
+            try:
+                if self.current_part is None:  # nothing was written, still create the first part
+                    self.open_next_part()
+                self.current_part.close()
+                if len(self.part_paths) > self.num_two_letter_parts:
+                    self.rename_parts_to_longer_extensions()
+            finally:
+                super().close()